@@ -634,9 +634,21 @@ def PositionedDevice(latitude, longitude):
     return Device(components={'position': _PositionedDeviceComponent(latitude, longitude)})
 
 
+def get_device_position(device):
+    """Return the (latitude, longitude) of a device as given by PositionedDevice, or None if it has no position."""
+    for component in six.itervalues(IDevice(device).get_components_dict()):
+        if IPositionedDevice.providedBy(component):
+            track = component.get_track()
+            return (track.latitude.value, track.longitude.value)
+    return None
+
+
+__all__.append('get_device_position')
+
+
 class IPositionedDevice(Interface):
     """
-    Client marker interface only.
+    Marker interface for device components which specify the device's location.
     """
 
 
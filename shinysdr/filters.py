@@ -31,9 +31,11 @@ from gnuradio.fft import window
 from gnuradio import filter as grfilter  # don't shadow builtin
 from gnuradio.filter import pfb
 from gnuradio.filter import firdes
+from gnuradio.filter import optfir
 from gnuradio.filter import rational_resampler
 
 from shinysdr.interfaces import BandShape
+from shinysdr.i.filter_cache import the_filter_design_cache
 from shinysdr.i.math import factorize, small_factor_at_least
 from shinysdr.i.pycompat import defaultstr
 
@@ -44,6 +46,53 @@ __all__ = []  # appended later
 _use_rational_resampler = True
 
 
+def _low_pass_taps(gain, sampling_freq, cutoff_freq, transition_width, window_type=firdes.WIN_HAMMING):
+    """Memoized firdes.low_pass."""
+    return the_filter_design_cache.get_or_compute(
+        ('low_pass', float(gain), float(sampling_freq), float(cutoff_freq), float(transition_width), int(window_type)),
+        lambda: firdes.low_pass(gain, sampling_freq, cutoff_freq, transition_width, window_type))
+
+
+def _rational_resampler_taps(interpolation, decimation, fractional_bw):
+    """Memoized rational_resampler.design_filter."""
+    return the_filter_design_cache.get_or_compute(
+        ('rational_resampler', int(interpolation), int(decimation), float(fractional_bw)),
+        lambda: rational_resampler.design_filter(
+            interpolation=interpolation,
+            decimation=decimation,
+            fractional_bw=fractional_bw))
+
+
+def _pfb_arb_resampler_taps(resample_rate, flt_size=32, atten=100):
+    """Memoized equivalent of the filter design pfb.arb_resampler_ccf does when not given taps.
+    
+    This is where optfir gets used, which is the slowest design procedure we have.
+    """
+    def compute():
+        percent = 0.80
+        if resample_rate < 1:
+            halfband = 0.5 * resample_rate
+            bw = percent * halfband
+            tb = (percent / 2.0) * halfband
+            return firdes.low_pass_2(flt_size, flt_size, bw, tb, atten, firdes.WIN_BLACKMAN_HARRIS)
+        else:
+            halfband = 0.5
+            bw = percent * halfband
+            tb = (percent / 2.0) * halfband
+            ripple = 0.1
+            while True:
+                try:
+                    return optfir.low_pass(flt_size, flt_size, bw, bw + tb, ripple, atten)
+                except RuntimeError:
+                    ripple += 0.01
+                    if ripple >= 1.0:
+                        raise
+    
+    return the_filter_design_cache.get_or_compute(
+        ('pfb_arb_resampler', float(resample_rate), int(flt_size), float(atten)),
+        compute)
+
+
 class _MultistageChannelFilterPlan(object):
     """
     Description of a MultistageChannelFilter without any instantiation. The analogue of
@@ -78,6 +127,11 @@ class _MultistageChannelFilterPlan(object):
     def get_shape(self):
         return self.__band_shape
     
+    def estimate_cost(self):
+        return sum(
+            design.estimate_cost(taps)
+            for design, taps in self.get_stage_designs_and_taps())
+    
     def replace(self, cutoff_freq=None, transition_width=None):
         if cutoff_freq is None:
             cutoff_freq = self.__cutoff_freq
@@ -116,6 +170,9 @@ class _FilterPlanCommentStage(_FilterPlanStage):
     def calculate_taps(self, final_cutoff, final_transition):
         return None
     
+    def estimate_cost(self, taps):
+        return 0
+    
     def explain(self):
         return self.comment
 
@@ -137,6 +194,9 @@ class _FilterPlanXlateStage(_FilterPlanStage):
     def calculate_taps(self, final_cutoff, final_transition):
         return [1]
     
+    def estimate_cost(self, taps):
+        return self.input_rate
+    
     def explain(self):
         return 'freq xlation only'
 
@@ -166,13 +226,16 @@ class _FilterPlanDecimatingStage(_FilterPlanStage):
         # TODO check for collision with user filter
         user_inner = final_cutoff - final_transition / 2
         limit = self.output_rate / 2
-        return firdes.low_pass(
+        return _low_pass_taps(
             1.0,
             self.input_rate,
             (user_inner + limit) / 2,
             limit - user_inner,
             firdes.WIN_HAMMING)
     
+    def estimate_cost(self, taps):
+        return self.output_rate * len(taps)
+    
     def explain(self):
         fx = 'freq xlate and ' if self.freq_xlating else ''
         return '%sdecimate by %i' % (fx, self.decimation,)
@@ -183,7 +246,7 @@ class _FilterPlanFinalDecimatingStage(_FilterPlanDecimatingStage):
         _FilterPlanDecimatingStage.__init__(self, **kwargs)
 
     def calculate_taps(self, final_cutoff, final_transition):
-        return firdes.low_pass(
+        return _low_pass_taps(
             1.0,
             self.input_rate,
             final_cutoff,
@@ -210,11 +273,14 @@ class _FilterPlanRationalResamplerStage(_FilterPlanStage):
     
     def calculate_taps(self, final_cutoff, final_transition):
         # TODO: This might be internal, and we eventually want to integrate it in the plan anyway
-        return rational_resampler.design_filter(
+        return _rational_resampler_taps(
             interpolation=self.interpolation,
             decimation=self.decimation,
             fractional_bw=0.4)
     
+    def estimate_cost(self, taps):
+        return self.output_rate * len(taps) / self.interpolation
+    
     def explain(self):
         return 'rational_resampler by %s/%s (stage rates %s/%s)' % (self.interpolation, self.decimation, self.output_rate, self.input_rate)
 
@@ -226,10 +292,14 @@ class _FilterPlanPfbResamplerStage(_FilterPlanStage):
             **kwargs)
     
     def create_block(self, taps):
-        return pfb.arb_resampler_ccf(self.resample_rate)  # TODO explicitly compute taps
+        assert taps is not None
+        return pfb.arb_resampler_ccf(self.resample_rate, taps=taps, flt_size=32)
     
     def calculate_taps(self, final_cutoff, final_transition):
-        return None
+        return _pfb_arb_resampler_taps(self.resample_rate, flt_size=32)
+    
+    def estimate_cost(self, taps):
+        return self.output_rate * len(taps) / 32
     
     def explain(self):
         return 'arb_resampler %s/%s = %s' % (self.output_rate, self.input_rate, float(self.output_rate) / self.input_rate)
@@ -307,7 +377,6 @@ def _make_filter_plan_1(input_rate, output_rate):
                 input_rate=stage_input_rate,
                 output_rate=output_rate))
         else:
-            # TODO: cache filter computation as optfir is used and takes a noticeable time
             stage_designs.append(_FilterPlanPfbResamplerStage(
                 resample_rate=float(output_rate) / stage_input_rate,
                 input_rate=stage_input_rate,
@@ -439,13 +508,20 @@ class MultistageChannelFilter(gr.hier_block2):
         This is primarily a helper for simplifying the code implementing demodulator objects.
         """
         return self.__plan.get_shape()
+    
+    def get_estimated_cost(self):
+        """Estimate the computation this filter performs, in complex multiply-accumulates per second.
+        
+        This is a rough figure for comparing filters (and the receivers using them) to each other, not a prediction of actual CPU usage.
+        """
+        return self.__plan.estimate_cost()
 
 
 __all__.append('MultistageChannelFilter')
 
 
 # TODO: Rename for consistency. Document.
-# TODO: Add the ability to memoize/precompute filter taps, particularly because pfb uses optfir internally which is slow. Maybe we can express this using the same 'plan' type as MultistageChannelFilter.
+# TODO: Maybe we can express this using the same 'plan' type as MultistageChannelFilter.
 # TODO: I think there are places where we are _not_ using make_resampler because it didn't have a complex mode before.
 def make_resampler(in_rate, out_rate, complex=False):
     # pylint: disable=redefined-builtin
@@ -469,7 +545,7 @@ def make_resampler(in_rate, out_rate, complex=False):
         return (rational_resampler.rational_resampler_ccf if complex else rational_resampler.rational_resampler_fff)(
             interpolation=interpolation,
             decimation=decimation,
-            taps=firdes.low_pass(
+            taps=_low_pass_taps(
                 interpolation,  # gain compensates for interpolation
                 interpolation,  # rational resampler filter runs at the interpolated rate
                 in_relative_cutoff,
@@ -479,7 +555,7 @@ def make_resampler(in_rate, out_rate, complex=False):
         pfbsize = 32  # TODO: justify magic number (taken from gqrx)
         return (pfb.arb_resampler_ccf if complex else pfb.arb_resampler_fff)(
             resample_ratio,
-            firdes.low_pass(
+            _low_pass_taps(
                 pfbsize,
                 pfbsize,
                 in_relative_cutoff,
@@ -124,6 +124,9 @@ class _DemodulatorAdapterContext(object):
     
     def get_absolute_frequency_cell(self):
         return self.__freq_cell
+    
+    def get_device_position(self):
+        return None
 
 
 class ModulatorAdapter(gr.hier_block2):
@@ -0,0 +1,109 @@
+# Copyright 2019 Kevin Reid and the ShinySDR contributors
+#
+# This file is part of ShinySDR.
+#
+# ShinySDR is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ShinySDR is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ShinySDR.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Sample encodings for audio streamed to clients.
+
+Audio is produced as float32 samples nominally in the range -1 to 1; the other encodings trade precision for bandwidth. All encodings are little-endian and stateless, so that one encoded buffer can be sent to any number of clients regardless of when they started listening.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from collections import namedtuple
+
+import numpy
+import six
+
+
+__all__ = []  # appended later
+
+
+AudioEncoding = namedtuple('AudioEncoding', [
+    'name',  # unicode, as used in URLs and stream metadata
+    'bytes_per_sample',  # int
+    'wav_format_tag',  # int, WAVE_FORMAT_* value for WAV headers
+    'encode',  # function from numpy float32 array to bytes
+])
+
+
+__all__.append('AudioEncoding')
+
+
+def _encode_float32(array):
+    return array.astype(numpy.dtype('<f4'), copy=False).tobytes()
+
+
+def _to_s16(array):
+    return (numpy.clip(array, -1.0, 1.0) * 32767).astype(numpy.int16)
+
+
+def _encode_s16(array):
+    return _to_s16(array).astype(numpy.dtype('<i2'), copy=False).tobytes()
+
+
+_MULAW_BIAS = 0x84
+_MULAW_CLIP = 32635
+# Segment number for each value of (biased magnitude >> 7).
+_MULAW_EXPONENT_TABLE = numpy.floor(numpy.log2(numpy.maximum(numpy.arange(256), 1))).astype(numpy.int32)
+
+
+def _encode_mulaw(array):
+    """G.711 mu-law, as in the common reference implementation, but vectorized."""
+    samples = _to_s16(array).astype(numpy.int32)
+    sign = numpy.where(samples < 0, 0x80, 0)
+    magnitude = numpy.minimum(numpy.abs(samples), _MULAW_CLIP) + _MULAW_BIAS
+    exponent = _MULAW_EXPONENT_TABLE[magnitude >> 7]
+    mantissa = (magnitude >> (exponent + 3)) & 0x0F
+    return (~(sign | (exponent << 4) | mantissa) & 0xFF).astype(numpy.uint8).tobytes()
+
+
+AUDIO_ENCODINGS = {e.name: e for e in [
+    AudioEncoding(name=u'float32', bytes_per_sample=4, wav_format_tag=3, encode=_encode_float32),
+    AudioEncoding(name=u's16', bytes_per_sample=2, wav_format_tag=1, encode=_encode_s16),
+    AudioEncoding(name=u'mulaw', bytes_per_sample=1, wav_format_tag=7, encode=_encode_mulaw),
+]}
+DEFAULT_AUDIO_ENCODING = AUDIO_ENCODINGS[u'float32']
+
+
+__all__.append('AUDIO_ENCODINGS')
+__all__.append('DEFAULT_AUDIO_ENCODING')
+
+
+_LOWER_BANDWIDTH = {
+    u'float32': u's16',
+    u's16': u'mulaw',
+}
+
+
+def lower_bandwidth_encoding(encoding):
+    """Return the encoding to switch to if a client cannot keep up with the given encoding, or None if there is none."""
+    name = _LOWER_BANDWIDTH.get(encoding.name)
+    return AUDIO_ENCODINGS[name] if name is not None else None
+
+
+__all__.append('lower_bandwidth_encoding')
+
+
+def higher_bandwidth_encoding(encoding):
+    """Return the encoding which lower_bandwidth_encoding steps down to the given encoding from, or None if there is none."""
+    for higher, lower in six.iteritems(_LOWER_BANDWIDTH):
+        if lower == encoding.name:
+            return AUDIO_ENCODINGS[higher]
+    return None
+
+
+__all__.append('higher_bandwidth_encoding')
@@ -30,6 +30,7 @@ from gnuradio import blocks
 from gnuradio import gr
 import numpy
 
+from shinysdr.i.audioformat import DEFAULT_AUDIO_ENCODING
 from shinysdr.i.blocks import ReactorSink, VectorResampler
 from shinysdr.types import EnumT
 
@@ -78,7 +79,8 @@ class AudioManager(object):
         audio_destination_dict[CLIENT_AUDIO_DEVICE] = 'Client'  # TODO reconsider name
         self.__audio_destination_type = EnumT(audio_destination_dict)
         self.__audio_channels = 2 if stereo else 1
-        self.__audio_sinks = {}
+        self.__client_taps = {}  # sample rate -> _ClientAudioTap
+        self.__callback_rates = {}  # callback -> sample rate
         self.__audio_buses = {key: BusPlumber(graph, self.__audio_channels) for key in audio_destination_dict}
     
     def get_destination_type(self):
@@ -90,24 +92,46 @@ class AudioManager(object):
     def get_default_destination(self):
         return CLIENT_AUDIO_DEVICE
 
-    def add_audio_callback(self, callback, sample_rate):
-        """Caller must reconnect flow graph."""
+    def add_audio_callback(self, callback, sample_rate, encoding=DEFAULT_AUDIO_ENCODING):
+        """Add a callback which will receive client audio at sample_rate, as bytes in the given shinysdr.i.audioformat.AudioEncoding.
+        
+        All callbacks at the same sample rate share one sink, and those also with the same encoding share the encoded data. Returns true if a new sink was created, in which case the caller must reconnect the flow graph.
+        """
         
         if not 1 <= sample_rate <= 192000:
             # TODO: This sanity check is also enforced in the UI entry point; arrange for a common definition of the limits
             raise ValueError('Sample rate out of range')
-        self.__audio_sinks[callback] = (
-            sample_rate,
-            ReactorSink(
-                numpy_type=numpy.dtype((numpy.float32, self.__audio_channels)),
-                callback=lambda array: callback(array.tobytes()),
-                reactor=the_reactor)
-        )
+        if callback in self.__callback_rates:
+            raise ValueError('Audio callback {!r} already added'.format(callback))
+        tap = self.__client_taps.get(sample_rate)
+        created = tap is None
+        if created:
+            tap = self.__client_taps[sample_rate] = _ClientAudioTap(self.__audio_channels, reactor=the_reactor)
+        tap.add(callback, encoding)
+        self.__callback_rates[callback] = sample_rate
+        return created
     
     def remove_audio_callback(self, callback):
-        """Caller must reconnect flow graph."""
+        """Remove a callback added by add_audio_callback.
+        
+        Returns true if its sink is no longer used and was removed, in which case the caller must reconnect the flow graph.
+        """
         
-        del self.__audio_sinks[callback]
+        sample_rate = self.__callback_rates.pop(callback)
+        tap = self.__client_taps[sample_rate]
+        tap.remove(callback)
+        if tap.is_empty():
+            del self.__client_taps[sample_rate]
+            return True
+        else:
+            return False
+    
+    def set_audio_callback_encoding(self, callback, encoding):
+        """Change the encoding in which a callback added by add_audio_callback receives audio. Does not require reconnecting the flow graph."""
+        self.__client_taps[self.__callback_rates[callback]].set_encoding(callback, encoding)
+    
+    def get_audio_callback_count(self):
+        return len(self.__callback_rates)
     
     def get_channels(self):
         return self.__audio_channels
@@ -115,8 +139,12 @@ class AudioManager(object):
     def validate_destination(self, destination):
         return destination in self.__audio_buses
     
-    def reconnecting(self):
-        return ReconnectSession(self.__audio_buses, self.__audio_devices, self.__audio_sinks, self.__logger)
+    def reconnecting(self, graph=None):
+        """Begin reconnecting the audio buses.
+        
+        If graph is given, connections are made to it (e.g. a ConnectionPlan) instead of to the graph given at construction."""
+        client_outputs = [(sample_rate, tap.sink) for sample_rate, tap in six.iteritems(self.__client_taps)]
+        return ReconnectSession(self.__audio_buses, self.__audio_devices, client_outputs, self.__logger, graph)
 
     # @exported_value()
     def get_audio_bus_rate(self):
@@ -127,11 +155,47 @@ class AudioManager(object):
 __all__.append('AudioManager')
 
 
+class _ClientAudioTap(object):
+    """
+    A ReactorSink whose output is delivered to any number of callbacks, so that clients at the same sample rate share all DSP.
+    
+    Each callback has an encoding, and each buffer is encoded only once per distinct encoding.
+    """
+    def __init__(self, channels, reactor):
+        self.__callbacks = []
+        self.sink = ReactorSink(
+            numpy_type=numpy.dtype((numpy.float32, channels)),
+            callback=self._deliver,
+            reactor=reactor)
+    
+    def add(self, callback, encoding=DEFAULT_AUDIO_ENCODING):
+        self.__callbacks.append((callback, encoding))
+    
+    def remove(self, callback):
+        self.__callbacks = [(c, e) for c, e in self.__callbacks if c != callback]
+    
+    def set_encoding(self, callback, encoding):
+        self.__callbacks = [(c, encoding if c == callback else e) for c, e in self.__callbacks]
+    
+    def is_empty(self):
+        return not self.__callbacks
+    
+    def _deliver(self, array):
+        encoded = {}
+        # Copy since a callback may remove itself.
+        for callback, encoding in list(self.__callbacks):
+            data = encoded.get(encoding.name)
+            if data is None:
+                data = encoded[encoding.name] = encoding.encode(array)
+            callback(data)
+
+
 class ReconnectSession(object):
-    def __init__(self, buses, devices, audio_sinks, log):
+    def __init__(self, buses, devices, client_outputs, log, graph):
         self.__buses = buses
+        self.__graph = graph
         self.__devices = devices
-        self.__audio_sinks = audio_sinks
+        self.__client_outputs = client_outputs
         self.__log = log
         self.__bus_inputs = {bus: [] for bus in buses}
         self.__fallback_bus = list(buses.keys())[0]
@@ -147,8 +211,8 @@ class ReconnectSession(object):
         for key, bus in six.iteritems(self.__buses):
             inputs = self.__bus_inputs[key]
             if key == CLIENT_AUDIO_DEVICE:
-                outputs = six.itervalues(self.__audio_sinks)
-                noutputs = len(self.__audio_sinks)
+                outputs = self.__client_outputs
+                noutputs = len(self.__client_outputs)
             else:
                 outputs = [self.__devices[key]]
                 noutputs = 1
@@ -156,7 +220,8 @@ class ReconnectSession(object):
                 has_useful = True
             bus.connect(
                 inputs=inputs,
-                outputs=outputs)
+                outputs=outputs,
+                graph=self.__graph)
         return has_useful
 
 
@@ -173,16 +238,26 @@ class BusPlumber(object):
         self.__nchannels = nchannels
         self.__channels = six.moves.range(nchannels)
         self.__bus_rate = 0.0
+        
+        # Blocks kept from the previous connect() so that an unchanged bus produces unchanged connections.
+        self.__bus_sum = None
+        self.__bus_sum_inputs = 0
+        self.__null_sink = None
+        self.__resamplers = {}
     
     def get_current_rate(self):
         return self.__bus_rate
     
-    def connect(self, inputs, outputs):
+    def connect(self, inputs, outputs, graph=None):
         """
-        Make all new connections (graph.disconnect_all() must have been done) between inputs and outputs.
+        Make all new connections between inputs and outputs, either in a graph which has had disconnect_all() done or in a fresh ConnectionPlan.
         
         inputs and outputs must be iterables of (sample_rate, block) tuples.
+        
+        Blocks internal to the bus are reused from the previous call where possible, so that connecting the same inputs and outputs again produces the same connections.
         """
+        if graph is None:
+            graph = self.__graph
         inputs = list(inputs)
         outputs = list(outputs)
         
@@ -200,39 +275,47 @@ class BusPlumber(object):
         elif new_bus_rate != self.__bus_rate:
             self.__bus_rate = new_bus_rate
         
-        # recreated each time because reusing an add_ff w/ different
-        # input counts fails; TODO: report/fix bug
-        bus_sum = blocks.add_ff(vlen=self.__nchannels)
+        # Reusing an add_ff w/ different input counts fails, so it is recreated whenever the count changes; TODO: report/fix bug
+        if self.__bus_sum is None or self.__bus_sum_inputs != len(inputs):
+            self.__bus_sum = blocks.add_ff(vlen=self.__nchannels)
+            self.__bus_sum_inputs = len(inputs)
+        bus_sum = self.__bus_sum
+        
+        old_resamplers = self.__resamplers
+        self.__resamplers = {}
         
         in_index = 0
         for in_rate, in_block in inputs:
-            self.__connect_maybe_with_resampler(in_block, in_rate, self.__bus_rate, (bus_sum, in_index))
+            self.__connect_maybe_with_resampler(graph, old_resamplers, in_block, in_rate, self.__bus_rate, (bus_sum, in_index))
             in_index += 1
         
         if in_index > 0:
             # connect output only if there is at least one input
             if len(outputs) > 0:
-                resampler_table = {}
                 for out_rate, out_block in outputs:
-                    self.__connect_maybe_with_resampler(bus_sum, self.__bus_rate, out_rate, out_block, resampler_table=resampler_table)
+                    self.__connect_maybe_with_resampler(graph, old_resamplers, bus_sum, self.__bus_rate, out_rate, out_block)
             else:
                 # gnuradio requires at least one connected output
-                self.__graph.connect(bus_sum, blocks.null_sink(gr.sizeof_float * self.__nchannels))
+                if self.__null_sink is None:
+                    self.__null_sink = blocks.null_sink(gr.sizeof_float * self.__nchannels)
+                graph.connect(bus_sum, self.__null_sink)
     
-    def __connect_maybe_with_resampler(self, in_endpoint, in_rate, out_rate, out_endpoint, resampler_table=None):
+    def __connect_maybe_with_resampler(self, graph, old_resamplers, in_endpoint, in_rate, out_rate, out_endpoint):
         """Connect in_endpoint, a source of vectors of size self.__nchannels, to out_endpoint, inserting per-channel resamplers if needed.
         
-        If resampler_table (a dict) is provided then it is used to record resamplers already created that can be shared. in_endpoint and in_rate are assumed to be the same."""
+        Resamplers are shared between all uses of the same in_endpoint and rates, and reused from old_resamplers if they were created by a previous connect()."""
         if in_rate == out_rate:
-            self.__graph.connect(in_endpoint, out_endpoint)
+            graph.connect(in_endpoint, out_endpoint)
         else:
-            if resampler_table is not None and out_rate in resampler_table:
-                self.__graph.connect(resampler_table[out_rate], out_endpoint)
+            key = (in_endpoint, in_rate, out_rate)
+            if key in self.__resamplers:
+                graph.connect(self.__resamplers[key], out_endpoint)
             else:
-                resampler = VectorResampler(in_rate, out_rate, vlen=self.__nchannels)
-                self.__graph.connect(in_endpoint, resampler, out_endpoint)
-                if resampler_table is not None:
-                    resampler_table[out_rate] = resampler
+                resampler = old_resamplers.get(key)
+                if resampler is None:
+                    resampler = VectorResampler(in_rate, out_rate, vlen=self.__nchannels)
+                self.__resamplers[key] = resampler
+                graph.connect(in_endpoint, resampler, out_endpoint)
 
 
 class VectorAudioSink(gr.hier_block2):
@@ -35,9 +35,11 @@ from zope.interface import Interface, implementer
 from gnuradio import gr
 from gnuradio import blocks
 from gnuradio.fft import fft_vfc, fft_vcc, window as windows
+from gnuradio.filter import firdes
+from gnuradio.filter import pfb
 import numpy
 
-from shinysdr.filters import make_resampler
+from shinysdr.filters import _low_pass_taps, make_resampler
 from shinysdr.math import to_dB
 from shinysdr.signals import SignalType
 from shinysdr.types import BulkDataT, EnumT, RangeT
@@ -98,6 +100,47 @@ def make_sink_to_process_stdin(process, itemsize=gr.sizeof_char):
     return blocks.file_descriptor_sink(itemsize, fd_owned_by_sink)
 
 
+class NonBlockingProcessStdinSink(gr.sync_block):
+    """
+    Writes its input to a process's stdin, without ever blocking the flow graph.
+    
+    writer is a shinysdr.i.processpool.DecoderProcessLease, or another object whose write(data) method writes as much as it can without blocking and returns the number of bytes written.
+    
+    If the process does not read its input fast enough, up to buffer_limit bytes are buffered; beyond that, input is discarded, a whole work() call at a time so that what the process receives is still made of whole items.
+    
+    encode is a function from a numpy array of input items to the bytes to write; by default the items are written as they are.
+    """
+    def __init__(self, writer, numpy_type, buffer_limit, encode=None):
+        gr.sync_block.__init__(
+            self,
+            name=type(self).__name__,
+            in_sig=[numpy_type],
+            out_sig=[])
+        self.__writer = writer
+        self.__buffer_limit = buffer_limit
+        self.__encode = encode if encode is not None else _encode_raw
+        self.__buffer = bytearray()
+        self.__dropped_items = 0
+    
+    def get_dropped_items(self):
+        """Return the number of input items which were discarded rather than written."""
+        return self.__dropped_items
+    
+    def work(self, input_items, output_items):
+        items = input_items[0]
+        if len(self.__buffer) > self.__buffer_limit:
+            self.__dropped_items += len(items)
+        else:
+            self.__buffer += self.__encode(items)
+        if self.__buffer:
+            del self.__buffer[:self.__writer.write(self.__buffer)]
+        return len(items)
+
+
+def _encode_raw(items):
+    return items.tobytes()
+
+
 class ReactorSink(gr.sync_block):
     """Transfers items from a flow graph to the Twisted reactor world, as a numpy array."""
     def __init__(self, numpy_type, callback, reactor):
@@ -114,6 +157,56 @@ class ReactorSink(gr.sync_block):
         return len(items_numpy_array)
 
 
+class GapFiller(gr.basic_block):
+    """
+    Passes through a stream which may stop while it is gated, such as the output of a demodulator with gated squelch, and inserts zeros while it is gated so that the output keeps pace with a clock stream.
+    
+    The clock input is any stream which runs continuously at a fixed rate, such as the gated block's own input; its contents are ignored. On average, ratio output items are produced per clock item, so the output stays locked to the clock and can be mixed with other streams driven by it.
+    
+    Zeros are inserted only while is_gated() returns true (it is called from the flow graph thread) and the output is behind the clock. The gated stream's latency can put the output briefly ahead of the clock after the gate opens or closes; input which would put it more than max_lead items ahead is discarded.
+    """
+    def __init__(self, vlen, ratio, is_gated, max_lead):
+        item_type = numpy.dtype((numpy.float32, vlen)) if vlen > 1 else numpy.float32
+        gr.basic_block.__init__(
+            self,
+            name=type(self).__name__,
+            in_sig=[item_type, numpy.complex64],
+            out_sig=[item_type])
+        self.__ratio = float(ratio)
+        self.__is_gated = is_gated
+        self.__max_lead = int(max_lead)
+        self.__clock_items = 0
+        self.__output_items = 0
+    
+    def forecast(self, noutput_items, ninput_items_required):
+        # Wait only for the clock, since the gated input may have stopped.
+        ninput_items_required[0] = 0
+        ninput_items_required[1] = 1
+    
+    def general_work(self, input_items, output_items):
+        items, clock = input_items
+        output = output_items[0]
+        self.consume(1, len(clock))
+        pass_count, drop_count, fill_count = self._advance(len(clock), len(items), len(output), self.__is_gated())
+        output[:pass_count] = items[:pass_count]
+        self.consume(0, pass_count + drop_count)
+        output[pass_count:pass_count + fill_count] = 0
+        return pass_count + fill_count
+    
+    def _advance(self, clock_count, input_count, output_space, gated):
+        """Account for clock_count more clock items and return how many input items to pass through, to discard, and how many zeros to output after them."""
+        self.__clock_items += clock_count
+        expected = int(self.__clock_items * self.__ratio)
+        accepted = min(input_count, output_space)
+        pass_count = max(0, min(accepted, expected + self.__max_lead - self.__output_items))
+        drop_count = accepted - pass_count
+        fill_count = 0
+        if gated and input_count == 0:
+            fill_count = max(0, min(output_space, expected - self.__output_items))
+        self.__output_items += pass_count + fill_count
+        return pass_count, drop_count, fill_count
+
+
 _maximum_fft_rate = 500
 
 
@@ -220,23 +313,27 @@ class MonitorSink(gr.hier_block2, ExportedState):
         
         # interest tracking
         # this is indirect because we ignore interest when paused
+        # FFT and scope interest are tracked separately so that each chain can be gated off independently.
         self.__interested_cell = LooseCell(type=bool, value=False, writable=False, persists=False)
-        self.__has_subscriptions = False
-        self.__interest = InterestTracker(self.__cell_interest_callback)
+        self.__has_fft_subscriptions = False
+        self.__has_scope_subscriptions = False
+        self.__fft_interest = InterestTracker(self.__fft_interest_callback)
+        self.__scope_interest = InterestTracker(self.__scope_interest_callback)
 
         self.__fft_cell = ElementSinkCell(
             info_getter=self._get_fft_info,
             type=BulkDataT(array_format='b', info_format='dff'),
-            interest_tracker=self.__interest,
+            interest_tracker=self.__fft_interest,
             label='Spectrum')
         self.__scope_cell = ElementSinkCell(
             info_getter=self._get_scope_info,
             type=BulkDataT(array_format='f', info_format='d'),
-            interest_tracker=self.__interest,
+            interest_tracker=self.__scope_interest,
             label='Scope')
         
         # stuff created by __do_connect
-        self.__gate = None
+        self.__fft_gate = None
+        self.__scope_gate = None
         self.__frame_dec = None
         self.__frame_rate_to_decimation_conversion = 0.0
         
@@ -269,8 +366,10 @@ class MonitorSink(gr.hier_block2, ExportedState):
         
         self.__frame_rate_to_decimation_conversion = sample_rate * overlap_factor / input_length
         
-        self.__gate = blocks.copy(itemsize)
-        self.__gate.set_enabled(not self.__paused)
+        # The gates discard input when nobody is looking at their output, so that the FFT (or scope) chain downstream of them is never scheduled. This matters when the flow graph is running only for the sake of receivers.
+        self.__fft_gate = blocks.copy(itemsize)
+        self.__scope_gate = blocks.copy(itemsize)
+        self.__update_gates()
         
         overlapper = _OverlappedStreamToVector(
             size=input_length,
@@ -316,7 +415,7 @@ class MonitorSink(gr.hier_block2, ExportedState):
             self.disconnect_all()
             self.connect(
                 self,
-                self.__gate,
+                self.__fft_gate,
                 overlapper,
                 self.__frame_dec,
                 fft_block,
@@ -330,7 +429,8 @@ class MonitorSink(gr.hier_block2, ExportedState):
                 self.connect(logarithmizer, self.__fft_converter, fft_sink)
             if self.__enable_scope:
                 self.connect(
-                    self.__gate,
+                    self,
+                    self.__scope_gate,
                     scope_chunker,
                     scope_sink)
         finally:
@@ -341,12 +441,25 @@ class MonitorSink(gr.hier_block2, ExportedState):
     def get_interested_cell(self):
         return self.__interested_cell
     
-    def __cell_interest_callback(self, interested):
-        self.__has_subscriptions = interested
+    def __fft_interest_callback(self, interested):
+        self.__has_fft_subscriptions = interested
+        self.__update_interested()
+    
+    def __scope_interest_callback(self, interested):
+        self.__has_scope_subscriptions = interested
         self.__update_interested()
     
     def __update_interested(self):
-        self.__interested_cell.set_internal(not self.__paused and self.__has_subscriptions)
+        self.__update_gates()
+        self.__interested_cell.set_internal(not self.__paused and (
+            self.__has_fft_subscriptions or
+            (self.__enable_scope and self.__has_scope_subscriptions)))
+    
+    def __update_gates(self):
+        if self.__fft_gate is not None:
+            self.__fft_gate.set_enabled(not self.__paused and self.__has_fft_subscriptions)
+        if self.__scope_gate is not None:
+            self.__scope_gate.set_enabled(not self.__paused and self.__has_scope_subscriptions)
     
     @exported_value(type=SignalType, changes='explicit')
     def get_signal_type(self):
@@ -425,7 +538,6 @@ class MonitorSink(gr.hier_block2, ExportedState):
     @setter
     def set_paused(self, value):
         self.__paused = value
-        self.__gate.set_enabled(not value)
         self.__update_interested()
 
     # exported via state_def
@@ -459,3 +571,106 @@ class VectorResampler(gr.hier_block2):
                     make_resampler(in_rate, out_rate, complex=complex),
                     (joiner, ch))
             self.connect(joiner, self)
+
+
+class DeviceChannelizer(gr.hier_block2):
+    """
+    Splits a device's output into overlapping sub-bands, so that many narrow receivers can share the cost of the first decimation instead of each filtering at the full device rate.
+    
+    Output port k carries the sub-band centered on k * channel spacing (wrapping around to negative frequencies for k > channel_count / 2), at a sample rate of twice the channel spacing. Every output port must be connected.
+    
+    The prototype filter is flat up to 3/4 of the channel spacing from the channel center, so any band no wider than half the channel spacing fits within some channel.
+    """
+    
+    __OVERSAMPLE = 2
+    __PASSBAND_FRACTION = 0.75
+    
+    def __init__(self, input_rate, channel_count):
+        channel_count = int(channel_count)
+        assert channel_count >= self.__OVERSAMPLE
+        assert channel_count % self.__OVERSAMPLE == 0
+        gr.hier_block2.__init__(
+            self, type(self).__name__,
+            gr.io_signature(1, 1, gr.sizeof_gr_complex),
+            gr.io_signature(channel_count, channel_count, gr.sizeof_gr_complex))
+        
+        self.__input_rate = float(input_rate)
+        self.__channel_count = channel_count
+        self.__spacing = self.__input_rate / channel_count
+        self.__mode_fits = {}
+        
+        # Passband edge at PASSBAND_FRACTION * spacing; stopband edge placed so that the transition band folds only onto the portion of the output outside the passband.
+        spacing = self.__spacing
+        transition = 2 * (1 - self.__PASSBAND_FRACTION) * spacing
+        taps = _low_pass_taps(1.0, self.__input_rate, spacing, transition, firdes.WIN_HAMMING)
+        self.__tap_count = len(taps)
+        
+        channelizer = pfb.channelizer_ccf(
+            channel_count,
+            taps=taps,
+            oversample_rate=self.__OVERSAMPLE)
+        self.connect(self, channelizer)
+        for k in six.moves.range(channel_count):
+            self.connect((channelizer, k), (self, k))
+    
+    def get_input_rate(self):
+        return self.__input_rate
+    
+    def get_channel_count(self):
+        return self.__channel_count
+    
+    def get_channel_rate(self):
+        return self.__spacing * self.__OVERSAMPLE
+    
+    def get_estimated_cost(self):
+        """Estimate the computation this channelizer performs, in complex multiply-accumulates per second, on the same scale as MultistageChannelFilter.get_estimated_cost()."""
+        # Each output vector takes channel_count / OVERSAMPLE input samples and costs one pass over the prototype filter plus an FFT.
+        n = self.__channel_count
+        return self.__input_rate * self.__OVERSAMPLE / n * (self.__tap_count + n * math.log(n, 2))
+    
+    def get_channel_freq(self, channel):
+        """Return the center frequency of the given channel, relative to the input center frequency."""
+        if channel > self.__channel_count // 2:
+            channel -= self.__channel_count
+        return channel * self.__spacing
+    
+    def band_fits(self, shape):
+        """Return whether a demodulator with the given BandShape can always be served by one channel."""
+        return shape.stop_high - shape.stop_low <= (2 * self.__PASSBAND_FRACTION - 1) * self.__spacing
+    
+    def find_channel(self, low, high):
+        """
+        Return the index of the channel which completely contains the band from low to high (relative frequencies), or None if there is none.
+        """
+        center = (low + high) / 2
+        channel = int(round(center / self.__spacing))
+        channel_freq = channel * self.__spacing
+        usable = self.__PASSBAND_FRACTION * self.__spacing
+        if low < channel_freq - usable or high > channel_freq + usable:
+            return None
+        return channel % self.__channel_count
+    
+    def get_mode_fits(self, mode):
+        """Return whether the mode's demodulator was previously found to fit in a channel, or None if not yet known."""
+        return self.__mode_fits.get(mode)
+    
+    def set_mode_fits(self, mode, fits):
+        self.__mode_fits[mode] = bool(fits)
+
+
+# Channels narrower than this are not useful for common voice modes.
+_CHANNELIZER_MINIMUM_SPACING = 25e3
+_CHANNELIZER_MAXIMUM_CHANNELS = 64
+
+
+def choose_channelizer_channel_count(input_rate):
+    """
+    Return a suitable channel count for a DeviceChannelizer at the given input rate, or None if channelizing would not be worthwhile.
+    """
+    channel_count = 1
+    while (channel_count * 2 <= _CHANNELIZER_MAXIMUM_CHANNELS and
+            input_rate / (channel_count * 2) >= _CHANNELIZER_MINIMUM_SPACING):
+        channel_count *= 2
+    if channel_count < 4:
+        return None
+    return channel_count
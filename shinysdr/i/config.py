@@ -63,10 +63,14 @@ class Config(object):
         
         # these are to be read by main
         self._state_filename = None
+        self._filter_design_cache_filename = None
         self._service_makers = []
         
         # private: config state
         self.__server_audio = None
+        self.__receiver_cost_budget = None
+        self.__recording_config = None
+        self.__iq_ring_buffer_config = None
         
         # private: meta
         self.__waiting = []
@@ -98,6 +102,9 @@ class Config(object):
         return AppRoot(
             devices=self.devices._values,
             audio_config=self.__server_audio,
+            receiver_cost_budget=self.__receiver_cost_budget,
+            recording_config=self.__recording_config,
+            iq_ring_buffer_config=self.__iq_ring_buffer_config,
             read_only_dbs=self.databases._get_read_only_databases(),
             writable_db=self.databases._get_writable_database(),
             features=self.features._get_all())
@@ -116,6 +123,13 @@ class Config(object):
         if self._state_filename is not None:
             raise ConfigException('config.persist_to_file has already been done once')
         self._state_filename = str(filename)
+    
+    def persist_filter_designs_to_file(self, filename):
+        """Save computed filter designs in the given file so that they need not be recomputed after a restart."""
+        self._not_finished()
+        if self._filter_design_cache_filename is not None:
+            raise ConfigException('config.persist_filter_designs_to_file has already been done once')
+        self._filter_design_cache_filename = str(filename)
 
     def serve_web(self, 
             http_endpoint,
@@ -180,6 +194,49 @@ class Config(object):
         else:
             self.__server_audio = None
     
+    def set_receiver_cost_budget(self, budget):
+        """
+        Set the limit on the total estimated computation (in complex multiply-accumulates per second) of receivers which will be run at once.
+        """
+        self._not_finished()
+        budget = float(budget)
+        if not budget > 0:
+            raise ConfigException('config.set_receiver_cost_budget: budget must be positive, not %r' % (budget,))
+        self.__receiver_cost_budget = budget
+    
+    def set_recording_directory(self, directory, rotate_seconds=3600, rotate_bytes=2 ** 30, iq_rate=48000):
+        """
+        Allow receivers to record their audio and IQ to files in the given directory.
+        """
+        self._not_finished()
+        if self.__recording_config is not None:
+            raise ConfigException('config.set_recording_directory has already been done once')
+        if not os.path.isdir(directory):
+            raise ConfigException('config.set_recording_directory: %r is not a directory' % (directory,))
+        if not rotate_seconds > 0 or not rotate_bytes > 0:
+            raise ConfigException('config.set_recording_directory: rotate_seconds and rotate_bytes must be positive')
+        from shinysdr.i.recording import make_recording_config
+        self.__recording_config = make_recording_config(
+            directory=directory,
+            rotate_seconds=rotate_seconds,
+            rotate_bytes=rotate_bytes,
+            iq_rate=iq_rate)
+    
+    def set_iq_ring_buffer(self, seconds, directory=None):
+        """
+        Keep the last seconds of IQ from each device in use, so that receivers can be time-shifted into the past.
+        """
+        self._not_finished()
+        seconds = float(seconds)
+        if not seconds > 0:
+            raise ConfigException('config.set_iq_ring_buffer: seconds must be positive, not %r' % (seconds,))
+        if directory is not None and not os.path.isdir(directory):
+            raise ConfigException('config.set_iq_ring_buffer: %r is not a directory' % (directory,))
+        from shinysdr.i.ringbuffer import IQRingBufferConfig
+        self.__iq_ring_buffer_config = IQRingBufferConfig(
+            seconds=seconds,
+            directory=str(directory) if directory is not None else None)
+    
     def set_stereo(self, value):
         """
         Deprecated alias for self.features.(en|dis)able('stereo').
@@ -311,7 +368,9 @@ class _ConfigDbs(object):
 class _ConfigFeatures(object):
     def __init__(self, config):
         self._state = {
+            'channelizer': False,
             'reboot': False,
+            'squelch_gate': False,
             'stereo': True,
             '_test_disabled_feature': False,
             '_test_enabled_feature': True,
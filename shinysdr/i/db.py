@@ -61,11 +61,19 @@ class DatabaseModel(object):
         self.records = records
         self.__pathname = pathname
         self.writable = writable
+        self.__revision = 0
+    
+    def get_revision(self):
+        """
+        Return a number which is incremented whenever dirty() is called, so that users of the records can tell when they have changed.
+        """
+        return self.__revision
     
     def dirty(self):
         """
         Notify that a record has been changed and the database should be written to disk.
         """
+        self.__revision += 1
         if self.__can_write() and not self.__dirty:
             self.__dirty = True
             self.__reactor.callLater(0.5, self.__write)
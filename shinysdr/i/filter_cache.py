@@ -0,0 +1,138 @@
+# Copyright 2019 Kevin Reid and the ShinySDR contributors
+#
+# This file is part of ShinySDR.
+#
+# ShinySDR is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ShinySDR is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ShinySDR.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Memoization of filter designs (lists of taps).
+
+Designing filters (particularly with optfir) can take a noticeable amount of time, and receivers are frequently rebuilt with the same parameters, so we keep recently used designs around.
+
+This module is not an external API and not guaranteed to have a stable
+interface.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from collections import OrderedDict
+import json
+import os
+import os.path
+
+import six
+
+from twisted.logger import Logger
+
+
+__all__ = []  # appended later
+
+
+class FilterDesignCache(object):
+    """
+    Least-recently-used cache of filter taps.
+
+    Keys are tuples of JSON-compatible scalars, conventionally beginning with a string naming the design procedure, followed by every parameter which affects the result (rates, cutoff, transition width, window type, ...). Values are tuples of real or complex numbers.
+
+    The cache may optionally be loaded from and saved to a file, so that designs survive restarts.
+    """
+    __log = Logger()
+
+    def __init__(self, max_entries=256):
+        self.__max_entries = int(max_entries)
+        self.__table = OrderedDict()
+        self.__hits = 0
+        self.__misses = 0
+
+    def get_or_compute(self, key, compute):
+        """
+        Return the cached design for key, or call compute() to produce it.
+        """
+        key = tuple(key)
+        table = self.__table
+        if key in table:
+            self.__hits += 1
+            # move to most-recently-used position
+            taps = table.pop(key)
+            table[key] = taps
+            return taps
+
+        self.__misses += 1
+        taps = tuple(compute())
+        table[key] = taps
+        while len(table) > self.__max_entries:
+            table.popitem(last=False)
+        return taps
+
+    def clear(self):
+        self.__table.clear()
+
+    def get_statistics(self):
+        """Return a dict of counters, for debugging and benchmarking."""
+        return {
+            'entries': len(self.__table),
+            'hits': self.__hits,
+            'misses': self.__misses,
+        }
+
+    def load_file(self, path):
+        """
+        Add the designs stored in the file at path, if it exists.
+
+        A damaged file is logged and ignored, since the cache can always be regenerated.
+        """
+        if not os.path.exists(path):
+            return
+        try:
+            with open(path, 'r') as f:
+                entries = json.load(f)
+            for key, taps in entries:
+                self.get_or_compute(_key_from_json(key), lambda: _taps_from_json(taps))
+        except (IOError, OSError, ValueError, TypeError) as e:
+            self.__log.warn('Ignoring unreadable filter design cache {path}: {e}', path=path, e=e)
+
+    def save_file(self, path):
+        """
+        Write all designs currently cached to the file at path.
+        """
+        entries = [
+            [list(key), _taps_to_json(taps)]
+            for key, taps in six.iteritems(self.__table)]
+        temp_path = path + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(entries, f)
+        os.rename(temp_path, path)
+
+
+__all__.append('FilterDesignCache')
+
+
+def _key_from_json(key):
+    return tuple(six.text_type(v) if isinstance(v, six.string_types) else v for v in key)
+
+
+def _taps_to_json(taps):
+    # JSON has no complex type; complex taps are stored as pairs
+    return [[t.real, t.imag] if isinstance(t, complex) else t for t in taps]
+
+
+def _taps_from_json(taps):
+    return [complex(t[0], t[1]) if isinstance(t, list) else float(t) for t in taps]
+
+
+# There is only one cache because filter designs do not depend on anything but their parameters.
+the_filter_design_cache = FilterDesignCache()
+
+
+__all__.append('the_filter_design_cache')
@@ -0,0 +1,90 @@
+# Copyright 2019 Kevin Reid and the ShinySDR contributors
+#
+# This file is part of ShinySDR.
+#
+# ShinySDR is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ShinySDR is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ShinySDR.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Incremental reconfiguration of GNU Radio flow graphs.
+
+Rather than disconnect_all() followed by connecting everything again, code which (re)builds a flow graph records the connections it wants in a ConnectionPlan, and the plan is then applied as a difference against the previously applied plan. Connections which did not change are left alone, so GNU Radio keeps the blocks and buffers involved.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+
+__all__ = []  # appended later
+
+
+def _normalize_endpoint(endpoint):
+    if isinstance(endpoint, tuple):
+        block, port = endpoint
+        return (block, port)
+    else:
+        return (endpoint, 0)
+
+
+class ConnectionPlan(object):
+    """
+    A set of flow graph connections, recorded with the same connect() signature as a GNU Radio hier_block2.
+    """
+    def __init__(self):
+        self.__edges = []
+        self.__edge_set = set()
+
+    def connect(self, *endpoints):
+        """Record connections as gr.hier_block2.connect would make them. Endpoints are blocks or (block, port) tuples."""
+        if len(endpoints) < 2:
+            raise TypeError('connect() of a single block is not supported in a ConnectionPlan')
+        normalized = [_normalize_endpoint(e) for e in endpoints]
+        for i in range(len(normalized) - 1):
+            edge = (normalized[i], normalized[i + 1])
+            if edge in self.__edge_set:
+                continue
+            self.__edges.append(edge)
+            self.__edge_set.add(edge)
+
+    def get_edges(self):
+        """Return the recorded connections, in the order they were first made, as ((block, port), (block, port)) tuples."""
+        return list(self.__edges)
+
+    def __contains__(self, edge):
+        return edge in self.__edge_set
+
+    def __len__(self):
+        return len(self.__edges)
+
+    def diff(self, old_plan):
+        """Return (removed_edges, added_edges) which transform old_plan into this plan."""
+        removed = [edge for edge in old_plan.get_edges() if edge not in self.__edge_set]
+        added = [edge for edge in self.__edges if edge not in old_plan]
+        return removed, added
+
+
+__all__.append('ConnectionPlan')
+
+
+def apply_connection_diff(graph, removed, added):
+    """
+    Disconnect the removed edges and then connect the added edges in graph. The graph should be locked if it is running.
+
+    Disconnections are done first since a GNU Radio input port may only have one connection.
+    """
+    for src, dst in removed:
+        graph.disconnect(src, dst)
+    for src, dst in added:
+        graph.connect(src, dst)
+
+
+__all__.append('apply_connection_diff')
@@ -23,15 +23,15 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 import math
 import struct
 
+from twisted.internet import reactor as the_reactor
+from twisted.logger import Logger
 from twisted.web.resource import Resource
 from twisted.web.server import NOT_DONE_YET
 
+from shinysdr.i.network.audio_queue import ClientAudioQueue
 from shinysdr.i.network.base import parse_audio_stream_options, render_error_page
 
 
-_BYTES_PER_NUMBER = 4  # 32-bit float samples
-
-
 class AudioStreamResource(Resource):
     """A resource which is a WAV audio stream."""
     isLeaf = True
@@ -59,7 +59,7 @@ class AudioStreamResource(Resource):
         request.setHeader(b'Cache-Control', b'no-cache, no-store, must-revalidate')
         
         if request.method == b'GET':
-            _HTTPWavStreamGlue(request, self.__audio_source, options.sample_rate)
+            _HTTPWavStreamGlue(request, self.__audio_source, options.sample_rate, options.encoding)
             return NOT_DONE_YET
         elif request.method == b'HEAD':
             return b''
@@ -69,32 +69,36 @@ class AudioStreamResource(Resource):
 
 class _HTTPWavStreamGlue(object):
     """Generates WAV header and connects ShinySDR audio stream callback to Twisted HTTP response."""
-    def __init__(self, request, audio_source, sample_rate):
+    __log = Logger()
+    
+    def __init__(self, request, audio_source, sample_rate, encoding, reactor=the_reactor):
         channels = audio_source.get_audio_callback_channels()
         
         self.__request = request
         self.__audio_source = audio_source
         # we're going to be reusing this so don't reconstruct it
-        self.__callback = self.__callback        
-        # byte length of 1 second of buffered audio
-        self.__max_buffered_bytes = sample_rate * _BYTES_PER_NUMBER * channels
+        self.__callback = self.__callback
         
         # write header
-        request.write(_generate_wav_header(sample_rate, channels))
+        request.write(_generate_wav_header(sample_rate, channels, encoding))
+        
+        # The WAV header fixes the format, so unlike the WebSocket stream there is no stepping down under congestion.
+        self.__queue = ClientAudioQueue(
+            consumer=request,
+            write=self.__write,
+            byte_rate=sample_rate * encoding.bytes_per_sample * channels,
+            reactor=reactor)
         
         # hook up streaming
         request.notifyFinish().addBoth(self.__stop)
-        self.__audio_source.add_audio_callback(self.__callback, sample_rate)
+        self.__audio_source.add_audio_callback(self.__callback, sample_rate, encoding)
         
     def __callback(self, data_bytes):  # pylint: disable=method-hidden
         if self.__request is None:
             return
-            
-        # Drop data when not being delivered to the client
-        # TODO: detection condition is horrible implementation-diving kludge
-        if len(self.__request.channel.transport.dataBuffer) > self.__max_buffered_bytes:
-            return
-        
+        self.__queue.push(data_bytes)
+    
+    def __write(self, data_bytes):
         try:
             # Everybody's little-endian, right?
             self.__request.write(data_bytes)
@@ -106,11 +110,17 @@ class _HTTPWavStreamGlue(object):
     def __stop(self, _=None):
         if self.__request is not None:
             self.__audio_source.remove_audio_callback(self.__callback)
+            if self.__request.channel is not None:
+                self.__queue.close()
+            else:
+                # The connection is gone, and with it the request's ability to unregister producers.
+                self.__queue.stopProducing()
+            self.__log.info('WAV audio stream ended: {statistics}', statistics=self.__queue.get_statistics())
             self.__request = None
             self.__audio_source = None
 
 
-def _generate_wav_header(sample_rate, channels):
+def _generate_wav_header(sample_rate, channels, encoding):
     # Sources used to understand the header format:
     #   http://soundfile.sapp.org/doc/WaveFormat/
     #   http://www-mmsp.ece.mcgill.ca/Documents/AudioFormats/WAVE/WAVE.html
@@ -123,15 +133,16 @@ def _generate_wav_header(sample_rate, channels):
         fake_max_size,
         b'WAVE')
     
+    bytes_per_sample = encoding.bytes_per_sample
     audio_format_chunk = struct.pack('<4sIHHIIHH', 
         b'fmt ',
         16,  # this chunk size
-        3,  # float format
+        encoding.wav_format_tag,  # sample format
         channels,  # number of channels interleaved in a block
         integral_sample_rate,  # sample rate per channel / block rate
-        channels * integral_sample_rate * _BYTES_PER_NUMBER,  # byte rate
-        channels * _BYTES_PER_NUMBER,  # bytes per block
-        _BYTES_PER_NUMBER * 8)  # bits per sample
+        channels * integral_sample_rate * bytes_per_sample,  # byte rate
+        channels * bytes_per_sample,  # bytes per block
+        bytes_per_sample * 8)  # bits per sample
     
     incomplete_data_chunk = struct.pack('<4sI', b'data', fake_max_size)
     
@@ -0,0 +1,190 @@
+# Copyright 2019 Kevin Reid and the ShinySDR contributors
+#
+# This file is part of ShinySDR.
+#
+# ShinySDR is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ShinySDR is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ShinySDR.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Flow control for audio streamed to a network client."""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from collections import deque
+
+from twisted.internet.interfaces import IPushProducer
+from zope.interface import implementer
+
+
+__all__ = []  # appended later
+
+
+@implementer(IPushProducer)
+class ClientAudioQueue(object):
+    """
+    A bounded queue of audio chunks between the flow graph and one network client.
+
+    The queue registers itself as a streaming producer with consumer (a Twisted transport or HTTP request), which pauses it when the client is not keeping up. While paused, chunks are queued, and if more than max_seconds of audio is queued the oldest chunks are dropped (an overrun). Chunks are passed to write in order when the consumer resumes.
+
+    Since the client plays audio at a fixed rate from when it receives the first chunk, delivery that falls more than underrun_seconds behind that schedule is counted as a client underrun, and the schedule restarted.
+
+    If overruns occur in congested_windows consecutive one-second windows, on_congestion is called (with no arguments), after which the caller may use set_byte_rate to reflect a lower-bandwidth format. Conversely, if no overruns occur in uncongested_windows consecutive windows, on_uncongested is called, after which the caller may try a higher-bandwidth format again.
+
+    The owner of the queue must call close() when it stops streaming, unless the consumer has already been disconnected.
+    """
+    def __init__(self, consumer, write, byte_rate, reactor,
+            max_seconds=1.0,
+            underrun_seconds=0.25,
+            congested_windows=5,
+            on_congestion=lambda: None,
+            uncongested_windows=30,
+            on_uncongested=lambda: None):
+        self.__consumer = consumer
+        self.__write = write
+        self.__reactor = reactor
+        self.__max_seconds = max_seconds
+        self.__underrun_seconds = underrun_seconds
+        self.__congested_windows = congested_windows
+        self.__on_congestion = on_congestion
+        self.__uncongested_windows = uncongested_windows
+        self.__on_uncongested = on_uncongested
+        self.__byte_rate = byte_rate
+        self.__max_bytes = byte_rate * max_seconds
+
+        self.__queue = deque()
+        self.__queued_bytes = 0
+        self.__paused = False
+        self.__stopped = False
+
+        # Playback schedule for underrun detection
+        self.__schedule_start = None
+        self.__scheduled_bytes = 0
+
+        # Drain rate and congestion measurement
+        self.__window_start = reactor.seconds()
+        self.__window_bytes = 0
+        self.__window_overrun = False
+        self.__congested_count = 0
+        self.__uncongested_count = 0
+        self.__drain_rate = 0.0
+
+        self.__overruns = 0
+        self.__underruns = 0
+        self.__dropped_bytes = 0
+
+        consumer.registerProducer(self, True)
+
+    def set_byte_rate(self, byte_rate):
+        """Change the expected byte rate of the audio; discards any queued audio, which is presumably in the old format."""
+        self.__byte_rate = byte_rate
+        self.__max_bytes = byte_rate * self.__max_seconds
+        self.__queue.clear()
+        self.__queued_bytes = 0
+        self.__schedule_start = None
+        self.__scheduled_bytes = 0
+        # Congestion in the old format says nothing about the new one.
+        self.__congested_count = 0
+        self.__uncongested_count = 0
+
+    def close(self):
+        """Stop and unregister from the consumer."""
+        self.stopProducing()
+        if self.__consumer is not None:
+            consumer, self.__consumer = self.__consumer, None
+            consumer.unregisterProducer()
+
+    def push(self, data):
+        """Add a chunk of audio to the queue, writing it immediately if the consumer is not paused."""
+        if self.__stopped:
+            return
+        self.__queue.append(data)
+        self.__queued_bytes += len(data)
+        if self.__queued_bytes > self.__max_bytes:
+            # Drop oldest first, so what the client does hear is as recent as possible.
+            while self.__queued_bytes > self.__max_bytes and len(self.__queue) > 1:
+                dropped = self.__queue.popleft()
+                self.__queued_bytes -= len(dropped)
+                self.__dropped_bytes += len(dropped)
+            self.__overruns += 1
+            self.__window_overrun = True
+        self.__flush()
+        self.__maybe_end_window()
+
+    def get_statistics(self):
+        return {
+            'overruns': self.__overruns,
+            'underruns': self.__underruns,
+            'dropped_bytes': self.__dropped_bytes,
+            'queued_bytes': self.__queued_bytes,
+            'drain_rate': self.__drain_rate,  # bytes per second over the last window
+        }
+
+    def pauseProducing(self):
+        """Implements IPushProducer."""
+        self.__paused = True
+
+    def resumeProducing(self):
+        """Implements IPushProducer."""
+        self.__paused = False
+        self.__flush()
+
+    def stopProducing(self):
+        """Implements IPushProducer."""
+        self.__stopped = True
+        self.__queue.clear()
+        self.__queued_bytes = 0
+
+    def __flush(self):
+        # Writing may synchronously pause us, so check every time.
+        while self.__queue and not self.__paused and not self.__stopped:
+            data = self.__queue.popleft()
+            self.__queued_bytes -= len(data)
+            self.__schedule(len(data))
+            self.__window_bytes += len(data)
+            self.__write(data)
+
+    def __schedule(self, nbytes):
+        now = self.__reactor.seconds()
+        if self.__schedule_start is None:
+            self.__schedule_start = now
+        else:
+            client_runs_out_at = self.__schedule_start + self.__scheduled_bytes / self.__byte_rate
+            if now > client_runs_out_at + self.__underrun_seconds:
+                self.__underruns += 1
+                self.__schedule_start = now
+                self.__scheduled_bytes = 0
+        self.__scheduled_bytes += nbytes
+
+    def __maybe_end_window(self):
+        now = self.__reactor.seconds()
+        elapsed = now - self.__window_start
+        if elapsed < 1.0:
+            return
+        self.__drain_rate = self.__window_bytes / elapsed
+        if self.__window_overrun:
+            self.__congested_count += 1
+            self.__uncongested_count = 0
+        else:
+            self.__congested_count = 0
+            self.__uncongested_count += 1
+        self.__window_start = now
+        self.__window_bytes = 0
+        self.__window_overrun = False
+        if self.__congested_count >= self.__congested_windows:
+            self.__congested_count = 0
+            self.__on_congestion()
+        elif self.__uncongested_count >= self.__uncongested_windows:
+            self.__uncongested_count = 0
+            self.__on_uncongested()
+
+
+__all__.append('ClientAudioQueue')
@@ -33,6 +33,7 @@ from twisted.python.util import sibpath
 from twisted.web import template
 from twisted.web.server import Site
 
+from shinysdr.i.audioformat import AUDIO_ENCODINGS, DEFAULT_AUDIO_ENCODING
 from shinysdr.i.json import serialize
 from shinysdr.i.pycompat import defaultstr
 from shinysdr.i.roots import IEntryPoint
@@ -208,11 +209,21 @@ def parse_audio_stream_options(args):
         raise ValueError('?rate= not a number')
     if not 1 <= rate_number <= 192000:
         raise ValueError('?rate= must be between 1 and 192000')
+    if b'encoding' in args:
+        try:
+            encoding_bytes, = args[b'encoding']
+            encoding = AUDIO_ENCODINGS[encoding_bytes.decode('us-ascii', 'replace')]
+        except (KeyError, ValueError):
+            raise ValueError('?encoding= must be one of ' + ', '.join(sorted(AUDIO_ENCODINGS)))
+    else:
+        encoding = DEFAULT_AUDIO_ENCODING
     return ParsedAudioStreamOptions(
         sample_rate=rate_number,
+        encoding=encoding,
     )
 
 
 ParsedAudioStreamOptions = namedtuple('ParsedAudioStreamOptions', [
     'sample_rate',
+    'encoding',  # shinysdr.i.audioformat.AudioEncoding
 ])
@@ -32,7 +32,9 @@ from twisted.logger import Logger
 from twisted.web.http import urlparse, parse_qs
 from zope.interface import implementer, providedBy
 
+from shinysdr.i.audioformat import higher_bandwidth_encoding, lower_bandwidth_encoding
 from shinysdr.i.json import serialize
+from shinysdr.i.network.audio_queue import ClientAudioQueue
 from shinysdr.i.network.base import AUDIO_STREAM_PATH_ELEMENT, CAP_OBJECT_PATH_ELEMENT, parse_audio_stream_options
 from shinysdr.i.pycompat import bytes_or_ascii
 from shinysdr.i.shared_test_objects import SHARED_TEST_OBJECTS_CAP, SharedTestObjects
@@ -307,31 +309,86 @@ class StateStreamInner(object):
 
 
 class AudioStreamInner(object):
-    def __init__(self, reactor, send, audio_source, audio_rate):
+    """Streams audio to a WebSocket client.
+    
+    Audio passes through a ClientAudioQueue registered as a producer with consumer (the WebSocket transport). If the client stays congested, the stream steps down to a lower-bandwidth encoding, announced by a new metadata message; if it then stays uncongested, the stream steps back up, but never above the encoding the client asked for.
+    """
+    __log = Logger()
+    
+    def __init__(self, reactor, send, audio_source, audio_rate, encoding, consumer):
         self._send = send
         self.__audio_source = audio_source
+        self.__audio_rate = audio_rate
+        self.__encoding = encoding
+        self.__requested_encoding = encoding
+        self.__channels = self.__audio_source.get_audio_callback_channels()
         self.__callback = self.__deliver  # identical object just to avoid any confusion
-        self.__audio_source.add_audio_callback(self.__callback, audio_rate)
-        
+        self.__queue = ClientAudioQueue(
+            consumer=consumer,
+            write=self.__write,
+            byte_rate=self.__byte_rate(),
+            reactor=reactor,
+            on_congestion=self.__step_down,
+            on_uncongested=self.__step_up)
+        self.__audio_source.add_audio_callback(self.__callback, audio_rate, encoding)
+        self.__send_metadata()
+    
+    def dataReceived(self, data):
+        pass
+    
+    def connectionLost(self, reason):
+        # pylint: disable=no-member
+        self.__audio_source.remove_audio_callback(self.__callback)
+        self.__queue.close()
+        self.__log.info('Audio stream ended: {statistics}', statistics=self.__queue.get_statistics())
+    
+    def get_statistics(self):
+        return self.__queue.get_statistics()
+    
+    def __byte_rate(self):
+        return self.__audio_rate * self.__encoding.bytes_per_sample * self.__channels
+    
+    def __send_metadata(self):
         # We don't actually benefit specifically from using a SignalType in this context but it avoids reinventing vocabulary.
         signal_type = SignalType(
-            kind='STEREO' if self.__audio_source.get_audio_callback_channels() == 2 else 'MONO',
-            sample_rate=audio_rate)
+            kind='STEREO' if self.__channels == 2 else 'MONO',
+            sample_rate=self.__audio_rate)
         
-        send(serialize({
+        self._send(serialize({
             # Not used to discriminate, but it seems worth applying the convention in general.
             u'type': u'audio_stream_metadata',
             u'signal_type': signal_type,
+            u'encoding': self.__encoding.name,
         }))
     
-    def dataReceived(self, data):
-        pass
+    def __step_down(self):
+        lower = lower_bandwidth_encoding(self.__encoding)
+        if lower is None:
+            return
+        self.__log.info('Audio stream congested; switching from {old} to {new}', old=self.__encoding.name, new=lower.name)
+        self.__switch_encoding(lower)
     
-    def connectionLost(self, reason):
-        # pylint: disable=no-member
-        self.__audio_source.remove_audio_callback(self.__callback)
+    def __step_up(self):
+        if self.__encoding == self.__requested_encoding:
+            return
+        higher = higher_bandwidth_encoding(self.__encoding)
+        if higher is None:
+            return
+        self.__log.info('Audio stream no longer congested; switching from {old} to {new}', old=self.__encoding.name, new=higher.name)
+        self.__switch_encoding(higher)
+    
+    def __switch_encoding(self, encoding):
+        # The shared audio tap is not rebuilt; only what it encodes for us changes, so the flow graph need not be reconnected.
+        self.__audio_source.set_audio_callback_encoding(self.__callback, encoding)
+        self.__encoding = encoding
+        # Discards queued audio in the old encoding, so that the metadata message precedes all audio in the new one.
+        self.__queue.set_byte_rate(self.__byte_rate())
+        self.__send_metadata()
     
     def __deliver(self, data_bytes):
+        self.__queue.push(data_bytes)
+    
+    def __write(self, data_bytes):
         self._send(data_bytes, safe_to_drop=True)
 
 
@@ -389,7 +446,7 @@ class WebSocketDispatcherProtocol(Protocol):
         # figure out what is wanted from the root cap
         if path == [AUDIO_STREAM_PATH_ELEMENT]:
             options = parse_audio_stream_options(parse_qs(query_bytes, 1))
-            self.inner = AudioStreamInner(the_reactor, self.__send, root_object, options.sample_rate)
+            self.inner = AudioStreamInner(the_reactor, self.__send, root_object, options.sample_rate, options.encoding, self.transport)
         elif len(path) >= 1 and path[0] == CAP_OBJECT_PATH_ELEMENT:
             # note _lookup_block may throw. TODO: Better error reporting
             root_object = _lookup_block(root_object, path[1:])
@@ -82,6 +82,18 @@ class TestAudioStreamResource(unittest.TestCase):
         yield prefix_reader.done
         self.assertEqual(prefix_reader.data, _generate_wav_header(sample_rate=44100, channels=2))
     
+    @defer.inlineCallbacks
+    def test_wav_header_s16(self):
+        _response, prefix_reader = yield get_stream_head(self, self.__url('/stereo?rate=22050&encoding=s16'))
+        yield prefix_reader.done
+        self.assertEqual(prefix_reader.data, _generate_wav_header(sample_rate=22050, channels=2, format_tag=1, number_size=2))
+    
+    @defer.inlineCallbacks
+    def test_wav_header_mulaw(self):
+        _response, prefix_reader = yield get_stream_head(self, self.__url('/mono?rate=8000&encoding=mulaw'))
+        yield prefix_reader.done
+        self.assertEqual(prefix_reader.data, _generate_wav_header(sample_rate=8000, channels=1, format_tag=7, number_size=1))
+    
     @defer.inlineCallbacks
     def test_bad_options(self):
         response = yield http_head(the_reactor, self.__url('/mono?rate=asdf'))
@@ -92,7 +104,7 @@ class _FakeSession(object):
     def __init__(self, channels):
         self.__channels = channels
     
-    def add_audio_callback(self, callback, sample_rate):
+    def add_audio_callback(self, callback, sample_rate, encoding=None):
         pass
     
     def remove_audio_callback(self, callback):
@@ -127,10 +139,9 @@ class _PrefixReaderProtocol(Protocol):
         self.done.callback(None)
 
 
-def _generate_wav_header(sample_rate, channels):
+def _generate_wav_header(sample_rate, channels, format_tag=3, number_size=4):
     # This was originally a copy of the code under test. The point of it being a copy is that as the test and the tested code evolve they may eventually become different due to their differing usage patterns, and if so that makes a better test than reusing the same generator in both places. Or at least, that's what I'm telling myself right now.
     fake_max_size = 2 ** 32 - 1
-    number_size = 4  # 32-bit float
     riff_header_chunk = struct.pack('<4sI4s', 
         b'RIFF',
         fake_max_size,
@@ -139,7 +150,7 @@ def _generate_wav_header(sample_rate, channels):
     audio_format_chunk = struct.pack('<4sIHHIIHH', 
         b'fmt ',
         16,  # this chunk size
-        3,  # float format
+        format_tag,
         channels,  # number of channels interleaved in a block
         sample_rate,  # sample rate per channel / block rate
         channels * sample_rate * number_size,  # byte rate
@@ -0,0 +1,115 @@
+# Copyright 2019 Kevin Reid and the ShinySDR contributors
+#
+# This file is part of ShinySDR.
+#
+# ShinySDR is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ShinySDR is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ShinySDR.  If not, see <http://www.gnu.org/licenses/>.
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from twisted.internet.task import Clock
+from twisted.trial import unittest
+
+from shinysdr.i.network.audio_queue import ClientAudioQueue
+
+
+class TestClientAudioQueue(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        self.written = []
+        self.congestion_calls = []
+        self.uncongested_calls = []
+        self.producer = None
+        self.queue = ClientAudioQueue(
+            consumer=self,
+            write=self.written.append,
+            byte_rate=10,
+            reactor=self.clock,
+            congested_windows=2,
+            on_congestion=lambda: self.congestion_calls.append(self.clock.seconds()),
+            uncongested_windows=3,
+            on_uncongested=lambda: self.uncongested_calls.append(self.clock.seconds()))
+
+    def registerProducer(self, producer, streaming):
+        """Implements the consumer side."""
+        self.assertTrue(streaming)
+        self.producer = producer
+
+    def unregisterProducer(self):
+        """Implements the consumer side."""
+        self.producer = None
+
+    def test_registered(self):
+        self.assertIs(self.producer, self.queue)
+
+    def test_passthrough(self):
+        self.queue.push(b'abc')
+        self.queue.push(b'def')
+        self.assertEqual(self.written, [b'abc', b'def'])
+        self.assertEqual(self.queue.get_statistics()['overruns'], 0)
+
+    def test_pause_and_resume(self):
+        self.queue.pauseProducing()
+        self.queue.push(b'abc')
+        self.queue.push(b'def')
+        self.assertEqual(self.written, [])
+        self.assertEqual(self.queue.get_statistics()['queued_bytes'], 6)
+        self.queue.resumeProducing()
+        self.assertEqual(self.written, [b'abc', b'def'])
+
+    def test_overrun_drops_oldest(self):
+        self.queue.pauseProducing()
+        for chunk in [b'11111', b'22222', b'33333']:
+            self.queue.push(chunk)
+        stats = self.queue.get_statistics()
+        self.assertEqual(stats['overruns'], 1)
+        self.assertEqual(stats['dropped_bytes'], 5)
+        self.queue.resumeProducing()
+        self.assertEqual(self.written, [b'22222', b'33333'])
+
+    def test_underrun(self):
+        self.queue.push(b'0123456789')  # 1 second
+        self.clock.advance(1.1)
+        self.queue.push(b'0123456789')
+        self.assertEqual(self.queue.get_statistics()['underruns'], 0)
+        self.clock.advance(2)
+        self.queue.push(b'0123456789')
+        self.assertEqual(self.queue.get_statistics()['underruns'], 1)
+
+    def test_congestion(self):
+        self.queue.pauseProducing()
+        for _ in range(3):
+            self.queue.push(b'0123456789ab')
+            self.clock.advance(1)
+        self.queue.push(b'0123456789ab')
+        self.assertEqual(len(self.congestion_calls), 1)
+        self.assertEqual(self.uncongested_calls, [])
+
+    def test_uncongested(self):
+        for _ in range(3):
+            self.queue.push(b'01')
+            self.clock.advance(1)
+        self.queue.push(b'01')
+        self.assertEqual(len(self.uncongested_calls), 1)
+        self.assertEqual(self.congestion_calls, [])
+
+    def test_stop(self):
+        self.queue.stopProducing()
+        self.queue.push(b'abc')
+        self.assertEqual(self.written, [])
+
+    def test_close(self):
+        self.queue.close()
+        self.assertIs(self.producer, None)
+        self.queue.push(b'abc')
+        self.assertEqual(self.written, [])
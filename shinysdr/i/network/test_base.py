@@ -20,7 +20,7 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 from twisted.trial import unittest
 from twisted.internet import reactor as the_reactor
 
-from shinysdr.i.network.base import WebServiceCommon
+from shinysdr.i.network.base import WebServiceCommon, parse_audio_stream_options
 
 
 class TestWebServiceCommon(unittest.TestCase):
@@ -71,4 +71,18 @@ class FakeRequest(object):
 # TODO: test render_error_page
 # TODO: test endpoint_string_to_url
 # TODO: test prepath_escaped
-# TODO: test parse_audio_stream_options
+
+
+class TestParseAudioStreamOptions(unittest.TestCase):
+    def test_rate(self):
+        options = parse_audio_stream_options({b'rate': [b'44100']})
+        self.assertEqual(options.sample_rate, 44100)
+        self.assertEqual(options.encoding.name, 'float32')
+        self.assertRaises(ValueError, lambda: parse_audio_stream_options({}))
+        self.assertRaises(ValueError, lambda: parse_audio_stream_options({b'rate': [b'0']}))
+    
+    def test_encoding(self):
+        options = parse_audio_stream_options({b'rate': [b'8000'], b'encoding': [b'mulaw']})
+        self.assertEqual(options.encoding.name, 'mulaw')
+        self.assertEqual(options.encoding.bytes_per_sample, 1)
+        self.assertRaises(ValueError, lambda: parse_audio_stream_options({b'rate': [b'8000'], b'encoding': [b'mp3']}))
@@ -30,10 +30,11 @@ from zope.interface import Interface, implementer
 
 import numpy
 
+from shinysdr.i.audioformat import AUDIO_ENCODINGS
 from shinysdr.i.json import transform_for_json
 from shinysdr.i.network.base import AUDIO_STREAM_PATH_ELEMENT
 # TODO: StateStreamInner is an implementation detail; arrange a better interface to test
-from shinysdr.i.network.export_ws import StateStreamInner, WebSocketDispatcherProtocol
+from shinysdr.i.network.export_ws import AudioStreamInner, StateStreamInner, WebSocketDispatcherProtocol
 from shinysdr.i.roots import CapTable, IEntryPoint
 from shinysdr.signals import SignalType
 from shinysdr.testutil import Cells, SubscriptionTester
@@ -347,10 +348,88 @@ class TestWebSocketDispatcherProtocol(unittest.TestCase):
                     u'kind': u'MONO',
                     u'sample_rate': 1.0
                 },
-                u'type': u'audio_stream_metadata'
+                u'type': u'audio_stream_metadata',
+                u'encoding': u'float32',
             },
             _FAKE_SAMPLES,
         ])
+    
+    @defer.inlineCallbacks
+    def test_audio_encoding(self):
+        self.begin('/foo/' + AUDIO_STREAM_PATH_ELEMENT + '?rate=1&encoding=s16')
+        self.clock.advance(1)
+        yield deferLater(the_reactor, 0.0, lambda: None)
+        self.assertEqual(self.transport.messages()[0][u'encoding'], u's16')
+    
+    @defer.inlineCallbacks
+    def test_audio_paused(self):
+        self.begin('/foo/' + AUDIO_STREAM_PATH_ELEMENT + '?rate=1')
+        self.transport.producer.pauseProducing()
+        yield deferLater(the_reactor, 0.0, lambda: None)
+        self.assertEqual(len(self.transport.messages()), 1)  # metadata only
+        self.transport.producer.resumeProducing()
+        self.assertEqual(self.transport.messages()[1], _FAKE_SAMPLES)
+
+
+class TestAudioStreamInner(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        self.transport = FakeWebSocketTransport()
+        self.source = _FakeAudioSource()
+        self.inner = AudioStreamInner(
+            reactor=self.clock,
+            send=lambda value, safe_to_drop=False: self.transport.write(value),
+            audio_source=self.source,
+            audio_rate=1000,  # 2000 bytes per second in s16
+            encoding=AUDIO_ENCODINGS[u's16'],
+            consumer=self.transport)
+    
+    def __run(self, seconds, chunk):
+        for _ in range(seconds):
+            self.source.callback(chunk)
+            self.clock.advance(1)
+    
+    def __encodings_announced(self):
+        return [m[u'encoding'] for m in self.transport.messages() if isinstance(m, dict)]
+    
+    def test_step_down_and_up(self):
+        self.transport.producer.pauseProducing()
+        self.__run(6, b'x' * 3000)
+        self.assertEqual(self.source.encoding_changes, [u'mulaw'])
+        self.transport.producer.resumeProducing()
+        self.__run(31, b'x')
+        self.assertEqual(self.source.encoding_changes, [u'mulaw', u's16'])
+        # Not above the requested encoding.
+        self.__run(31, b'x')
+        self.assertEqual(self.source.encoding_changes, [u'mulaw', u's16'])
+        self.assertEqual(self.__encodings_announced(), [u's16', u'mulaw', u's16'])
+        # The callback was never removed, so the flow graph was never reconnected.
+        self.assertEqual(self.source.removed, [])
+    
+    def test_connection_lost(self):
+        self.inner.connectionLost(None)
+        self.assertEqual(self.source.removed, [self.source.callback])
+        self.assertIs(self.transport.producer, None)
+
+
+class _FakeAudioSource(object):
+    def __init__(self):
+        self.callback = None
+        self.encoding_changes = []
+        self.removed = []
+    
+    def add_audio_callback(self, callback, sample_rate, encoding=None):
+        self.callback = callback
+    
+    def remove_audio_callback(self, callback):
+        self.removed.append(callback)
+    
+    def set_audio_callback_encoding(self, callback, encoding):
+        assert callback == self.callback
+        self.encoding_changes.append(encoding.name)
+    
+    def get_audio_callback_channels(self):
+        return 1
 
 
 class FakeWebSocketTransport(object):
@@ -358,12 +437,19 @@ class FakeWebSocketTransport(object):
         self.__messages = []
         # faking up stuff!!!
         self.location = None
+        self.producer = None
         self.transport = StringTransport()
         self.transport.dataBuffer = []
     
     def write(self, data):
         self.__messages.append(data)
     
+    def registerProducer(self, producer, streaming):
+        self.producer = producer
+    
+    def unregisterProducer(self):
+        self.producer = None
+    
     def messages(self):
         return [json.loads(m) if isinstance(m, six.text_type) else m for m in self.__messages]
 
@@ -376,11 +462,14 @@ class EntryPointStub(ExportedState):
     def entry_point_is_deleted(self):
         return False
     
-    def add_audio_callback(self, callback, sample_rate):
+    def add_audio_callback(self, callback, sample_rate, encoding=None):
         deferLater(the_reactor, 0.0, lambda: callback(_FAKE_SAMPLES))
     
     def remove_audio_callback(self, callback):
         pass
+    
+    def set_audio_callback_encoding(self, callback, encoding):
+        pass
         
     def get_audio_callback_channels(self):
         return 1
@@ -0,0 +1,297 @@
+# Copyright 2019 Kevin Reid and the ShinySDR contributors
+#
+# This file is part of ShinySDR.
+#
+# ShinySDR is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ShinySDR is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ShinySDR.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Sharing of external decoder processes (such as multimon-ng and rtl_433) between demodulators.
+
+The decoders we use read a single stream of samples, so a process can only serve one channel at a time. But starting one is slow, and demodulators are frequently discarded and recreated (changing modes or devices), so instead of each demodulator starting and abandoning its own process, demodulators lease processes from a DecoderProcessPool. A released process is kept running for a while, and given to the next demodulator which needs a process with the same command line.
+
+Each lease has its own ProcessProtocol, which receives the process's output only while the lease is held, so messages are attributed to the demodulator which supplied the samples. Between leases, the pool feeds the process some zeros to push the previous samples through the decoder, and discards its output.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import errno
+import fcntl
+import os
+import threading
+import weakref
+
+from twisted.internet import reactor as the_reactor
+from twisted.internet.protocol import ProcessProtocol
+
+
+__all__ = []  # appended later
+
+
+# Time a released process must have been idle, after its flush was written, before it is reused; during this time its leftover output is discarded.
+_SETTLE_SECONDS = 1.0
+
+# Interval at which the pool retries writing flush data to an idle process whose pipe is full.
+_FLUSH_RETRY_SECONDS = 0.05
+
+
+class DecoderProcessPool(object):
+    """
+    Starts decoder processes and keeps idle ones for reuse.
+
+    At most max_idle processes are kept idle, and each for at most idle_seconds; the process is then stopped by closing its stdin.
+    """
+    def __init__(self, reactor, max_idle=4, idle_seconds=600, settle_seconds=_SETTLE_SECONDS):
+        self.__reactor = reactor
+        self.__max_idle = max_idle
+        self.__idle_seconds = idle_seconds
+        self.__settle_seconds = settle_seconds
+        self.__idle = []  # _DecoderProcess, least recently released first
+        self.__leases = set()  # outstanding DecoderProcessLease
+        self.__statistics = {
+            'started': 0,
+            'reused': 0,
+            'stopped': 0,
+            'ended': 0,
+        }
+
+    def lease(self, args, protocol, item_size=1, flush_bytes=0, owner=None):
+        """Return a DecoderProcessLease for a process running args, started if necessary.
+
+        protocol: a ProcessProtocol which will receive the process's output for the duration of the lease.
+        item_size: the size in bytes of the samples which will be written; a process released partway through a sample is padded to a whole sample before reuse.
+        flush_bytes: number of zero bytes to write to the process after the lease is released, enough to make it finish decoding the samples it has been given.
+        owner: if given, the lease is released when owner is garbage collected, for owners which are not reliably closed.
+        """
+        key = tuple(args)
+        process = None
+        now = self.__reactor.seconds()
+        for i, candidate in enumerate(self.__idle):
+            if candidate.key == key and candidate.is_settled(now, self.__settle_seconds):
+                process = self.__idle.pop(i)
+                process.cancel_timers()
+                self.__statistics['reused'] += 1
+                break
+        if process is None:
+            process = self.__start(key)
+        lease = DecoderProcessLease(self, process, item_size, flush_bytes)
+        self.__leases.add(lease)
+        if owner is not None:
+            reactor = self.__reactor
+            lease._owner_ref = weakref.ref(owner, lambda _ref: reactor.callFromThread(lease.release))
+        process.lessee = protocol
+        return lease
+
+    def get_statistics(self):
+        stats = dict(self.__statistics)
+        stats['idle'] = len(self.__idle)
+        stats['leased'] = len(self.__leases)
+        return stats
+
+    def stop_idle(self):
+        """Stop all idle processes now, rather than waiting for them to expire."""
+        while self.__idle:
+            self.__stop(self.__idle.pop(0))
+
+    def __start(self, key):
+        process = _DecoderProcess(self, key)
+        # using /usr/bin/env because twisted spawnProcess doesn't support path search
+        transport = self.__reactor.spawnProcess(
+            process,
+            '/usr/bin/env',
+            env=None,  # inherit environment
+            args=('env',) + key,
+            childFDs={
+                0: 'w',
+                1: 'r',
+                2: 2
+            })
+        process.take_stdin(transport)
+        self.__statistics['started'] += 1
+        return process
+
+    def __stop(self, process):
+        process.cancel_timers()
+        process.stop()
+        self.__statistics['stopped'] += 1
+
+    def _released(self, lease, process, padding):
+        self.__leases.discard(lease)
+        process.lessee = None
+        if process.ended:
+            return
+        if self.__max_idle <= 0:
+            self.__stop(process)
+            return
+        process.released_time = None
+        process.padding = padding
+        self.__flush(process)
+        self.__idle.append(process)
+        process.expiry_call = self.__reactor.callLater(self.__idle_seconds, self.__expire, process)
+        while len(self.__idle) > self.__max_idle:
+            self.__stop(self.__idle.pop(0))
+
+    def _ended(self, process):
+        self.__statistics['ended'] += 1
+        if process in self.__idle:
+            self.__idle.remove(process)
+            process.cancel_timers()
+
+    def __flush(self, process):
+        process.flush_call = None
+        process.write_padding()
+        if process.padding and not process.ended:
+            process.flush_call = self.__reactor.callLater(_FLUSH_RETRY_SECONDS, self.__flush, process)
+        else:
+            process.released_time = self.__reactor.seconds()
+
+    def __expire(self, process):
+        process.expiry_call = None
+        if process in self.__idle:
+            self.__idle.remove(process)
+            self.__stop(process)
+
+
+__all__.append('DecoderProcessPool')
+
+
+class DecoderProcessLease(object):
+    """A process leased from a DecoderProcessPool. Samples are written to it with write(), which may be called from any thread; call release() when done."""
+    def __init__(self, pool, process, item_size, flush_bytes):
+        self.__pool = pool
+        self.__process = process
+        self.__item_size = item_size
+        self.__flush_bytes = flush_bytes
+        self.__bytes_written = 0
+        self.__lock = threading.Lock()  # so that release() sees a consistent __bytes_written
+        self._owner_ref = None
+
+    def get_pid(self):
+        process = self.__process
+        return process.pid if process is not None else None
+
+    def write(self, data):
+        """Write as much of data as the process's stdin pipe will take without blocking, and return the number of bytes written.
+
+        If the lease has been released or the process has exited, data is discarded (and reported as written).
+        """
+        with self.__lock:
+            process = self.__process
+            if process is None:
+                return len(data)
+            written = process.write(data)
+            self.__bytes_written += written
+            return written
+
+    def release(self):
+        """Return the process to the pool. Idempotent."""
+        with self.__lock:
+            process = self.__process
+            if process is None:
+                return
+            self.__process = None
+        padding = (-self.__bytes_written) % self.__item_size + self.__flush_bytes
+        self.__pool._released(self, process, padding)
+
+
+__all__.append('DecoderProcessLease')
+
+
+class _DecoderProcess(ProcessProtocol):
+    """A running decoder process; passes its output to the current lessee's protocol."""
+    def __init__(self, pool, key):
+        self.key = key
+        self.lessee = None  # ProcessProtocol or None
+        self.pid = None
+        self.ended = False
+        self.padding = 0  # zero bytes still to be written before the process is reused
+        self.released_time = None  # time the process finished flushing after its last lease, or None if it has not
+        self.flush_call = None
+        self.expiry_call = None
+        self.__pool = pool
+        self.__stdin_fd = None
+        self.__stdin_lock = threading.Lock()  # write() is called from other threads; the fd must not be closed (and its number reused) while it is being written to
+
+    def take_stdin(self, transport):
+        """Take over the process's stdin from Twisted, to be written from other threads."""
+        self.pid = transport.pid
+        self.__stdin_fd = os.dup(transport.pipes[0].fileno())  # TODO: More public way to do this?
+        transport.closeStdin()
+        fcntl.fcntl(self.__stdin_fd, fcntl.F_SETFL, fcntl.fcntl(self.__stdin_fd, fcntl.F_GETFL) | os.O_NONBLOCK)
+
+    def is_settled(self, now, settle_seconds):
+        return not self.ended and self.released_time is not None and now - self.released_time >= settle_seconds
+
+    def write(self, data):
+        with self.__stdin_lock:
+            fd = self.__stdin_fd
+            if fd is None:
+                return len(data)
+            try:
+                return os.write(fd, data)
+            except OSError as e:
+                if e.errno == errno.EAGAIN:
+                    return 0
+                elif e.errno == errno.EPIPE:
+                    self.__close_stdin_locked()
+                    return len(data)
+                else:
+                    raise
+
+    def write_padding(self):
+        if self.padding:
+            self.padding -= self.write(b'\0' * self.padding)
+
+    def cancel_timers(self):
+        for call in (self.flush_call, self.expiry_call):
+            if call is not None and call.active():
+                call.cancel()
+        self.flush_call = None
+        self.expiry_call = None
+
+    def stop(self):
+        # The decoders exit when their input ends.
+        self.__close_stdin()
+        if self.transport is not None:
+            self.transport.loseConnection()
+
+    def __close_stdin(self):
+        with self.__stdin_lock:
+            self.__close_stdin_locked()
+
+    def __close_stdin_locked(self):
+        if self.__stdin_fd is not None:
+            os.close(self.__stdin_fd)
+            self.__stdin_fd = None
+
+    def outReceived(self, data):
+        """Implements ProcessProtocol."""
+        if self.lessee is not None:
+            self.lessee.outReceived(data)
+
+    def errReceived(self, data):
+        """Implements ProcessProtocol."""
+        if self.lessee is not None:
+            self.lessee.errReceived(data)
+
+    def processEnded(self, reason):
+        """Implements ProcessProtocol."""
+        self.ended = True
+        self.__close_stdin()
+        self.__pool._ended(self)
+        if self.lessee is not None:
+            self.lessee.processEnded(reason)
+
+
+the_decoder_process_pool = DecoderProcessPool(reactor=the_reactor)
+__all__.append('the_decoder_process_pool')
@@ -18,6 +18,7 @@
 
 from __future__ import absolute_import, division, print_function, unicode_literals
 
+from collections import namedtuple
 import time
 
 import six
@@ -29,22 +30,30 @@ from gnuradio import analog
 from gnuradio import gr
 from gnuradio import blocks
 
+from shinysdr.filters import MultistageChannelFilter
+from shinysdr.i.blocks import GapFiller
 from shinysdr.i.modes import get_modes, lookup_mode
-from shinysdr.interfaces import IDemodulator, IDemodulatorContext, IDemodulatorModeChange, ITunableDemodulator
+from shinysdr.i.recording import RecordingSink
+from shinysdr.interfaces import ICostEstimatingDemodulator, IDemodulator, IDemodulatorContext, IDemodulatorModeChange, IGatingDemodulator, ITunableDemodulator
 from shinysdr.math import dB, rotator_inc, to_dB
 from shinysdr.signals import SignalType, no_signal
 from shinysdr.types import EnumT, QuantityT, RangeT, ReferenceT
 from shinysdr import units
-from shinysdr.values import ExportedState, exported_value, setter, unserialize_exported_state
+from shinysdr.values import ExportedState, exported_value, setter, split_constructor_state
 
 
 # arbitrary non-infinite limit
 _audio_power_minimum_dB = -60
 _audio_power_minimum_amplitude = dB(_audio_power_minimum_dB)
+# TODO adapt to output audio rate
+_audio_probe_alpha = 10.0 / 44100
 
 
 _dummy_audio_rate = 2000
 
+# Assumed cost, in complex multiply-accumulates per input sample, of demodulators which do not implement ICostEstimatingDemodulator.
+_default_demodulator_cost_per_input_sample = 100
+
 
 class IReceiver(Interface):
     """
@@ -105,18 +114,43 @@ class Receiver(gr.hier_block2, ExportedState):
         
         # Blocks
         self.__rotator = blocks.rotator_cc()
-        self.__demodulator = self.__make_demodulator(mode, {})
+        self.__channelizer = None
+        self.__input_channel = None
+        self.__demodulator, self.__demodulator_pool_info = self.__make_demodulator_for_input(mode, {})
         self.__update_demodulator_info()
         self.__audio_gain_block = blocks.multiply_const_vff([0.0] * audio_channels)
-        self.probe_audio = analog.probe_avg_mag_sqrd_f(0, alpha=10.0 / 44100)  # TODO adapt to output audio rate
+        self.probe_audio = analog.probe_avg_mag_sqrd_f(0, alpha=_audio_probe_alpha)
+        
+        # Recording
+        self.__record_audio = False
+        self.__record_iq = False
+        self.__audio_recording_sink = None
+        self.__iq_recording_sink = None
+        self.__iq_recording_filter = None
+        self.__iq_recording_input_rate = None
+        
+        # Time shift
+        self.__time_shift = 0.0
+        self.__time_shift_generation = 0
         
         # Other internals
         self.__last_output_type = None
+        self.__output_gaps_allowed = False
         
         self.__update_rotator()  # initialize rotator, also in case of __demod_tunable
         self.__update_audio_gain()
         self.__do_connect(reason=u'initialization')
     
+    def state_def(self):
+        for d in super(Receiver, self).state_def():
+            if d[0] in ('record_audio', 'record_iq') and self.context.get_recorder() is None:
+                # Recording is not configured.
+                continue
+            if d[0] == 'time_shift' and self.context.get_time_shift_limit() is None:
+                # IQ ring buffers are not configured.
+                continue
+            yield d
+    
     def __update_demodulator_info(self):
         self.__demod_tunable = ITunableDemodulator.providedBy(self.__demodulator)
         output_type = self.__demodulator.get_output_type()
@@ -144,38 +178,63 @@ class Receiver(gr.hier_block2, ExportedState):
             else:
                 self.connect(self, self.__rotator, self.__demodulator)
             
+            self.__update_recording_sinks()
+            gating = self.__update_output_gaps_allowed()
+            if self.__iq_recording_sink is not None:
+                if self.__demod_tunable:
+                    self.connect(self, self.__rotator)
+                # else the rotator is already connected to our input, for the demodulator
+                self.connect(self.__rotator, self.__iq_recording_filter, self.__iq_recording_sink)
+            
             if self.__demod_output:
-                # Construct stereo-to-mono conversion (used at least for level probe)
+                # Connect demodulator to level probe. Stereo is metered as interleaved samples (the mean power of the two channels) since that takes only one block, so the probe's time constant is halved to match.
                 if self.__demod_stereo:
-                    splitter = blocks.vector_to_streams(gr.sizeof_float, 2)
-                    mono_audio = blocks.multiply_matrix_ff(((0.5, 0.5),))
-                    self.connect(self.__demodulator, splitter)
-                    self.connect((splitter, 0), (mono_audio, 0))
-                    self.connect((splitter, 1), (mono_audio, 1))
+                    interleaver = blocks.vector_to_stream(gr.sizeof_float, 2)
+                    self.connect(self.__demodulator, interleaver, self.probe_audio)
+                    self.probe_audio.set_alpha(_audio_probe_alpha / 2)
                 else:
-                    mono_audio = self.__demodulator
-                
-                # Connect mono audio to level probe
-                self.connect(mono_audio, self.probe_audio)
+                    self.connect(self.__demodulator, self.probe_audio)
+                    self.probe_audio.set_alpha(_audio_probe_alpha)
                 
                 # Connect demodulator to output gain control, converting as needed
                 if (self.__audio_channels == 2) == self.__demod_stereo:
                     # stereo to stereo or mono to mono
-                    self.connect(self.__demodulator, self.__audio_gain_block)
+                    audio_out = self.__demodulator
                 elif self.__audio_channels == 2 and not self.__demod_stereo:
                     # mono to stereo
-                    duplicator = blocks.streams_to_vector(gr.sizeof_float, 2)
-                    self.connect(self.__demodulator, (duplicator, 0))
-                    self.connect(self.__demodulator, (duplicator, 1))
-                    self.connect(duplicator, self.__audio_gain_block)
+                    audio_out = blocks.streams_to_vector(gr.sizeof_float, 2)
+                    self.connect(self.__demodulator, (audio_out, 0))
+                    self.connect(self.__demodulator, (audio_out, 1))
                 elif self.__audio_channels == 1 and self.__demod_stereo:
                     # stereo to mono
-                    self.connect(mono_audio, self.__audio_gain_block)
+                    splitter = blocks.vector_to_streams(gr.sizeof_float, 2)
+                    audio_out = blocks.multiply_matrix_ff(((0.5, 0.5),))
+                    self.connect(self.__demodulator, splitter)
+                    self.connect((splitter, 0), (audio_out, 0))
+                    self.connect((splitter, 1), (audio_out, 1))
                 else:
                     raise Exception('shouldn\'t happen')
+                self.connect(audio_out, self.__audio_gain_block)
+                if self.__audio_recording_sink is not None:
+                    self.connect(audio_out, self.__audio_recording_sink)
                     
                 # Connect gain control to output of receiver
-                self.connect(self.__audio_gain_block, self)
+                if gating:
+                    # Fill the gaps with silence so that the output stays rate-locked with the other receivers' for mixing.
+                    input_rate = self.__get_input_rate()
+                    output_rate = self.__output_type.get_sample_rate()
+                    decimation = max(1, int(input_rate // output_rate))
+                    clock = blocks.keep_one_in_n(gr.sizeof_gr_complex, decimation)
+                    filler = GapFiller(
+                        vlen=self.__audio_channels,
+                        ratio=output_rate * decimation / input_rate,
+                        is_gated=self.__demodulator.get_output_gated,
+                        max_lead=int(output_rate))
+                    self.connect(self.__audio_gain_block, (filler, 0))
+                    self.connect(self, clock, (filler, 1))
+                    self.connect(filler, self)
+                else:
+                    self.connect(self.__audio_gain_block, self)
             else:
                 # Dummy output, ignored by containing block
                 self.connect(
@@ -188,8 +247,78 @@ class Receiver(gr.hier_block2, ExportedState):
         finally:
             self.context.unlock()
     
+    def __update_recording_sinks(self):
+        """Create or discard recording sinks (and so files) to match the recording settings and current sample rates."""
+        recorder = self.context.get_recorder()
+        
+        audio_rate = self.__output_type.get_sample_rate() if self.__demod_output else None
+        want_audio = recorder is not None and self.__record_audio and audio_rate is not None
+        sink = self.__audio_recording_sink
+        if sink is not None and (not want_audio or sink.get_stream().sample_rate != audio_rate):
+            recorder.close_stream(sink.get_stream())
+            self.__audio_recording_sink = None
+        if want_audio and self.__audio_recording_sink is None:
+            stream = recorder.open_stream(self.context.get_recording_name(), 'audio', audio_rate, channels=self.__audio_channels)
+            self.__audio_recording_sink = RecordingSink(recorder, stream, vlen=self.__audio_channels)
+        
+        input_rate = self.__get_input_rate()
+        want_iq = recorder is not None and self.__record_iq
+        sink = self.__iq_recording_sink
+        if sink is not None and (not want_iq or self.__iq_recording_input_rate != input_rate):
+            recorder.close_stream(sink.get_stream())
+            self.__iq_recording_sink = None
+            self.__iq_recording_filter = None
+        if want_iq and self.__iq_recording_sink is None:
+            iq_rate = min(recorder.get_config().iq_rate, input_rate)
+            stream = recorder.open_stream(self.context.get_recording_name(), 'iq', iq_rate)
+            self.__iq_recording_sink = RecordingSink(recorder, stream)
+            self.__iq_recording_filter = MultistageChannelFilter(
+                input_rate=input_rate,
+                output_rate=iq_rate,
+                cutoff_freq=iq_rate * 0.4,
+                transition_width=iq_rate * 0.2)
+            self.__iq_recording_input_rate = input_rate
+    
+    def _set_output_gaps_allowed(self, allowed):
+        """Called by the containing flow graph to say whether our demodulator may stop while squelched, with its output gaps filled; see IGatingDemodulator."""
+        allowed = bool(allowed)
+        if allowed != self.__output_gaps_allowed:
+            self.__output_gaps_allowed = allowed
+            self.__do_connect(reason=u'changed output gaps allowed')
+    
+    def __update_output_gaps_allowed(self):
+        """Tell the demodulator whether it may gate its output, and return whether it may."""
+        if not IGatingDemodulator.providedBy(self.__demodulator):
+            return False
+        # The audio recording is a second consumer of the output, and would be shortened by gaps.
+        gating = bool(self.__output_gaps_allowed and self.__demod_output and self.__audio_recording_sink is None)
+        self.__demodulator.set_output_gaps_allowed(gating)
+        return gating
+    
+    def _stop_recording(self):
+        """Called when this receiver is being discarded, to close its recording files."""
+        self.__record_audio = False
+        self.__record_iq = False
+        self.__update_recording_sinks()
+    
     def get_output_type(self):
         return self.__output_type
+    
+    def get_estimated_cost(self):
+        """Estimate the computation this receiver performs, in complex multiply-accumulates per second, for resource budgeting."""
+        input_rate = self.__get_input_rate()
+        cost = 0 if self.__demod_tunable else input_rate  # rotator
+        if ICostEstimatingDemodulator.providedBy(self.__demodulator):
+            cost += self.__demodulator.get_estimated_cost()
+        else:
+            cost += input_rate * _default_demodulator_cost_per_input_sample
+        return cost
+    
+    def get_input_channel(self):
+        """Return the index of the output of the device's DeviceChannelizer which this receiver should be connected to, or None if it should be connected to the device directly."""
+        if self.__channelizer is None:
+            return None
+        return self.__input_channel
 
     def changed_device_freq(self):
         if self.__freq_linked_to_device:
@@ -309,6 +438,60 @@ class Receiver(gr.hier_block2, ExportedState):
         self.audio_pan = value
         self.__update_audio_gain()
     
+    @exported_value(type=bool, changes='this_setter', label='Record audio')
+    def get_record_audio(self):
+        return self.__record_audio
+    
+    @setter
+    def set_record_audio(self, value):
+        value = bool(value)
+        if value != self.__record_audio:
+            self.__record_audio = value
+            self.__do_connect(reason=u'changed audio recording')
+    
+    @exported_value(type=bool, changes='this_setter', label='Record IQ')
+    def get_record_iq(self):
+        return self.__record_iq
+    
+    @setter
+    def set_record_iq(self, value):
+        value = bool(value)
+        if value != self.__record_iq:
+            self.__record_iq = value
+            self.__do_connect(reason=u'changed IQ recording')
+    
+    # Not persisted since the past samples it refers to will not survive a restart.
+    @exported_value(
+        type_fn=lambda self: RangeT([(0, self.context.get_time_shift_limit() or 0)], unit=units.s, strict=False),
+        changes='explicit',
+        persists=False,
+        label='Time shift')
+    def get_time_shift(self):
+        return self.__time_shift
+    
+    @setter
+    def set_time_shift(self, value):
+        """Start receiving from value seconds in the past, catching up to live as fast as possible. Setting the same value again starts again from that far back."""
+        self.__time_shift = max(0.0, float(value))
+        self.__time_shift_generation += 1
+        self.__time_shift_changed(u'changed time shift')
+    
+    def _time_shift_caught_up(self):
+        """Called by the containing flow graph when time-shifted input has caught up with live input, to switch to live input."""
+        self.__time_shift = 0.0
+        self.__time_shift_changed(u'time shift caught up')
+    
+    def __time_shift_changed(self, reason):
+        self.state_changed('time_shift')
+        if self.context.get_channelizer(self.__device_name) is not self.__channelizer:
+            # Time-shifted input is never channelized, so the demodulator may need a different input rate.
+            self._rebuild_demodulator(reason=reason)
+        self.context.changed_needed_connections(reason)
+    
+    def get_time_shift_generation(self):
+        """Return a number which changes whenever set_time_shift is called, so that the caller can tell when to start a new replay."""
+        return self.__time_shift_generation
+    
     @exported_value(
         type_fn=lambda self: self.context.get_audio_destination_type(),
         changes='this_setter',
@@ -347,33 +530,57 @@ class Receiver(gr.hier_block2, ExportedState):
             return _audio_power_minimum_dB
     
     def __update_rotator(self):
-        device = self.__get_device()
-        sample_rate = device.get_rx_driver().get_output_type().get_sample_rate()
+        sample_rate = self.__get_input_rate()
+        if self.__channelizer is None:
+            input_freq_relative = self.__freq_relative
+        else:
+            shape = self.__demodulator.get_band_shape()
+            channel = self.__channelizer.find_channel(
+                self.__freq_relative + shape.stop_low,
+                self.__freq_relative + shape.stop_high)
+            if channel is None:
+                # Out of the device's passband, so we are invalid anyway; stay put.
+                channel = self.__input_channel or 0
+            if channel != self.__input_channel:
+                self.__input_channel = channel
+                self.context.changed_needed_connections(u'changed channelizer channel')
+            input_freq_relative = self.__freq_relative - self.__channelizer.get_channel_freq(channel)
         if self.__demod_tunable:
             # TODO: Method should perhaps be renamed to convey that it is relative
-            self.__demodulator.set_rec_freq(self.__freq_relative)
-        else:
-            self.__rotator.set_phase_inc(rotator_inc(rate=sample_rate, shift=-self.__freq_relative))
+            self.__demodulator.set_rec_freq(input_freq_relative)
+        # The rotator is also used for IQ recording, so keep it up to date even if the demodulator does not use it.
+        self.__rotator.set_phase_inc(rotator_inc(rate=sample_rate, shift=-input_freq_relative))
     
     def __get_device(self):
         return self.context.get_device(self.__device_name)
     
+    def __get_input_rate(self):
+        if self.__channelizer is None:
+            return self.__get_device().get_rx_driver().get_output_type().get_sample_rate()
+        else:
+            return self.__channelizer.get_channel_rate()
+    
     # called from facet
-    def _rebuild_demodulator(self, mode=None, reason='<unspecified>'):
-        self.__rebuild_demodulator_nodirty(mode)
+    def _rebuild_demodulator(self, mode=None, reason='<unspecified>', reuse_old=True):
+        self.__rebuild_demodulator_nodirty(mode, reuse_old=reuse_old)
         self.__do_connect(reason=u'demodulator rebuilt: %s' % (reason,))
         # TODO write a test showing that revalidate is needed and works
         self.context.revalidate(tuning=False)  # in case our bandwidth changed
         self.state_changed('is_valid')
 
-    def __rebuild_demodulator_nodirty(self, mode=None):
+    def __rebuild_demodulator_nodirty(self, mode=None, reuse_old=True):
         if self.__demodulator is None:
             defaults = {}
         else:
             defaults = self.__demodulator.state_to_json()
         if mode is None:
             mode = self.mode
-        self.__demodulator = self.__make_demodulator(mode, defaults)
+        old_demodulator = self.__demodulator
+        old_pool_info = self.__demodulator_pool_info
+        self.__demodulator, self.__demodulator_pool_info = self.__make_demodulator_for_input(mode, defaults)
+        # The old demodulator is released only after the new one is made so that it cannot be handed straight back. It remains connected until the caller reconnects.
+        if reuse_old and old_pool_info.key is not None and old_pool_info.key[0] == self.mode:
+            self.__release_demodulator(old_demodulator, old_pool_info)
         self.__update_demodulator_info()
         self.__update_rotator()
         self.mode = mode
@@ -383,8 +590,29 @@ class Receiver(gr.hier_block2, ExportedState):
         self.__audio_gain_block = blocks.multiply_const_vff([0.0] * self.__audio_channels)
         self.__update_audio_gain()
 
-    def __make_demodulator(self, mode, state):
-        """Returns the demodulator."""
+    def __make_demodulator_for_input(self, mode, state):
+        """Returns the demodulator and its _PoolInfo, and chooses whether to take input from the device's channelizer."""
+        input_rate = self.__get_device().get_rx_driver().get_output_type().get_sample_rate()
+        channelizer = self.context.get_channelizer(self.__device_name)
+        if channelizer is not None and channelizer.get_mode_fits(mode) is not False:
+            demodulator, pool_info = self.__make_demodulator(mode, state, channelizer.get_channel_rate())
+            fits = channelizer.band_fits(demodulator.get_band_shape())
+            channelizer.set_mode_fits(mode, fits)
+            if fits:
+                if channelizer is not self.__channelizer:
+                    self.__channelizer = channelizer
+                    self.__input_channel = None  # recomputed by __update_rotator
+                return demodulator, pool_info
+            # It was never connected, so it may be reused by anyone.
+            self.__release_demodulator(demodulator, pool_info)
+        if self.__channelizer is not None:
+            self.__channelizer = None
+            self.__input_channel = None
+            self.context.changed_needed_connections(u'stopped using channelizer')
+        return self.__make_demodulator(mode, state, input_rate)
+
+    def __make_demodulator(self, mode, state, input_rate):
+        """Returns the demodulator and its _PoolInfo, taking it from the demodulator pool if possible."""
 
         t0 = time.time()
         
@@ -397,21 +625,63 @@ class Receiver(gr.hier_block2, ExportedState):
         state = state.copy()  # don't modify arg
         if 'mode' in state: del state['mode']  # don't switch back to the mode we just switched from
         
+        # Constructor arguments are part of the pool key because they cannot be changed afterward.
+        ctor_kwargs, remaining_state = split_constructor_state(clas, state)
+        pool = self.context.get_demodulator_pool()
+        key = _pool_key(mode, input_rate, ctor_kwargs)
+        pooled = pool.take(key) if pool is not None and key is not None else None
+        
+        if pooled is not None:
+            demodulator, pool_info = pooled
+            facet = pool_info.facet
+            facet._receiver = self
+            facet._pooled = False
+            facet._enabled = False
+            # Reset to the state it had when new, so that reuse is not distinguishable from construction.
+            combined_state = dict(pool_info.initial_state)
+            combined_state.update(remaining_state)
+            demodulator.state_from_json(combined_state)
+            facet._enabled = True
+            time_ms = (time.time() - t0) * 1000
+            pool.record_reuse(time_ms)
+            self.__log.debug('Reused {mode} demodulator: {time_ms} ms.', mode=mode, time_ms=time_ms)
+            return demodulator, pool_info
+        
         facet = ContextForDemodulator(self)
         
         init_kwargs = dict(
             mode=mode,
-            input_rate=self.__get_device().get_rx_driver().get_output_type().get_sample_rate(),
+            input_rate=input_rate,
             context=facet)
-        demodulator = IDemodulator(unserialize_exported_state(
-            ctor=clas,
-            state=state,
-            kwargs=init_kwargs))
+        init_kwargs.update(ctor_kwargs)
+        demodulator = IDemodulator(clas(**init_kwargs))
+        initial_state = demodulator.state_to_json()
+        if remaining_state:
+            demodulator.state_from_json(remaining_state)
         
         # until _enabled, ignore any callbacks resulting from unserialization calling setters
         facet._enabled = True
-        self.__log.debug('Constructed {mode} demodulator: {time_ms} ms.', mode=mode, time_ms=(time.time() - t0) * 1000)
-        return demodulator
+        time_ms = (time.time() - t0) * 1000
+        if pool is not None:
+            pool.record_construction(time_ms)
+        self.__log.debug('Constructed {mode} demodulator: {time_ms} ms.', mode=mode, time_ms=time_ms)
+        return demodulator, _PoolInfo(key=key, facet=facet, initial_state=initial_state)
+    
+    def __release_demodulator(self, demodulator, pool_info):
+        pool = self.context.get_demodulator_pool()
+        if pool is not None and pool_info.key is not None:
+            pool_info.facet._pooled = True
+            pool.put(pool_info.key, (demodulator, pool_info))
+    
+    def _release_demodulator(self):
+        """Called when this receiver is being discarded, to make its demodulator available for reuse."""
+        self.context.lock()
+        try:
+            self.disconnect_all()
+        finally:
+            self.context.unlock()
+        self.__release_demodulator(self.__demodulator, self.__demodulator_pool_info)
+        self.__demodulator = None
 
     def __update_audio_gain(self):
         gain_lin = dB(self.audio_gain)
@@ -431,10 +701,13 @@ class ContextForDemodulator(object):
     def __init__(self, receiver):
         self._receiver = receiver
         self._enabled = False  # assigned outside
+        self._pooled = False  # assigned outside; true while the demodulator is unused in a DemodulatorPool
     
     def rebuild_me(self):
+        if self._pooled: return
         assert self._enabled, 'ContextForReceiver({}) is not currently valid'.format(self._receiver)
-        self._receiver._rebuild_demodulator(reason=u'rebuild_me')
+        # The demodulator asked to be replaced, so it is not fit for reuse.
+        self._receiver._rebuild_demodulator(reason=u'rebuild_me', reuse_old=False)
 
     def lock(self):
         self._receiver.context.lock()
@@ -443,9 +716,79 @@ class ContextForDemodulator(object):
         self._receiver.context.unlock()
     
     def output_message(self, message):
+        if self._pooled: return  # stale output from an unused demodulator
         assert self._enabled, 'ContextForReceiver({}) is not currently valid'.format(self._receiver)
         self._receiver.context.output_message(message)
     
     def get_absolute_frequency_cell(self):
         # TODO: This should return a read-only cell (until we have a use case demonstrating otherwise) (but we don't have read-only wrapper cells yet)
         return self._receiver.state()['rec_freq']
+    
+    def get_device_position(self):
+        return self._receiver.context.get_device_position()
+
+
+_PoolInfo = namedtuple('_PoolInfo', [
+    'key',  # pool key or None if not poolable
+    'facet',  # ContextForDemodulator
+    'initial_state',  # state_to_json() of the demodulator when newly constructed
+])
+
+
+def _pool_key(mode, input_rate, ctor_kwargs):
+    key = (mode, input_rate, frozenset(six.iteritems(ctor_kwargs)))
+    try:
+        hash(key)
+    except TypeError:
+        # Constructor arguments we can't compare; just don't pool it.
+        return None
+    return key
+
+
+class DemodulatorPool(object):
+    """
+    Keeps recently discarded demodulators for reuse, since constructing them (designing filters, starting subprocesses) is slow.
+    
+    Demodulators are keyed by mode, input sample rate, and constructor arguments. The pool is bounded; the least recently released demodulator is dropped first.
+    """
+    def __init__(self, max_entries=8):
+        self.__max_entries = max_entries
+        self.__entries = []  # list of (key, value), oldest first
+        self.__statistics = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'construct_count': 0,
+            'construct_ms_total': 0.0,
+            'construct_ms_max': 0.0,
+            'reuse_ms_total': 0.0,
+        }
+    
+    def take(self, key):
+        """Remove and return a value for key, or None."""
+        for i in six.moves.range(len(self.__entries) - 1, -1, -1):
+            if self.__entries[i][0] == key:
+                self.__statistics['hits'] += 1
+                return self.__entries.pop(i)[1]
+        self.__statistics['misses'] += 1
+        return None
+    
+    def put(self, key, value):
+        self.__entries.append((key, value))
+        while len(self.__entries) > self.__max_entries:
+            del self.__entries[0]
+            self.__statistics['evictions'] += 1
+    
+    def record_construction(self, time_ms):
+        stats = self.__statistics
+        stats['construct_count'] += 1
+        stats['construct_ms_total'] += time_ms
+        stats['construct_ms_max'] = max(stats['construct_ms_max'], time_ms)
+    
+    def record_reuse(self, time_ms):
+        self.__statistics['reuse_ms_total'] += time_ms
+    
+    def get_statistics(self):
+        stats = dict(self.__statistics)
+        stats['entries'] = len(self.__entries)
+        return stats
@@ -0,0 +1,260 @@
+# Copyright 2019 Kevin Reid and the ShinySDR contributors
+#
+# This file is part of ShinySDR.
+#
+# ShinySDR is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ShinySDR is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ShinySDR.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Continuous recording of receiver audio and IQ to files.
+
+Samples are copied out of the flow graph by RecordingSink blocks and written to disk by a single writer thread per Recorder, so that a slow disk delays only the writer. If the writer falls too far behind, new samples are dropped (and counted) rather than the flow graph being blocked.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from collections import namedtuple
+import os.path
+import struct
+import threading
+import time
+
+from six.moves import queue
+
+from twisted.logger import Logger
+
+from gnuradio import gr
+import numpy
+
+
+__all__ = []  # appended later
+
+
+RecordingConfig = namedtuple('RecordingConfig', [
+    'directory',  # str, existing directory to write files in
+    'rotate_seconds',  # float, start a new file after this long
+    'rotate_bytes',  # int, start a new file before exceeding this size
+    'iq_rate',  # float, sample rate IQ is decimated to for recording
+    'max_queued_bytes',  # int, drop samples rather than queue more than this for writing
+])
+
+
+__all__.append('RecordingConfig')
+
+
+def make_recording_config(directory, rotate_seconds=3600, rotate_bytes=2 ** 30, iq_rate=48000, max_queued_bytes=64 * 2 ** 20):
+    return RecordingConfig(
+        directory=str(directory),
+        rotate_seconds=float(rotate_seconds),
+        rotate_bytes=int(rotate_bytes),
+        iq_rate=float(iq_rate),
+        max_queued_bytes=int(max_queued_bytes))
+
+
+__all__.append('make_recording_config')
+
+
+_WRITE_BUFFER_SIZE = 2 ** 20
+_WAV_HEADER_SIZE = 44
+_WAV_MAX_SIZE = 2 ** 32 - 1
+
+
+class Recorder(object):
+    """
+    Writes any number of RecordingStreams to files using one writer thread.
+
+    open_stream, submit, and close_stream may be called from any thread.
+    """
+    __log = Logger()
+
+    def __init__(self, config, _time=time.time):
+        self.__config = config
+        self.__time = _time
+        self.__queue = queue.Queue()
+        self.__lock = threading.Lock()
+        self.__queued_bytes = 0  # guarded by __lock
+        self.__dropped_bytes = 0  # guarded by __lock
+        self.__written_bytes = 0  # written only by writer thread
+        self.__thread = None
+
+    def get_config(self):
+        return self.__config
+
+    def open_stream(self, name, kind, sample_rate, channels=1):
+        """Return a new RecordingStream. kind is 'audio' (float samples, written as WAV) or 'iq' (complex samples, written as raw cf32)."""
+        if self.__thread is None:
+            self.__thread = threading.Thread(target=self.__run, name='ShinySDR recording writer')
+            self.__thread.daemon = True
+            self.__thread.start()
+        return RecordingStream(self.__config, name, kind, sample_rate, channels)
+
+    def submit(self, stream, data):
+        """Queue bytes to be written to stream. Never blocks; returns false if the data was dropped because too much is already queued."""
+        size = len(data)
+        with self.__lock:
+            if self.__queued_bytes + size > self.__config.max_queued_bytes:
+                self.__dropped_bytes += size
+                return False
+            self.__queued_bytes += size
+        self.__queue.put((stream, data))
+        return True
+
+    def close_stream(self, stream):
+        """Close stream after all data already submitted for it has been written."""
+        self.__queue.put((stream, None))
+
+    def close(self):
+        """Write all queued data, close all files, and stop the writer thread."""
+        if self.__thread is not None:
+            self.__queue.put(None)
+            self.__thread.join()
+            self.__thread = None
+
+    def get_statistics(self):
+        with self.__lock:
+            return {
+                'queued_bytes': self.__queued_bytes,
+                'dropped_bytes': self.__dropped_bytes,
+                'written_bytes': self.__written_bytes,
+            }
+
+    def __run(self):
+        open_streams = set()
+        while True:
+            item = self.__queue.get()
+            if item is None:
+                break
+            stream, data = item
+            try:
+                if data is None:
+                    stream._close_file()
+                    open_streams.discard(stream)
+                else:
+                    with self.__lock:
+                        self.__queued_bytes -= len(data)
+                    stream._write(data, self.__time())
+                    open_streams.add(stream)
+                    self.__written_bytes += len(data)
+            except Exception:  # pylint: disable=broad-except
+                self.__log.failure('Error writing recording {name}', name=stream.name)
+        for stream in open_streams:
+            stream._close_file()
+
+
+__all__.append('Recorder')
+
+
+class RecordingStream(object):
+    """
+    One continuous recording, which is written to a series of files named after it and their start time.
+
+    The methods other than the constructor are called only by the Recorder's writer thread.
+    """
+    def __init__(self, config, name, kind, sample_rate, channels):
+        assert kind in ('audio', 'iq')
+        self.name = name
+        self.kind = kind
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.__config = config
+        self.__file = None
+        self.__file_start = None
+        self.__file_bytes = 0
+
+    def _write(self, data, now):
+        if self.__file is not None and (
+                now - self.__file_start >= self.__config.rotate_seconds or
+                self.__file_bytes + len(data) > self.__config.rotate_bytes):
+            self._close_file()
+        if self.__file is None:
+            self.__open_file(now)
+        self.__file.write(data)
+        self.__file_bytes += len(data)
+
+    def _close_file(self):
+        if self.__file is None:
+            return
+        if self.kind == 'audio':
+            # Fill in the sizes left as placeholders.
+            data_size = min(self.__file_bytes, _WAV_MAX_SIZE - _WAV_HEADER_SIZE)
+            self.__file.seek(4)
+            self.__file.write(struct.pack('<I', data_size + _WAV_HEADER_SIZE - 8))
+            self.__file.seek(_WAV_HEADER_SIZE - 4)
+            self.__file.write(struct.pack('<I', data_size))
+        self.__file.close()
+        self.__file = None
+
+    def __open_file(self, now):
+        extension = 'wav' if self.kind == 'audio' else 'cf32'
+        base = os.path.join(self.__config.directory, '%s-%s-%dHz-%s' % (
+            self.name,
+            self.kind,
+            int(round(self.sample_rate)),
+            time.strftime('%Y%m%dT%H%M%SZ', time.gmtime(now))))
+        path = base + '.' + extension
+        suffix = 1
+        while os.path.exists(path):
+            # Rotated by size more than once in the same second.
+            path = '%s-%d.%s' % (base, suffix, extension)
+            suffix += 1
+        self.__file = open(path, 'wb', _WRITE_BUFFER_SIZE)
+        self.__file_start = now
+        self.__file_bytes = 0
+        if self.kind == 'audio':
+            self.__file.write(_wav_header(self.sample_rate, self.channels))
+
+
+def _wav_header(sample_rate, channels, data_size=0):
+    bytes_per_sample = 4
+    integral_sample_rate = int(round(sample_rate))
+    return struct.pack('<4sI4s4sIHHIIHH4sI',
+        b'RIFF',
+        data_size + _WAV_HEADER_SIZE - 8,
+        b'WAVE',
+        b'fmt ',
+        16,  # this chunk size
+        3,  # float format
+        channels,
+        integral_sample_rate,
+        channels * integral_sample_rate * bytes_per_sample,  # byte rate
+        channels * bytes_per_sample,  # bytes per block
+        bytes_per_sample * 8,  # bits per sample
+        b'data',
+        data_size)
+
+
+class RecordingSink(gr.sync_block):
+    """Passes its input to a Recorder without ever blocking."""
+    def __init__(self, recorder, stream, vlen=1):
+        if stream.kind == 'iq':
+            item_type = numpy.complex64
+        else:
+            item_type = numpy.dtype((numpy.float32, vlen)) if vlen > 1 else numpy.float32
+        gr.sync_block.__init__(
+            self,
+            name=type(self).__name__,
+            in_sig=[item_type],
+            out_sig=[])
+        self.__recorder = recorder
+        self.__stream = stream
+
+    def get_stream(self):
+        return self.__stream
+
+    def work(self, input_items, output_items):
+        items = input_items[0]
+        self.__recorder.submit(self.__stream, items.tobytes())
+        return len(items)
+
+
+__all__.append('RecordingSink')
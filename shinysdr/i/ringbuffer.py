@@ -0,0 +1,173 @@
+# Copyright 2019 Kevin Reid and the ShinySDR contributors
+#
+# This file is part of ShinySDR.
+#
+# ShinySDR is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ShinySDR is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ShinySDR.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Buffering of recent device IQ so that receivers can be started in the past ("time shift").
+
+Each device's samples are written into a circular buffer in a memory-mapped temporary file, so that the buffer can be large without being in the Python heap or counting against process memory the same way. A time-shifted receiver reads from the buffer starting some seconds ago, as fast as the flow graph will take samples, until it has caught up with the live samples, after which it is switched back to live input.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from collections import namedtuple
+import tempfile
+import time
+
+from gnuradio import gr
+import numpy
+
+
+__all__ = []  # appended later
+
+
+IQRingBufferConfig = namedtuple('IQRingBufferConfig', [
+    'seconds',  # float, duration of IQ kept per device
+    'directory',  # str or None, where to put the backing files (None for the system temporary directory)
+])
+
+
+__all__.append('IQRingBufferConfig')
+
+
+# Fraction of the buffer, at the old end, which readers avoid since the writer may be overwriting it.
+_GUARD_FRACTION = 1 / 16
+
+# Time to wait in a source which has caught up, to avoid spinning the scheduler thread until it is disconnected.
+_CAUGHT_UP_SLEEP = 0.005
+
+
+class IQRingBuffer(object):
+    """
+    A circular buffer of complex samples backed by a memory-mapped temporary file.
+
+    Positions are counts of samples written since the buffer was created, so they never wrap. There is one writer thread; readers may be in other threads and may find that the samples they wanted have been overwritten, in which case they skip ahead.
+    """
+    def __init__(self, sample_rate, seconds, directory=None):
+        self.sample_rate = sample_rate
+        self.__capacity = max(1, int(seconds * sample_rate))
+        self.__guard = int(self.__capacity * _GUARD_FRACTION)
+        self.__file = tempfile.TemporaryFile(prefix='shinysdr-iq-', dir=directory)
+        self.__file.truncate(self.__capacity * numpy.dtype(numpy.complex64).itemsize)
+        self.__array = numpy.memmap(self.__file, dtype=numpy.complex64, mode='r+', shape=(self.__capacity,))
+        self.__written = 0
+        self.__valid_from = 0
+
+    def get_capacity(self):
+        return self.__capacity
+
+    def get_write_position(self):
+        return self.__written
+
+    def get_oldest_position(self):
+        """Return the position of the oldest sample which may be read."""
+        return max(self.__valid_from, self.__written - self.__capacity + self.__guard)
+
+    def position_seconds_ago(self, seconds):
+        return max(self.get_oldest_position(), self.__written - int(seconds * self.sample_rate))
+
+    def invalidate(self):
+        """Discard all samples written so far, e.g. because the device was retuned and they no longer correspond to the current frequency."""
+        self.__valid_from = self.__written
+
+    def write(self, items):
+        count = len(items)
+        capacity = self.__capacity
+        if count > capacity:
+            items = items[-capacity:]
+            self.__written += count - capacity
+            count = capacity
+        start = self.__written % capacity
+        first = min(count, capacity - start)
+        self.__array[start:start + first] = items[:first]
+        self.__array[:count - first] = items[first:]
+        self.__written += count
+
+    def read_into(self, position, out):
+        """Copy samples starting at position into out, as many as are available.
+
+        Returns (new_position, count). The samples read start at new_position - count, which is later than position if position was too old."""
+        position = max(position, self.get_oldest_position())
+        count = min(len(out), self.__written - position)
+        if count <= 0:
+            return position, 0
+        capacity = self.__capacity
+        start = position % capacity
+        first = min(count, capacity - start)
+        out[:first] = self.__array[start:start + first]
+        out[first:count] = self.__array[:count - first]
+        return position + count, count
+
+    def close(self):
+        self.__array = None
+        self.__file.close()
+
+
+__all__.append('IQRingBuffer')
+
+
+class IQRingBufferSink(gr.sync_block):
+    """Writes its input into an IQRingBuffer."""
+    def __init__(self, ring_buffer):
+        gr.sync_block.__init__(
+            self,
+            name=type(self).__name__,
+            in_sig=[numpy.complex64],
+            out_sig=[])
+        self.__ring_buffer = ring_buffer
+
+    def get_ring_buffer(self):
+        return self.__ring_buffer
+
+    def work(self, input_items, output_items):
+        items = input_items[0]
+        self.__ring_buffer.write(items)
+        return len(items)
+
+
+__all__.append('IQRingBufferSink')
+
+
+class IQRingBufferSource(gr.sync_block):
+    """Reads an IQRingBuffer starting seconds_ago in the past, as fast as downstream blocks accept samples.
+    
+    When it has caught up with the live samples, on_caught_up is called once, from the flow graph's thread; the caller should then replace this source with live input. Until then it follows the live samples, waiting for each.
+    """
+    def __init__(self, ring_buffer, seconds_ago, on_caught_up=lambda: None):
+        gr.sync_block.__init__(
+            self,
+            name=type(self).__name__,
+            in_sig=[],
+            out_sig=[numpy.complex64])
+        self.__ring_buffer = ring_buffer
+        self.__position = ring_buffer.position_seconds_ago(seconds_ago)
+        self.__on_caught_up = on_caught_up
+
+    def get_lag_seconds(self):
+        """Return how far behind the live samples this source is."""
+        return (self.__ring_buffer.get_write_position() - self.__position) / self.__ring_buffer.sample_rate
+
+    def work(self, input_items, output_items):
+        self.__position, count = self.__ring_buffer.read_into(self.__position, output_items[0])
+        if count == 0:
+            if self.__on_caught_up is not None:
+                on_caught_up, self.__on_caught_up = self.__on_caught_up, None
+                on_caught_up()
+            time.sleep(_CAUGHT_UP_SLEEP)
+        return count
+
+
+__all__.append('IQRingBufferSource')
@@ -0,0 +1,293 @@
+# Copyright 2019 Kevin Reid and the ShinySDR contributors
+#
+# This file is part of ShinySDR.
+#
+# ShinySDR is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ShinySDR is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ShinySDR.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Activity scanning over database channels.
+
+Rather than running a demodulator per channel, the scanner watches the monitor's spectrum (which is computed anyway for the waterfall) for power in each database channel that lies within the current device's bandwidth, and creates an ordinary receiver only for channels which are active. This lets many channels be watched for little more CPU than the receivers actually in use.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from collections import namedtuple
+
+import six
+
+from twisted.internet import reactor as the_reactor
+from twisted.logger import Logger
+import numpy
+
+from shinysdr.i.modes import lookup_mode
+from shinysdr.i.poller import the_subscription_context
+from shinysdr.types import RangeT
+from shinysdr import units
+from shinysdr.values import ExportedState, exported_value, setter
+
+
+__all__ = []  # appended later
+
+
+ScanChannel = namedtuple('ScanChannel', [
+    'freq',  # float, Hz
+    'mode',  # unicode
+    'label',  # unicode
+])
+
+
+__all__.append('ScanChannel')
+
+
+def _mode_is_installed(mode):
+    return lookup_mode(mode) is not None
+
+
+def channels_from_databases(databases, mode_available=_mode_is_installed):
+    """Return a sorted list of ScanChannel for every single-frequency record with a usable mode in the given DatabaseModels.
+
+    Duplicate channels (same frequency and mode) in multiple databases are included only once.
+    """
+    channels = {}
+    for database in databases:
+        for record in six.itervalues(database.records):
+            if record[u'type'] != u'channel' or record[u'lowerFreq'] != record[u'upperFreq']:
+                continue
+            mode = record[u'mode']
+            if not mode or not mode_available(mode):
+                continue
+            key = (record[u'lowerFreq'], mode)
+            if key not in channels:
+                channels[key] = ScanChannel(freq=record[u'lowerFreq'], mode=mode, label=record[u'label'])
+    return sorted(six.itervalues(channels))
+
+
+__all__.append('channels_from_databases')
+
+
+class ChannelScanner(ExportedState):
+    """Watches the spectrum of the monitored device and creates receivers on database channels which become active.
+
+    top must be a shinysdr.i.top.Top or equivalent. databases is a list of DatabaseModels to take channels from (see channels_from_databases); they are re-read whenever their revision changes, so edits made while the server is running are scanned too. Receivers created by the scanner are deleted again after their channel has been quiet for hold_time, or when the scanner is disabled, and are not persisted.
+    """
+    __log = Logger()
+
+    def __init__(self, top, databases, mode_available=_mode_is_installed, reactor=the_reactor, subscription_context=the_subscription_context):
+        self.__top = top
+        self.__databases = list(databases)
+        self.__mode_available = mode_available
+        self.__revisions = None  # database revisions self.__channels was computed from
+        self.__channels = []
+        self.__reactor = reactor
+        self.__subscription_context = subscription_context
+
+        # settings
+        self.__enabled = False
+        self.__threshold = 10.0
+        self.__hold_time = 3.0
+        self.__max_receivers = 4
+        self.__channel_width = 10e3
+
+        # state
+        self.__subscription = None
+        self.__geometry = None  # (center_freq, sample_rate, bins) the bin table was computed for
+        self.__in_band = []  # indexes into self.__channels
+        self.__in_band_set = frozenset()
+        self.__bin_table = None  # numpy array of shape (len(in_band), bins_per_channel)
+        self.__last_active = {}  # channel index -> reactor time last seen active
+        self.__receiver_keys = {}  # channel index -> receiver key
+
+    @exported_value(type=bool, changes='this_setter', label='Scan')
+    def get_enabled(self):
+        return self.__enabled
+
+    @setter
+    def set_enabled(self, value):
+        value = bool(value)
+        if value == self.__enabled:
+            return
+        self.__enabled = value
+        if value:
+            _, self.__subscription = self.__top.get_monitor().state()['fft'].subscribe2(
+                self.__spectrum_update, self.__subscription_context)
+        else:
+            self.__subscription.unsubscribe()
+            self.__subscription = None
+            for index in list(self.__receiver_keys):
+                self.__release(index)
+            self.__last_active.clear()
+        self.state_changed('active_channels')
+
+    @exported_value(type=RangeT([(0, 50)], unit=units.dB, strict=False), changes='this_setter', label='Threshold above noise')
+    def get_threshold(self):
+        return self.__threshold
+
+    @setter
+    def set_threshold(self, value):
+        self.__threshold = float(value)
+
+    @exported_value(type=RangeT([(0, 60)], unit=units.s, strict=False), changes='this_setter', label='Hold time')
+    def get_hold_time(self):
+        return self.__hold_time
+
+    @setter
+    def set_hold_time(self, value):
+        self.__hold_time = float(value)
+
+    @exported_value(type=RangeT([(1, 20)], strict=True, integer=True), changes='this_setter', label='Max receivers')
+    def get_max_receivers(self):
+        return self.__max_receivers
+
+    @setter
+    def set_max_receivers(self, value):
+        self.__max_receivers = int(value)
+
+    @exported_value(type=RangeT([(1e3, 200e3)], unit=units.Hz, strict=False), changes='this_setter', label='Channel width')
+    def get_channel_width(self):
+        return self.__channel_width
+
+    @setter
+    def set_channel_width(self, value):
+        self.__channel_width = float(value)
+        self.__geometry = None  # force recomputing bin table
+
+    @exported_value(type=int, changes='explicit', label='Channels in band')
+    def get_channels_in_band(self):
+        return len(self.__in_band)
+
+    @exported_value(type=six.text_type, changes='explicit', label='Active')
+    def get_active_channels(self):
+        return u', '.join(
+            u'%.4f %s' % (self.__channels[index].freq / 1e6, self.__channels[index].mode)
+            for index in sorted(self.__receiver_keys))
+
+    def __spectrum_update(self, patch):
+        if not self.__enabled or not patch:
+            return
+        # Only the most recent frame is of interest; older ones in the same batch are stale.
+        element = patch[-1]
+        center_freq, sample_rate, _power_offset = element.info
+        frame = numpy.frombuffer(element.data, dtype=numpy.int8)
+        self.__process_frame(center_freq, sample_rate, frame, self.__reactor.seconds())
+
+    def __process_frame(self, center_freq, sample_rate, frame, now):
+        bins = len(frame)
+        if bins <= 0:
+            return
+        self.__check_databases()
+        if self.__geometry != (center_freq, sample_rate, bins):
+            self.__update_bin_table(center_freq, sample_rate, bins)
+
+        if self.__in_band:
+            # FFT output is in unshifted order; shift so that bin index increases with frequency, matching the bin table.
+            levels = numpy.fft.fftshift(frame.astype(numpy.float32))
+            noise_floor = numpy.median(levels)
+            channel_levels = levels[self.__bin_table].max(axis=1)
+            active = channel_levels > noise_floor + self.__threshold
+            for table_index in numpy.flatnonzero(active):
+                self.__last_active[self.__in_band[table_index]] = now
+
+        changed = False
+        # Release channels which have been quiet long enough, including ones which are no longer in band.
+        for index in list(self.__receiver_keys):
+            if now - self.__last_active.get(index, now) > self.__hold_time or index not in self.__in_band_set:
+                self.__release(index)
+                changed = True
+        # Acquire channels which just became active, in frequency order.
+        candidates = sorted(
+            (index for index, t in six.iteritems(self.__last_active) if t == now and index not in self.__receiver_keys),
+            key=lambda index: self.__channels[index])
+        for index in candidates:
+            if len(self.__receiver_keys) >= self.__max_receivers:
+                break
+            self.__acquire(index)
+            changed = True
+        if changed:
+            self.state_changed('active_channels')
+
+    def __check_databases(self):
+        revisions = [database.get_revision() for database in self.__databases]
+        if revisions == self.__revisions:
+            return
+        self.__revisions = revisions
+        channels = channels_from_databases(self.__databases, mode_available=self.__mode_available)
+        if channels == self.__channels:
+            return
+        old_channels = self.__channels
+        new_indexes = {(channel.freq, channel.mode): index for index, channel in enumerate(channels)}
+        # Carry over receivers and activity of channels which still exist; release those of channels which were deleted or changed frequency or mode.
+        receiver_keys = {}
+        for index in list(self.__receiver_keys):
+            channel = old_channels[index]
+            new_index = new_indexes.get((channel.freq, channel.mode))
+            if new_index is None:
+                self.__release(index)
+            else:
+                receiver_keys[new_index] = self.__receiver_keys[index]
+        last_active = {}
+        for index, t in six.iteritems(self.__last_active):
+            channel = old_channels[index]
+            new_index = new_indexes.get((channel.freq, channel.mode))
+            if new_index is not None:
+                last_active[new_index] = t
+        self.__channels = channels
+        self.__receiver_keys = receiver_keys
+        self.__last_active = last_active
+        self.__geometry = None  # force recomputing bin table
+        self.state_changed('active_channels')
+
+    def __update_bin_table(self, center_freq, sample_rate, bins):
+        self.__geometry = (center_freq, sample_rate, bins)
+        bin_width = sample_rate / bins
+        half_channel_bins = max(0, int(round(self.__channel_width / 2 / bin_width)))
+        offsets = numpy.arange(-half_channel_bins, half_channel_bins + 1)
+        low_edge = center_freq - sample_rate / 2
+        in_band = []
+        centers = []
+        for index, channel in enumerate(self.__channels):
+            center_bin = int(round((channel.freq - low_edge) / bin_width))
+            if half_channel_bins <= center_bin < bins - half_channel_bins:
+                in_band.append(index)
+                centers.append(center_bin)
+        self.__in_band = in_band
+        self.__in_band_set = frozenset(in_band)
+        if in_band:
+            self.__bin_table = numpy.array(centers)[:, numpy.newaxis] + offsets[numpy.newaxis, :]
+        else:
+            self.__bin_table = None
+        self.__last_active = {index: t for index, t in six.iteritems(self.__last_active) if index in self.__in_band_set}
+        self.__log.debug('Scanner: {count} channels in band', count=len(in_band))
+        self.state_changed('channels_in_band')
+
+    def __acquire(self, index):
+        channel = self.__channels[index]
+        try:
+            # Not persisted, since the scanner would not know to remove it after a restart.
+            key, _receiver = self.__top.add_receiver(channel.mode, state={u'rec_freq': channel.freq}, persists=False)
+        except Exception:  # pylint: disable=broad-except
+            self.__log.failure('Scanner: could not create receiver for {channel}', channel=channel)
+            # Don't retry until the channel becomes active again.
+            del self.__last_active[index]
+            return
+        self.__receiver_keys[index] = key
+
+    def __release(self, index):
+        key = self.__receiver_keys.pop(index)
+        # The user may have deleted the receiver already.
+        if self.__top.has_receiver(key):
+            self.__top.delete_receiver(key)
+
+
+__all__.append('ChannelScanner')
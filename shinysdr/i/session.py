@@ -23,21 +23,35 @@ import importlib
 
 from zope.interface import implementer
 
+from shinysdr.i.audioformat import DEFAULT_AUDIO_ENCODING
 from shinysdr.i.network.base import IWebEntryPoint
+from shinysdr.i.scanner import ChannelScanner
 from shinysdr.i.top import Top
 from shinysdr.types import ReferenceT
-from shinysdr.values import ExportedState, exported_value
+from shinysdr.values import ExportedState, LooseCell, exported_value
 
 
 class AppRoot(ExportedState):
-    def __init__(self, devices, audio_config, read_only_dbs, writable_db, features):
+    def __init__(self, devices, audio_config, read_only_dbs, writable_db, features, receiver_cost_budget=None, recording_config=None, iq_ring_buffer_config=None):
+        top_kwargs = {}
+        if receiver_cost_budget is not None:
+            top_kwargs['receiver_cost_budget'] = receiver_cost_budget
+        if recording_config is not None:
+            top_kwargs['recording_config'] = recording_config
+        if iq_ring_buffer_config is not None:
+            top_kwargs['iq_ring_buffer_config'] = iq_ring_buffer_config
         self.__receive_flowgraph = Top(
             devices=devices,
             audio_config=audio_config,
-            features=features)
+            features=features,
+            **top_kwargs)
+        self.__scanner = ChannelScanner(
+            top=self.__receive_flowgraph,
+            databases=list(read_only_dbs.values()) + [writable_db])
         # TODO: only one session while we sort out other things
         self.__session = Session(
             receive_flowgraph=self.__receive_flowgraph,
+            scanner=self.__scanner,
             read_only_dbs=read_only_dbs,
             writable_db=writable_db,
             features=features)
@@ -64,8 +78,12 @@ class AppRoot(ExportedState):
 
 @implementer(IWebEntryPoint)
 class Session(ExportedState):
-    def __init__(self, receive_flowgraph, read_only_dbs, writable_db, features):
+    def __init__(self, receive_flowgraph, read_only_dbs, writable_db, features, scanner=None):
         self.__receive_flowgraph = receive_flowgraph
+        if scanner is not None:
+            self.__scanner_cell = LooseCell(value=scanner, type=ReferenceT(), writable=False, persists=True)
+        else:
+            self.__scanner_cell = None
         self.__read_only_dbs = read_only_dbs
         self.__writable_db = writable_db
     
@@ -81,9 +99,12 @@ class Session(ExportedState):
             'accessories',
             'telemetry_store',
             'source_name',
-            'clip_warning'
+            'clip_warning',
+            'receiver_budget_warning',
         ]:
             yield name, rxfs[name]
+        if self.__scanner_cell is not None:
+            yield 'scanner', self.__scanner_cell
 
     def get_type(self):
         """implements IEntryPoint"""
@@ -107,11 +128,14 @@ class Session(ExportedState):
         # TODO: Quick refactoring; make this interface more sensible/faceted. Used by SessionResource
         return self.__receive_flowgraph
     
-    def add_audio_callback(self, callback, sample_rate):
-        return self.__receive_flowgraph.add_audio_callback(callback, sample_rate)
+    def add_audio_callback(self, callback, sample_rate, encoding=DEFAULT_AUDIO_ENCODING):
+        return self.__receive_flowgraph.add_audio_callback(callback, sample_rate, encoding)
     
     def remove_audio_callback(self, callback):
         return self.__receive_flowgraph.remove_audio_callback(callback)
     
+    def set_audio_callback_encoding(self, callback, encoding):
+        return self.__receive_flowgraph.set_audio_callback_encoding(callback, encoding)
+    
     def get_audio_callback_channels(self):
         return self.__receive_flowgraph.get_audio_callback_channels()
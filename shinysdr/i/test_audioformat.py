@@ -0,0 +1,53 @@
+# Copyright 2019 Kevin Reid and the ShinySDR contributors
+#
+# This file is part of ShinySDR.
+#
+# ShinySDR is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ShinySDR is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ShinySDR.  If not, see <http://www.gnu.org/licenses/>.
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from twisted.trial import unittest
+
+import numpy
+
+from shinysdr.i.audioformat import AUDIO_ENCODINGS, higher_bandwidth_encoding, lower_bandwidth_encoding
+
+
+_SAMPLES = numpy.array([0.0, 1.0, -1.0, 2.0], dtype=numpy.float32)
+
+
+class TestAudioEncodings(unittest.TestCase):
+    def test_float32(self):
+        self.assertEqual(AUDIO_ENCODINGS['float32'].encode(_SAMPLES), _SAMPLES.astype('<f4').tobytes())
+    
+    def test_s16(self):
+        self.assertEqual(
+            numpy.frombuffer(AUDIO_ENCODINGS['s16'].encode(_SAMPLES), dtype='<i2').tolist(),
+            [0, 32767, -32767, 32767])
+    
+    def test_mulaw(self):
+        self.assertEqual(
+            list(bytearray(AUDIO_ENCODINGS['mulaw'].encode(_SAMPLES))),
+            [0xFF, 0x80, 0x00, 0x80])
+    
+    def test_sizes(self):
+        for encoding in AUDIO_ENCODINGS.values():
+            self.assertEqual(len(encoding.encode(_SAMPLES)), len(_SAMPLES) * encoding.bytes_per_sample)
+    
+    def test_step_up_inverts_step_down(self):
+        for encoding in AUDIO_ENCODINGS.values():
+            lower = lower_bandwidth_encoding(encoding)
+            if lower is not None:
+                self.assertEqual(higher_bandwidth_encoding(lower), encoding)
+        self.assertEqual(higher_bandwidth_encoding(AUDIO_ENCODINGS['float32']), None)
@@ -21,8 +21,10 @@ from twisted.trial import unittest
 
 from gnuradio import blocks
 from gnuradio import gr
+import numpy
 
-from shinysdr.i.audiomux import AudioManager
+from shinysdr.i.audioformat import AUDIO_ENCODINGS
+from shinysdr.i.audiomux import AudioManager, _ClientAudioTap
 
 
 class TestAudioManager(unittest.TestCase):
@@ -41,6 +43,39 @@ class TestAudioManager(unittest.TestCase):
         self.tb.stop()
         self.tb.wait()
 
+    def test_stereo_mixed_smoke(self):
+        p = AudioManager(
+            graph=self.tb,
+            audio_config=None,
+            stereo=True)
+        p.add_audio_callback(lambda data: None, 10000)
+        rs = p.reconnecting()
+        rs.input(ConnectionCanarySource(self.tb, vlen=2), 10000, 'client')
+        rs.input(ConnectionCanarySource(self.tb, vlen=2), 20000, 'client')
+        rs.finish_bus_connections()
+        self.tb.start()
+        self.tb.stop()
+        self.tb.wait()
+
+    def test_callbacks_share_sink(self):
+        def a(data):
+            pass
+        
+        def b(data):
+            pass
+        
+        def c(data):
+            pass
+        
+        self.assertTrue(self.p.add_audio_callback(a, 48000))
+        self.assertFalse(self.p.add_audio_callback(b, 48000))
+        self.assertTrue(self.p.add_audio_callback(c, 8000))
+        self.assertEqual(self.p.get_audio_callback_count(), 3)
+        self.assertFalse(self.p.remove_audio_callback(a))
+        self.assertTrue(self.p.remove_audio_callback(b))
+        self.assertTrue(self.p.remove_audio_callback(c))
+        self.assertEqual(self.p.get_audio_callback_count(), 0)
+
     def test_wrong_dest_name(self):
         """
         Shouldn't fail to construct a valid flow graph, despite the bad name.
@@ -53,11 +88,38 @@ class TestAudioManager(unittest.TestCase):
         self.tb.wait()
 
 
-def ConnectionCanarySource(graph):
+class TestClientAudioTap(unittest.TestCase):
+    def test_fan_out(self):
+        received = []
+        tap = _ClientAudioTap(channels=1, reactor=None)
+        tap.add(lambda data: received.append(('a', data)))
+        tap.add(lambda data: received.append(('b', data)))
+        array = numpy.array([1, 2], dtype=numpy.float32)
+        tap._deliver(array)
+        self.assertEqual(received, [('a', array.tobytes()), ('b', array.tobytes())])
+
+    def test_encoding(self):
+        received = []
+        tap = _ClientAudioTap(channels=1, reactor=None)
+        tap.add(lambda data: received.append(data), AUDIO_ENCODINGS['s16'])
+        tap._deliver(numpy.array([0, 1], dtype=numpy.float32))
+        self.assertEqual(received, [numpy.array([0, 32767], dtype='<i2').tobytes()])
+
+    def test_set_encoding(self):
+        received = []
+        callback = received.append
+        tap = _ClientAudioTap(channels=1, reactor=None)
+        tap.add(callback)
+        tap.set_encoding(callback, AUDIO_ENCODINGS['mulaw'])
+        tap._deliver(numpy.array([0, 1], dtype=numpy.float32))
+        self.assertEqual(received, [b'\xff\x80'])
+
+
+def ConnectionCanarySource(graph, vlen=1):
     """
     Set up a partial graph to detect its output not being connected
     """
-    source = blocks.vector_source_f([])
-    copy = blocks.copy(gr.sizeof_float)
+    source = blocks.vector_source_f([], vlen=vlen)
+    copy = blocks.copy(gr.sizeof_float * vlen)
     graph.connect(source, copy)
     return copy
@@ -27,7 +27,8 @@ from gnuradio import gr
 from gnuradio.fft import window as windows
 import numpy
 
-from shinysdr.i.blocks import Context, MonitorSink, ReactorSink, RecursiveLockBlockMixin
+from shinysdr.i.blocks import Context, DeviceChannelizer, GapFiller, MonitorSink, NonBlockingProcessStdinSink, ReactorSink, RecursiveLockBlockMixin, choose_channelizer_channel_count
+from shinysdr.i.poller import the_subscription_context
 from shinysdr.signals import SignalType
 
 
@@ -66,6 +67,53 @@ class TestReactorSink(unittest.TestCase):
         self.assertEqual(self.out, [test_data_floats])
 
 
+class TestNonBlockingProcessStdinSink(unittest.TestCase):
+    def setUp(self):
+        self.writer = _FakeWriter(capacity=1000)
+        self.sink = NonBlockingProcessStdinSink(self.writer, numpy.float32, buffer_limit=1000)
+    
+    def test_write(self):
+        items = numpy.arange(10, dtype=numpy.float32)
+        self.assertEqual(self.sink.work([items], []), 10)
+        self.assertEqual(self.writer.take(), items.tobytes())
+        self.assertEqual(self.sink.get_dropped_items(), 0)
+    
+    def test_stalled_reader(self):
+        items = numpy.arange(100, dtype=numpy.float32)
+        # Fill the writer and then the buffer; none of these calls may block.
+        calls = 0
+        while self.sink.get_dropped_items() == 0:
+            self.assertEqual(self.sink.work([items], []), len(items))
+            calls += 1
+        self.assertEqual(self.sink.get_dropped_items(), len(items))
+        # Everything not dropped is eventually written, in whole items.
+        written = b''
+        while True:
+            self.sink.work([items[:0]], [])
+            data = self.writer.take()
+            if not data:
+                break
+            written += data
+        self.assertEqual(written, items.tobytes() * (calls - 1))
+
+
+class _FakeWriter(object):
+    """Like a pipe with the given capacity, which is read by take()."""
+    def __init__(self, capacity):
+        self.__capacity = capacity
+        self.__data = b''
+    
+    def write(self, data):
+        count = min(len(data), self.__capacity - len(self.__data))
+        self.__data += bytes(data[:count])
+        return count
+    
+    def take(self):
+        data = self.__data
+        self.__data = b''
+        return data
+
+
 class TestMonitorSink(unittest.TestCase):
     def setUp(self):
         self.tb = RLTB()
@@ -97,6 +145,78 @@ class TestMonitorSink(unittest.TestCase):
         m.set_window_type(windows.WIN_FLATTOP)
         self.tb.stop()
         self.tb.wait()
+    
+    def test_gates_follow_interest(self):
+        m = self.make()
+        fft_gate = m._MonitorSink__fft_gate
+        scope_gate = m._MonitorSink__scope_gate
+        self.assertFalse(fft_gate.enabled())
+        self.assertFalse(scope_gate.enabled())
+        self.assertFalse(m.get_interested_cell().get())
+        
+        _, subscription = m.state()['fft'].subscribe2(lambda v: None, the_subscription_context)
+        self.assertTrue(fft_gate.enabled())
+        self.assertFalse(scope_gate.enabled())
+        self.assertTrue(m.get_interested_cell().get())
+        
+        m.set_paused(True)
+        self.assertFalse(fft_gate.enabled())
+        self.assertFalse(m.get_interested_cell().get())
+        m.set_paused(False)
+        self.assertTrue(fft_gate.enabled())
+        
+        subscription.unsubscribe()
+        self.assertFalse(fft_gate.enabled())
+        self.assertFalse(m.get_interested_cell().get())
+
+
+class TestDeviceChannelizer(unittest.TestCase):
+    def setUp(self):
+        self.channelizer = DeviceChannelizer(input_rate=800e3, channel_count=8)
+    
+    def test_rates(self):
+        self.assertEqual(self.channelizer.get_channel_rate(), 200e3)
+        self.assertEqual(self.channelizer.get_channel_freq(0), 0)
+        self.assertEqual(self.channelizer.get_channel_freq(1), 100e3)
+        self.assertEqual(self.channelizer.get_channel_freq(7), -100e3)
+    
+    def test_find_channel(self):
+        self.assertEqual(self.channelizer.find_channel(-10e3, 10e3), 0)
+        self.assertEqual(self.channelizer.find_channel(140e3, 160e3), 1)
+        self.assertEqual(self.channelizer.find_channel(-120e3, -80e3), 7)
+        self.assertEqual(self.channelizer.find_channel(-100e3, 100e3), None)
+    
+    def test_choose_channel_count(self):
+        self.assertEqual(choose_channelizer_channel_count(2.4e6), 64)
+        self.assertEqual(choose_channelizer_channel_count(200e3), 8)
+        self.assertEqual(choose_channelizer_channel_count(48e3), None)
+    
+    def test_smoke(self):
+        tb = gr.top_block()
+        tb.connect(blocks.vector_source_c([0] * 1000), self.channelizer)
+        for k in range(self.channelizer.get_channel_count()):
+            tb.connect((self.channelizer, k), blocks.null_sink(gr.sizeof_gr_complex))
+        tb.run()
+
+
+class TestGapFiller(unittest.TestCase):
+    def setUp(self):
+        self.gated = False
+        self.filler = GapFiller(vlen=2, ratio=0.5, is_gated=lambda: self.gated, max_lead=10)
+    
+    def test_pass_through(self):
+        self.assertEqual(self.filler._advance(20, 8, 100, False), (8, 0, 0))
+        # Not gated, so no input means no output.
+        self.assertEqual(self.filler._advance(20, 0, 100, False), (0, 0, 0))
+    
+    def test_fill_while_gated(self):
+        self.assertEqual(self.filler._advance(20, 4, 100, True), (4, 0, 0))
+        self.assertEqual(self.filler._advance(20, 0, 100, True), (0, 0, 16))
+        self.assertEqual(self.filler._advance(20, 0, 5, True), (0, 0, 5))
+    
+    def test_discard_beyond_lead(self):
+        self.assertEqual(self.filler._advance(20, 0, 100, True), (0, 0, 10))
+        self.assertEqual(self.filler._advance(0, 30, 100, False), (10, 20, 0))
 
 
 class RLTB(gr.top_block, RecursiveLockBlockMixin):
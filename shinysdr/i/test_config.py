@@ -99,6 +99,16 @@ class TestConfigObject(unittest.TestCase):
         self.config.persist_to_file('foo')
         self.assertRaises(ConfigException, lambda: self.config.persist_to_file('bar'))
         self.assertEqual('foo', self.config._state_filename)
+    
+    def test_persist_filter_designs_ok(self):
+        self.assertEqual(None, self.config._filter_design_cache_filename)
+        self.config.persist_filter_designs_to_file('foo')
+        self.assertEqual('foo', self.config._filter_design_cache_filename)
+    
+    def test_persist_filter_designs_duplication(self):
+        self.config.persist_filter_designs_to_file('foo')
+        self.assertRaises(ConfigException, lambda: self.config.persist_filter_designs_to_file('bar'))
+        self.assertEqual('foo', self.config._filter_design_cache_filename)
 
     # --- Devices ---
     
@@ -224,6 +234,29 @@ class TestConfigObject(unittest.TestCase):
     
     # TODO test rest of config.set_server_audio_allowed
 
+    def test_receiver_cost_budget_invalid(self):
+        self.assertRaises(ConfigException, lambda: self.config.set_receiver_cost_budget(0))
+    
+    @defer.inlineCallbacks
+    def test_receiver_cost_budget_too_late(self):
+        self.complete_minimally()
+        yield self.config._wait_and_validate()
+        self.assertRaises(ConfigTooLateException, lambda:
+            self.config.set_receiver_cost_budget(1e6))
+    
+    def test_recording_directory_invalid(self):
+        self.assertRaises(ConfigException, lambda: self.config.set_recording_directory('/nonexistent/shinysdr-recordings'))
+    
+    def test_recording_directory_twice(self):
+        directory = self.mktemp()
+        os.mkdir(directory)
+        self.config.set_recording_directory(directory)
+        self.assertRaises(ConfigException, lambda: self.config.set_recording_directory(directory))
+    
+    def test_iq_ring_buffer_invalid(self):
+        self.assertRaises(ConfigException, lambda: self.config.set_iq_ring_buffer(0))
+        self.assertRaises(ConfigException, lambda: self.config.set_iq_ring_buffer(10, directory='/nonexistent/shinysdr-iq'))
+    
     @defer.inlineCallbacks
     def test_stereo_too_late(self):
         self.complete_minimally()
@@ -0,0 +1,72 @@
+# Copyright 2019 Kevin Reid and the ShinySDR contributors
+#
+# This file is part of ShinySDR.
+#
+# ShinySDR is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ShinySDR is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ShinySDR.  If not, see <http://www.gnu.org/licenses/>.
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from twisted.trial import unittest
+
+from shinysdr.i.filter_cache import FilterDesignCache
+
+
+class TestFilterDesignCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = FilterDesignCache(max_entries=2)
+        self.computed = []
+
+    def compute(self, value):
+        def f():
+            self.computed.append(value)
+            return [value]
+        return f
+
+    def test_memoizes(self):
+        self.assertEqual(self.cache.get_or_compute(('a', 1.0), self.compute(1.0)), (1.0,))
+        self.assertEqual(self.cache.get_or_compute(('a', 1.0), self.compute(99.0)), (1.0,))
+        self.assertEqual(self.computed, [1.0])
+        self.assertEqual(self.cache.get_statistics(), {'entries': 1, 'hits': 1, 'misses': 1})
+
+    def test_lru_eviction(self):
+        self.cache.get_or_compute(('a',), self.compute(1.0))
+        self.cache.get_or_compute(('b',), self.compute(2.0))
+        self.cache.get_or_compute(('a',), self.compute(1.0))  # touch
+        self.cache.get_or_compute(('c',), self.compute(3.0))  # evicts b
+        self.cache.get_or_compute(('a',), self.compute(1.0))
+        self.cache.get_or_compute(('b',), self.compute(2.0))
+        self.assertEqual(self.computed, [1.0, 2.0, 3.0, 2.0])
+
+    def test_file_round_trip(self):
+        path = self.mktemp()
+        self.cache.get_or_compute(('low_pass', 1.0, 2), lambda: [0.5, 0.25])
+        self.cache.get_or_compute(('complex',), lambda: [1 + 2j])
+        self.cache.save_file(path)
+
+        other = FilterDesignCache()
+        other.load_file(path)
+        self.assertEqual(other.get_or_compute(('low_pass', 1.0, 2), self.compute(0.0)), (0.5, 0.25))
+        self.assertEqual(other.get_or_compute(('complex',), self.compute(0.0)), (1 + 2j,))
+        self.assertEqual(self.computed, [])
+
+    def test_load_missing_file(self):
+        self.cache.load_file(self.mktemp())
+        self.assertEqual(self.cache.get_statistics()['entries'], 0)
+
+    def test_load_damaged_file(self):
+        path = self.mktemp()
+        with open(path, 'w') as f:
+            f.write('[[')
+        self.cache.load_file(path)
+        self.assertEqual(self.cache.get_statistics()['entries'], 0)
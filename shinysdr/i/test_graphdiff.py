@@ -0,0 +1,65 @@
+# Copyright 2019 Kevin Reid and the ShinySDR contributors
+#
+# This file is part of ShinySDR.
+#
+# ShinySDR is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ShinySDR is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ShinySDR.  If not, see <http://www.gnu.org/licenses/>.
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from twisted.trial import unittest
+
+from shinysdr.i.graphdiff import ConnectionPlan, apply_connection_diff
+
+
+class TestConnectionPlan(unittest.TestCase):
+    def test_chain_and_ports(self):
+        plan = ConnectionPlan()
+        plan.connect('a', 'b', ('c', 1))
+        plan.connect(('c', 2), 'd')
+        plan.connect('a', 'b')  # duplicate ignored
+        self.assertEqual(plan.get_edges(), [
+            (('a', 0), ('b', 0)),
+            (('b', 0), ('c', 1)),
+            (('c', 2), ('d', 0)),
+        ])
+        self.assertEqual(len(plan), 3)
+
+    def test_diff(self):
+        old = ConnectionPlan()
+        old.connect('src', 'rx1', 'sum')
+        new = ConnectionPlan()
+        new.connect('src', 'rx1')
+        new.connect('src', 'rx2')
+        removed, added = new.diff(old)
+        self.assertEqual(removed, [(('rx1', 0), ('sum', 0))])
+        self.assertEqual(added, [(('src', 0), ('rx2', 0))])
+        self.assertEqual(new.diff(new), ([], []))
+
+    def test_apply_disconnects_first(self):
+        log = []
+
+        class StubGraph(object):
+            def connect(self, src, dst):
+                log.append(('connect', src, dst))
+
+            def disconnect(self, src, dst):
+                log.append(('disconnect', src, dst))
+
+        apply_connection_diff(StubGraph(),
+            removed=[(('a', 0), ('b', 0))],
+            added=[(('c', 0), ('b', 0))])
+        self.assertEqual(log, [
+            ('disconnect', ('a', 0), ('b', 0)),
+            ('connect', ('c', 0), ('b', 0)),
+        ])
@@ -0,0 +1,147 @@
+# Copyright 2019 Kevin Reid and the ShinySDR contributors
+#
+# This file is part of ShinySDR.
+#
+# ShinySDR is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ShinySDR is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ShinySDR.  If not, see <http://www.gnu.org/licenses/>.
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import gc
+import os
+import signal
+import threading
+import time
+
+from twisted.internet import defer
+from twisted.internet import reactor as the_reactor
+from twisted.internet.protocol import ProcessProtocol
+from twisted.internet.task import deferLater
+from twisted.trial import unittest
+
+from shinysdr.i.processpool import DecoderProcessPool
+
+
+class TestDecoderProcessPool(unittest.TestCase):
+    timeout = 10
+
+    def setUp(self):
+        self.pool = DecoderProcessPool(the_reactor, max_idle=1, settle_seconds=0.1)
+
+    @defer.inlineCallbacks
+    def tearDown(self):
+        self.pool.stop_idle()
+        # Wait for the processes to exit so that the reactor is clean.
+        while self.pool.get_statistics()['ended'] < self.pool.get_statistics()['started']:
+            yield deferLater(the_reactor, 0.05, lambda: None)
+
+    def lease(self, protocol, **kwargs):
+        return self.pool.lease(['cat'], protocol, **kwargs)
+
+    @defer.inlineCallbacks
+    def wait_for_output(self, protocol, expected):
+        while b''.join(protocol.output) != expected:
+            yield deferLater(the_reactor, 0.01, lambda: None)
+
+    @defer.inlineCallbacks
+    def test_output_attribution_and_reuse(self):
+        first = _CollectingProtocol()
+        lease = self.lease(first, item_size=2)
+        self.assertEqual(lease.write(b'abc'), 3)
+        yield self.wait_for_output(first, b'abc')
+        pid = lease.get_pid()
+        lease.release()
+        self.assertEqual(lease.write(b'ignored'), len(b'ignored'))
+
+        # Padding to a whole item, and the flush, are not seen by anyone.
+        yield deferLater(the_reactor, 0.2, lambda: None)
+        second = _CollectingProtocol()
+        lease = self.lease(second)
+        self.assertEqual(lease.get_pid(), pid)
+        lease.write(b'def')
+        yield self.wait_for_output(second, b'def')
+        self.assertEqual(b''.join(first.output), b'abc')
+        lease.release()
+        self.assertEqual(self.pool.get_statistics()['started'], 1)
+        self.assertEqual(self.pool.get_statistics()['reused'], 1)
+
+    @defer.inlineCallbacks
+    def test_not_reused_before_settled(self):
+        lease = self.lease(_CollectingProtocol())
+        pid = lease.get_pid()
+        lease.release()
+        lease = self.lease(_CollectingProtocol())
+        self.assertNotEqual(lease.get_pid(), pid)
+        lease.release()
+        yield deferLater(the_reactor, 0, lambda: None)
+
+    @defer.inlineCallbacks
+    def test_idle_limit(self):
+        leases = [self.lease(_CollectingProtocol()) for _ in range(3)]
+        for lease in leases:
+            lease.release()
+        stats = self.pool.get_statistics()
+        self.assertEqual(stats['idle'], 1)
+        self.assertEqual(stats['stopped'], 2)
+        yield deferLater(the_reactor, 0, lambda: None)
+
+    @defer.inlineCallbacks
+    def test_release_on_owner_collected(self):
+        owner = _Owner()
+        self.pool.lease(['cat'], _CollectingProtocol(), owner=owner)
+        self.assertEqual(self.pool.get_statistics()['leased'], 1)
+        del owner
+        gc.collect()
+        yield deferLater(the_reactor, 0, lambda: None)
+        self.assertEqual(self.pool.get_statistics()['leased'], 0)
+        self.assertEqual(self.pool.get_statistics()['idle'], 1)
+
+    @defer.inlineCallbacks
+    def test_write_from_thread_while_process_ends(self):
+        lease = self.lease(_CollectingProtocol())
+        errors = []
+        stopping = threading.Event()
+
+        def writer():
+            try:
+                while not stopping.is_set():
+                    lease.write(b'x' * 1000)
+                    time.sleep(0.001)
+            except Exception as e:  # pylint: disable=broad-except
+                errors.append(e)
+
+        thread = threading.Thread(target=writer)
+        thread.start()
+        try:
+            yield deferLater(the_reactor, 0.05, lambda: None)
+            os.kill(lease.get_pid(), signal.SIGTERM)
+            while self.pool.get_statistics()['ended'] < 1:
+                yield deferLater(the_reactor, 0.01, lambda: None)
+            yield deferLater(the_reactor, 0.05, lambda: None)
+        finally:
+            stopping.set()
+            thread.join()
+        self.assertEqual(errors, [])
+        lease.release()
+
+
+class _CollectingProtocol(ProcessProtocol):
+    def __init__(self):
+        self.output = []
+
+    def outReceived(self, data):
+        self.output.append(data)
+
+
+class _Owner(object):
+    pass
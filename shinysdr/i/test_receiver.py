@@ -17,9 +17,13 @@
 
 from __future__ import absolute_import, division, print_function, unicode_literals
 
+import os
+
 from twisted.trial import unittest
 
 from shinysdr.i.modes import lookup_mode
+from shinysdr.i.receiver import DemodulatorPool
+from shinysdr.i.recording import make_recording_config
 from shinysdr.i.top import Top
 from shinysdr.plugins.simulate import SimulatedDevice
 from shinysdr.testutil import state_smoke_test
@@ -45,3 +49,66 @@ class TestReceiver(unittest.TestCase):
                 break
         else:
             raise unittest.SkipTest('No no-audio mode available.')
+
+    def test_stereo_audio_power(self):
+        """Smoke test for metering a stereo demodulator."""
+        self.receiver.set_mode('WFM')
+        self.receiver.get_audio_power()
+
+    def test_demodulator_reuse(self):
+        first_am = self.receiver.get_demodulator()
+        self.receiver.set_mode('NFM')
+        self.assertIsNot(self.receiver.get_demodulator(), first_am)
+        self.receiver.set_mode('AM')
+        self.assertIs(self.receiver.get_demodulator(), first_am)
+        stats = self.top.get_demodulator_statistics()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['entries'], 1)  # the NFM demodulator
+    
+    def test_deleted_receiver_demodulator_reuse(self):
+        demodulator = self.receiver.get_demodulator()
+        self.top.delete_receiver('a')
+        (_key, receiver) = self.top.add_receiver('AM', key='b')
+        self.assertIs(receiver.get_demodulator(), demodulator)
+
+
+class TestReceiverRecording(unittest.TestCase):
+    def setUp(self):
+        self.directory = self.mktemp()
+        os.mkdir(self.directory)
+        self.top = Top(
+            devices={'s1': SimulatedDevice()},
+            recording_config=make_recording_config(self.directory))
+    
+    def tearDown(self):
+        self.top.close_all_devices()
+    
+    def __check_record_iq(self, mode):
+        (_key, receiver) = self.top.add_receiver(mode, key='a')
+        receiver.set_record_iq(True)
+        self.assertTrue(receiver.get_record_iq())
+        self.top.start()
+        self.top.stop()
+        self.top.wait()
+        receiver.set_record_iq(False)
+    
+    def test_record_tunable(self):
+        self.__check_record_iq('AM')
+    
+    def test_record_not_tunable(self):
+        """The demodulator takes its input from the rotator rather than tuning itself, and the IQ recording shares it."""
+        self.__check_record_iq('AM-unsel')
+
+
+class TestDemodulatorPool(unittest.TestCase):
+    def test_take_and_evict(self):
+        pool = DemodulatorPool(max_entries=2)
+        self.assertEqual(pool.take('k1'), None)
+        pool.put('k1', 'a')
+        pool.put('k2', 'b')
+        pool.put('k1', 'c')  # evicts 'a'
+        self.assertEqual(pool.take('k1'), 'c')
+        self.assertEqual(pool.take('k1'), None)
+        self.assertEqual(pool.take('k2'), 'b')
+        stats = pool.get_statistics()
+        self.assertEqual((stats['hits'], stats['misses'], stats['evictions'], stats['entries']), (2, 2, 1, 0))
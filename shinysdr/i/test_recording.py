@@ -0,0 +1,72 @@
+# Copyright 2019 Kevin Reid and the ShinySDR contributors
+#
+# This file is part of ShinySDR.
+#
+# ShinySDR is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ShinySDR is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ShinySDR.  If not, see <http://www.gnu.org/licenses/>.
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import os
+import struct
+
+from twisted.trial import unittest
+
+from shinysdr.i.recording import Recorder, make_recording_config
+
+
+class TestRecorder(unittest.TestCase):
+    def setUp(self):
+        self.directory = self.mktemp()
+        os.mkdir(self.directory)
+        self.now = 1500000000.0
+
+    def recorder(self, **kwargs):
+        recorder = Recorder(make_recording_config(self.directory, **kwargs), _time=lambda: self.now)
+        self.addCleanup(recorder.close)
+        return recorder
+
+    def files(self):
+        return sorted(os.listdir(self.directory))
+
+    def test_audio_wav(self):
+        recorder = self.recorder()
+        stream = recorder.open_stream('rx-a', 'audio', 8000, channels=2)
+        recorder.submit(stream, b'\0' * 16)
+        recorder.submit(stream, b'\0' * 8)
+        recorder.close()
+        self.assertEqual(self.files(), ['rx-a-audio-8000Hz-20170714T024000Z.wav'])
+        with open(os.path.join(self.directory, self.files()[0]), 'rb') as f:
+            data = f.read()
+        self.assertEqual(len(data), 44 + 24)
+        self.assertEqual(struct.unpack('<I', data[4:8])[0], 36 + 24)
+        self.assertEqual(struct.unpack('<I', data[40:44])[0], 24)
+
+    def test_iq_rotate_by_size(self):
+        recorder = self.recorder(rotate_bytes=16)
+        stream = recorder.open_stream('rx-a', 'iq', 48000)
+        for _ in range(3):
+            recorder.submit(stream, b'\0' * 8)
+        recorder.close()
+        self.assertEqual(self.files(), [
+            'rx-a-iq-48000Hz-20170714T024000Z-1.cf32',
+            'rx-a-iq-48000Hz-20170714T024000Z.cf32',
+        ])
+
+    def test_drop_when_full(self):
+        recorder = self.recorder(max_queued_bytes=10)
+        stream = recorder.open_stream('rx-a', 'iq', 48000)
+        recorder.close()  # stop writer so nothing is dequeued
+        self.assertTrue(recorder.submit(stream, b'\0' * 8))
+        self.assertFalse(recorder.submit(stream, b'\0' * 8))
+        self.assertEqual(recorder.get_statistics()['dropped_bytes'], 8)
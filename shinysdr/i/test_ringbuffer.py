@@ -0,0 +1,103 @@
+# Copyright 2019 Kevin Reid and the ShinySDR contributors
+#
+# This file is part of ShinySDR.
+#
+# ShinySDR is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ShinySDR is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ShinySDR.  If not, see <http://www.gnu.org/licenses/>.
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import time
+
+from twisted.trial import unittest
+
+from gnuradio import blocks
+from gnuradio import gr
+import numpy
+
+from shinysdr.i.ringbuffer import IQRingBuffer, IQRingBufferSink, IQRingBufferSource
+
+
+class TestIQRingBuffer(unittest.TestCase):
+    def setUp(self):
+        self.ring = IQRingBuffer(sample_rate=100, seconds=1)
+        self.addCleanup(self.ring.close)
+    
+    def test_read_back(self):
+        self.ring.write(numpy.arange(10, dtype=numpy.complex64))
+        out = numpy.zeros(4, dtype=numpy.complex64)
+        position, count = self.ring.read_into(3, out)
+        self.assertEqual((position, count), (7, 4))
+        self.assertEqual(out.real.tolist(), [3, 4, 5, 6])
+    
+    def test_wrap_and_overwrite(self):
+        for i in range(3):
+            self.ring.write(numpy.arange(i * 60, (i + 1) * 60, dtype=numpy.complex64))
+        self.assertEqual(self.ring.get_write_position(), 180)
+        out = numpy.zeros(200, dtype=numpy.complex64)
+        # position 0 has been overwritten, so reading starts at the oldest available sample
+        position, count = self.ring.read_into(0, out)
+        oldest = 180 - 100 + 6  # minus capacity, plus guard
+        self.assertEqual((position, count), (180, 180 - oldest))
+        self.assertEqual(out.real[:count].tolist(), list(range(oldest, 180)))
+    
+    def test_seconds_ago(self):
+        self.ring.write(numpy.zeros(50, dtype=numpy.complex64))
+        self.assertEqual(self.ring.position_seconds_ago(0.2), 30)
+        self.assertEqual(self.ring.position_seconds_ago(10), 0)
+    
+    def test_invalidate(self):
+        self.ring.write(numpy.zeros(50, dtype=numpy.complex64))
+        self.ring.invalidate()
+        self.assertEqual(self.ring.position_seconds_ago(0.2), 50)
+
+
+class TestIQRingBufferBlocks(unittest.TestCase):
+    def test_replay(self):
+        ring = IQRingBuffer(sample_rate=100, seconds=1)
+        self.addCleanup(ring.close)
+        data = numpy.arange(50, dtype=numpy.complex64)
+        
+        tb = gr.top_block()
+        tb.connect(blocks.vector_source_c(data), IQRingBufferSink(ring))
+        tb.run()
+        
+        tb = gr.top_block()
+        sink = blocks.vector_sink_c()
+        tb.connect(IQRingBufferSource(ring, seconds_ago=0.2), blocks.head(gr.sizeof_gr_complex, 20), sink)
+        tb.run()
+        self.assertEqual([x.real for x in sink.data()], list(range(30, 50)))
+    
+    def test_caught_up(self):
+        ring = IQRingBuffer(sample_rate=100, seconds=1)
+        self.addCleanup(ring.close)
+        ring.write(numpy.arange(50, dtype=numpy.complex64))
+        caught_up = []
+        source = IQRingBufferSource(ring, seconds_ago=0.2, on_caught_up=lambda: caught_up.append(True))
+        
+        tb = gr.top_block()
+        tb.connect(source, blocks.head(gr.sizeof_gr_complex, 20), blocks.null_sink(gr.sizeof_gr_complex))
+        tb.run()
+        self.assertEqual(caught_up, [])
+        self.assertEqual(source.get_lag_seconds(), 0)
+        
+        tb = gr.top_block()
+        tb.connect(source, blocks.head(gr.sizeof_gr_complex, 10), blocks.null_sink(gr.sizeof_gr_complex))
+        tb.start()
+        deadline = time.time() + 5
+        while not caught_up and time.time() < deadline:
+            time.sleep(0.01)
+        # Follows live samples until disconnected.
+        ring.write(numpy.zeros(10, dtype=numpy.complex64))
+        tb.wait()
+        self.assertEqual(caught_up, [True])
@@ -0,0 +1,134 @@
+# Copyright 2019 Kevin Reid and the ShinySDR contributors
+#
+# This file is part of ShinySDR.
+#
+# ShinySDR is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ShinySDR is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ShinySDR.  If not, see <http://www.gnu.org/licenses/>.
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from twisted.internet import reactor as the_reactor
+from twisted.trial import unittest
+import numpy
+
+from shinysdr.i.db import DatabaseModel, normalize_record
+from shinysdr.i.scanner import ChannelScanner, ScanChannel, channels_from_databases
+
+
+_BINS = 256
+_RATE = 256e3  # 1 kHz per bin
+
+
+class TestChannelsFromDatabases(unittest.TestCase):
+    def test_filtering(self):
+        db1 = DatabaseModel(the_reactor, {
+            1: normalize_record({u'freq': 1e6, u'mode': u'AM', u'label': u'a'}),
+            2: normalize_record({u'lowerFreq': 1e6, u'upperFreq': 2e6, u'mode': u'AM'}),  # band
+            3: normalize_record({u'freq': 3e6, u'mode': u''}),  # no mode
+            4: normalize_record({u'freq': 4e6, u'mode': u'BOGUS'}),
+        })
+        db2 = DatabaseModel(the_reactor, {
+            1: normalize_record({u'freq': 1e6, u'mode': u'AM', u'label': u'duplicate'}),
+            2: normalize_record({u'freq': 0.5e6, u'mode': u'NFM', u'label': u'b'}),
+        })
+        self.assertEqual(
+            channels_from_databases([db1, db2], mode_available=lambda mode: mode != u'BOGUS'),
+            [
+                ScanChannel(freq=0.5e6, mode=u'NFM', label=u'b'),
+                ScanChannel(freq=1e6, mode=u'AM', label=u'a'),
+            ])
+
+
+class TestChannelScanner(unittest.TestCase):
+    def setUp(self):
+        self.top = _StubTop()
+        self.db = DatabaseModel(the_reactor, {
+            1: normalize_record({u'freq': -50e3, u'mode': u'NFM'}),
+            2: normalize_record({u'freq': 20e3, u'mode': u'NFM'}),
+            3: normalize_record({u'freq': 40e3, u'mode': u'AM'}),
+            4: normalize_record({u'freq': 500e3, u'mode': u'AM'}),  # out of band
+        }, writable=True)
+        self.scanner = ChannelScanner(top=self.top, databases=[self.db], mode_available=lambda mode: True)
+        self.scanner.set_hold_time(2.0)
+        self.scanner.set_max_receivers(2)
+    
+    def __frame(self, now, active_freqs):
+        shifted = numpy.zeros(_BINS, dtype=numpy.int8)
+        for freq in active_freqs:
+            shifted[int(freq / (_RATE / _BINS)) + _BINS // 2] = 30
+        self.scanner._ChannelScanner__process_frame(0.0, _RATE, numpy.fft.ifftshift(shifted), now)
+    
+    def test_in_band(self):
+        self.__frame(0, [])
+        self.assertEqual(self.scanner.get_channels_in_band(), 3)
+    
+    def test_open_and_hold(self):
+        self.__frame(0, [20e3])
+        self.assertEqual(self.top.receivers, {'r0': (u'NFM', 20e3)})
+        self.__frame(1, [])
+        self.assertEqual(list(self.top.receivers), ['r0'])
+        self.__frame(3.5, [])
+        self.assertEqual(self.top.receivers, {})
+    
+    def test_max_receivers(self):
+        self.__frame(0, [-50e3, 20e3, 40e3])
+        self.assertEqual(sorted(f for _, f in self.top.receivers.values()), [-50e3, 20e3])
+    
+    def test_below_threshold(self):
+        self.scanner.set_threshold(40)
+        self.__frame(0, [20e3])
+        self.assertEqual(self.top.receivers, {})
+    
+    def test_database_edit(self):
+        self.__frame(0, [20e3])
+        self.assertEqual(self.top.receivers, {'r0': (u'NFM', 20e3)})
+        self.db.records[5] = normalize_record({u'freq': 10e3, u'mode': u'AM'})
+        self.db.records[2][u'label'] = u'relabeled'
+        self.db.dirty()
+        self.__frame(1, [10e3, 20e3])
+        self.assertEqual(self.scanner.get_channels_in_band(), 4)
+        self.assertEqual(self.top.receivers, {'r0': (u'NFM', 20e3), 'r1': (u'AM', 10e3)})
+        del self.db.records[2]
+        self.db.dirty()
+        self.__frame(2, [10e3, 20e3])
+        self.assertEqual(self.top.receivers, {'r1': (u'AM', 10e3)})
+    
+    def test_receivers_not_persisted(self):
+        self.__frame(0, [20e3])
+        self.assertEqual(self.top.persistent, {'r0': False})
+    
+    def test_user_deleted_receiver(self):
+        self.__frame(0, [20e3])
+        self.top.delete_receiver('r0')
+        self.__frame(10, [])
+        self.assertEqual(self.top.receivers, {})
+
+
+class _StubTop(object):
+    def __init__(self):
+        self.receivers = {}
+        self.persistent = {}
+        self.__counter = 0
+    
+    def add_receiver(self, mode, key=None, state=None, persists=True):
+        key = 'r%d' % (self.__counter,)
+        self.__counter += 1
+        self.receivers[key] = (mode, state[u'rec_freq'])
+        self.persistent[key] = persists
+        return key, None
+    
+    def has_receiver(self, key):
+        return key in self.receivers
+    
+    def delete_receiver(self, key):
+        del self.receivers[key]
@@ -23,6 +23,7 @@ from twisted.trial import unittest
 
 from shinysdr.i.db import DatabaseModel
 from shinysdr.i.network.base import WebServiceCommon
+from shinysdr.i.scanner import ChannelScanner
 from shinysdr.i.session import Session
 from shinysdr.i.top import Top
 from shinysdr.plugins.simulate import SimulatedDevice
@@ -31,11 +32,13 @@ from shinysdr.testutil import state_smoke_test
 
 class TestSession(unittest.TestCase):
     def setUp(self):
+        top = Top(devices={'s1': SimulatedDevice()})
         self.session = Session(
-            receive_flowgraph=Top(devices={'s1': SimulatedDevice()}),
+            receive_flowgraph=top,
             read_only_dbs={},
             writable_db=DatabaseModel(the_reactor, {}, writable=True),
-            features={})
+            features={},
+            scanner=ChannelScanner(top=top, databases=[]))
     
     def test_state_smoke(self):
         state_smoke_test(self.session)
@@ -17,6 +17,8 @@
 
 from __future__ import absolute_import, division, print_function, unicode_literals
 
+import os
+
 import six
 
 from twisted.internet import defer
@@ -27,6 +29,8 @@ from zope.interface import implementer  # available via Twisted
 
 from shinysdr.devices import Device, IComponent, merge_devices
 from shinysdr.i.poller import the_subscription_context
+from shinysdr.i.recording import make_recording_config
+from shinysdr.i.ringbuffer import IQRingBufferConfig
 from shinysdr.i.top import Top
 from shinysdr.plugins.simulate import SimulatedDeviceForTest
 from shinysdr.signals import SignalType
@@ -99,6 +103,13 @@ class TestTop(unittest.TestCase):
         (_key, receiver2) = top.add_receiver('AM', key='b')
         self.assertEqual(receiver2.get_device_name(), 's2')
         self.assertEqual(receiver1.get_device_name(), 's1')
+    
+    def test_receiver_not_persisted(self):
+        top = Top(devices={'s1': SimulatedDeviceForTest()})
+        top.add_receiver('AM', key='a')
+        top.add_receiver('AM', key='b', persists=False)
+        self.assertEqual(sorted(top.receivers.state().keys()), ['a', 'b'])
+        self.assertEqual(list(top.state_to_json()['receivers'].keys()), ['a'])
 
     def test_add_unknown_mode(self):
         """
@@ -116,6 +127,22 @@ class TestTop(unittest.TestCase):
         top.add_audio_callback(callback, 48000)
         top.remove_audio_callback(callback)
     
+    def test_audio_callback_same_rate_no_reconnect(self):
+        def callback1(data):
+            pass
+        
+        def callback2(data):
+            pass
+        
+        top = Top(devices={'s1': SimulatedDeviceForTest(freq=0)})
+        (_key, _receiver) = top.add_receiver('AM', key='a')
+        top.add_audio_callback(callback1, 48000)
+        reconnects = top.get_reconnect_statistics()['reconnects']
+        top.add_audio_callback(callback2, 48000)
+        top.remove_audio_callback(callback2)
+        self.assertEqual(top.get_reconnect_statistics()['reconnects'], reconnects)
+        top.remove_audio_callback(callback1)
+    
     def test_mono(self):
         def callback(data):
             pass
@@ -126,6 +153,120 @@ class TestTop(unittest.TestCase):
         top.add_audio_callback(callback, 48000)
         top.remove_audio_callback(callback)
     
+    def test_squelch_gate_smoke(self):
+        def callback(data):
+            pass
+        top = Top(
+            devices={'s1': SimulatedDeviceForTest(freq=0)},
+            features={'stereo': True, 'squelch_gate': True})
+        (_key, _receiver) = top.add_receiver('NFM', key='a')
+        (_key, _receiver) = top.add_receiver('AM', key='b')
+        top.add_audio_callback(callback, 48000)
+        top.remove_audio_callback(callback)
+    
+    def test_squelch_gate_mixed(self):
+        top = Top(
+            devices={'s1': SimulatedDeviceForTest(freq=0)},
+            features={'stereo': True, 'squelch_gate': True})
+        (_key, receiver) = top.add_receiver('NFM', key='a')
+        allowed = []
+        receiver._set_output_gaps_allowed = allowed.append
+        # Gaps are filled, so mixing with another receiver still allows them.
+        top.add_receiver('NFM', key='b')
+        self.assertEqual(allowed[-1:], [True])
+        top.delete_receiver('b')
+        self.assertEqual(allowed[-1:], [True])
+    
+    def test_channelizer(self):
+        top = Top(
+            devices={'s1': SimulatedDeviceForTest(freq=0)},
+            features={'stereo': True, 'channelizer': True})
+        (_key, receiver) = top.add_receiver('USB', key='a')
+        self.assertEqual(receiver.get_input_channel(), 0)
+        receiver.set_rec_freq(50e3)
+        self.assertEqual(receiver.get_input_channel(), 2)
+        receiver.set_mode('IQ')
+        self.assertEqual(receiver.get_input_channel(), None)
+    
+    def test_recording_smoke(self):
+        directory = self.mktemp()
+        os.mkdir(directory)
+        top = Top(
+            devices={'s1': SimulatedDeviceForTest(freq=0)},
+            recording_config=make_recording_config(directory))
+        (_key, receiver) = top.add_receiver('AM', key='a')
+        self.assertIn('record_audio', receiver.state())
+        receiver.set_record_audio(True)
+        receiver.set_record_iq(True)
+        receiver.set_mode('NFM')
+        top.delete_receiver('a')
+        top.close_all_devices()
+    
+    def test_recording_not_configured(self):
+        top = Top(devices={'s1': SimulatedDeviceForTest(freq=0)})
+        (_key, receiver) = top.add_receiver('AM', key='a')
+        self.assertNotIn('record_audio', receiver.state())
+    
+    def test_time_shift_smoke(self):
+        top = Top(
+            devices={'s1': SimulatedDeviceForTest(freq=0)},
+            features={'stereo': True, 'channelizer': True},
+            iq_ring_buffer_config=IQRingBufferConfig(seconds=1, directory=None))
+        (_key, receiver) = top.add_receiver('USB', key='a')
+        self.assertEqual(receiver.get_input_channel(), 0)
+        receiver.set_time_shift(0.5)
+        self.assertEqual(receiver.get_input_channel(), None)
+        receiver.set_time_shift(0)
+        self.assertEqual(receiver.get_input_channel(), 0)
+    
+    def test_time_shift_caught_up(self):
+        top = Top(
+            devices={'s1': SimulatedDeviceForTest(freq=0)},
+            features={'stereo': True, 'channelizer': True},
+            iq_ring_buffer_config=IQRingBufferConfig(seconds=1, directory=None))
+        (_key, receiver) = top.add_receiver('USB', key='a')
+        receiver.set_time_shift(0.5)
+        generation = receiver.get_time_shift_generation()
+        top._Top__replay_caught_up('a', generation - 1)  # stale
+        self.assertEqual(receiver.get_time_shift(), 0.5)
+        top._Top__replay_caught_up('a', generation)
+        self.assertEqual(receiver.get_time_shift(), 0)
+        self.assertEqual(receiver.get_input_channel(), 0)
+    
+    def test_receiver_cost_budget(self):
+        probe_top = Top(devices={'s1': SimulatedDeviceForTest(freq=0)})
+        (_key, probe_receiver) = probe_top.add_receiver('AM', key='a')
+        cost = probe_receiver.get_estimated_cost()
+        self.assertTrue(cost > 0)
+        
+        top = Top(
+            devices={'s1': SimulatedDeviceForTest(freq=0)},
+            receiver_cost_budget=cost * 1.5)
+        top.add_receiver('AM', key='a')
+        self.assertEqual(top.get_shed_receivers(), {})
+        self.assertEqual(top.get_receiver_budget_warning(), '')
+        top.add_receiver('AM', key='b')
+        self.assertEqual(list(top.get_shed_receivers().keys()), ['b'])
+        self.assertIn('b', top.get_receiver_budget_warning())
+        top.delete_receiver('a')
+        self.assertEqual(top.get_shed_receivers(), {})
+    
+    def test_incremental_reconnect(self):
+        top = Top(devices={'s1': SimulatedDeviceForTest(freq=0)})
+        (_key, receiver_a) = top.add_receiver('AM', key='a')
+        input_edge = ((top._sources['s1'].get_rx_driver(), 0), (receiver_a, 0))
+        self.assertIn(input_edge, top._Top__connections)
+        
+        top.add_receiver('AM', key='b')
+        self.assertIn(input_edge, top._Top__connections)
+        
+        # A reconnect which changes nothing should not lock the flow graph.
+        count = top.get_reconnect_statistics()['reconnects']
+        top._trigger_reconnect(u'test')
+        stats = top.get_reconnect_statistics()
+        self.assertEqual(stats['reconnects'], count + 1)
+        self.assertEqual(stats['last_lock_ms'], 0.0)
+    
     def test_close(self):
         log = []
         top = Top(devices={'m':
@@ -17,6 +17,7 @@
 
 from __future__ import absolute_import, division, print_function, unicode_literals
 
+import functools
 import math
 import time
 
@@ -29,11 +30,15 @@ from zope.interface import implementer  # available via Twisted
 from gnuradio import blocks
 from gnuradio import gr
 
-from shinysdr.devices import DeviceContext
-from shinysdr.i.audiomux import AudioManager
-from shinysdr.i.blocks import MonitorSink, RecursiveLockBlockMixin, Context
+from shinysdr.devices import DeviceContext, get_device_position
+from shinysdr.i.audiomux import AudioManager, CLIENT_AUDIO_DEVICE
+from shinysdr.i.audioformat import DEFAULT_AUDIO_ENCODING
+from shinysdr.i.blocks import DeviceChannelizer, MonitorSink, RecursiveLockBlockMixin, Context, choose_channelizer_channel_count
+from shinysdr.i.graphdiff import ConnectionPlan, apply_connection_diff
 from shinysdr.i.poller import the_subscription_context
-from shinysdr.i.receiver import Receiver
+from shinysdr.i.receiver import DemodulatorPool, Receiver
+from shinysdr.i.recording import Recorder
+from shinysdr.i.ringbuffer import IQRingBuffer, IQRingBufferSink, IQRingBufferSource
 from shinysdr.signals import SignalType
 from shinysdr.telemetry import TelemetryStore
 from shinysdr.types import EnumT, NoticeT, ReferenceT
@@ -62,13 +67,17 @@ class ReceiverCollection(CollectionState):
 
 
 # TODO: Figure out how to stop having to 'declare' this here and in config.py
-_STUB_FEATURES = {'stereo': True}
+_STUB_FEATURES = {'stereo': True, 'channelizer': False, 'squelch_gate': False}
+
+
+# Default limit on the total Receiver.get_estimated_cost() of connected receivers. On a 2.4 MS/s device, this is roughly fifty narrowband receivers (NFM, APRS, PSK31, RTTY, WSPR, …) or ten Mode S receivers; demodulators which do not implement ICostEstimatingDemodulator are charged much more, about four to the budget.
+DEFAULT_RECEIVER_COST_BUDGET = 1e9
 
 
 class Top(gr.top_block, ExportedState, RecursiveLockBlockMixin):
     __log = Logger()
 
-    def __init__(self, devices={}, audio_config=None, features=_STUB_FEATURES):
+    def __init__(self, devices={}, audio_config=None, features=_STUB_FEATURES, receiver_cost_budget=DEFAULT_RECEIVER_COST_BUDGET, recording_config=None, iq_ring_buffer_config=None):
         # pylint: disable=dangerous-default-value
         if len(devices) <= 0:
             raise ValueError('Must be configured with at least one RF device! (This should normally be caught by the configuration validator.)')
@@ -107,6 +116,16 @@ class Top(gr.top_block, ExportedState, RecursiveLockBlockMixin):
         # Receiver blocks (multiple, eventually)
         self._receivers = CellDict(dynamic=True)
         self._receiver_valid = {}
+        self.__use_channelizer = features.get('channelizer', False)
+        self.__squelch_gate = features.get('squelch_gate', False)
+        self.__demodulator_pool = DemodulatorPool()
+        self.__channelizers = {}
+        self.__receiver_cost_budget = float(receiver_cost_budget)
+        self.__shed_receivers = {}  # key -> reason not connected
+        self.__recorder = Recorder(recording_config) if recording_config is not None else None
+        self.__iq_ring_buffer_config = iq_ring_buffer_config
+        self.__ring_buffer_sinks = {}  # device key -> IQRingBufferSink
+        self.__replay_sources = {}  # receiver key -> (time shift generation, IQRingBufferSource)
         
         # collections
         # TODO: No longer necessary to have these non-underscore names
@@ -118,6 +137,14 @@ class Top(gr.top_block, ExportedState, RecursiveLockBlockMixin):
         # Flags, other state
         self.__needs_reconnect = [u'initialization']
         self.__in_reconnect = False
+        self.__connections = ConnectionPlan()  # connections currently made in the flow graph
+        self.__null_sinks = {}  # endpoint -> null sink, kept so unchanged connections stay unchanged
+        self.__reconnect_statistics = {
+            'reconnects': 0,
+            'last_lock_ms': 0.0,
+            'max_lock_ms': 0.0,
+            'total_lock_ms': 0.0,
+        }
         self.receiver_key_counter = 0
         self.receiver_default_state = {}
         
@@ -140,7 +167,8 @@ class Top(gr.top_block, ExportedState, RecursiveLockBlockMixin):
             yield d
         yield 'clip_warning', self.__clip_probe.state()['clip_warning']
 
-    def add_receiver(self, mode, key=None, state=None):
+    def add_receiver(self, mode, key=None, state=None, persists=True):
+        """Create a receiver and return (key, receiver). If persists is false, the receiver is not saved in the persistent state, so it will not be restored after a restart."""
         if len(self._receivers) >= 100:
             # Prevent storage-usage DoS attack
             raise Exception('Refusing to create more than 100 receivers')
@@ -176,7 +204,7 @@ class Top(gr.top_block, ExportedState, RecursiveLockBlockMixin):
             context=facet,
         ), state=combined_state)
         facet._receiver = receiver
-        self._receivers[key] = receiver
+        self._receivers.insert(key, receiver, persists=persists)
         self._receiver_valid[key] = False
         
         self.__needs_reconnect.append(u'added receiver ' + key)
@@ -187,6 +215,9 @@ class Top(gr.top_block, ExportedState, RecursiveLockBlockMixin):
         
         return (key, receiver)
 
+    def has_receiver(self, key):
+        return key in self._receivers
+
     def delete_receiver(self, key):
         assert key in self._receivers
         receiver = self._receivers[key]
@@ -199,19 +230,24 @@ class Top(gr.top_block, ExportedState, RecursiveLockBlockMixin):
         del self._receiver_valid[key]
         self.__needs_reconnect.append(u'removed receiver ' + key)
         self._do_connect()
+        receiver._release_demodulator()
+        receiver._stop_recording()
 
     # TODO move these methods to a facet of AudioManager
-    def add_audio_callback(self, callback, sample_rate):
-        self.__audio_manager.add_audio_callback(callback, sample_rate)
-        self.__needs_reconnect.append(u'added audio callback')
-        self._do_connect()
+    def add_audio_callback(self, callback, sample_rate, encoding=DEFAULT_AUDIO_ENCODING):
+        if self.__audio_manager.add_audio_callback(callback, sample_rate, encoding):
+            self.__needs_reconnect.append(u'added audio callback')
+            self._do_connect()
         self.__start_or_stop()
     
     def remove_audio_callback(self, callback):
-        self.__audio_manager.remove_audio_callback(callback)
-        self.__start_or_stop()
-        self.__needs_reconnect.append(u'removed audio callback')
-        self._do_connect()
+        if self.__audio_manager.remove_audio_callback(callback):
+            self.__start_or_stop()
+            self.__needs_reconnect.append(u'removed audio callback')
+            self._do_connect()
+    
+    def set_audio_callback_encoding(self, callback, encoding):
+        self.__audio_manager.set_audio_callback_encoding(callback, encoding)
     
     def get_audio_callback_channels(self):
         """
@@ -246,55 +282,161 @@ class Top(gr.top_block, ExportedState, RecursiveLockBlockMixin):
                 reasons=', '.join(self.__needs_reconnect))
             self.__needs_reconnect = []
             
-            self._recursive_lock()
-            self.disconnect_all()
+            # Work out the complete set of connections we want without touching the flow graph, then lock it only to apply the difference from what is there now.
+            plan = ConnectionPlan()
+            old_null_sinks = self.__null_sinks
+            self.__null_sinks = {}
             
-            self.connect(
+            def connect_to_null_sink(endpoint, item_size):
+                # Reuse null sinks so that the connection is the same as last time.
+                key = (endpoint, item_size)
+                sink = old_null_sinks.get(key)
+                if sink is None:
+                    sink = blocks.null_sink(item_size)
+                self.__null_sinks[key] = sink
+                plan.connect(endpoint, sink)
+            
+            plan.connect(
                 self.__monitor_rx_driver,
                 self.monitor)
-            self.connect(
+            plan.connect(
                 self.__monitor_rx_driver,
                 self.__clip_probe)
 
             # Filter receivers
-            audio_rs = self.__audio_manager.reconnecting()
-            n_valid_receivers = 0
+            audio_rs = self.__audio_manager.reconnecting(plan)
+            total_cost = 0.0
+            shed_receivers = {}
             has_non_audio_receiver = False
-            for key, receiver in six.iteritems(self._receivers):
+            used_channels = {}
+            used_devices = set([self.source_name])
+            old_replay_sources = self.__replay_sources
+            self.__replay_sources = {}
+            gated_receivers = set()  # keys of receivers whose output may stop while squelched
+            # sorted so that which receivers are shed is stable
+            for key, receiver in sorted(six.iteritems(self._receivers)):
                 self._receiver_valid[key] = receiver.get_is_valid()
                 if not self._receiver_valid[key]:
                     continue
                 if not self.__audio_manager.validate_destination(receiver.get_audio_destination()):
                     self.__log.info('Flow graph: receiver audio destination {audio_destination} is not available', audio_destination=receiver.get_audio_destination())
                     continue
-                n_valid_receivers += 1
-                if n_valid_receivers > 6:
-                    # Sanity-check to avoid burning arbitrary resources
-                    # TODO: less arbitrary constant; communicate this restriction to client
-                    self.__log.info('Flow graph: Refusing to connect more than 6 receivers')
-                    break
-                self.connect(self._sources[receiver.get_device_name()].get_rx_driver(), receiver)
+                # Admit receivers only as long as their total estimated cost fits in the budget, to avoid burning arbitrary resources.
+                cost = receiver.get_estimated_cost()
+                if total_cost + cost > self.__receiver_cost_budget:
+                    shed_receivers[key] = u'estimated cost %.3g exceeds remaining budget %.3g' % (cost, self.__receiver_cost_budget - total_cost)
+                    self.__log.info('Flow graph: Not connecting receiver {key}: {reason}', key=key, reason=shed_receivers[key])
+                    continue
+                total_cost += cost
+                used_devices.add(receiver.get_device_name())
+                input_channel = receiver.get_input_channel()
+                replaying = self.__iq_ring_buffer_config is not None and receiver.get_time_shift() > 0
+                if replaying:
+                    replay = old_replay_sources.get(key)
+                    if replay is None or replay[0] != receiver.get_time_shift_generation():
+                        generation = receiver.get_time_shift_generation()
+                        replay = (
+                            generation,
+                            IQRingBufferSource(
+                                self.__get_ring_buffer_sink(receiver.get_device_name()).get_ring_buffer(),
+                                receiver.get_time_shift(),
+                                on_caught_up=functools.partial(reactor.callFromThread, self.__replay_caught_up, key, generation)))
+                    self.__replay_sources[key] = replay
+                    plan.connect(replay[1], receiver)
+                elif input_channel is None:
+                    plan.connect(self._sources[receiver.get_device_name()].get_rx_driver(), receiver)
+                else:
+                    channelizer = self.__channelizers[receiver.get_device_name()]
+                    used_channels.setdefault(receiver.get_device_name(), set()).add(input_channel)
+                    plan.connect((channelizer, input_channel), receiver)
                 receiver_output_type = receiver.get_output_type()
-                if receiver_output_type.get_sample_rate() <= 0:
+                if receiver_output_type.get_sample_rate() <= 0 or replaying:
                     # Demodulator has no output, but receiver has a dummy output, so connect it to something to satisfy flow graph structure.
-                    self.connect(receiver, blocks.null_sink(gr.sizeof_float * self.__audio_manager.get_channels()))
+                    # A time-shifted receiver's audio is also discarded until it has caught up, since the audio bus runs in real time and would hold it back.
+                    connect_to_null_sink(receiver, gr.sizeof_float * self.__audio_manager.get_channels())
                     # Note that we have a non-audio receiver which may be useful even if there is no audio output
                     has_non_audio_receiver = True
                 else:
                     assert receiver_output_type.get_kind() == 'STEREO'
                     audio_rs.input(receiver, receiver_output_type.get_sample_rate(), receiver.get_audio_destination())
+                    if self.__squelch_gate and receiver.get_audio_destination() == CLIENT_AUDIO_DEVICE:
+                        gated_receivers.add(key)
+            
+            # Keep history of every device in use for time-shifted receivers.
+            if self.__iq_ring_buffer_config is not None:
+                for device_name in used_devices:
+                    plan.connect(self._sources[device_name].get_rx_driver(), self.__get_ring_buffer_sink(device_name))
+            
+            # Connect channelizers which are in use. All of their outputs must be connected.
+            for device_name, channels in six.iteritems(used_channels):
+                channelizer = self.__channelizers[device_name]
+                plan.connect(self._sources[device_name].get_rx_driver(), channelizer)
+                for channel in six.moves.range(channelizer.get_channel_count()):
+                    if channel not in channels:
+                        connect_to_null_sink((channelizer, channel), gr.sizeof_gr_complex)
             
             self.__has_a_useful_receiver = audio_rs.finish_bus_connections() or \
                 has_non_audio_receiver
             
-            self._recursive_unlock()
+            if shed_receivers != self.__shed_receivers:
+                self.__shed_receivers = shed_receivers
+                self.state_changed('receiver_budget_warning')
+            
+            # A gated receiver fills its output with silence, so that it stays rate-locked for mixing. This is only done for the client audio, since a hardware audio sink would be starved by the pipeline delay of the filling.
+            for key, receiver in six.iteritems(self._receivers):
+                receiver._set_output_gaps_allowed(key in gated_receivers)
+            
+            removed, added = plan.diff(self.__connections)
+            if removed or added:
+                t_lock = time.time()
+                self._recursive_lock()
+                try:
+                    apply_connection_diff(self, removed, added)
+                finally:
+                    self._recursive_unlock()
+                lock_ms = (time.time() - t_lock) * 1000
+            else:
+                lock_ms = 0.0
+            self.__connections = plan
+            
+            stats = self.__reconnect_statistics
+            stats['reconnects'] += 1
+            stats['last_lock_ms'] = lock_ms
+            stats['max_lock_ms'] = max(stats['max_lock_ms'], lock_ms)
+            stats['total_lock_ms'] += lock_ms
+            
             # (this is in an if block but it can't not execute if anything else did)
-            self.__log.info('Flow graph: ...done reconnecting ({time_ms} ms).', time_ms=(time.time() - t0) * 1000)
+            self.__log.info('Flow graph: ...done reconnecting ({time_ms} ms, {lock_ms} ms locked; {removed} connections removed, {added} added).',
+                time_ms=(time.time() - t0) * 1000,
+                lock_ms=lock_ms,
+                removed=len(removed),
+                added=len(added))
             
             self.__start_or_stop_later()
         
         self.__in_reconnect = False
 
+    def __replay_caught_up(self, key, generation):
+        receiver = self._receivers.get(key)
+        if receiver is None or receiver.get_time_shift_generation() != generation or receiver.get_time_shift() <= 0:
+            # Replay already stopped or restarted.
+            return
+        self.__log.info('Flow graph: time-shifted receiver {key} caught up', key=key)
+        receiver._time_shift_caught_up()
+
+    def __get_ring_buffer_sink(self, device_key):
+        """Return the IQRingBufferSink for the device, creating it if necessary or if the device's sample rate has changed."""
+        sample_rate = self._sources[device_key].get_rx_driver().get_output_type().get_sample_rate()
+        sink = self.__ring_buffer_sinks.get(device_key)
+        if sink is None or sink.get_ring_buffer().sample_rate != sample_rate:
+            # The old buffer's file is closed when the last block using it is discarded.
+            sink = IQRingBufferSink(IQRingBuffer(
+                sample_rate=sample_rate,
+                seconds=self.__iq_ring_buffer_config.seconds,
+                directory=self.__iq_ring_buffer_config.directory))
+            self.__ring_buffer_sinks[device_key] = sink
+        return sink
+    
     def __device_vfo_callback(self, device_key):
         reactor.callLater(
             self._sources[device_key].get_rx_driver().get_tune_delay(),
@@ -304,6 +446,10 @@ class Top(gr.top_block, ExportedState, RecursiveLockBlockMixin):
     def __device_vfo_changed(self, device_key):
         device = self._sources[device_key]
         freq = device.get_freq()
+        sink = self.__ring_buffer_sinks.get(device_key)
+        if sink is not None:
+            # Samples from before retuning must not be replayed as if they were at the new frequency.
+            sink.get_ring_buffer().invalidate()
         if self.source is device:
             self.monitor.set_input_center_freq(freq)
         for rec_key, receiver in six.iteritems(self._receivers):
@@ -318,6 +464,29 @@ class Top(gr.top_block, ExportedState, RecursiveLockBlockMixin):
             self.__needs_reconnect.append(u'receiver %s validity changed' % (key,))
             self._do_connect()
     
+    def get_demodulator_statistics(self):
+        """Return a dict of demodulator pool reuse counts and demodulator construction times."""
+        return self.__demodulator_pool.get_statistics()
+    
+    def get_recording_statistics(self):
+        """Return a dict of bytes written, queued, and dropped by receiver recording, or None if recording is not configured."""
+        return self.__recorder.get_statistics() if self.__recorder is not None else None
+    
+    def get_reconnect_statistics(self):
+        """Return a dict of how many times the flow graph has been reconnected and how long it was locked for doing so."""
+        return dict(self.__reconnect_statistics)
+    
+    @exported_value(type=NoticeT(always_visible=False), changes='explicit')
+    def get_receiver_budget_warning(self):
+        if not self.__shed_receivers:
+            return u''
+        return u'Not running receivers %s: CPU budget exceeded.' % (
+            u', '.join(sorted(self.__shed_receivers)))
+    
+    def get_shed_receivers(self):
+        """Return a dict of the keys of receivers which were not connected because of the resource budget, with the reason for each."""
+        return dict(self.__shed_receivers)
+    
     @exported_value(type=ReferenceT(), changes='never')
     def get_monitor(self):
         return self.monitor
@@ -388,6 +557,8 @@ class Top(gr.top_block, ExportedState, RecursiveLockBlockMixin):
             device.close()
         self.stop()
         self.wait()
+        if self.__recorder is not None:
+            self.__recorder.close()
 
     @exported_value(
         type_fn=lambda self: self.__rx_device_type,
@@ -413,6 +584,35 @@ class Top(gr.top_block, ExportedState, RecursiveLockBlockMixin):
         """for ContextForReceiver only"""
         return self.__audio_manager.get_destination_type()
     
+    def _get_channelizer(self, device_key):
+        """for ContextForReceiver only"""
+        if not self.__use_channelizer:
+            return None
+        input_rate = self._sources[device_key].get_rx_driver().get_output_type().get_sample_rate()
+        channelizer = self.__channelizers.get(device_key)
+        if channelizer is None or channelizer.get_input_rate() != input_rate:
+            channel_count = choose_channelizer_channel_count(input_rate)
+            if channel_count is None:
+                channelizer = None
+            else:
+                channelizer = DeviceChannelizer(input_rate=input_rate, channel_count=channel_count)
+            self.__channelizers[device_key] = channelizer
+        return channelizer
+    
+    def _get_demodulator_pool(self):
+        """for ContextForReceiver only"""
+        return self.__demodulator_pool
+    
+    def _get_recorder(self):
+        """for ContextForReceiver only"""
+        return self.__recorder
+    
+    def _get_time_shift_limit(self):
+        """for ContextForReceiver only"""
+        if self.__iq_ring_buffer_config is None:
+            return None
+        return self.__iq_ring_buffer_config.seconds
+    
     def _trigger_reconnect(self, reason):
         self.__needs_reconnect.append(reason)
         self._do_connect()
@@ -439,6 +639,29 @@ class ContextForReceiver(Context):
     def get_audio_destination_type(self):
         return self.__top._get_audio_destination_type()
 
+    def get_channelizer(self, device_key):
+        if self._receiver is not None and self._receiver.get_time_shift() > 0:
+            # Time-shifted input comes from the device's ring buffer, not the channelizer.
+            return None
+        return self.__top._get_channelizer(device_key)
+
+    def get_time_shift_limit(self):
+        return self.__top._get_time_shift_limit()
+
+    def get_device_position(self):
+        if self._receiver is None:
+            return None
+        return get_device_position(self.__top._sources[self._receiver.get_device_name()])
+
+    def get_demodulator_pool(self):
+        return self.__top._get_demodulator_pool()
+
+    def get_recorder(self):
+        return self.__top._get_recorder()
+
+    def get_recording_name(self):
+        return u'rx-' + self._key
+
     def revalidate(self, tuning):
         if not self._enabled: return
 
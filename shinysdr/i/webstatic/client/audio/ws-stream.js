@@ -64,6 +64,38 @@ define([
   // In connectAudio, we assume that the maximum audio bandwidth is lower than that suiting this sample rate, so that if the native sample rate is much higher than this we can send a lower one over the network without losing anything of interest.
   const ASSUMED_USEFUL_SAMPLE_RATE = 40000;
   
+  // Sample encoding to request from the server (see shinysdr/i/audioformat.py). 16-bit samples are half the bandwidth of float32 and indistinguishable in practice.
+  const REQUESTED_ENCODING = 's16';
+  
+  const MULAW_TABLE = new Float32Array(256);
+  for (let i = 0; i < 256; i++) {
+    const u = ~i & 0xFF;
+    const exponent = (u >> 4) & 0x07;
+    const magnitude = ((((u & 0x0F) << 3) + 0x84) << exponent) - 0x84;
+    MULAW_TABLE[i] = ((u & 0x80) ? -magnitude : magnitude) / 32767;
+  }
+  
+  // Functions from an encoded ArrayBuffer to a float32 ArrayBuffer.
+  const AUDIO_DECODERS = Object.freeze({
+    float32: buffer => buffer,
+    s16: buffer => {
+      const input = new Int16Array(buffer);
+      const output = new Float32Array(input.length);
+      for (let i = 0; i < input.length; i++) {
+        output[i] = input[i] / 32767;
+      }
+      return output.buffer;
+    },
+    mulaw: buffer => {
+      const input = new Uint8Array(buffer);
+      const output = new Float32Array(input.length);
+      for (let i = 0; i < input.length; i++) {
+        output[i] = MULAW_TABLE[input[i]];
+      }
+      return output.buffer;
+    },
+  });
+  
   function logAutoplayBehavior() {
     console.info.apply(console, ['audio playback debug:'].concat(Array.from(arguments)));
   }
@@ -142,13 +174,15 @@ define([
       });
       retryingConnection(
         () => new webSocketCtor(
-          url + '?rate=' + encodeURIComponent(JSON.stringify(statusImpl.requestedSampleRateCell.get()))),
+          url + '?rate=' + encodeURIComponent(JSON.stringify(statusImpl.requestedSampleRateCell.get())) +
+              '&encoding=' + REQUESTED_ENCODING),
         null,
         ws => handleWebSocket(ws, buffererMessagePort));
     });
     
     function handleWebSocket(ws, buffererMessagePort) {
       let isInitializedFromStream = false;
+      let decode = null;
     
       ws.addEventListener('open', event => {
         ws.send(''); // dummy required due to server limitation
@@ -175,7 +209,7 @@ define([
             return;
           }
           
-          buffererMessagePort.postMessage(['acceptSamples', wsDataValue]);
+          buffererMessagePort.postMessage(['acceptSamples', decode(wsDataValue)]);
           if (!started) startStop();
           
         } else if (typeof wsDataValue === 'string') {
@@ -196,6 +230,12 @@ define([
             lose('Message was not properly formatted');
             return;
           }
+          // Servers which predate encodings send no encoding field and always float32.
+          decode = AUDIO_DECODERS[message.encoding || 'float32'];
+          if (!decode) {
+            lose('Unsupported audio encoding: ' + message.encoding);
+            return;
+          }
           const numAudioChannels = message.signal_type.kind === 'STEREO' ? 2 : 1;
           const streamSampleRate = message.signal_type.sample_rate;
           buffererMessagePort.postMessage(['setFormat', numAudioChannels, streamSampleRate]);
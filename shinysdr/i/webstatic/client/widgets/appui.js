@@ -82,6 +82,7 @@ define([
       addWidget('source', Device);
 
       addWidget('clip_warning', Banner);
+      addWidget('receiver_budget_warning', Banner);
       addWidget('receivers', ReceiverSet);
       addWidget('accessories', AccessorySet);
       
@@ -61,6 +61,8 @@ class IDemodulator(Interface):
     Demodulators may also wish to implement:
     IDemodulatorModeChange
     ITunableDemodulator
+    ICostEstimatingDemodulator
+    IGatingDemodulator
     
     Additional constraints:
     
@@ -113,6 +115,12 @@ class IDemodulatorContext(Interface):
     
     def get_absolute_frequency_cell():
         """Returns a cell containing the original RF carrier frequency of the signal to be demodulated — the frequency the signal entering the demodulator has been shifted down from."""
+    
+    def get_device_position():
+        """Returns the (latitude, longitude) in degrees of the device the signal is being received from, or None if it is not known.
+        
+        The result may change over the life of the demodulator (if the receiver is switched to another device), so it should not be cached for long.
+        """
 
 
 class ITunableDemodulator(IDemodulator):
@@ -146,6 +154,41 @@ class IDemodulatorModeChange(IDemodulator):
 __all__.append('IDemodulatorModeChange')
 
 
+class ICostEstimatingDemodulator(IDemodulator):
+    """If a demodulator implements this interface, then it can estimate how much computation it performs, which is used to decide how many receivers can be run at once."""
+    
+    def get_estimated_cost():
+        """
+        Return an estimate of the computation performed by the demodulator, in complex multiply-accumulates per second (or equivalent work).
+        
+        Demodulators not implementing this interface are assumed to cost a fixed amount per input sample.
+        """
+
+
+__all__.append('ICostEstimatingDemodulator')
+
+
+class IGatingDemodulator(IDemodulator):
+    """If a demodulator implements this interface, then it can stop producing output samples while it has nothing useful to output (such as while squelched), rather than producing silence, so that everything downstream of it goes idle."""
+    
+    def set_output_gaps_allowed(allowed):
+        """
+        Set whether the demodulator may stop producing output. Initially it may not.
+        
+        This is allowed only if the consumer of the output fills the gaps (see shinysdr.i.blocks.GapFiller), since a mixer combining it with other audio cannot tell a gap from a late input. It must take effect immediately.
+        """
+    
+    def get_output_gated():
+        """
+        Return whether the demodulator is currently producing no output because it is gated; always false while gaps are not allowed.
+        
+        This is called from flow graph threads.
+        """
+
+
+__all__.append('IGatingDemodulator')
+
+
 # TODO: BandShape doesn't really belong here but it is related to IDemodulator. Find better location.
 
 # All frequencies are relative to the demodulator's input signal (i.e. baseband)
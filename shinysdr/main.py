@@ -108,6 +108,13 @@ def _main_async(reactor, argv=None, _abort_for_test=False):
         defer.returnValue(None)
         return
     
+    if config_obj._filter_design_cache_filename is not None:
+        from shinysdr.i.filter_cache import the_filter_design_cache
+        filter_design_cache_filename = config_obj._filter_design_cache_filename
+        the_filter_design_cache.load_file(filter_design_cache_filename)
+        reactor.addSystemEventTrigger('during', 'shutdown',
+            lambda: the_filter_design_cache.save_file(filter_design_cache_filename))
+    
     _log.info('Constructing...')
     app = config_obj._create_app()
     
@@ -34,14 +34,21 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 
 from collections import namedtuple
 from datetime import datetime
+import multiprocessing
 import os.path
 import re
-import threading
 import time
 
 import six
 
+from twisted.application.internet import ClientService
+from twisted.internet import defer
+from twisted.internet.endpoints import HostnameEndpoint
+from twisted.internet.protocol import Factory
+from twisted.internet.task import LoopingCall
 from twisted.logger import Logger
+from twisted.protocols.basic import LineReceiver
+from twisted.protocols.policies import TimeoutMixin
 from twisted.web import static
 from zope.interface import Interface, implementer  # available via Twisted
 
@@ -272,6 +279,9 @@ Velocity = namedtuple('Velocity', [
 ])
 
 
+_TNC2_RE = re.compile(r'^([^:>,]+?)>([^:>,]+)((?:,[^:>]+)*):(.*?)$')
+
+
 def parse_tnc2(line, receive_time, log=None):
     """Parse "TNC2 text format" APRS messages."""
     if not isinstance(line, six.text_type):
@@ -280,7 +290,7 @@ def parse_tnc2(line, receive_time, log=None):
     
     facts = []
     errors = []
-    match = re.match(r'^([^:>,]+?)>([^:>,]+)((?:,[^:>]+)*):(.*?)$', line)
+    match = _TNC2_RE.match(line)
     if not match:
         errors.append('Could not parse TNC2')
         parsed = APRSMessage(receive_time, '', '', '', line, facts, errors, line)
@@ -290,205 +300,468 @@ def parse_tnc2(line, receive_time, log=None):
         parsed = APRSMessage(receive_time, source, destination, via, payload, facts, errors, comment)
     
     if log:
-        # repr here provides robustness against control characters.
-        log.info('APRS: {line}\n   -> {aprs_message}', line=repr_no_string_tag(line), aprs_message=parsed)
+        _log_message(log, line, parsed)
     return parsed
 
 
-def APRSISRXDevice(reactor, client, name=None, aprs_filter=None):
+def _log_message(log, line, parsed):
+    # repr here provides robustness against control characters.
+    log.info('APRS: {line}\n   -> {aprs_message}', line=repr_no_string_tag(line), aprs_message=parsed)
+
+
+# Worker pool used by TNC2LineParser, or None to parse on the reactor thread.
+_parse_pool = None
+
+# Largest number of lines sent to a worker process at once.
+_PARSE_CHUNK_SIZE = 500
+
+# Time after which a chunk sent to a worker process is presumed lost (e.g. because the worker died), and parsed on the reactor thread instead.
+_PARSE_TIMEOUT = 60
+
+
+def set_parse_processes(reactor, processes=None):
+    """Parse APRS messages from all sources in a pool of worker processes, rather than on the reactor thread.
+    
+    processes: number of worker processes; the default is the number of CPUs.
+    
+    This should be called from the configuration file, so that the worker processes are started before the flow graph's threads are.
+    """
+    global _parse_pool  # pylint: disable=global-statement
+    if _parse_pool is not None:
+        _parse_pool.close()
+    _parse_pool = _ParsePool(reactor, processes)
+
+
+class TNC2LineParser(object):
+    """
+    Parses TNC2 lines from one source and passes the resulting APRSMessages to callback.
+    
+    If set_parse_processes has been used, lines are parsed in worker processes, a chunk at a time; messages are still delivered in the order the lines were given, on the reactor thread. Otherwise they are parsed immediately.
+    """
+    __log = Logger()
+    
+    def __init__(self, reactor, callback, log=None, pool=None):
+        self.__reactor = reactor
+        self.__callback = callback
+        self.__message_log = log
+        self.__pool = pool if pool is not None else _parse_pool
+        self.__pending = []  # (line, receive_time) not yet sent to the pool
+        self.__flush_call = None
+        self.__next_chunk = 0  # sequence number of the next chunk sent
+        self.__next_delivery = 0  # sequence number of the next chunk to be delivered
+        self.__completed = {}  # sequence number -> (items, results) of chunks parsed out of order
+    
+    def parse_lines(self, lines, receive_time):
+        pool = self.__pool
+        if pool is None:
+            callback = self.__callback
+            for line in lines:
+                callback(parse_tnc2(line, receive_time, log=self.__message_log))
+            return
+        self.__pending.extend((line, receive_time) for line in lines)
+        if self.__flush_call is None:
+            # Wait until the end of this reactor turn so that lines arriving one at a time are sent together.
+            self.__flush_call = self.__reactor.callLater(0, self.__flush)
+    
+    def __flush(self):
+        self.__flush_call = None
+        pending = self.__pending
+        self.__pending = []
+        for start in range(0, len(pending), _PARSE_CHUNK_SIZE):
+            items = pending[start:start + _PARSE_CHUNK_SIZE]
+            sequence = self.__next_chunk
+            self.__next_chunk += 1
+            self.__pool.parse(items).addCallbacks(
+                self.__chunk_parsed, self.__chunk_failed,
+                callbackArgs=(sequence, items),
+                errbackArgs=(sequence, items))
+    
+    def __chunk_failed(self, failure, sequence, items):
+        self.__log.warn('APRS parse worker failed ({failure}); parsing {count} lines here', failure=failure.getErrorMessage(), count=len(items))
+        # None results are parsed here, and later chunks are not held up.
+        self.__chunk_parsed([None] * len(items), sequence, items)
+    
+    def __chunk_parsed(self, results, sequence, items):
+        self.__completed[sequence] = (items, results)
+        while self.__next_delivery in self.__completed:
+            items, results = self.__completed.pop(self.__next_delivery)
+            self.__next_delivery += 1
+            for (line, receive_time), message in zip(items, results):
+                if message is None:
+                    # The worker failed; parse here so that the error is reported the same way as without the pool.
+                    try:
+                        message = parse_tnc2(line, receive_time)
+                    except Exception:  # pylint: disable=broad-except
+                        self.__log.failure('Error parsing APRS line {line}', line=repr_no_string_tag(line))
+                        continue
+                if self.__message_log:
+                    _log_message(self.__message_log, line, message)
+                self.__callback(message)
+
+
+class _ParsePool(object):
+    def __init__(self, reactor, processes):
+        self.__reactor = reactor
+        self.__pool = multiprocessing.Pool(processes)
+    
+    def parse(self, items, timeout=_PARSE_TIMEOUT):
+        """Parse a list of (line, receive_time) and return a Deferred list of APRSMessage or None for lines which failed.
+        
+        The Deferred fails if the worker raises or has not answered within timeout seconds. A pool whose worker dies never answers at all.
+        """
+        d = defer.Deferred()
+        
+        def fire(fn, value):
+            if not d.called:
+                timeout_call.cancel()
+                fn(value)
+        
+        def timed_out():
+            d.errback(defer.TimeoutError('APRS parse worker did not answer within %s seconds' % (timeout,)))
+        
+        timeout_call = self.__reactor.callLater(timeout, timed_out)
+        kwargs = {}
+        if six.PY3:
+            # Python 2's Pool has no error_callback; the timeout covers that case too.
+            kwargs['error_callback'] = lambda error: self.__reactor.callFromThread(fire, d.errback, error)
+        self.__pool.apply_async(
+            _parse_items,
+            (items,),
+            callback=lambda results: self.__reactor.callFromThread(fire, d.callback, results),
+            **kwargs)
+        return d
+    
+    def close(self):
+        self.__pool.terminate()
+
+
+def _parse_items(items):
+    """Runs in a worker process. Must not raise, since the pool would never deliver the chunk."""
+    results = []
+    for line, receive_time in items:
+        try:
+            results.append(parse_tnc2(line, receive_time))
+        except Exception:  # pylint: disable=broad-except
+            results.append(None)
+    return results
+
+
+def APRSISRXDevice(reactor, callsign=None, name=None, aprs_filter=None, passcode=-1, endpoint=None, client=None):
     """
-    client: an aprs.APRS object (see <https://pypi.python.org/pypi/aprs>)
+    callsign: callsign to log in to APRS-IS as
     name: device label
     aprs_filter: filter on incoming data (see <http://www.aprs-is.net/javAPRSFilter.aspx>)
+    passcode: APRS-IS passcode; the default of -1 is sufficient for receiving
+    endpoint: Twisted client endpoint to connect to instead of the APRS-IS server pool
+    client: no longer supported; accepted only to report configurations which pass an aprs.APRS object
     """
+    if client is not None or not (callsign is None or isinstance(callsign, six.string_types)):
+        raise TypeError('APRSISRXDevice no longer takes an aprs.APRS client object; pass callsign=\'...\' (and optionally passcode=...) instead')
+    if callsign is None:
+        raise TypeError('APRSISRXDevice: callsign must be specified')
     if name is None:
         name = 'APRS-IS ' + aprs_filter if aprs_filter else 'APRS-IS'
-    component = _APRSISComponent(reactor, client, name, aprs_filter)
+    if endpoint is None:
+        endpoint = HostnameEndpoint(reactor, _APRSIS_DEFAULT_HOST, _APRSIS_DEFAULT_PORT)
+    login = 'user {0} pass {1} vers ShinySDR 0'.format(callsign, passcode)
+    if aprs_filter:
+        login += ' filter ' + aprs_filter
+    component = _APRSISComponent(reactor, endpoint, login.encode('us-ascii'))
     return Device(name=name, components={'aprs-is': component})
 
 
+_APRSIS_DEFAULT_HOST = 'rotate.aprs2.net'
+_APRSIS_DEFAULT_PORT = 14580  # user-defined filter port
+
+# APRS-IS servers send a comment line at least every 20 seconds, so a connection which has been silent for much longer than that is dead.
+_APRSIS_IDLE_TIMEOUT = 90
+
+# Some servers disconnect clients which never send anything.
+_APRSIS_KEEPALIVE_INTERVAL = 5 * 60
+
+
 @implementer(IComponent)
 class _APRSISComponent(ExportedState):
-    __alive = True
-    __log = Logger()
-    
-    def __init__(self, reactor, client, name, aprs_filter):
+    def __init__(self, reactor, endpoint, login):
         # not specifically expecting more than one but this neatly handles zero-or-one
         self.__device_contexts = []
+        self.__status = 'Connecting'
+        self.__parser = TNC2LineParser(reactor, self.__output_message)
         
-        client.connect(aprs_filter=aprs_filter)  # TODO either expect the user to do this or forward args
-        
-        def main_callback(line):
-            message = parse_tnc2(line, time.time(), log=self.__log)
-            for c in self.__device_contexts:
-                c.output_message(message)
-    
-        # client blocks in a loop, so set up a thread
-        def threaded_callback(line):
-            if not self.__alive:
-                raise StopIteration()
-            reactor.callFromThread(main_callback, line)
-        
-        def thread_body():
-            try:
-                client.receive(callback=threaded_callback)
-            except StopIteration:  # thrown by callback
-                pass
-    
-        thread = threading.Thread(
-            name='APRSISRXClient({}) reader thread'.format(repr_no_string_tag(name)),
-            target=thread_body)
-        thread.daemon = True  # Allow clean process shutdown without waiting for us
-        thread.start()
+        factory = Factory()
+        factory.protocol = lambda: _APRSISProtocol(
+            clock=reactor,
+            login=login,
+            lines_callback=self.__lines_received,
+            status_callback=self.__set_status)
+        # ClientService takes care of reconnecting with backoff.
+        self.__client_service = ClientService(endpoint, factory, clock=reactor)
+        self.__client_service.startService()
         
         # TODO: Allow the filter to be changed at runtime
     
     def close(self):
         """implements IComponent"""
-        # Note that this does not promptly stop the thread, because we cannot: the aprs.APRS.receive call is blocked on a socket read. The thread will only stop once a message has been received.
-        self.__alive = False
+        return self.__client_service.stopService()
     
     def attach_context(self, device_context):
         """implements IComponent"""
         self.__device_contexts.append(device_context)
+    
+    @exported_value(type=six.text_type, changes='explicit', label='Status')
+    def get_status(self):
+        return self.__status
+    
+    def __set_status(self, status):
+        self.__status = status
+        self.state_changed('status')
+    
+    def __lines_received(self, lines):
+        self.__parser.parse_lines(lines, time.time())
+    
+    def __output_message(self, message):
+        for c in self.__device_contexts:
+            c.output_message(message)
 
 
-def _parse_payload(facts, errors, source, destination, payload, receive_time):
-    # pylint: disable=unused-variable
-    # (variables for information we're not yet using)
+class _APRSISProtocol(LineReceiver, TimeoutMixin):
+    """
+    Client side of the APRS-IS protocol.
     
-    if len(payload) < 1:
-        errors.append('zero length information')
-        return payload
-    data_type = payload[0]
+    Lines are collected and passed to lines_callback once per read, rather than individually, so that a busy feed costs fewer calls per line.
+    """
+    __log = Logger()
     
-    if data_type == '!' or data_type == '=':  # Position Without Timestamp
-        facts.append(Messaging(data_type == '='))
-        return _parse_position_and_symbol(facts, errors, payload[1:])
+    def __init__(self, clock, login, lines_callback, status_callback):
+        self.callLater = clock.callLater  # overrides TimeoutMixin
+        self.__clock = clock
+        self.__login = login
+        self.__lines_callback = lines_callback
+        self.__status_callback = status_callback
+        self.__batch = []
+        self.__keepalive = None
     
-    if data_type == '/' or data_type == '@':  # Position With Timestamp
-        facts.append(Messaging(data_type == '@'))
-        match = re.match(r'^.(.{7})(.*)$', payload)
-        if not match:
-            errors.append('Position With Timestamp is too short')
-            return payload
-        else:
-            time_str, position_str = match.groups()
-            _parse_dhm_hms_timestamp(facts, errors, time_str, receive_time)
-            return _parse_position_and_symbol(facts, errors, position_str)
+    def connectionMade(self):
+        """overrides Protocol"""
+        self.setTimeout(_APRSIS_IDLE_TIMEOUT)
+        self.sendLine(self.__login)
+        self.__keepalive = LoopingCall(self.sendLine, b'#keepalive')
+        self.__keepalive.clock = self.__clock
+        self.__keepalive.start(_APRSIS_KEEPALIVE_INTERVAL, now=False)
+        self.__status_callback('Connected')
     
-    elif data_type == '<':  # Capabilities
-        facts.append(Capabilities(dict(map(_parse_capability, payload[1:].split(',')))))
-        return ''
+    def connectionLost(self, reason=None):
+        """overrides Protocol"""
+        self.setTimeout(None)
+        if self.__keepalive is not None and self.__keepalive.running:
+            self.__keepalive.stop()
+        self.__status_callback('Disconnected')
     
-    elif data_type == '>':  # Status
-        # TODO: parse timestamp
-        facts.append(Status(payload[1:]))
-        return ''
+    def dataReceived(self, data):
+        """overrides LineReceiver"""
+        self.resetTimeout()
+        LineReceiver.dataReceived(self, data)
+        if self.__batch:
+            batch = self.__batch
+            self.__batch = []
+            self.__lines_callback(batch)
+    
+    def lineReceived(self, line):
+        """overrides LineReceiver"""
+        if line.startswith(b'#'):
+            # Server comment: banner, keepalive, or login response.
+            if line.startswith(b'# logresp '):
+                self.__status_callback('Logged in: ' + line[len(b'# logresp '):].decode('utf-8', 'replace'))
+            return
+        if line:
+            self.__batch.append(line.decode('utf-8', 'replace'))
     
-    elif data_type == '`' or data_type == "'":  # Mic-E position
-        match = re.match(r'^.(.)(.)(.)(.)(.)(.)(..)(.*)$', payload)
-        if not match:
-            errors.append('Mic-E Information is too short')
-            return payload
-        elif len(destination) < 6:
-            errors.append('Mic-E Destination Address is too short')
-            return payload
+    def timeoutConnection(self):
+        """overrides TimeoutMixin"""
+        self.__log.warn('APRS-IS connection idle for {seconds} seconds; reconnecting', seconds=_APRSIS_IDLE_TIMEOUT)
+        self.transport.abortConnection()
+
+
+# The parsers below are written to handle a full APRS-IS feed: patterns are compiled once, the payload is dispatched on its data type identifier with a table rather than a chain of comparisons, and values which recur often (positions of fixed stations, symbols) are memoized.
+# shinysdr/test_manually/aprs_parser_benchmark.py measures the throughput.
+
+
+def _parse_payload(facts, errors, source, destination, payload, receive_time):
+    if len(payload) < 1:
+        errors.append('zero length information')
+        return payload
+    data_type = payload[0]
+    parser = _payload_parsers.get(data_type)
+    if parser is None:
+        errors.append('unrecognized data type: {}'.format(repr_no_string_tag(data_type)))
+        return payload
+    return parser(facts, errors, destination, payload, receive_time)
+
+
+def _parse_position_without_timestamp(facts, errors, destination, payload, receive_time):
+    facts.append(_MESSAGING_TRUE if payload[0] == '=' else _MESSAGING_FALSE)
+    return _parse_position_and_symbol(facts, errors, payload[1:])
+
+
+_POSITION_WITH_TIMESTAMP_RE = re.compile(r'^.(.{7})(.*)$')
+
+
+def _parse_position_with_timestamp(facts, errors, destination, payload, receive_time):
+    facts.append(_MESSAGING_TRUE if payload[0] == '@' else _MESSAGING_FALSE)
+    match = _POSITION_WITH_TIMESTAMP_RE.match(payload)
+    if not match:
+        errors.append('Position With Timestamp is too short')
+        return payload
+    else:
+        time_str, position_str = match.groups()
+        _parse_dhm_hms_timestamp(facts, errors, time_str, receive_time)
+        return _parse_position_and_symbol(facts, errors, position_str)
+
+
+def _parse_capabilities(facts, errors, destination, payload, receive_time):
+    facts.append(Capabilities(dict(map(_parse_capability, payload[1:].split(',')))))
+    return ''
+
+
+def _parse_status(facts, errors, destination, payload, receive_time):
+    # TODO: parse timestamp
+    facts.append(Status(payload[1:]))
+    return ''
+
+
+_MIC_E_RE = re.compile(r'^.(.)(.)(.)(.)(.)(.)(..)(.*)$')
+_MIC_E_TYPE_RE = re.compile(r"^([] >`'])(?:(...)\})?(.*)$")
+
+
+def _parse_mic_e(facts, errors, destination, payload, receive_time):
+    # pylint: disable=unused-variable
+    # (variables for information we're not yet using)
+    match = _MIC_E_RE.match(payload)
+    if not match:
+        errors.append('Mic-E Information is too short')
+        return payload
+    elif len(destination) < 6:
+        errors.append('Mic-E Destination Address is too short')
+        return payload
+    else:
+        # TODO: deal with ssid/7th byte
+        # This is a generic application of the decoding table: note that not all of the resulting values are meaningful (e.g. only ns_bits[3] is a north/south value).
+        lat_digits, message_bits, ns_bits, lon_offset_bits, ew_bits = zip(*[_mic_e_addr_decode_table[x] for x in destination[0:6]])
+        latitude_string = ''.join(lat_digits[0:4]) + '.' + ''.join(lat_digits[4:6]) + ns_bits[3]
+        latitude = _parse_angle(latitude_string)
+        longitude_offset = lon_offset_bits[4]
+        
+        # TODO: parse Mic-E "message"/"position comment" bits
+        
+        # TODO: interpret data type ID values (note spec revisions about it)
+        
+        d28, m28, h28, sp28, dc28, se28, symbol_rev, type_and_more = match.groups()
+        
+        # decode longitude, as specified in http://www.aprs.org/doc/APRS101.PDF page 48
+        lon_d = ord(d28) - 28 + longitude_offset
+        if 180 <= lon_d <= 189:
+            lon_d -= 80
+        elif 190 <= lon_d <= 199:
+            lon_d -= 190
+        lon_m = ord(m28) - 28
+        if lon_m >= 60:
+            lon_m -= 60
+        lon_s = ord(h28) - 28
+        longitude = ew_bits[5] * (lon_d + (lon_m + lon_s / 100) / 60)
+        # TODO: interpret position ambiguity from latitude
+        
+        if latitude is not None:
+            facts.append(Position(latitude, longitude))
         else:
-            # TODO: deal with ssid/7th byte
-            # This is a generic application of the decoding table: note that not all of the resulting values are meaningful (e.g. only ns_bits[3] is a north/south value).
-            lat_digits, message_bits, ns_bits, lon_offset_bits, ew_bits = zip(*[_mic_e_addr_decode_table[x] for x in destination[0:6]])
-            latitude_string = ''.join(lat_digits[0:4]) + '.' + ''.join(lat_digits[4:6]) + ns_bits[3]
-            latitude = _parse_angle(latitude_string)
-            longitude_offset = lon_offset_bits[4]
-            
-            # TODO: parse Mic-E "message"/"position comment" bits
-            
-            # TODO: interpret data type ID values (note spec revisions about it)
-            
-            d28, m28, h28, sp28, dc28, se28, symbol_rev, type_and_more = match.groups()
-            
-            # decode longitude, as specified in http://www.aprs.org/doc/APRS101.PDF page 48
-            lon_d = ord(d28) - 28 + longitude_offset
-            if 180 <= lon_d <= 189:
-                lon_d -= 80
-            elif 190 <= lon_d <= 199:
-                lon_d -= 190
-            lon_m = ord(m28) - 28
-            if lon_m >= 60:
-                lon_m -= 60
-            lon_s = ord(h28) - 28
-            longitude = ew_bits[5] * (lon_d + (lon_m + lon_s / 100) / 60)
-            # TODO: interpret position ambiguity from latitude
-            
-            if latitude is not None:
-                facts.append(Position(latitude, longitude))
-            else:
-                errors.append('Mic-E latitude does not parse: {}'.format(repr_no_string_tag(latitude_string)))
-            
-            # decode course and speed, as specified in http://www.aprs.org/doc/APRS101.PDF page 52
-            dc = ord(dc28) - 28
-            speed = (ord(sp28) - 28) * 10 + dc // 10
-            course = dc % 10 + (ord(se28) - 28)
-            if speed >= 800:
-                speed -= 800
-            if course >= 400:
-                course -= 400
-            facts.append(Velocity(speed_knots=speed, course_degrees=course))
-            
-            _parse_symbol(facts, errors, symbol_rev[1] + symbol_rev[0])
-            
-            # Type code per http://www.aprs.org/aprs12/mic-e-types.txt
-            # TODO: parse and process manufacturer codes
-            type_match = re.match(r"^([] >`'])(?:(...)\})?(.*)$", type_and_more)
-            if type_match is None:
-                errors.append('Mic-E contained non-type-code text: {}'.format(repr_no_string_tag(type_and_more)))
-                return type_and_more
-            else:
-                type_code, opt_altitude, more_text = type_match.groups()
-                # TODO: process type code
-                if opt_altitude is not None:
-                    facts.append(Altitude(value=_parse_base91(opt_altitude) - 10000, feet_not_meters=False))
-                return more_text  # or should this be a status fact?
-
-    elif data_type == ';':  # Object
-        match = re.match(r'^.(.{9})([*_])(.{7})(.*)$', payload)
-        if not match:
-            errors.append('Object Information did not parse')
-            return payload
+            errors.append('Mic-E latitude does not parse: {}'.format(repr_no_string_tag(latitude_string)))
+        
+        # decode course and speed, as specified in http://www.aprs.org/doc/APRS101.PDF page 52
+        dc = ord(dc28) - 28
+        speed = (ord(sp28) - 28) * 10 + dc // 10
+        course = dc % 10 + (ord(se28) - 28)
+        if speed >= 800:
+            speed -= 800
+        if course >= 400:
+            course -= 400
+        facts.append(Velocity(speed_knots=speed, course_degrees=course))
+        
+        _parse_symbol(facts, errors, symbol_rev[1] + symbol_rev[0])
+        
+        # Type code per http://www.aprs.org/aprs12/mic-e-types.txt
+        # TODO: parse and process manufacturer codes
+        type_match = _MIC_E_TYPE_RE.match(type_and_more)
+        if type_match is None:
+            errors.append('Mic-E contained non-type-code text: {}'.format(repr_no_string_tag(type_and_more)))
+            return type_and_more
         else:
-            name, live_str, time_str, position_ext_and_comment = match.groups()
-            obj_facts = []
-            
-            _parse_dhm_hms_timestamp(obj_facts, errors, time_str, receive_time)
-            comment = _parse_position_and_symbol(obj_facts, errors, position_ext_and_comment)
-            
-            facts.append(ObjectItemReport(
-                object=True,
-                name=name,
-                live=live_str == '*',
-                facts=obj_facts))
-            return comment
+            type_code, opt_altitude, more_text = type_match.groups()
+            # TODO: process type code
+            if opt_altitude is not None:
+                facts.append(Altitude(value=_parse_base91(opt_altitude) - 10000, feet_not_meters=False))
+            return more_text  # or should this be a status fact?
 
-    elif data_type == 'T':  # Telemetry (1.0.1 format)
-        # more lenient than spec because a real packet I saw had decimal points and variable field lengths
-        match = re.match(r'^T#([^,]*|MIC),?([^,]*),([^,]*),([^,]*),([^,]*),([^,]*),([01]{8})(.*)$', payload)
-        if not match:
-            errors.append('Telemetry did not parse: {}'.format(repr_no_string_tag(payload)))
-            return ''
-        else:
-            seq, a1, a2, a3, a4, a5, digital, comment = match.groups()
-            _parse_telemetry_value(facts, errors, a1, 1)
-            _parse_telemetry_value(facts, errors, a2, 2)
-            _parse_telemetry_value(facts, errors, a3, 3)
-            _parse_telemetry_value(facts, errors, a4, 4)
-            _parse_telemetry_value(facts, errors, a5, 5)
-            # TODO: handle seq # (how is it used in practice?) and digital
-            return comment
+
+_OBJECT_RE = re.compile(r'^.(.{9})([*_])(.{7})(.*)$')
+
+
+def _parse_object(facts, errors, destination, payload, receive_time):
+    match = _OBJECT_RE.match(payload)
+    if not match:
+        errors.append('Object Information did not parse')
+        return payload
+    else:
+        name, live_str, time_str, position_ext_and_comment = match.groups()
+        obj_facts = []
+        
+        _parse_dhm_hms_timestamp(obj_facts, errors, time_str, receive_time)
+        comment = _parse_position_and_symbol(obj_facts, errors, position_ext_and_comment)
         
+        facts.append(ObjectItemReport(
+            object=True,
+            name=name,
+            live=live_str == '*',
+            facts=obj_facts))
+        return comment
+
+
+# more lenient than spec because a real packet I saw had decimal points and variable field lengths
+_TELEMETRY_RE = re.compile(r'^T#([^,]*|MIC),?([^,]*),([^,]*),([^,]*),([^,]*),([^,]*),([01]{8})(.*)$')
+
+
+def _parse_telemetry(facts, errors, destination, payload, receive_time):
+    # pylint: disable=unused-variable
+    # (variables for information we're not yet using)
+    match = _TELEMETRY_RE.match(payload)
+    if not match:
+        errors.append('Telemetry did not parse: {}'.format(repr_no_string_tag(payload)))
+        return ''
     else:
-        errors.append('unrecognized data type: {}'.format(repr_no_string_tag(data_type)))
-        return payload
+        seq, a1, a2, a3, a4, a5, digital, comment = match.groups()
+        _parse_telemetry_value(facts, errors, a1, 1)
+        _parse_telemetry_value(facts, errors, a2, 2)
+        _parse_telemetry_value(facts, errors, a3, 3)
+        _parse_telemetry_value(facts, errors, a4, 4)
+        _parse_telemetry_value(facts, errors, a5, 5)
+        # TODO: handle seq # (how is it used in practice?) and digital
+        return comment
+
+
+_payload_parsers = {
+    '!': _parse_position_without_timestamp,  # Position Without Timestamp
+    '=': _parse_position_without_timestamp,
+    '/': _parse_position_with_timestamp,  # Position With Timestamp
+    '@': _parse_position_with_timestamp,
+    '<': _parse_capabilities,
+    '>': _parse_status,
+    '`': _parse_mic_e,  # Mic-E position
+    "'": _parse_mic_e,
+    ';': _parse_object,
+    'T': _parse_telemetry,  # Telemetry (1.0.1 format)
+}
+
+
+_MESSAGING_TRUE = Messaging(True)
+_MESSAGING_FALSE = Messaging(False)
 
 
 _mic_e_addr_decode_table = {
@@ -531,22 +804,38 @@ _mic_e_addr_decode_table = {
 }
 
 
+# Memoization caches, cleared when they reach _CACHE_SIZE entries so that they stay bounded.
+_CACHE_SIZE = 4096
+_symbol_cache = {}
+_angle_cache = {}
+_receive_datetime_cache = {}
+
+
 def _parse_symbol(facts, errors, symbol):
     # TODO: Interpret symbol string more
-    facts.append(Symbol(symbol))
+    fact = _symbol_cache.get(symbol)
+    if fact is None:
+        if len(_symbol_cache) >= _CACHE_SIZE:
+            _symbol_cache.clear()
+        fact = _symbol_cache[symbol] = Symbol(symbol)
+    facts.append(fact)
 
 
 def _parse_capability(capability):
-    match = re.match(r'^(.*?)=(.*)$', capability)
-    if match:
-        return match.groups()
+    key, equals, value = capability.partition('=')
+    if equals:
+        return key, value
     else:
         return capability, None
 
 
+_UNCOMPRESSED_POSITION_RE = re.compile(r'^(\d.{7})(.)(.{9})(.)(.*)$')
+_COMPRESSED_POSITION_RE = re.compile(r'^(.)(.{4})(.{4})(.)(.)(.)(.)(.*)$')
+
+
 def _parse_position_and_symbol(facts, errors, data):
     # Uncompressed position
-    match = re.match(r'^(\d.{7})(.)(.{9})(.)(.*)$', data)
+    match = _UNCOMPRESSED_POSITION_RE.match(data)
     if match:
         lat, symbol1, lon, symbol2, ext_and_comment = match.groups()
         plat = _parse_angle(lat)
@@ -561,7 +850,7 @@ def _parse_position_and_symbol(facts, errors, data):
              _parse_data_extension(facts, errors, ext_and_comment, symbol))
     
     # Compressed position
-    match = re.match(r'^(.)(.{4})(.{4})(.)(.)(.)(.)(.*)$', data)
+    match = _COMPRESSED_POSITION_RE.match(data)
     if match:
         symbol1, lat, lon, symbol2, c, s, comptype, comment = match.groups()
         plat = 90 - _parse_base91(lat) / 380926
@@ -594,6 +883,13 @@ def _parse_position_and_symbol(facts, errors, data):
     return data
 
 
+_COURSE_SPEED_RE = re.compile(r'^(\d\d\d)/(\d\d\d)(.*)$')
+_PHG_RE = re.compile(r'^PHG(\d)(\d)(\d)(\d)(.*)$')
+_RNG_RE = re.compile(r'^RNG(\d\d\d\d)(.*)$')
+_DFS_RE = re.compile(r'^DFS(\d)(\d)(\d)(\d)(.*)$')
+_AREA_RE = re.compile(r'^(\d)(\d\d)([/1]\d)(\d\d)(.*)$')
+
+
 def _parse_data_extension(facts, errors, data, symbol):
     # pylint: disable=unused-variable
     # (variables for information we're not yet using)
@@ -601,46 +897,52 @@ def _parse_data_extension(facts, errors, data, symbol):
     if len(data) < 7:
         return data
     
-    match = re.match(r'^(\d\d\d)/(\d\d\d)(.*)$', data)
-    if match and symbol != '\\l':  # not an area object, which is ambiguous
-        # TODO: Deal with wind direction case
-        course, speed, comment = match.groups()
-        facts.append(Velocity(speed_knots=int(speed), course_degrees=int(course)))
-        return comment
-    
-    match = re.match(r'^PHG(\d)(\d)(\d)(\d)(.*)$', data)
-    if match:
-        # TODO: Store this data
-        p, h, g, d, comment = match.groups()
-        errors.append('PHG parsing not implemented')
-        return comment
-    
-    match = re.match(r'^RNG(\d\d\d\d)(.*)$', data)
-    if match:
-        range_str, comment = match.groups()
-        facts.append(RadioRange(int(range_str)))
-        return comment
-    
-    match = re.match(r'^DFS(\d)(\d)(\d)(\d)(.*)$', data)
-    if match:
-        # TODO: Store this data
-        s, h, g, d, comment = match.groups()
-        errors.append('DFS parsing not implemented')
-        return comment
-    
-    match = re.match(r'^(\d)(\d\d)([/1]\d)(\d\d)(.*)$', data)
-    if match:
-        # TODO: Store this data
-        type_code, yy, color_code, xx, comment = match.groups()
-        errors.append('Area object not implemented')
-        # TODO: Parse line "corridor"
-        return comment
+    # Each extension is identified by its first character, so only the pattern which could match is tried.
+    first = data[0]
+    if first == 'P':
+        match = _PHG_RE.match(data)
+        if match:
+            # TODO: Store this data
+            p, h, g, d, comment = match.groups()
+            errors.append('PHG parsing not implemented')
+            return comment
+    elif first == 'R':
+        match = _RNG_RE.match(data)
+        if match:
+            range_str, comment = match.groups()
+            facts.append(RadioRange(int(range_str)))
+            return comment
+    elif first == 'D':
+        match = _DFS_RE.match(data)
+        if match:
+            # TODO: Store this data
+            s, h, g, d, comment = match.groups()
+            errors.append('DFS parsing not implemented')
+            return comment
+    else:
+        match = _COURSE_SPEED_RE.match(data)
+        if match and symbol != '\\l':  # not an area object, which is ambiguous
+            # TODO: Deal with wind direction case
+            course, speed, comment = match.groups()
+            facts.append(Velocity(speed_knots=int(speed), course_degrees=int(course)))
+            return comment
+        
+        match = _AREA_RE.match(data)
+        if match:
+            # TODO: Store this data
+            type_code, yy, color_code, xx, comment = match.groups()
+            errors.append('Area object not implemented')
+            # TODO: Parse line "corridor"
+            return comment
     
     return data
 
 
+_DHM_HMS_TIMESTAMP_RE = re.compile(r'^(\d\d)(\d\d)(\d\d)([zh/])$')
+
+
 def _parse_dhm_hms_timestamp(facts, errors, data, receive_time):
-    match = re.match(r'^(\d\d)(\d\d)(\d\d)([zh/])$', data)
+    match = _DHM_HMS_TIMESTAMP_RE.match(data)
     if not match:
         errors.append('DHM/HMS timestamp does not parse')
         return
@@ -654,11 +956,11 @@ def _parse_dhm_hms_timestamp(facts, errors, data, receive_time):
     # TODO: We should probably take larger-than-current day numbers as the previous month, and similar for hours just before midnight in 'h' format
     try:
         if kind == 'h':
-            absolute_time = datetime.utcfromtimestamp(receive_time).replace(hour=n1, minute=n2, second=n3)
+            absolute_time = _receive_datetime(receive_time, True).replace(hour=n1, minute=n2, second=n3)
         elif kind == 'z':
-            absolute_time = datetime.utcfromtimestamp(receive_time).replace(day=n1, hour=n2, minute=n3, second=0, microsecond=0)
+            absolute_time = _receive_datetime(receive_time, True).replace(day=n1, hour=n2, minute=n3, second=0, microsecond=0)
         else:  # kind == '/'
-            absolute_time = datetime.fromtimestamp(receive_time).replace(day=n1, hour=n2, minute=n3, second=0, microsecond=0)
+            absolute_time = _receive_datetime(receive_time, False).replace(day=n1, hour=n2, minute=n3, second=0, microsecond=0)
     except ValueError as e:
         errors.append('DHM/HMS timestamp invalid: {}'.format(e))
         return
@@ -666,12 +968,34 @@ def _parse_dhm_hms_timestamp(facts, errors, data, receive_time):
     facts.append(Timestamp(absolute_time))
 
 
+def _receive_datetime(receive_time, utc):
+    # Messages received together share a receive_time, so this avoids converting it for each one.
+    key = (receive_time, utc)
+    value = _receive_datetime_cache.get(key)
+    if value is None:
+        if len(_receive_datetime_cache) >= _CACHE_SIZE:
+            _receive_datetime_cache.clear()
+        if utc:
+            value = datetime.utcfromtimestamp(receive_time)
+        else:
+            value = datetime.fromtimestamp(receive_time)
+        _receive_datetime_cache[key] = value
+    return value
+
+
+_ANGLE_RE = re.compile(r'^(\d{1,3})([\d ]{2}\.[\d ]{2})([NESW])$')
+
+
 def _parse_angle(angle_str):
     # TODO return imprecision information
     # TODO old notes say "." is allowed as imprecision, check
-    match = re.match(r'^(\d{1,3})([\d ]{2}\.[\d ]{2})([NESW])$', angle_str)
+    try:
+        return _angle_cache[angle_str]
+    except KeyError:
+        pass
+    match = _ANGLE_RE.match(angle_str)
     if not match:
-        return None
+        value = None
     else:
         degrees, minutes, direction = match.groups()
         minutes = minutes.replace(' ', '0')
@@ -679,11 +1003,20 @@ def _parse_angle(angle_str):
             sign = -1
         else:
             sign = 1
-        return sign * (float(degrees) + float(minutes) / 60)
+        value = sign * (float(degrees) + float(minutes) / 60)
+    if len(_angle_cache) >= _CACHE_SIZE:
+        _angle_cache.clear()
+    _angle_cache[angle_str] = value
+    return value
+
+
+_COMMENT_ALTITUDE_RE = re.compile(r'/A=(\d{6})')
 
 
 def _parse_comment_altitude(facts, errors, comment):
-    match = re.search(r'/A=(\d{6})', comment)
+    if '/A=' not in comment:
+        return comment
+    match = _COMMENT_ALTITUDE_RE.search(comment)
     if match:
         facts.append(Altitude(value=int(match.group(1)), feet_not_meters=True))
         comment = comment[:match.start()] + comment[match.end():]
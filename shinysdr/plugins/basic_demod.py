@@ -30,7 +30,7 @@ from gnuradio import filter as grfilter  # don't shadow builtin
 from gnuradio.analog import fm_emph
 from gnuradio.filter import firdes
 
-from shinysdr.interfaces import BandShape, ModeDef, IDemodulator, IModulator, ITunableDemodulator
+from shinysdr.interfaces import BandShape, ModeDef, ICostEstimatingDemodulator, IDemodulator, IGatingDemodulator, IModulator, ITunableDemodulator
 from shinysdr.math import dB, to_dB
 from shinysdr.filters import MultistageChannelFilter, make_resampler, design_sawtooth_filter
 from shinysdr.i.pycompat import defaultstr
@@ -42,19 +42,28 @@ from shinysdr.values import ExportedState, exported_value, setter
 
 TWO_PI = pi * 2
 
+# Rough allowance for demodulation and audio processing after the channel filter, per sample at the demodulator rate.
+_DEMOD_COST_PER_SAMPLE = 50
+
 BASIC_MODE_SORT_PREFIX = ' '
 
 
+@implementer(IGatingDemodulator)
 class SquelchMixin(ExportedState):
-    """Provides simple RF-power squelch and a level meter.
+    """Provides simple RF-power squelch and a level meter, and IGatingDemodulator.
     
     To use, connect self.squelch_block in the pre-demodulation signal path.
+    
+    While output gaps are allowed, the squelch produces no samples at all while closed, instead of zeros, so that the rest of the demodulator does no work.
     """
     
+    __gate = False
+    
     def __init__(self, squelch_rate, squelch_threshold=-100):
         alpha = 80.0 / squelch_rate
         
-        self.__squelch = analog.simple_squelch_cc(squelch_threshold, alpha)
+        # With ramp=0 and gate=False, pwr_squelch_cc is equivalent to simple_squelch_cc.
+        self.__squelch = analog.pwr_squelch_cc(squelch_threshold, alpha, 0, False)
         self.__probe = analog.probe_avg_mag_sqrd_c(0, alpha=alpha)
         
         self.squelch_block = gr.hier_block2(
@@ -86,11 +95,20 @@ class SquelchMixin(ExportedState):
     @setter
     def set_squelch_threshold(self, level):
         self.__squelch.set_threshold(level)
+    
+    def set_output_gaps_allowed(self, allowed):
+        """Implement IGatingDemodulator."""
+        self.__gate = bool(allowed)
+        self.__squelch.set_gate(self.__gate)
+    
+    def get_output_gated(self):
+        """Implement IGatingDemodulator."""
+        return self.__gate and not self.__squelch.unmuted()
 
 
-@implementer(ITunableDemodulator)
+@implementer(ITunableDemodulator, ICostEstimatingDemodulator)
 class ChannelFilterMixin(object):
-    """Provides a MultistageChannelFilter block and matching implementations of get_band_shape and ITunableDemodulator.
+    """Provides a MultistageChannelFilter block and matching implementations of get_band_shape, ITunableDemodulator, and ICostEstimatingDemodulator.
     
     Does not make any connection automatically.
     """
@@ -102,6 +120,7 @@ class ChannelFilterMixin(object):
         assert cutoff_freq > 0
         assert transition_width > 0
         
+        self.__demod_rate = demod_rate
         self.channel_filter_block = MultistageChannelFilter(
             input_rate=input_rate,
             output_rate=demod_rate,
@@ -116,6 +135,10 @@ class ChannelFilterMixin(object):
     def set_rec_freq(self, freq):
         """Implements ITunableDemodulator."""
         self.channel_filter_block.set_center_freq(freq)
+    
+    def get_estimated_cost(self):
+        """Implements ICostEstimatingDemodulator."""
+        return self.channel_filter_block.get_estimated_cost() + self.__demod_rate * _DEMOD_COST_PER_SAMPLE
 
 
 @implementer(IDemodulator)
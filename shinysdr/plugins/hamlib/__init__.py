@@ -107,6 +107,21 @@ _vfos = EnumT({'VFOA': 'VFO A', 'VFOB': 'VFO B', 'VFOC': 'VFO C', 'currVFO': 'cu
 _passbands = RangeT([(0, 0)])
 
 
+# Values are polled at intervals which adapt to how often they change: a poll which finds the value changed resets its interval to the minimum, and one which finds it unchanged (or unsupported) lengthens it by _POLL_BACKOFF, up to the maximum. Fast polls are values likely to be changed by the rig's own controls.
+_POLL_FAST_INTERVALS = (0.2, 2.0)
+_POLL_SLOW_INTERVALS = (2.0, 10.0)
+_POLL_BACKOFF = 1.5
+
+# Received signal values (such as the S-meter and DCD) change by themselves rather than being set, so an unchanged value says nothing about the next poll; they are polled at this interval always, without backing off.
+_POLL_SIGNAL_INTERVALS = (0.2, 0.2)
+
+# Levels which are meters of the received or transmitted signal rather than settings.
+_SIGNAL_LEVELS = frozenset(['STRENGTH', 'RAWSTR', 'SWR', 'ALC', 'RFPOWER_METER', 'COMP_METER'])
+
+# At most this many polls are outstanding at once, so that a slow rig (or serial link) does not accumulate an ever-growing queue of commands; polls which are due while the limit is reached, or while the same poll is still outstanding, are skipped until the next opportunity.
+_MAX_POLLS_IN_FLIGHT = 4
+
+
 _cap_remap = {
     # TODO: Make this well-founded
     'Ant': ['Antenna'],
@@ -166,7 +181,7 @@ def _connect_to_daemon(reactor, host, port, server_name, proxy_ctor):
     connected = defer.Deferred()
     reactor.connectTCP(host, port, _HamlibClientFactory(server_name, connected))
     protocol = yield connected
-    proxy = proxy_ctor(protocol, _default_log)
+    proxy = proxy_ctor(protocol, _default_log, clock=reactor)
     yield proxy._ready_deferred  # wait for dump_caps round trip
     defer.returnValue(proxy)
 
@@ -289,11 +304,12 @@ class _HamlibProxy(ExportedState):
     Abstract class for objects which export state proxied to a hamlib daemon.
     """
     
-    def __init__(self, protocol, log):
+    def __init__(self, protocol, log, clock=None):
         # info from hamlib
         self.__cache = {}
         self.__caps = {}
         self.__levels = []
+        self.__transceive = False
         
         # invert command table
         # TODO: we only need to do this once per class, really
@@ -312,13 +328,23 @@ class _HamlibProxy(ExportedState):
         self.__disconnect_deferred = defer.Deferred()
         protocol._set_proxy(self)
 
-        # TODO: If hamlib backend supports "transceive mode", use it in lieu of polling
-        self.__poller_slow = LoopingCall(self.__poll_slow)
-        self.__poller_fast = LoopingCall(self.__poll_fast)
-        self.__poller_slow.start(2.0)
-        self.__poller_fast.start(0.2)
+        # polling state; levels are added once dump_caps tells us what they are
+        self.__polls = {}  # (command, argument) to _Poll
+        self.__polls_in_flight = 0
+        for command in self._polls_fast:
+            self.__add_poll(command, '', _POLL_FAST_INTERVALS)
+        for command in self._polls_slow:
+            self.__add_poll(command, '', _POLL_SLOW_INTERVALS)
+        for command in self._polls_signal:
+            self.__add_poll(command, '', _POLL_SIGNAL_INTERVALS)
+        
+        self.__poller = LoopingCall(self.__poll)
+        if clock is not None:
+            self.__poller.clock = clock
+        self.__poller.start(_POLL_FAST_INTERVALS[0])
         
         self._ready_deferred = protocol.rc_send('dump_caps')
+        self._ready_deferred.addCallback(self.__enable_transceive)
     
     def sync(self):
         # TODO: Replace 'sync' with more specifically meaningful operations
@@ -355,7 +381,10 @@ class _HamlibProxy(ExportedState):
                         match = re.match(r'^(\w+)\([^()]+\)$', info)
                         # part in parens is probably min/max/step info, but we don't have any working examples to test against (they are all 0)
                         if match:
-                            self.__levels.append(match.group(1))
+                            level_name = match.group(1)
+                            self.__levels.append(level_name)
+                            self.__add_poll('get_level', level_name,
+                                _POLL_SIGNAL_INTERVALS if level_name in _SIGNAL_LEVELS else _POLL_FAST_INTERVALS)
                         else:
                             self.__log.error('Unrecognized level description from %s: %r' % (self._server_name, info))  # TODO use logger formatting
             
@@ -367,12 +396,17 @@ class _HamlibProxy(ExportedState):
             else:
                 write(key)
         else:
-            self.__update_cache_and_cells(key, value)
+            if self.__update_cache_and_cells(key, value):
+                self.__poll_found_change(command, '')
     
     def _clientReceivedLevel(self, level_name, value_str):
-        self.__update_cache_and_cells(level_name + ' level', value_str)
+        if self.__update_cache_and_cells(level_name + ' level', value_str):
+            self.__poll_found_change('get_level', level_name)
     
     def _clientError(self, cmd, error_number):
+        if cmd == 'set_trn':
+            # transceive mode is optional, and not supported by all Hamlib versions
+            return
         if cmd.startswith('get_'):
             # these getter failures are boring, probably us polling something not implemented
             if error_number == RIG_ENIMPL or error_number == RIG_ENTARGET or error_number == RIG_BUSERROR:
@@ -384,13 +418,15 @@ class _HamlibProxy(ExportedState):
         self.state_changed('errors')
     
     def __update_cache_and_cells(self, key, value):
+        """Returns whether the value changed."""
+        changed = self.__cache.get(key) != value
         self.__cache[key] = value
         if key in self._cell_updaters:
             self._cell_updaters[key](value)
+        return changed
     
     def _clientConnectionLost(self, reason):
-        self.__poller_slow.stop()
-        self.__poller_fast.stop()
+        self.__poller.stop()
         self.__disconnect_deferred.callback(None)
     
     def _ehs_set(self, name_full, value):
@@ -402,6 +438,11 @@ class _HamlibProxy(ExportedState):
             self.__protocol.rc_send(
                 'set_' + name_in_cmd,
                 ' '.join(self.__cache[arg_name] for arg_name in self._commands[name_in_cmd]))
+            # read back promptly, in case the rig did something other than what we asked
+            poll = self.__polls.get(('get_' + name_in_cmd, ''))
+            if poll is not None:
+                poll.interval = poll.min_interval
+                poll.next_time = 0
     
     def state_def(self):
         for d in super(_HamlibProxy, self).state_def():
@@ -419,17 +460,51 @@ class _HamlibProxy(ExportedState):
             # TODO support writable levels
             yield _install_cell(self, level_name + ' level', True, False, self.__caps)
 
-    def __poll_fast(self):
-        # TODO: Stop if we're getting behind
-        p = self.__protocol
-        self.poll_fast(p.rc_send)
-        for level_name in self.__levels:
-            p.rc_send('get_level', level_name)
+    def __enable_transceive(self, value):
+        # If the rig reports changes on its own ("transceive"), ask the backend to listen for them, so that it can track the rig's state without polling the rig for every command we send it. rigctld does not pass the reports on to us, so we still poll rigctld.
+        if self.__caps.get('Transceive') == 'RIG':
+            self.__protocol.rc_send('set_trn', 'RIG').addCallback(self.__transceive_result)
+        return value
+    
+    def __transceive_result(self, return_code):
+        self.__transceive = return_code == RIG_OK
+        self.state_changed('transceive')
+    
+    @exported_value(type=bool, changes='explicit', label='Transceive')
+    def get_transceive(self):
+        """Whether the backend is listening for changes reported by the rig."""
+        return self.__transceive
+    
+    def __add_poll(self, command, arg, intervals):
+        self.__polls[(command, arg)] = _Poll(command, arg, *intervals)
+    
+    def __poll(self):
+        now = self.__poller.clock.seconds()
+        due = [poll for poll in six.itervalues(self.__polls)
+            if not poll.in_flight and poll.next_time <= now]
+        due.sort(key=lambda poll: poll.next_time)  # most overdue first
+        for poll in due:
+            if self.__polls_in_flight >= _MAX_POLLS_IN_FLIGHT:
+                break
+            poll.in_flight = True
+            poll.changed = False
+            self.__polls_in_flight += 1
+            self.__protocol.rc_send(poll.command, poll.arg).addBoth(self.__poll_finished, poll)
+    
+    def __poll_finished(self, value, poll):
+        self.__polls_in_flight -= 1
+        poll.in_flight = False
+        if poll.changed:
+            poll.interval = poll.min_interval
+        else:
+            poll.interval = min(poll.interval * _POLL_BACKOFF, poll.max_interval)
+        poll.next_time = self.__poller.clock.seconds() + poll.interval
+        return value
     
-    def __poll_slow(self):
-        # TODO: Stop if we're getting behind
-        p = self.__protocol
-        self.poll_slow(p.rc_send)
+    def __poll_found_change(self, command, arg):
+        poll = self.__polls.get((command, arg))
+        if poll is not None:
+            poll.changed = True
     
     @exported_value(type=NoticeT(always_visible=False), changes='explicit')
     def get_errors(self):
@@ -441,12 +516,19 @@ class _HamlibProxy(ExportedState):
                 return u'%s: %s' % (cmd, error_number)
             else:
                 return u''
-    
-    def poll_fast(self, send):
-        raise NotImplementedError()
-    
-    def poll_slow(self, send):
-        raise NotImplementedError()
+
+
+class _Poll(object):
+    """Scheduling state of one polled command."""
+    def __init__(self, command, arg, min_interval, max_interval):
+        self.command = command
+        self.arg = arg
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = min_interval
+        self.next_time = 0  # due immediately
+        self.in_flight = False
+        self.changed = False  # whether the response to the outstanding poll showed a change
 
 
 def _install_cell(self, name, is_level, writable, caps):
@@ -554,27 +636,31 @@ class _HamlibRig(_HamlibProxy):
         'powerstat': ['Power Stat'],
     }
     
-    def poll_fast(self, send):
+    _polls_fast = [
         # likely to be set by hw controls
-        send('get_freq')
-        send('get_mode')
-        
+        'get_freq',
+        'get_mode',
+    ]
+    
+    _polls_signal = [
         # received signal info
-        send('get_dcd')
-    
-    def poll_slow(self, send):
-        send('get_vfo')
-        send('get_rit')
-        send('get_xit')
-        send('get_ptt')
-        send('get_rptr_shift')
-        send('get_rptr_offs')
-        send('get_ctcss_tone')
-        send('get_dcs_code')
-        send('get_split_freq')
-        send('get_split_mode')
-        send('get_split_vfo')
-        send('get_ts')
+        'get_dcd',
+    ]
+    
+    _polls_slow = [
+        'get_vfo',
+        'get_rit',
+        'get_xit',
+        'get_ptt',
+        'get_rptr_shift',
+        'get_rptr_offs',
+        'get_ctcss_tone',
+        'get_dcs_code',
+        'get_split_freq',
+        'get_split_mode',
+        'get_split_vfo',
+        'get_ts',
+    ]
 
 
 @implementer(IRotator)
@@ -598,11 +684,9 @@ class _HamlibRotator(_HamlibProxy):
         'pos': ['Azimuth', 'Elevation'],
     }
     
-    def poll_fast(self, send):
-        send('get_pos')
-    
-    def poll_slow(self, send):
-        pass
+    _polls_fast = ['get_pos']
+    _polls_slow = []
+    _polls_signal = []
 
 
 class _HamlibClientFactory(ClientFactory):
@@ -665,6 +749,7 @@ class _HamlibClientProtocol(Protocol):
                 for i, (wait_cmd, wait_deferred) in enumerate(waiting):
                     if self.__receive_cmd != wait_cmd:
                         self.__log.error("%s client: Didn't get a response for command %r before receiving one for command %r" % (self.__server_name, wait_cmd, self.__receive_cmd))  # TODO use logger formatting
+                        wait_deferred.callback(None)  # no response is coming; don't leave the sender waiting forever
                     else:
                         # TODO: Consider 'parsing' return code more here.
                         if return_code != 0:
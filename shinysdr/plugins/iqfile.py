@@ -0,0 +1,271 @@
+# Copyright 2019 Kevin Reid and the ShinySDR contributors
+#
+# This file is part of ShinySDR.
+#
+# ShinySDR is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ShinySDR is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ShinySDR.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Device which plays back recorded IQ from a file.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import os.path
+import struct
+import time
+
+from zope.interface import implementer  # available via Twisted
+
+from gnuradio import blocks
+from gnuradio import gr
+import numpy
+
+from shinysdr.devices import Device, IRXDriver
+from shinysdr.i.pycompat import defaultstr
+from shinysdr.signals import SignalType
+from shinysdr.types import RangeT
+from shinysdr import units
+from shinysdr.values import ExportedState, LooseCell, exported_value, setter
+
+
+__all__ = []  # appended later
+
+
+# Sample formats: numpy dtype of one I or Q component, and the (offset, scale) mapping it to -1..1.
+_FORMATS = {
+    'cf32': (numpy.dtype('<f4'), 0.0, 1.0),
+    'cs16': (numpy.dtype('<i2'), 0.0, 1 / 32768),
+    'cu8': (numpy.dtype('u1'), -127.5, 1 / 127.5),
+}
+
+# Throttle rate used for "unthrottled"; changing the rate of the existing throttle block avoids reconnecting.
+_UNTHROTTLED_RATE = 1e12
+
+_THROUGHPUT_INTERVAL = 0.5  # seconds
+
+
+def IQFileDevice(
+        filename,
+        sample_rate=None,
+        format=None,  # pylint: disable=redefined-builtin
+        freq=0.0,
+        throttle=True,
+        loop=True,
+        name=None):
+    """
+    See documentation in shinysdr/i/webstatic/manual/configuration.html.
+    """
+    filename = str(filename)
+    if name is None:
+        name = os.path.basename(filename)
+    if format is None:
+        format = os.path.splitext(filename)[1].lstrip('.').lower()
+    if format == 'wav':
+        format, wav_sample_rate, offset, length = _read_wav_header(filename)
+        if sample_rate is None:
+            sample_rate = wav_sample_rate
+    elif format in _FORMATS:
+        offset = 0
+        length = None
+        if sample_rate is None:
+            raise ValueError('IQFileDevice: sample_rate must be specified for {0} files'.format(format))
+    else:
+        raise ValueError('IQFileDevice: unknown format {0!r}; use one of cf32, cs16, cu8, wav'.format(format))
+
+    source = _IQFileSource(filename, format, offset, length, loop=loop)
+    rx_driver = _IQFileRXDriver(name, source, float(sample_rate), throttle=throttle)
+    return Device(
+        name=name,
+        vfo_cell=LooseCell(
+            value=freq,
+            type=RangeT([(freq, freq)]),
+            writable=True,
+            persists=False),
+        rx_driver=rx_driver)
+
+
+__all__.append('IQFileDevice')
+
+
+def _read_wav_header(filename):
+    """Return (format, sample_rate, data_offset, data_length) for a 2-channel (I and Q) WAV file."""
+    with open(filename, 'rb') as f:
+        riff, _, wave = struct.unpack('<4sI4s', f.read(12))
+        if riff != b'RIFF' or wave != b'WAVE':
+            raise ValueError('IQFileDevice: {0!r} is not a WAV file'.format(filename))
+        fmt = None
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                raise ValueError('IQFileDevice: {0!r} has no data chunk'.format(filename))
+            chunk_id, chunk_size = struct.unpack('<4sI', header)
+            if chunk_id == b'fmt ':
+                fmt = f.read(chunk_size)
+                if chunk_size % 2:
+                    f.read(1)
+            elif chunk_id == b'data':
+                offset = f.tell()
+                break
+            else:
+                f.seek(chunk_size + chunk_size % 2, 1)
+    if fmt is None:
+        raise ValueError('IQFileDevice: {0!r} has no fmt chunk'.format(filename))
+    format_tag, channels, sample_rate, _, _, bits = struct.unpack('<HHIIHH', fmt[:16])
+    if format_tag == 0xFFFE and len(fmt) >= 26:
+        # WAVE_FORMAT_EXTENSIBLE; the real format tag is the start of the subformat GUID.
+        format_tag, = struct.unpack('<H', fmt[24:26])
+    if channels != 2:
+        raise ValueError('IQFileDevice: {0!r} has {1} channels; IQ WAV files must have 2'.format(filename, channels))
+    format = {(1, 8): 'cu8', (1, 16): 'cs16', (3, 32): 'cf32'}.get((format_tag, bits))
+    if format is None:
+        raise ValueError('IQFileDevice: {0!r} has unsupported sample format {1} with {2} bits'.format(filename, format_tag, bits))
+    length = os.path.getsize(filename) - offset
+    if 0 < chunk_size < length:  # streaming writers may leave the size as 0 or 2**32-1
+        length = chunk_size
+    return format, sample_rate, offset, length
+
+
+class _IQFileSource(gr.sync_block):
+    """Reads samples from a memory-mapped file, converting them to complex float."""
+    def __init__(self, filename, format, offset, length, loop):  # pylint: disable=redefined-builtin
+        gr.sync_block.__init__(
+            self,
+            name=type(self).__name__,
+            in_sig=[],
+            out_sig=[numpy.complex64])
+        dtype, self.__offset, self.__scale = _FORMATS[format]
+        if length is None:
+            length = os.path.getsize(filename) - offset
+        count = length // (2 * dtype.itemsize)
+        if count <= 0:
+            raise ValueError('IQFileDevice: {0!r} contains no samples'.format(filename))
+        self.__data = numpy.memmap(filename, dtype=dtype, mode='r', offset=offset, shape=(count, 2))
+        self.__length = count
+        self.__is_float = format == 'cf32'
+        self.__loop = loop
+        self.__position = 0
+
+        self.__throughput = 0.0
+        self.__throughput_time = time.time()
+        self.__throughput_count = 0
+
+    def get_length(self):
+        return self.__length
+
+    def get_position(self):
+        return self.__position
+
+    def get_throughput(self):
+        return self.__throughput
+
+    def close(self):
+        # Called from the reactor thread, so work() may still run afterward.
+        self.__data = None
+
+    def work(self, input_items, output_items):
+        out = output_items[0]
+        data = self.__data
+        if data is None:
+            return -1  # WORK_DONE; closed
+        length = len(data)
+        produced = 0
+        while produced < len(out):
+            if self.__position >= length:
+                if not self.__loop:
+                    break
+                self.__position = 0
+            count = min(len(out) - produced, length - self.__position)
+            chunk = data[self.__position:self.__position + count]
+            if self.__is_float:
+                out[produced:produced + count] = chunk.view(numpy.complex64)[:, 0]
+            else:
+                block = out[produced:produced + count]
+                block.real = (chunk[:, 0] + self.__offset) * self.__scale
+                block.imag = (chunk[:, 1] + self.__offset) * self.__scale
+            produced += count
+            self.__position += count
+        if produced == 0:
+            return -1  # WORK_DONE; end of file and not looping
+
+        self.__throughput_count += produced
+        now = time.time()
+        if now - self.__throughput_time >= _THROUGHPUT_INTERVAL:
+            self.__throughput = self.__throughput_count / (now - self.__throughput_time)
+            self.__throughput_time = now
+            self.__throughput_count = 0
+        return produced
+
+
+@implementer(IRXDriver)
+class _IQFileRXDriver(ExportedState, gr.hier_block2):
+    def __init__(self, name, source, sample_rate, throttle):
+        gr.hier_block2.__init__(
+            self, defaultstr(type(self).__name__ + ' ' + name),
+            gr.io_signature(0, 0, 0),
+            gr.io_signature(1, 1, gr.sizeof_gr_complex * 1),
+        )
+        self.__source = source
+        self.__sample_rate = sample_rate
+        self.__throttle = bool(throttle)
+        self.__throttle_block = blocks.throttle(gr.sizeof_gr_complex, self.__throttle_rate())
+        self.connect(source, self.__throttle_block, self)
+
+        self.__signal_type = SignalType(
+            kind='IQ',
+            sample_rate=sample_rate)
+        self.__usable_bandwidth = RangeT([(-sample_rate / 2, sample_rate / 2)])
+
+    def __throttle_rate(self):
+        return self.__sample_rate if self.__throttle else _UNTHROTTLED_RATE
+
+    @exported_value(type=bool, changes='this_setter', label='Real time')
+    def get_throttle(self):
+        return self.__throttle
+
+    @setter
+    def set_throttle(self, value):
+        self.__throttle = bool(value)
+        self.__throttle_block.set_sample_rate(self.__throttle_rate())
+
+    @exported_value(type=RangeT([(0, 1e12)], unit=units.Hz, strict=False), changes='continuous', label='Samples/s')
+    def get_throughput(self):
+        """Rate at which the rest of the flow graph is taking samples from the file."""
+        return self.__source.get_throughput()
+
+    @exported_value(type=RangeT([(0, 1)], strict=False), changes='continuous', label='Position')
+    def get_position(self):
+        """Fraction of the file played."""
+        return self.__source.get_position() / self.__source.get_length()
+
+    # implement IRXDriver
+    @exported_value(type=SignalType, changes='never')
+    def get_output_type(self):
+        return self.__signal_type
+
+    # implement IRXDriver
+    def get_tune_delay(self):
+        return 0.0
+
+    # implement IRXDriver
+    def get_usable_bandwidth(self):
+        return self.__usable_bandwidth
+
+    # implement IRXDriver
+    def close(self):
+        self.__source.close()
+
+    # implement IRXDriver
+    def notify_reconnecting_or_restarting(self):
+        # Same throttle clock kludge as in shinysdr.plugins.simulate.
+        self.__throttle_block.set_sample_rate(self.__throttle_block.sample_rate())
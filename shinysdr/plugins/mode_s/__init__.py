@@ -21,7 +21,9 @@
 
 from __future__ import absolute_import, division, print_function, unicode_literals
 
+from collections import OrderedDict
 import os.path
+import threading
 import time
 import traceback
 
@@ -32,7 +34,6 @@ from twisted.web import static
 from zope.interface import Interface, implementer
 
 from gnuradio import gr
-from gnuradio import gru
 
 try:
     import air_modes
@@ -41,8 +42,9 @@ except ImportError as e:
     _unavailability = six.text_type(e)
 
 from shinysdr.filters import MultistageChannelFilter
-from shinysdr.interfaces import BandShape, ClientResourceDef, IDemodulator, ModeDef
+from shinysdr.interfaces import BandShape, ClientResourceDef, ICostEstimatingDemodulator, IDemodulator, ModeDef
 from shinysdr.math import LazyRateCalculator
+from shinysdr.plugins.mode_s.cpr import CPRDecoder, CPRNoPositionError
 from shinysdr.signals import no_signal
 from shinysdr.telemetry import ITelemetryMessage, ITelemetryObject, TelemetryItem, Track, empty_track
 from shinysdr.types import EnumRow, RangeT, TimestampT
@@ -61,7 +63,7 @@ _INCH_PER_FOOT = 12
 _METERS_PER_FEET = (_CM_PER_INCH * _INCH_PER_FOOT) / 100
 
 
-@implementer(IDemodulator)
+@implementer(IDemodulator, ICostEstimatingDemodulator)
 class ModeSDemodulator(gr.hier_block2, ExportedState):
     def __init__(self, mode='MODE-S', input_rate=0, context=None):
         assert input_rate > 0
@@ -72,8 +74,9 @@ class ModeSDemodulator(gr.hier_block2, ExportedState):
         
         demod_rate = 2000000
         transition_width = 500000
+        self.__demod_rate = demod_rate
         
-        hex_msg_queue = gr.msg_queue(100)
+        hex_msg_queue = gr.msg_queue(_MESSAGE_QUEUE_LIMIT)
         
         self.__band_filter = MultistageChannelFilter(
             input_rate=input_rate,
@@ -95,32 +98,21 @@ class ModeSDemodulator(gr.hier_block2, ExportedState):
         self.__message_rate_calc = LazyRateCalculator(lambda: self.__messages_seen, min_interval=2)
         
         # Parsing
-        # TODO: These bits are mimicking gr-air-modes toplevel code. Figure out if we can have less glue.
-        # Note: gr pubsub is synchronous -- subscribers are called on the publisher's thread
-        parser_output = gr.pubsub.pubsub()
-        parser = air_modes.make_parser(parser_output)
-        cpr_decoder = air_modes.cpr_decoder(my_location=None)  # TODO: get position info from device
-        air_modes.output_print(cpr_decoder, parser_output)
+        # Messages are parsed on the reader's thread and delivered to the reactor in batches, grouped by aircraft, so that each aircraft's state changes at most once per batch.
+        cpr_decoder = CPRDecoder()
         
-        def msq_runner_callback(msg):  # called on msgq_runner's thread
-            # pylint: disable=broad-except
-            try:
-                reactor.callFromThread(parser, msg.to_string())
-            except Exception:
-                print(traceback.format_exc())
-        
-        self.__msgq_runner = gru.msgq_runner(hex_msg_queue, msq_runner_callback)
-        
-        def parsed_callback(msg):
-            timestamp = time.time()
-            self.__messages_seen += 1
-            context.output_message(ModeSMessageWrapper(msg, cpr_decoder, timestamp))
+        def deliver(groups):  # called on the reactor thread
+            receive_time = time.time()
+            # The receiver may have been switched to another device, so check the location every time.
+            cpr_decoder.set_location(context.get_device_position())
+            for object_id, messages in groups:
+                self.__messages_seen += len(messages)
+                context.output_message(ModeSMessageWrapper(object_id, messages, cpr_decoder, receive_time))
         
-        for i in six.moves.range(0, 2 ** 5):
-            parser_output.subscribe('type%i_dl' % i, parsed_callback)
+        self.__reader = _MessageQueueReader(hex_msg_queue, reactor, deliver)
 
     def __del__(self):
-        self.__msgq_runner.stop()
+        self.__reader.stop()
     
     @exported_value(type=RangeT([(0, 30)], unit=units.dB), changes='this_setter', label='Decode threshold')
     def get_decode_threshold(self):
@@ -140,24 +132,118 @@ class ModeSDemodulator(gr.hier_block2, ExportedState):
     @exported_value(type=BandShape, changes='never')
     def get_band_shape(self):
         return self.__band_filter.get_shape()
+    
+    def get_estimated_cost(self):
+        """Implements ICostEstimatingDemodulator."""
+        return self.__band_filter.get_estimated_cost() + self.__demod_rate * _DEMOD_COST_PER_SAMPLE
+
+
+# Rough allowance for air_modes.rx_path (magnitude, preamble detection, and slicing), per sample at the demodulator rate.
+_DEMOD_COST_PER_SAMPLE = 20
+
+# Large enough to hold the messages arriving during _DELIVERY_INTERVAL at a busy site, since the demodulator blocks when the queue is full.
+_MESSAGE_QUEUE_LIMIT = 10000
+
+# Minimum time between deliveries of messages to the reactor.
+_DELIVERY_INTERVAL = 0.1
+
+
+class _MessageQueueReader(object):
+    """
+    Takes hex messages from the air_modes demodulator's queue on its own thread, parses them, and passes them to deliver on the reactor thread, as a list of (object ID, messages) with each aircraft's messages in the order received.
+    """
+    def __init__(self, queue, reactor, deliver):
+        self.__queue = queue
+        self.__reactor = reactor
+        self.__deliver = deliver
+        self.__parsed = _ParsedMessageCollector()
+        self.__parser = air_modes.make_parser(self.__parsed)
+        self.__stopping = False
+        thread = threading.Thread(target=self.__run, name='Mode S message reader')
+        thread.daemon = True
+        thread.start()
+    
+    def stop(self):
+        self.__stopping = True
+        self.__queue.insert_tail(gr.message())  # wake up the thread if it is waiting
+    
+    def __run(self):
+        queue = self.__queue
+        last_delivery_time = 0
+        while True:
+            hex_messages = [queue.delete_head().to_string()]
+            delay = last_delivery_time + _DELIVERY_INTERVAL - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            while not queue.empty_p():
+                hex_messages.append(queue.delete_head_nowait().to_string())
+            if self.__stopping:
+                return
+            groups = self.__parse(hex_messages)
+            last_delivery_time = time.time()
+            if groups:
+                self.__reactor.callFromThread(self.__deliver, groups)
+    
+    def __parse(self, hex_messages):
+        # pylint: disable=broad-except
+        for hex_message in hex_messages:
+            if not hex_message:
+                continue  # from stop()
+            try:
+                self.__parser(hex_message)
+            except Exception:
+                print(traceback.format_exc())
+        return _group_by_aircraft(self.__parsed.take())
+
+
+class _ParsedMessageCollector(object):
+    """Stands in for the gr.pubsub object air_modes.make_parser publishes to, since all we want is a list of every message type."""
+    def __init__(self):
+        self.__messages = []
+    
+    def publish(self, topic, message):
+        # Each message is published under its type (which is what we used to subscribe to) and possibly also a catch-all topic; take only the former so it is not seen twice.
+        if topic.startswith('type'):
+            self.__messages.append(message)
+    
+    __setitem__ = publish  # gr.pubsub supports both
+    
+    def take(self):
+        messages = self.__messages
+        self.__messages = []
+        return messages
+
+
+def _group_by_aircraft(messages):
+    """Return a list of (object ID, messages), in order of each aircraft's first message."""
+    groups = OrderedDict()
+    for message in messages:
+        groups.setdefault(_get_object_id(message), []).append(message)
+    return list(groups.items())
+
+
+def _get_object_id(message):
+    # Unfortunately, gr-air-modes doesn't provide a function to implement this gunk -- imitating output_print.catch_nohandler
+    data = message.data
+    if "aa" in data.fields:
+        address_int = data["aa"]
+    else:
+        address_int = message.ecc
+    
+    return '%.6x' % (address_int,)
 
 
 @implementer(ITelemetryMessage)
 class ModeSMessageWrapper(object):
-    def __init__(self, message, cpr_decoder, receive_time):
-        self.message = message  # a gr-air-modes message
+    """One or more consecutive gr-air-modes messages about one aircraft."""
+    def __init__(self, object_id, messages, cpr_decoder, receive_time):
+        self.object_id = object_id
+        self.messages = messages  # list of gr-air-modes messages
         self.cpr_decoder = cpr_decoder
         self.receive_time = float(receive_time)
     
     def get_object_id(self):
-        # Unfortunately, gr-air-modes doesn't provide a function to implement this gunk -- imitating output_print.catch_nohandler
-        data = self.message.data
-        if "aa" in data.fields:
-            address_int = data["aa"]
-        else:
-            address_int = self.message.ecc
-        
-        return '%.6x' % (address_int,)
+        return self.object_id
     
     def get_object_constructor(self):
         return Aircraft
@@ -180,10 +266,18 @@ class Aircraft(ExportedState):
     
     # not exported
     def receive(self, message_wrapper):
-        message = message_wrapper.message
         cpr_decoder = message_wrapper.cpr_decoder
         receive_time = message_wrapper.receive_time
         self.__last_heard_time = receive_time
+        for message in message_wrapper.messages:
+            try:
+                self.__receive_one(message, cpr_decoder, receive_time)
+            except (air_modes.ADSBError, CPRNoPositionError):
+                # The message does not contain what we expected, or is a position which cannot be decoded yet. Only this message is lost, as it was before messages were batched.
+                pass
+        self.state_changed()
+    
+    def __receive_one(self, message, cpr_decoder, receive_time):
         # Unfortunately, gr-air-modes doesn't provide a function to implement this gunk -- imitating its output_flightgear code which
         data = message.data
         t = data.get_type()
@@ -247,7 +341,6 @@ class Aircraft(ExportedState):
         else:
             # TODO report
             pass
-        self.state_changed()
     
     def is_interesting(self):
         """
@@ -0,0 +1,264 @@
+# Copyright 2019 Kevin Reid and the ShinySDR contributors
+#
+# This file is part of ShinySDR.
+#
+# ShinySDR is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ShinySDR is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ShinySDR.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Decoding of the Compact Position Reporting (CPR) positions in ADS-B airborne and surface position messages.
+
+CPRDecoder has the same interface as air_modes.cpr_decoder, so it can be passed to air_modes.parseBDS05 and parseBDS06. Unlike that decoder, it decodes relative to a known reference position whenever it has one, so that most messages produce a position by themselves instead of needing an even/odd pair:
+
+1. If a message of the other format was received recently, by the global (pair) decoding, which is unambiguous. If the aircraft's own position is also known, the two decodings are cross-checked.
+2. If the aircraft's own position is recently known from the above, relative to that.
+3. If the receiver's location is known, relative to that, if the result is not so far away that it might be an alias of a position more than half a zone away. Such a position is provisional: it is not used as a reference for later messages, and is replaced as soon as a pair is received.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from bisect import bisect_right
+from collections import OrderedDict
+import math
+import time
+
+
+__all__ = []  # appended later
+
+
+_NZ = 15  # number of latitude zones between the equator and a pole
+_CPR_SCALE = 2 ** 17
+
+# Maximum time between the even and odd messages used for global decoding; a fast aircraft can cross into another zone within a longer interval.
+_MAX_PAIR_AGE = 10  # seconds
+
+# Maximum age of an aircraft's last position for it to be used as the reference for local decoding. Local decoding is correct if the aircraft is within half a zone (180 NM airborne, 45 NM on the surface) of the reference, which neither an aircraft nor a surface vehicle can move in this time.
+_MAX_REFERENCE_AGE = 60  # seconds
+
+# Maximum range of a position decoded relative to the receiver's location. A local decoding always lands within half a zone of the reference, so an aircraft beyond that is decoded to a wrong position nearer the receiver; positions near the half-zone limit are the likeliest to be such aliases, and are rejected.
+_MAX_RECEIVER_RELATIVE_RANGE_KM = 150 * 1.852  # airborne; half a zone is 180 NM
+_MAX_RECEIVER_RELATIVE_RANGE_KM_SURFACE = 35 * 1.852  # half a zone is 45 NM
+
+# Global and local decodings of the same message should agree to within rounding; if they differ by more, one of the messages involved was wrong.
+_CROSS_CHECK_KM = 1.0
+
+# Per-aircraft state is dropped when the aircraft has not sent a position message in this long, or when the table reaches its maximum size, least recently heard first.
+_STATE_LIFETIME = 60  # seconds
+_MAX_AIRCRAFT = 2000
+
+_EARTH_RADIUS_KM = 6371.0
+
+
+def _nl_boundaries():
+    """Latitudes at which the number of longitude zones decreases, in ascending order."""
+    a = 1 - math.cos(math.pi / (2 * _NZ))
+    return [
+        math.degrees(math.acos(math.sqrt(a / (1 - math.cos(2 * math.pi / nl)))))
+        for nl in range(4 * _NZ - 1, 1, -1)
+    ]
+
+
+_NL_BOUNDARIES = _nl_boundaries()
+
+
+def _nl(lat):
+    """Number of longitude zones at the given latitude."""
+    return 4 * _NZ - 1 - bisect_right(_NL_BOUNDARIES, abs(lat))
+
+
+class CPRNoPositionError(Exception):
+    """The message does not, with the information available so far, determine a position."""
+
+
+__all__.append('CPRNoPositionError')
+
+
+class _AircraftCPRState(object):
+    __slots__ = ['even', 'odd', 'position']
+
+    def __init__(self):
+        self.even = None  # (lat_cpr, lon_cpr, time) of the last even message
+        self.odd = None  # (lat_cpr, lon_cpr, time) of the last odd message
+        self.position = None  # (lat, lon, time) of the last decoded position which is reliable enough to decode relative to
+
+
+class CPRDecoder(object):
+    def __init__(self, my_location=None, time_source=time.time):
+        """my_location is the receiver's (latitude, longitude) or None."""
+        self.__my_location = my_location
+        self.__time_source = time_source
+        self.__aircraft = OrderedDict()  # ICAO address to _AircraftCPRState, least recently updated first
+
+    def set_location(self, my_location):
+        self.__my_location = my_location
+
+    def get_location(self):
+        return self.__my_location
+
+    def get_aircraft_count(self):
+        return len(self.__aircraft)
+
+    def decode(self, icao24, encoded_lat, encoded_lon, cpr_format, surface):
+        """Return [latitude, longitude, range_km, bearing] of the aircraft, or raise CPRNoPositionError.
+
+        Range and bearing are from the receiver's location, and are None if it is not known.
+        """
+        now = self.__time_source()
+        state = self.__get_state(icao24, now)
+        odd = bool(cpr_format)
+        surface = bool(surface)
+        lat_cpr = encoded_lat / _CPR_SCALE
+        lon_cpr = encoded_lon / _CPR_SCALE
+        entry = (lat_cpr, lon_cpr, now)
+        if odd:
+            state.odd = entry
+            other = state.even
+        else:
+            state.even = entry
+            other = state.odd
+
+        position = state.position
+        if position is not None and now - position[2] > _MAX_REFERENCE_AGE:
+            position = None
+        my_location = self.__my_location
+
+        decoded = None
+        if other is not None and now - other[2] <= _MAX_PAIR_AGE:
+            try:
+                if odd:
+                    decoded = _decode_global(other, entry, odd, surface, my_location)
+                else:
+                    decoded = _decode_global(entry, other, odd, surface, my_location)
+            except CPRNoPositionError:
+                pass
+            if decoded is not None and position is not None:
+                local = _decode_local(position[0], position[1], lat_cpr, lon_cpr, odd, surface)
+                if _range_bearing(local, decoded)[0] > _CROSS_CHECK_KM:
+                    # Either the pair or the reference is wrong (e.g. a corrupted message); trust none of them.
+                    state.position = None
+                    state.even = None
+                    state.odd = None
+                    raise CPRNoPositionError()
+        if decoded is None and position is not None:
+            decoded = _decode_local(position[0], position[1], lat_cpr, lon_cpr, odd, surface)
+
+        if decoded is not None:
+            lat, lon = decoded
+            state.position = (lat, lon, now)
+        elif my_location is not None:
+            lat, lon = _decode_local(my_location[0], my_location[1], lat_cpr, lon_cpr, odd, surface)
+            max_range = _MAX_RECEIVER_RELATIVE_RANGE_KM_SURFACE if surface else _MAX_RECEIVER_RELATIVE_RANGE_KM
+            if _range_bearing(my_location, (lat, lon))[0] > max_range:
+                raise CPRNoPositionError()
+            # Not stored in state.position, since it may be wrong; see module docstring.
+        else:
+            raise CPRNoPositionError()
+
+        if my_location is None:
+            return [lat, lon, None, None]
+        else:
+            rnge, bearing = _range_bearing(my_location, (lat, lon))
+            return [lat, lon, rnge, bearing]
+
+    def __get_state(self, icao24, now):
+        aircraft = self.__aircraft
+        state = aircraft.pop(icao24, None)
+
+        # Evict stale and excess state. Since the table is in order of last update, only the oldest entries need to be examined.
+        while aircraft:
+            oldest = aircraft[next(iter(aircraft))]
+            if now - _last_update_time(oldest) <= _STATE_LIFETIME and len(aircraft) < _MAX_AIRCRAFT:
+                break
+            aircraft.popitem(last=False)
+
+        if state is None:
+            state = _AircraftCPRState()
+        aircraft[icao24] = state  # at the end, as the most recently updated
+        return state
+
+
+__all__.append('CPRDecoder')
+
+
+def _last_update_time(state):
+    return max(
+        state.even[2] if state.even is not None else -1,
+        state.odd[2] if state.odd is not None else -1)
+
+
+def _decode_local(ref_lat, ref_lon, lat_cpr, lon_cpr, odd, surface):
+    """Decode a position which is within half a zone of the reference position."""
+    span = 90.0 if surface else 360.0
+    dlat = span / (4 * _NZ - odd)
+    j = math.floor(ref_lat / dlat) + math.floor(0.5 + (ref_lat % dlat) / dlat - lat_cpr)
+    lat = dlat * (j + lat_cpr)
+    dlon = span / max(_nl(lat) - odd, 1)
+    m = math.floor(ref_lon / dlon) + math.floor(0.5 + (ref_lon % dlon) / dlon - lon_cpr)
+    lon = dlon * (m + lon_cpr)
+    return lat, _normalize_lon(lon)
+
+
+def _decode_global(even, odd_entry, odd, surface, my_location):
+    """Decode a position from an even and an odd message; odd says which one is the most recent."""
+    span = 90.0 if surface else 360.0
+    lat_even, lon_even = even[0], even[1]
+    lat_odd, lon_odd = odd_entry[0], odd_entry[1]
+    j = math.floor(59 * lat_even - 60 * lat_odd + 0.5)
+    rlat_even = span / 60 * (j % 60 + lat_even)
+    rlat_odd = span / 59 * (j % 59 + lat_odd)
+    if surface:
+        # The solution is ambiguous between the northern and southern hemispheres; choose the receiver's.
+        if my_location is None:
+            raise CPRNoPositionError()
+        if my_location[0] < 0:
+            rlat_even -= 90
+            rlat_odd -= 90
+    else:
+        if rlat_even >= 270:
+            rlat_even -= 360
+        if rlat_odd >= 270:
+            rlat_odd -= 360
+    nl = _nl(rlat_even)
+    if nl != _nl(rlat_odd):
+        # The messages were sent from different latitude zones, so they cannot be combined.
+        raise CPRNoPositionError()
+    m = math.floor(lon_even * (nl - 1) - lon_odd * nl + 0.5)
+    if odd:
+        lat = rlat_odd
+        ni = max(nl - 1, 1)
+        lon = span / ni * (m % ni + lon_odd)
+    else:
+        lat = rlat_even
+        ni = max(nl, 1)
+        lon = span / ni * (m % ni + lon_even)
+    if surface:
+        # There are four solutions 90 degrees apart; choose the one nearest the receiver.
+        lon += 90 * round(((my_location[1] - lon) % 360) / 90)
+    return lat, _normalize_lon(lon)
+
+
+def _normalize_lon(lon):
+    return (lon + 180) % 360 - 180
+
+
+def _range_bearing(origin, target):
+    """Great-circle distance in kilometers and initial bearing in degrees from origin to target."""
+    lat1, lon1 = math.radians(origin[0]), math.radians(origin[1])
+    lat2, lon2 = math.radians(target[0]), math.radians(target[1])
+    dlon = lon2 - lon1
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon / 2) ** 2
+    rnge = 2 * _EARTH_RADIUS_KM * math.asin(min(1, math.sqrt(a)))
+    bearing = math.degrees(math.atan2(
+        math.sin(dlon) * math.cos(lat2),
+        math.cos(lat1) * math.sin(lat2) - math.sin(lat1) * math.cos(lat2) * math.cos(dlon)))
+    return rnge, bearing % 360
@@ -0,0 +1,155 @@
+# Copyright 2019 Kevin Reid and the ShinySDR contributors
+#
+# This file is part of ShinySDR.
+#
+# ShinySDR is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ShinySDR is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ShinySDR.  If not, see <http://www.gnu.org/licenses/>.
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import math
+
+from twisted.trial import unittest
+
+from shinysdr.plugins.mode_s.cpr import CPRDecoder, CPRNoPositionError, _MAX_AIRCRAFT, _nl
+
+
+# Example airborne position messages from "The 1090 Megahertz Riddle" (Junzi Sun), as (lat_cpr, lon_cpr): 8D40621D58C382D690C8AC2863A7 and 8D40621D58C386435CC412692AD6.
+_EXAMPLE_EVEN = (93000, 51372)
+_EXAMPLE_ODD = (74158, 50194)
+_EXAMPLE_POSITION = (52.25720, 3.91937)  # decoded with the even message newest
+
+
+def _encode(lat, lon, odd, surface=False):
+    """Encode a position as (lat_cpr, lon_cpr)."""
+    span = 90.0 if surface else 360.0
+    dlat = span / (60 - odd)
+    lat_cpr = int(math.floor(2 ** 17 * (lat % dlat) / dlat + 0.5)) % 2 ** 17
+    rlat = dlat * (lat_cpr / 2 ** 17 + math.floor(lat / dlat))
+    dlon = span / max(_nl(rlat) - odd, 1)
+    lon_cpr = int(math.floor(2 ** 17 * (lon % dlon) / dlon + 0.5)) % 2 ** 17
+    return lat_cpr, lon_cpr
+
+
+class TestCPRDecoder(unittest.TestCase):
+    def setUp(self):
+        self.time = 0
+        self.decoder = CPRDecoder(time_source=lambda: self.time)
+
+    def decode(self, icao24, encoded, odd, surface=False):
+        return self.decoder.decode(icao24, encoded[0], encoded[1], odd, surface)
+
+    def assertPosition(self, result, expected, places=4):
+        self.assertAlmostEqual(result[0], expected[0], places=places)
+        self.assertAlmostEqual(result[1], expected[1], places=places)
+
+    def test_global(self):
+        self.assertRaises(CPRNoPositionError, lambda: self.decode(1, _EXAMPLE_ODD, 1))
+        self.time = 1
+        result = self.decode(1, _EXAMPLE_EVEN, 0)
+        self.assertPosition(result, _EXAMPLE_POSITION)
+        self.assertEqual(result[2:], [None, None])
+
+    def test_global_pair_too_old(self):
+        self.assertRaises(CPRNoPositionError, lambda: self.decode(1, _EXAMPLE_ODD, 1))
+        self.time = 11
+        self.assertRaises(CPRNoPositionError, lambda: self.decode(1, _EXAMPLE_EVEN, 0))
+
+    def test_pairs_are_per_aircraft(self):
+        self.assertRaises(CPRNoPositionError, lambda: self.decode(1, _EXAMPLE_ODD, 1))
+        self.assertRaises(CPRNoPositionError, lambda: self.decode(2, _EXAMPLE_EVEN, 0))
+
+    def test_local_from_receiver(self):
+        self.decoder.set_location((52.258, 3.918))
+        result = self.decode(1, _EXAMPLE_EVEN, 0)
+        self.assertPosition(result, _EXAMPLE_POSITION)
+        self.assertAlmostEqual(result[2], 0.1, places=1)
+
+    def test_receiver_relative_range_check(self):
+        self.decoder.set_location((_EXAMPLE_POSITION[0], _EXAMPLE_POSITION[1] + 4.4))  # about 300 km
+        self.assertRaises(CPRNoPositionError, lambda: self.decode(1, _EXAMPLE_EVEN, 0))
+        self.decoder.set_location((_EXAMPLE_POSITION[0], _EXAMPLE_POSITION[1] + 3.0))  # about 200 km
+        self.assertPosition(self.decode(1, _EXAMPLE_EVEN, 0), _EXAMPLE_POSITION)
+
+    def test_receiver_relative_corrected_by_pair(self):
+        # The aircraft is more than half a zone from the receiver, so the receiver-relative decoding is an alias.
+        self.decoder.set_location((_EXAMPLE_POSITION[0], _EXAMPLE_POSITION[1] + 8.0))
+        alias = self.decode(1, _EXAMPLE_ODD, 1)
+        self.assertTrue(abs(alias[1] - _EXAMPLE_POSITION[1]) > 1)
+        self.time = 1
+        self.assertPosition(self.decode(1, _EXAMPLE_EVEN, 0), _EXAMPLE_POSITION)
+        # And the correct position is then used as the reference.
+        self.time = 30
+        self.assertPosition(self.decode(1, _EXAMPLE_EVEN, 0), _EXAMPLE_POSITION)
+
+    def test_cross_check(self):
+        self.assertRaises(CPRNoPositionError, lambda: self.decode(1, _EXAMPLE_ODD, 1))
+        self.time = 1
+        self.decode(1, _EXAMPLE_EVEN, 0)
+        # A corrupted odd message whose global decoding (with the recent even message) disagrees with its local decoding.
+        self.time = 2
+        self.assertRaises(CPRNoPositionError, lambda: self.decode(1, _encode(_EXAMPLE_POSITION[0] + 2.0, _EXAMPLE_POSITION[1], 1), 1))
+        # Neither the pair nor the reference is trusted until a new pair arrives.
+        self.time = 3
+        self.assertRaises(CPRNoPositionError, lambda: self.decode(1, _EXAMPLE_EVEN, 0))
+        self.time = 4
+        self.assertPosition(self.decode(1, _EXAMPLE_ODD, 1), (52.26578, 3.93889), places=3)
+
+    def test_local_from_last_position(self):
+        self.assertRaises(CPRNoPositionError, lambda: self.decode(1, _EXAMPLE_ODD, 1))
+        self.decode(1, _EXAMPLE_EVEN, 0)
+        # A single message now suffices.
+        position = (52.3, 4.1)
+        self.time = 30
+        self.assertPosition(self.decode(1, _encode(position[0], position[1], 1), 1), position)
+
+    def test_round_trip_airborne(self):
+        for lat, lon in [(52.25720, 3.91937), (-33.9, 151.2), (0.1, -179.9), (71.5, -156.8), (-54.8, -68.3)]:
+            for odd in (0, 1):
+                decoder = CPRDecoder(my_location=(lat + 1.0, lon - 1.0))
+                encoded = _encode(lat, lon, odd)
+                self.assertPosition(decoder.decode(1, encoded[0], encoded[1], odd, False), (lat, lon), places=3)
+
+    def test_global_round_trip_airborne(self):
+        for lat, lon in [(52.25720, 3.91937), (-33.9, 151.2), (0.1, -179.9), (71.5, -156.8), (-54.8, -68.3)]:
+            decoder = CPRDecoder(time_source=lambda: self.time)
+            self.assertRaises(CPRNoPositionError, lambda: decoder.decode(1, *(_encode(lat, lon, 0) + (0, False))))
+            self.assertPosition(decoder.decode(1, *(_encode(lat, lon, 1) + (1, False))), (lat, lon), places=3)
+
+    def test_surface(self):
+        position = (-43.4857, 172.5393)
+        even = _encode(position[0], position[1], 0, surface=True)
+        odd = _encode(position[0], position[1], 1, surface=True)
+        # Without a receiver location, surface positions cannot be globally decoded.
+        self.assertRaises(CPRNoPositionError, lambda: self.decode(1, even, 0, True))
+        self.assertRaises(CPRNoPositionError, lambda: self.decode(1, odd, 1, True))
+        self.decoder.set_location((-43.5, 172.5))
+        self.time = 100
+        self.decode(2, odd, 1, True)
+        self.assertPosition(self.decode(2, even, 0, True), position, places=3)
+
+    def test_eviction_by_age(self):
+        self.assertRaises(CPRNoPositionError, lambda: self.decode(1, _EXAMPLE_ODD, 1))
+        self.time = 30
+        self.assertRaises(CPRNoPositionError, lambda: self.decode(2, _EXAMPLE_ODD, 1))
+        self.assertEqual(self.decoder.get_aircraft_count(), 2)
+        self.time = 61
+        self.assertRaises(CPRNoPositionError, lambda: self.decode(3, _EXAMPLE_ODD, 1))
+        self.assertEqual(self.decoder.get_aircraft_count(), 2)  # 1 was evicted
+
+    def test_eviction_by_count(self):
+        for icao24 in range(_MAX_AIRCRAFT + 10):
+            self.assertRaises(CPRNoPositionError, lambda: self.decode(icao24, _EXAMPLE_ODD, 1))  # pylint: disable=cell-var-from-loop
+        self.assertEqual(self.decoder.get_aircraft_count(), _MAX_AIRCRAFT)
+        self.assertRaises(CPRNoPositionError, lambda: self.decode(0, _EXAMPLE_EVEN, 0))
+        self.assertPosition(self.decode(_MAX_AIRCRAFT + 9, _EXAMPLE_EVEN, 0), _EXAMPLE_POSITION)
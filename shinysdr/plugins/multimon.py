@@ -32,13 +32,15 @@ from zope.interface import implementer
 from gnuradio import analog
 from gnuradio import gr
 from gnuradio import blocks
+import numpy
 
 from shinysdr.filters import make_resampler
-from shinysdr.i.blocks import make_sink_to_process_stdin
+from shinysdr.i.blocks import NonBlockingProcessStdinSink
+from shinysdr.i.processpool import the_decoder_process_pool
 from shinysdr.i.pycompat import defaultstr
-from shinysdr.interfaces import BandShape, ModeDef, IDemodulator
+from shinysdr.interfaces import BandShape, ModeDef, ICostEstimatingDemodulator, IDemodulator
 from shinysdr.plugins.basic_demod import NFMDemodulator
-from shinysdr.plugins.aprs import parse_tnc2
+from shinysdr.plugins.aprs import TNC2LineParser
 from shinysdr.signals import SignalType
 from shinysdr.twisted_ext import test_subprocess
 from shinysdr.types import EnumT, ReferenceT
@@ -49,6 +51,15 @@ _maxint32 = 2 ** 15 - 1
 audio_gain = 0.5
 int_scale = _maxint32 * audio_gain
 
+# Maximum amount of input buffered for multimon-ng if it falls behind, after which input is dropped.
+_PIPE_BUFFER_SECONDS = 1.0
+
+# Zeros written after a receiver is done with a multimon-ng process, before it is reused, so that it finishes decoding the receiver's samples.
+_FLUSH_BYTES = pipe_rate * gr.sizeof_short // 4
+
+# Rough allowance for resampling, conversion, and multimon-ng itself, per sample at pipe_rate.
+_DECODER_COST_PER_SAMPLE = 100
+
 
 class MultimonNGDemodulator(gr.hier_block2, ExportedState):
     # This is not an IDemodulator; it takes float input, requires a fixed input rate and lacks other characteristics.
@@ -61,18 +72,16 @@ class MultimonNGDemodulator(gr.hier_block2, ExportedState):
         )
         
         # Subprocess
-        # using /usr/bin/env because twisted spawnProcess doesn't support path search
-        self.__process = reactor.spawnProcess(
-            protocol,
-            '/usr/bin/env',
-            env=None,  # inherit environment
-            args=['env', 'multimon-ng', '-t', 'raw'] + multimon_demod_args + ['-v', '10', '-'],
-            childFDs={
-                0: 'w',
-                1: 'r',
-                2: 2
-            })
-        sink = make_sink_to_process_stdin(self.__process, itemsize=gr.sizeof_short)
+        self.__lease = the_decoder_process_pool.lease(
+            args=['multimon-ng', '-t', 'raw'] + multimon_demod_args + ['-v', '10', '-'],
+            protocol=protocol,
+            item_size=gr.sizeof_short,
+            flush_bytes=_FLUSH_BYTES,
+            owner=self)
+        sink = NonBlockingProcessStdinSink(
+            self.__lease,
+            numpy_type=numpy.int16,
+            buffer_limit=int(pipe_rate * gr.sizeof_short * _PIPE_BUFFER_SECONDS))
         
         # Output
         to_short = blocks.float_to_short(vlen=1, scale=int_scale)
@@ -88,7 +97,7 @@ class MultimonNGDemodulator(gr.hier_block2, ExportedState):
         
     def _close(self):
         # TODO: This never gets called except in tests. Do this better, like by having an explicit life cycle for demodulators.
-        self.__process.loseConnection()
+        self.__lease.release()
     
     def get_input_type(self):
         return SignalType(kind='MONO', sample_rate=pipe_rate)
@@ -117,9 +126,10 @@ class APRSDemodulator(gr.hier_block2, ExportedState):
             gr.io_signature(1, 1, gr.sizeof_float * 1),
         )
         
+        parser = TNC2LineParser(reactor, context.output_message, log=self.__log)
+        
         def receive(line):
-            message = parse_tnc2(line, time.time(), log=self.__log)
-            context.output_message(message)
+            parser.parse_lines([line], time.time())
         
         self.__mm_demod = MultimonNGDemodulator(
             multimon_demod_args=['-A'],
@@ -180,7 +190,7 @@ class APRSDemodulator(gr.hier_block2, ExportedState):
 
 
 # TODO: Eliminate this class and replace it with adapters available to any demodulator
-@implementer(IDemodulator)
+@implementer(IDemodulator, ICostEstimatingDemodulator)
 class FMAPRSDemodulator(gr.hier_block2, ExportedState):
     def __init__(self, mode, input_rate=0, context=None):
         assert input_rate > 0
@@ -223,6 +233,10 @@ class FMAPRSDemodulator(gr.hier_block2, ExportedState):
     def get_band_shape(self):
         return self.fm_demod.get_band_shape()
     
+    def get_estimated_cost(self):
+        """Implements ICostEstimatingDemodulator."""
+        return self.fm_demod.get_estimated_cost() + pipe_rate * _DECODER_COST_PER_SAMPLE
+    
     def get_output_type(self):
         return self.mm_demod.get_output_type()
     
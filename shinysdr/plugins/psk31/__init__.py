@@ -37,12 +37,16 @@ except ImportError as e:
 
 from shinysdr.math import dB, rotator_inc
 from shinysdr.filters import MultistageChannelFilter
-from shinysdr.interfaces import ModeDef, IDemodulator, BandShape
+from shinysdr.interfaces import ModeDef, ICostEstimatingDemodulator, IDemodulator, BandShape
 from shinysdr.signals import SignalType
 from shinysdr.values import ExportedState, StringSinkCell, exported_value
 
 
-@implementer(IDemodulator)
+# Rough allowance for the demodulator and audio monitor chain, per sample at the demodulator rate.
+_DEMOD_COST_PER_SAMPLE = 50
+
+
+@implementer(IDemodulator, ICostEstimatingDemodulator)
 class PSK31Demodulator(gr.hier_block2, ExportedState):
     '''Demodulate PSK31.'''
     
@@ -62,7 +66,7 @@ class PSK31Demodulator(gr.hier_block2, ExportedState):
             gr.io_signature(1, 1, gr.sizeof_gr_complex),
             gr.io_signature(1, 1, gr.sizeof_float))
         
-        channel_filter = self.__make_channel_filter()
+        channel_filter = self.__channel_filter = self.__make_channel_filter()
 
         self.__text_cell = StringSinkCell(encoding='us-ascii')
         self.__text_sink = self.__text_cell.create_sink_internal()
@@ -126,6 +130,10 @@ class PSK31Demodulator(gr.hier_block2, ExportedState):
     def get_output_type(self):
         """implement IDemodulator"""
         return SignalType(kind='MONO', sample_rate=self.__demod_rate)
+    
+    def get_estimated_cost(self):
+        """implement ICostEstimatingDemodulator"""
+        return self.__channel_filter.get_estimated_cost() + self.__demod_rate * _DEMOD_COST_PER_SAMPLE
 
 
 pluginMode = ModeDef(mode='PSK31',
@@ -22,20 +22,20 @@ import time
 
 import six
 
-from twisted.internet import reactor as the_reactor  # TODO eliminate
 from twisted.internet.protocol import ProcessProtocol
-from twisted.protocols.basic import LineReceiver
 from twisted.logger import Logger
 from zope.interface import implementer
 
 from gnuradio import analog
 from gnuradio import gr
+import numpy
 
-from shinysdr.i.blocks import make_sink_to_process_stdin
+from shinysdr.i.blocks import NonBlockingProcessStdinSink
+from shinysdr.i.processpool import the_decoder_process_pool
 from shinysdr.i.pycompat import repr_no_string_tag
 from shinysdr.filters import MultistageChannelFilter
 from shinysdr.math import dB
-from shinysdr.interfaces import BandShape, ModeDef, IDemodulator
+from shinysdr.interfaces import BandShape, ModeDef, ICostEstimatingDemodulator, IDemodulator
 from shinysdr.signals import no_signal
 from shinysdr.telemetry import ITelemetryMessage, ITelemetryObject
 from shinysdr.twisted_ext import test_subprocess
@@ -46,8 +46,53 @@ from shinysdr.values import ExportedState, LooseCell, exported_value
 drop_unheard_timeout_seconds = 120
 upper_preferred_demod_rate = 250000  # Taken from rtl_433's default
 
+# Maximum amount of input buffered for rtl_433 if it falls behind, after which input is dropped.
+_PIPE_BUFFER_SECONDS = 1.0
 
-@implementer(IDemodulator)
+# Zeros written after a receiver is done with an rtl_433 process, before it is reused; at least rtl_433's input buffer size, so that it finishes decoding the receiver's samples.
+_FLUSH_BYTES = 2 ** 18
+
+# Maximum length of a line of rtl_433 output, to protect against unbounded buffering.
+_MAX_LINE_LENGTH = 65536
+
+# Rough allowance for the AGC, sample conversion, and rtl_433 itself, per sample at the demodulator rate.
+_DECODER_COST_PER_SAMPLE = 50
+
+# Minimum time between log entries for received messages.
+_LOG_INTERVAL = 10  # seconds
+
+
+def _encode_cs16(items):
+    # The AGC keeps the signal near full scale, so 16 bits lose nothing of interest.
+    return numpy.rint(items.view(numpy.float32) * 32767).clip(-32768, 32767).astype('<i2').tobytes()
+
+
+def _encode_cu8(items):
+    return numpy.rint(items.view(numpy.float32) * 127.5 + 127.5).clip(0, 255).astype(numpy.uint8).tobytes()
+
+
+# Sample formats rtl_433 accepts, as (bytes per sample, encoder); cf32 is the flow graph's own format.
+_SAMPLE_FORMATS = {
+    'cf32': (8, None),
+    'cs16': (4, _encode_cs16),
+    'cu8': (2, _encode_cu8),
+}
+
+_sample_format = 'cf32'
+
+
+def set_sample_format(sample_format):
+    """Set the sample format sent to rtl_433 by demodulators created after this call: 'cf32', 'cs16', or 'cu8'.
+    
+    The smaller formats reduce the bandwidth of the pipe to rtl_433, and the work rtl_433 does to read it, by 2 or 4 times.
+    """
+    global _sample_format  # pylint: disable=global-statement
+    if sample_format not in _SAMPLE_FORMATS:
+        raise ValueError('rtl_433 sample format must be one of {}, not {!r}'.format(', '.join(sorted(_SAMPLE_FORMATS)), sample_format))
+    _sample_format = sample_format
+
+
+@implementer(IDemodulator, ICostEstimatingDemodulator)
 class RTL433Demodulator(gr.hier_block2, ExportedState):
     __log = Logger()  # TODO: log to context/client
     
@@ -85,27 +130,28 @@ class RTL433Demodulator(gr.hier_block2, ExportedState):
                 output_rate=demod_rate,
                 cutoff_freq=demod_rate * 0.4,
                 transition_width=demod_rate * 0.2)
+        self.__demod_rate = demod_rate
         
         # Subprocess
-        # using /usr/bin/env because twisted spawnProcess doesn't support path search
-        # pylint: disable=no-member
-        self.__process = the_reactor.spawnProcess(
-            RTL433ProcessProtocol(context.output_message, self.__log),
-            '/usr/bin/env',
-            env=None,  # inherit environment
+        sample_format = _sample_format
+        bytes_per_sample, encode = _SAMPLE_FORMATS[sample_format]
+        self.__lease = the_decoder_process_pool.lease(
             # These arguments were last reviewed for rtl_433 18.12-142-g6c3ca9b
             args=[
-                b'env', b'rtl_433',
+                b'rtl_433',
                 b'-F', b'json',  # output format
-                b'-r', str(demod_rate) + b'sps:iq:cf32:-',  # specify input format and to use stdin
+                b'-r', str(demod_rate) + b'sps:iq:' + str(sample_format) + b':-',  # specify input format and to use stdin
                 b'-M', 'newmodel',
             ],
-            childFDs={
-                0: 'w',
-                1: 'r',
-                2: 2
-            })
-        sink = make_sink_to_process_stdin(self.__process, itemsize=gr.sizeof_gr_complex)
+            protocol=RTL433ProcessProtocol(context.output_message, self.__log),
+            item_size=bytes_per_sample,
+            flush_bytes=_FLUSH_BYTES,
+            owner=self)
+        self.__sink = NonBlockingProcessStdinSink(
+            self.__lease,
+            numpy_type=numpy.complex64,
+            buffer_limit=int(demod_rate * bytes_per_sample * _PIPE_BUFFER_SECONDS),
+            encode=encode)
         
         agc = analog.agc2_cc(reference=dB(-4))
         agc.set_attack_rate(200 / demod_rate)
@@ -120,11 +166,16 @@ class RTL433Demodulator(gr.hier_block2, ExportedState):
             self.connect(
                 self,
                 agc)
-        self.connect(agc, sink)
+        self.connect(agc, self.__sink)
     
     def _close(self):
         # TODO: This never gets called except in tests. Do this better, like by having an explicit life cycle for demodulators.
-        self.__process.loseConnection()
+        self.__lease.release()
+    
+    @exported_value(type=int, changes='continuous', label='Samples dropped')
+    def get_dropped_samples(self):
+        """Samples discarded because rtl_433 was not keeping up."""
+        return self.__sink.get_dropped_items()
     
     @exported_value(type=BandShape, changes='never')
     def get_band_shape(self):
@@ -135,40 +186,80 @@ class RTL433Demodulator(gr.hier_block2, ExportedState):
             # TODO Reuse UnselectiveAMDemodulator's approach to this
             return BandShape(stop_low=0, pass_low=0, pass_high=0, stop_high=0, markers={})
     
+    def get_estimated_cost(self):
+        """implements ICostEstimatingDemodulator"""
+        cost = self.__demod_rate * _DECODER_COST_PER_SAMPLE
+        if self.__band_filter:
+            cost += self.__band_filter.get_estimated_cost()
+        return cost
+    
     def get_output_type(self):
         """implements IDemodulator"""
         return no_signal
 
 
 class RTL433ProcessProtocol(ProcessProtocol):
-    def __init__(self, target, log):
+    def __init__(self, target, log, time_source=time.time):
         self.__target = target
         self.__log = log
-        self.__line_receiver = LineReceiver()
-        self.__line_receiver.delimiter = b'\n'
-        self.__line_receiver.lineReceived = self.__lineReceived
+        self.__time_source = time_source
+        self.__partial_line = b''
+        self.__last_log_time = None
+        self.__unlogged_count = 0
     
     def outReceived(self, data):
         """Implements ProcessProtocol."""
-        # split lines
-        self.__line_receiver.dataReceived(data)
+        lines = (self.__partial_line + data).split(b'\n')
+        self.__partial_line = lines.pop()
+        if len(self.__partial_line) > _MAX_LINE_LENGTH:
+            self.__log.warn('rtl_433 output line too long; discarding')
+            self.__partial_line = b''
+        lines = [line for line in lines if line.strip()]
+        if not lines:
+            return
+        # rtl_433 provides a time field, but when in file-input mode it assumes the input is not real-time and generates start-of-file-relative timestamps, so we can't use them directly.
+        receive_time = self.__time_source()
+        for message in self.__parse_lines(lines):
+            self.__log_message(message, receive_time)
+            self.__target(RTL433MessageWrapper(message, receive_time))
         
     def errReceived(self, data):
         """Implements ProcessProtocol."""
         # we should inherit stderr, not pipe it
         raise Exception('shouldn\'t happen')
     
-    def __lineReceived(self, line):
-        # rtl_433's JSON encoder is not perfect (e.g. it will emit unescaped newlines), so protect against parse failures
+    def __parse_lines(self, lines):
+        # Parsing all the lines as one JSON array is faster than parsing them individually.
         try:
-            message = json.loads(line)
+            messages = json.loads(b'[' + b','.join(lines) + b']')
+            if len(messages) == len(lines) and all(isinstance(m, dict) for m in messages):
+                return messages
         except ValueError:
-            self.__log.warn('bad JSON from rtl_433: {rtl_433_line}', rtl_433_line=repr_no_string_tag(line))
+            pass
+        # rtl_433's JSON encoder is not perfect (e.g. it will emit unescaped newlines), so protect against parse failures
+        messages = []
+        for line in lines:
+            try:
+                message = json.loads(line)
+            except ValueError:
+                message = None
+            if isinstance(message, dict):
+                messages.append(message)
+            else:
+                self.__log.warn('bad JSON from rtl_433: {rtl_433_line}', rtl_433_line=repr_no_string_tag(line))
+        return messages
+    
+    def __log_message(self, message, receive_time):
+        # Busy bands produce many messages, so log only a sample of them.
+        if self.__last_log_time is not None and receive_time - self.__last_log_time < _LOG_INTERVAL:
+            self.__unlogged_count += 1
             return
-        self.__log.info('rtl_433 message: {rtl_433_json!r}', rtl_433_json=message)
-        # rtl_433 provides a time field, but when in file-input mode it assumes the input is not real-time and generates start-of-file-relative timestamps, so we can't use them directly.
-        wrapper = RTL433MessageWrapper(message, time.time())
-        self.__target(wrapper)
+        if self.__unlogged_count:
+            self.__log.debug('rtl_433 message: {rtl_433_json!r} ({rtl_433_unlogged} not logged since the last)', rtl_433_json=message, rtl_433_unlogged=self.__unlogged_count)
+        else:
+            self.__log.debug('rtl_433 message: {rtl_433_json!r}', rtl_433_json=message)
+        self.__last_log_time = receive_time
+        self.__unlogged_count = 0
 
 
 # This includes both rtl_433's notion of device ID and also device type identification that makes a more informative to the user, and distinct, key. Distinctness from unrelated things is important because the telemetry object namespace is shared with other systems.
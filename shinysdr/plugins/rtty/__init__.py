@@ -40,7 +40,7 @@ except ImportError as e:
 
 from shinysdr.math import dB, rotator_inc
 from shinysdr.filters import MultistageChannelFilter
-from shinysdr.interfaces import BandShape, ModeDef, IDemodulator, IModulator
+from shinysdr.interfaces import BandShape, ModeDef, ICostEstimatingDemodulator, IDemodulator, IModulator
 from shinysdr.signals import SignalType, no_signal
 from shinysdr.values import ExportedState, StringSinkCell, exported_value
 
@@ -56,8 +56,11 @@ _DEFAULT_BAUD = 45.45
 _DATA_BITS = 5
 _HALF_BITS_PER_CODE = (1 + _DATA_BITS) * 2 + 3
 
+# Rough allowance for the demodulator and audio monitor filter, per sample at the demodulator rate.
+_DEMOD_COST_PER_SAMPLE = 100
 
-@implementer(IDemodulator)
+
+@implementer(IDemodulator, ICostEstimatingDemodulator)
 class RTTYDemodulator(gr.hier_block2, ExportedState):
     '''Demodulate typical amateur RTTY.
 
@@ -88,7 +91,7 @@ class RTTYDemodulator(gr.hier_block2, ExportedState):
             gr.io_signature(1, 1, gr.sizeof_gr_complex * 1),
             gr.io_signature(1, 1, gr.sizeof_float * 1))
         
-        channel_filter = self.__make_channel_filter()
+        channel_filter = self.__channel_filter = self.__make_channel_filter()
 
         self.__text_cell = StringSinkCell(encoding='us-ascii')
         self.__text_sink = self.__text_cell.create_sink_internal()
@@ -172,6 +175,10 @@ class RTTYDemodulator(gr.hier_block2, ExportedState):
     def get_output_type(self):
         """implement IDemodulator"""
         return SignalType(kind='MONO', sample_rate=self.__demod_rate)
+    
+    def get_estimated_cost(self):
+        """implement ICostEstimatingDemodulator"""
+        return self.__channel_filter.get_estimated_cost() + self.__demod_rate * _DEMOD_COST_PER_SAMPLE
 
 
 # Because we don't currently have an encoder which can operate as a block, the rtty modulator is limited to looping a fixed message. This is good enough for simulation testing.
@@ -19,12 +19,18 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 
 from datetime import datetime
 
+from twisted.internet import defer
+from twisted.internet import reactor as the_reactor
+from twisted.internet.endpoints import TCP4ClientEndpoint
+from twisted.internet.protocol import Factory
 from twisted.internet.task import Clock
+from twisted.protocols.basic import LineReceiver
 from twisted.trial import unittest
 
-from shinysdr.plugins.aprs import Altitude, APRSISRXDevice, APRSStation, APRSMessage, Capabilities, ObjectItemReport, Messaging, Position, RadioRange, Status, Symbol, Telemetry, Timestamp, Velocity, expand_aprs_message, parse_tnc2
+from shinysdr.plugins.aprs import Altitude, APRSISRXDevice, APRSStation, APRSMessage, Capabilities, ObjectItemReport, Messaging, Position, RadioRange, Status, Symbol, Telemetry, Timestamp, TNC2LineParser, Velocity, expand_aprs_message, parse_tnc2, _ParsePool, _parse_items
 from shinysdr.telemetry import TelemetryItem, TelemetryStore, empty_track
-from shinysdr.testutil import state_smoke_test
+from shinysdr.test_manually.aprs_parser_benchmark import load_corpus
+from shinysdr.testutil import StringTransportEndpoint, state_smoke_test
 
 
 # January 2, 2000, 12:30:30 + 1 microsecond
@@ -302,6 +308,14 @@ class TestAPRSParser(unittest.TestCase):
             Telemetry(channel=5, value=5)],
             errors=["Telemetry channel 3 did not parse: 'bang'"],
             comment='')
+    
+    def test_benchmark_corpus(self):
+        """Every packet in the benchmark corpus parses without exceptions, and the cached values are not confused between packets."""
+        lines = load_corpus()
+        first = [parse_tnc2(line, _dummy_receive_time) for line in lines]
+        second = [parse_tnc2(line, _dummy_receive_time) for line in reversed(lines)]
+        self.assertEqual(first, list(reversed(second)))
+        self.assertFalse([m for m in first if 'Could not parse TNC2' in m.errors])
 
 
 class TestAPRSTelemetryStore(unittest.TestCase):
@@ -354,6 +368,93 @@ class TestAPRSTelemetryStore(unittest.TestCase):
         self.assertEqual({'BAR'}, set(self.store.state().keys()))
 
 
+class TestTNC2LineParser(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        self.pool = _FakeParsePool()
+        self.messages = []
+    
+    def test_inline(self):
+        parser = TNC2LineParser(self.clock, self.messages.append)
+        parser.parse_lines(['FOO>BAR:>a', 'FOO>BAR:>b'], _dummy_receive_time)
+        self.assertEqual(self.messages, [
+            parse_tnc2('FOO>BAR:>a', _dummy_receive_time),
+            parse_tnc2('FOO>BAR:>b', _dummy_receive_time)])
+    
+    def test_pool_order(self):
+        parser = TNC2LineParser(self.clock, self.messages.append, pool=self.pool)
+        lines = ['FOO>BAR:>%d' % i for i in range(800)]
+        for line in lines:
+            parser.parse_lines([line], _dummy_receive_time)
+        self.assertEqual(self.pool.chunks, [])
+        self.clock.advance(0)
+        self.assertEqual([len(items) for items, _ in self.pool.chunks], [500, 300])
+        
+        # Second chunk finishes first
+        self.pool.finish(1)
+        self.assertEqual(self.messages, [])
+        self.pool.finish(0)
+        self.assertEqual([m.facts for m in self.messages], [[Status('%d' % i)] for i in range(800)])
+    
+    def test_pool_worker_failure(self):
+        parser = TNC2LineParser(self.clock, self.messages.append, pool=self.pool)
+        parser.parse_lines(['FOO>BAR:>a'], _dummy_receive_time)
+        self.clock.advance(0)
+        self.pool.finish(0, fail=True)
+        self.assertEqual(self.messages, [parse_tnc2('FOO>BAR:>a', _dummy_receive_time)])
+    
+    def test_pool_chunk_lost(self):
+        parser = TNC2LineParser(self.clock, self.messages.append, pool=self.pool)
+        parser.parse_lines(['FOO>BAR:>a'], _dummy_receive_time)
+        self.clock.advance(0)
+        parser.parse_lines(['FOO>BAR:>b'], _dummy_receive_time)
+        self.clock.advance(0)
+        self.pool.finish(1)
+        self.assertEqual(self.messages, [])
+        self.pool.chunks[0][1].errback(defer.TimeoutError())
+        self.assertEqual(self.messages, [
+            parse_tnc2('FOO>BAR:>a', _dummy_receive_time),
+            parse_tnc2('FOO>BAR:>b', _dummy_receive_time)])
+    
+    def test_real_pool_timeout(self):
+        pool = _ParsePool(_ResultLosingClock(), 1)
+        self.addCleanup(pool.close)
+        clock = pool._ParsePool__reactor
+        d = pool.parse([('FOO>BAR:>a', _dummy_receive_time)], timeout=10)
+        clock.advance(10)
+        return self.assertFailure(d, defer.TimeoutError)
+    
+    def test_real_pool(self):
+        pool = _ParsePool(the_reactor, 1)
+        self.addCleanup(pool.close)
+        items = [('FOO>BAR:>a', _dummy_receive_time), ('BOOM', _dummy_receive_time)]
+        d = pool.parse(items)
+        d.addCallback(self.assertEqual, [parse_tnc2(line, t) for line, t in items])
+        return d
+
+
+class _ResultLosingClock(Clock):
+    def callFromThread(self, f, *args, **kwargs):
+        """Discard the worker's answer, as if the worker had died."""
+
+
+class _FakeParsePool(object):
+    def __init__(self):
+        self.chunks = []
+    
+    def parse(self, items):
+        d = defer.Deferred()
+        self.chunks.append((items, d))
+        return d
+    
+    def finish(self, index, fail=False):
+        items, d = self.chunks[index]
+        if fail:
+            d.callback([None] * len(items))
+        else:
+            d.callback(_parse_items(items))
+
+
 class TestAPRSStation(unittest.TestCase):
     def setUp(self):
         self.s = APRSStation('TEST')
@@ -400,36 +501,106 @@ class TestAPRSStation(unittest.TestCase):
 
 
 class TestAPRSISRXDevice(unittest.TestCase):
+    timeout = 5
+    
     def setUp(self):
-        self.clock = _ClockWithFakeThread()
+        self.clock = Clock()
+        self.endpoint = StringTransportEndpoint()
+        self.t = self.endpoint.string_transport
     
     def test_smoke(self):
         device = APRSISRXDevice(
             reactor=self.clock,
+            callsign='N0CALL',
             aprs_filter='r/0/0/100',
-            client=_StubAPRSClient())
+            endpoint=self.endpoint)
         state_smoke_test(device)
         device.close()
         state_smoke_test(device)
+        self.assertTrue(self.t.disconnecting)
     
     def test_smoke_nofilter(self):
         device = APRSISRXDevice(
             reactor=self.clock,
-            client=_StubAPRSClient())
+            callsign='N0CALL',
+            endpoint=self.endpoint)
         state_smoke_test(device)
+        device.close()
+    
+    def test_login(self):
+        device = APRSISRXDevice(
+            reactor=self.clock,
+            callsign='N0CALL',
+            aprs_filter='r/0/0/100',
+            endpoint=self.endpoint)
+        self.addCleanup(device.close)
+        self.assertEqual(self.t.value(), b'user N0CALL pass -1 vers ShinySDR 0 filter r/0/0/100\r\n')
+    
+    def test_old_client_argument(self):
+        self.assertRaises(TypeError, lambda: APRSISRXDevice(reactor=self.clock, client=object()))
+        self.assertRaises(TypeError, lambda: APRSISRXDevice(self.clock, object()))
+        self.assertRaises(TypeError, lambda: APRSISRXDevice(reactor=self.clock))
 
 
-class _ClockWithFakeThread(Clock):
-    def callFromThread(self, func, *args, **kwargs):
-        # adequate for this test
-        func(*args, **kwargs)
+class TestAPRSISReplay(unittest.TestCase):
+    """Test the APRS-IS client against a local server replaying captured traffic."""
+    timeout = 5
+    
+    def setUp(self):
+        self.server_factory = Factory.forProtocol(_ReplayServerProtocol)
+        self.server_factory.logins = []
+        self.port = the_reactor.listenTCP(0, self.server_factory, interface='127.0.0.1')  # pylint: disable=no-member
+        self.context = _MessageCollectingContext(len(_CAPTURED_MESSAGES))
+        self.device = APRSISRXDevice(
+            reactor=the_reactor,
+            callsign='N0CALL',
+            endpoint=TCP4ClientEndpoint(the_reactor, '127.0.0.1', self.port.getHost().port))
+        self.device.get_components_dict()['aprs-is'].attach_context(self.context)
+    
+    def tearDown(self):
+        return defer.gatherResults([
+            self.device.get_components_dict()['aprs-is'].close(),
+            self.port.stopListening()])
+    
+    @defer.inlineCallbacks
+    def test_replay(self):
+        messages = yield self.context.done
+        self.assertEqual(self.server_factory.logins, [b'user N0CALL pass -1 vers ShinySDR 0'])
+        self.assertEqual(
+            [m.source for m in messages],
+            [parse_tnc2(line, 0).source for line in _CAPTURED_MESSAGES])
+        self.assertEqual(
+            self.device.get_components_dict()['aprs-is'].get_status(),
+            'Logged in: N0CALL unverified, server T2TEST')
 
 
-class _StubAPRSClient(object):
-    """Test stub for aprs.APRS class."""
+_CAPTURED_MESSAGES = [
+    'W6KWF-1>APOT30,WIDE2-1,qAR,W6YX-5:!/;ZI^/]m/k7UG 13.8V W6KWF',
+    'KF6GPE-6>APRS,TCPIP*,qAC,T2TEST:>Test status',
+    'N6ACK-2>APN383,qAR,KJ6MMB-10:!3715.41N/12150.12W#PHG5360/W2 test',
+]
+
+
+class _ReplayServerProtocol(LineReceiver):
+    def connectionMade(self):
+        self.sendLine(b'# aprsc 2.1.4-g408ed49')
     
-    def connect(self, aprs_filter):
-        pass
+    def lineReceived(self, line):
+        self.factory.logins.append(line)
+        self.sendLine(b'# logresp N0CALL unverified, server T2TEST')
+        # Send everything in one write so that the client sees it as one batch.
+        lines = [m.encode('utf-8') for m in _CAPTURED_MESSAGES]
+        lines.insert(1, b'# aprsc 2.1.4-g408ed49 keepalive')
+        self.transport.write(b''.join(line + b'\r\n' for line in lines))
+
+
+class _MessageCollectingContext(object):
+    def __init__(self, count):
+        self.__count = count
+        self.__messages = []
+        self.done = defer.Deferred()
     
-    def receive(self, callback):
-        callback('W6KWF-1>APOT30,WIDE2-1,qAR,W6YX-5:!/;ZI^/]m/k7UG 13.8V W6KWF')
+    def output_message(self, message):
+        self.__messages.append(message)
+        if len(self.__messages) == self.__count:
+            self.done.callback(self.__messages)
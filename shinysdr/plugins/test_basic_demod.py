@@ -17,6 +17,9 @@
 
 from __future__ import absolute_import, division, print_function, unicode_literals
 
+from zope.interface.verify import verifyObject
+
+from shinysdr.interfaces import IGatingDemodulator
 from shinysdr.testutil import DemodulatorTestCase
 
 
@@ -38,6 +41,13 @@ class TestUnselectiveAM(DemodulatorTestCase):
 class TestNFM(DemodulatorTestCase):
     def setUp(self):
         self.setUpFor(mode='NFM')
+    
+    def test_gating(self):
+        verifyObject(IGatingDemodulator, self.demodulator)
+        self.assertFalse(self.demodulator.get_output_gated())
+        self.demodulator.set_output_gaps_allowed(True)
+        self.demodulator.set_output_gaps_allowed(False)
+        self.assertFalse(self.demodulator.get_output_gated())
 
 
 class TestWFM(DemodulatorTestCase):
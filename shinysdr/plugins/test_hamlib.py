@@ -19,8 +19,16 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 
 from twisted.trial import unittest
 from twisted.internet import defer, reactor
+from twisted.internet.task import Clock
+from twisted.logger import Logger
 
-from shinysdr.plugins.hamlib import connect_to_rig, connect_to_rotator
+from shinysdr.plugins.hamlib import (
+    _HamlibRig,
+    _MAX_POLLS_IN_FLIGHT,
+    _POLL_FAST_INTERVALS,
+    connect_to_rig,
+    connect_to_rotator,
+)
 from shinysdr.testutil import state_smoke_test
 
 
@@ -92,3 +100,108 @@ class TestHamlibRotator(unittest.TestCase):
     def test_noop(self):
         """basic connect and disconnect, check is clean"""
         pass
+
+
+class TestHamlibPolling(unittest.TestCase):
+    """Tests of poll scheduling, using a fake rigctld connection."""
+    def setUp(self):
+        self.clock = Clock()
+        self.protocol = _FakeProtocol()
+        self.rig = _HamlibRig(self.protocol, Logger(), clock=self.clock)
+        self.protocol.respond('dump_caps', [('Can get Frequency', 'Y'), ('Transceive', 'RIG')])
+    
+    def tearDown(self):
+        self.rig._clientConnectionLost(None)
+    
+    def respond_to_polls(self, values):
+        for command in self.protocol.outstanding_commands():
+            if command == 'set_trn':
+                self.protocol.respond(command)
+            else:
+                self.protocol.respond(command, values.get(command, []))
+    
+    def test_in_flight_limit(self):
+        self.assertEqual(len(self.protocol.outstanding_commands()), _MAX_POLLS_IN_FLIGHT + 1)  # + set_trn
+        # Nothing more is sent while the polls are unanswered.
+        self.clock.advance(10)
+        self.assertEqual(len(self.protocol.outstanding_commands()), _MAX_POLLS_IN_FLIGHT + 1)
+    
+    def test_transceive(self):
+        self.assertIn('set_trn', self.protocol.outstanding_commands())
+        self.assertFalse(self.rig.get_transceive())
+        self.protocol.respond('set_trn')
+        self.assertTrue(self.rig.get_transceive())
+    
+    def test_adaptive_interval(self):
+        """An unchanging value is polled less often than a changing one."""
+        freq = [145000000]
+        counts = {'get_freq': 0, 'get_mode': 0}
+        for _ in range(200):
+            freq[0] += 1
+            for command in self.protocol.outstanding_commands():
+                if command in counts:
+                    counts[command] += 1
+            self.respond_to_polls({
+                'get_freq': [('Frequency', str(freq[0]))],
+                'get_mode': [('Mode', 'USB'), ('Passband', '2400')],
+            })
+            self.clock.advance(_POLL_FAST_INTERVALS[0])
+        self.assertGreater(counts['get_freq'], 2 * counts['get_mode'])
+        self.assertEqual(self.rig.state()['freq'].get(), freq[0])
+
+    
+    def test_signal_polled_constantly(self):
+        """An unchanging signal level is still polled at the fast rate, unlike a setting."""
+        self.rig._clientConnectionLost(None)
+        self.protocol = _FakeProtocol()
+        self.rig = _HamlibRig(self.protocol, Logger(), clock=self.clock)
+        self.protocol.respond('dump_caps', [('Can get Frequency', 'Y'), ('Get level', 'AF(0..1/0) STRENGTH(0..0/0)')])
+        steps = 100
+        counts = {'AF': 0, 'STRENGTH': 0}
+        for _ in range(steps):
+            for level_name in self.protocol.outstanding_levels():
+                counts[level_name] += 1
+                self.protocol.respond_level(level_name, '0')
+            self.respond_to_polls({'get_freq': [('Frequency', '145000000')]})
+            self.clock.advance(_POLL_FAST_INTERVALS[0])
+        self.assertGreater(counts['STRENGTH'], steps // 2)
+        self.assertLess(counts['AF'], steps // 4)
+
+
+class _FakeProtocol(object):
+    def __init__(self):
+        self.proxy = None
+        self.sent = []  # (command, argstr, deferred)
+    
+    def _set_proxy(self, proxy):
+        self.proxy = proxy
+    
+    def rc_send(self, cmd, argstr=''):
+        d = defer.Deferred()
+        self.sent.append((cmd, argstr, d))
+        return d
+    
+    def outstanding_commands(self):
+        return [cmd for cmd, _, d in self.sent if not d.called]
+    
+    def outstanding_levels(self):
+        return [arg for cmd, arg, d in self.sent if cmd == 'get_level' and not d.called]
+    
+    def respond(self, cmd, values=()):
+        for i, (sent_cmd, _, d) in enumerate(self.sent):
+            if sent_cmd == cmd and not d.called:
+                del self.sent[i]
+                for key, value in values:
+                    self.proxy._clientReceived(cmd, key, value)
+                d.callback(0)
+                return
+        raise AssertionError('{!r} was not sent'.format(cmd))
+    
+    def respond_level(self, level_name, value_str):
+        for i, (sent_cmd, arg, d) in enumerate(self.sent):
+            if sent_cmd == 'get_level' and arg == level_name and not d.called:
+                del self.sent[i]
+                self.proxy._clientReceivedLevel(level_name, value_str)
+                d.callback(0)
+                return
+        raise AssertionError('get_level {!r} was not sent'.format(level_name))
@@ -0,0 +1,106 @@
+# Copyright 2019 Kevin Reid and the ShinySDR contributors
+#
+# This file is part of ShinySDR.
+#
+# ShinySDR is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ShinySDR is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ShinySDR.  If not, see <http://www.gnu.org/licenses/>.
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import struct
+
+from twisted.trial import unittest
+
+from gnuradio import blocks
+from gnuradio import gr
+
+from shinysdr.plugins.iqfile import IQFileDevice, _IQFileSource, _read_wav_header
+from shinysdr.testutil import DeviceTestCase
+
+
+def _write(path, data):
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def _wav(channels, format_tag, bits, sample_rate, data):
+    block_align = channels * bits // 8
+    return struct.pack('<4sI4s4sIHHIIHH4sI',
+        b'RIFF', 36 + len(data), b'WAVE',
+        b'fmt ', 16, format_tag, channels, sample_rate, sample_rate * block_align, block_align, bits,
+        b'data', len(data)) + data
+
+
+class TestIQFileDevice(DeviceTestCase):
+    def setUp(self):
+        path = self.mktemp() + '.cf32'
+        _write(path, struct.pack('<8f', *range(8)))
+        super(TestIQFileDevice, self).setUpFor(
+            device=IQFileDevice(path, sample_rate=1000, freq=1e6))
+
+    # Test methods provided by DeviceTestCase
+
+    def test_throttle_setting(self):
+        rx_driver = self.device.get_rx_driver()
+        rx_driver.state()['throttle'].set(False)
+        self.assertEqual(rx_driver.get_throttle(), False)
+
+
+class TestIQFileFormats(unittest.TestCase):
+    def read_samples(self, path, format, count, offset=0, length=None, loop=True):  # pylint: disable=redefined-builtin
+        source = _IQFileSource(path, format, offset, length, loop=loop)
+        sink = blocks.vector_sink_c()
+        tb = gr.top_block()
+        tb.connect(source, blocks.head(gr.sizeof_gr_complex, count), sink)
+        tb.run()
+        return list(sink.data())
+
+    def test_cu8(self):
+        path = self.mktemp()
+        _write(path, b'\x00\xff\x80\x7f')
+        samples = self.read_samples(path, 'cu8', 2)
+        self.assertAlmostEqual(samples[0], -1 + 1j, places=5)
+        self.assertAlmostEqual(samples[1], 0.5 / 127.5 - 0.5j / 127.5, places=5)
+
+    def test_cs16_loops(self):
+        path = self.mktemp()
+        _write(path, struct.pack('<2h', -32768, 16384))
+        self.assertEqual(self.read_samples(path, 'cs16', 3), [-1 + 0.5j] * 3)
+
+    def test_no_loop_ends(self):
+        path = self.mktemp()
+        _write(path, struct.pack('<4f', 1, 2, 3, 4))
+        self.assertEqual(self.read_samples(path, 'cf32', 10, loop=False), [1 + 2j, 3 + 4j])
+
+    def test_closed_ends(self):
+        path = self.mktemp()
+        _write(path, struct.pack('<4f', 1, 2, 3, 4))
+        source = _IQFileSource(path, 'cf32', 0, None, loop=True)
+        source.close()
+        self.assertEqual(source.get_length(), 2)
+        self.assertEqual(source.work([], [[0j] * 4]), -1)
+
+    def test_wav_header(self):
+        path = self.mktemp()
+        _write(path, _wav(2, 1, 16, 250000, b'\0' * 8))
+        self.assertEqual(_read_wav_header(path), ('cs16', 250000, 44, 8))
+
+    def test_wav_not_iq(self):
+        path = self.mktemp()
+        _write(path, _wav(1, 1, 16, 8000, b'\0' * 8))
+        self.assertRaises(ValueError, lambda: _read_wav_header(path))
+
+    def test_missing_sample_rate(self):
+        path = self.mktemp() + '.cu8'
+        _write(path, b'\0' * 4)
+        self.assertRaises(ValueError, lambda: IQFileDevice(path))
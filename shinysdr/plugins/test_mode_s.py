@@ -17,9 +17,105 @@
 
 from __future__ import absolute_import, division, print_function, unicode_literals
 
+from twisted.internet import reactor as the_reactor
+from twisted.internet import defer
+from twisted.internet.task import deferLater
+from twisted.trial import unittest
+
+from gnuradio import gr
+
+from shinysdr.plugins.mode_s import Aircraft, ModeSMessageWrapper, _MessageQueueReader, _ParsedMessageCollector, _group_by_aircraft, _unavailability
 from shinysdr.testutil import DemodulatorTestCase
 
+if not _unavailability:
+    # pylint: disable=ungrouped-imports
+    import air_modes
+
+
+# DF17 messages in the format gr-air-modes puts on its message queue: an odd airborne position and an identification (call sign SDR12345) from aircraft a1b2c3, and an identification from 123456.
+_POSITION_A = '8da1b2c3589b849556bedd2dbca3 000000 0.005 1.0'
+_IDENT_A = '8da1b2c3204c44b1cb3d353c21a4 000000 0.005 1.0'
+_IDENT_B = '8d123456204c44b1cb3d352f1531 000000 0.005 1.0'
+
 
 class TestModeS(DemodulatorTestCase):
     def setUp(self):
         self.setUpFor(mode='MODE-S', skip_if_unavailable=True)
+
+
+class TestGroupByAircraft(unittest.TestCase):
+    def test_grouping(self):
+        messages = [
+            _FakeMessage(aa=0xa1b2c3, label='a1'),
+            _FakeMessage(ecc=0x123456, label='b1'),
+            _FakeMessage(aa=0xa1b2c3, label='a2'),
+            _FakeMessage(aa=0x123456, label='b2'),
+        ]
+        self.assertEqual(
+            [(object_id, [m.label for m in group]) for object_id, group in _group_by_aircraft(messages)],
+            [('a1b2c3', ['a1', 'a2']), ('123456', ['b1', 'b2'])])
+
+    def test_empty(self):
+        self.assertEqual(_group_by_aircraft([]), [])
+
+
+class TestMessageQueueReader(unittest.TestCase):
+    timeout = 10
+
+    def setUp(self):
+        if _unavailability:
+            raise unittest.SkipTest(_unavailability)
+        self.queue = gr.msg_queue(100)
+        self.delivered = []
+        self.reader = _MessageQueueReader(self.queue, the_reactor, self.delivered.append)
+
+    def tearDown(self):
+        self.reader.stop()
+
+    @defer.inlineCallbacks
+    def test_batched_delivery(self):
+        for hex_message in [_POSITION_A, _IDENT_B, _IDENT_A]:
+            self.queue.insert_tail(gr.message_from_string(hex_message))
+        while sum(len(messages) for groups in self.delivered for _, messages in groups) < 3:
+            yield deferLater(the_reactor, 0.01, lambda: None)
+        # The messages were inserted faster than the delivery interval, so they arrive together.
+        self.assertEqual(len(self.delivered), 1)
+        self.assertEqual(
+            [(object_id, len(messages)) for object_id, messages in self.delivered[0]],
+            [('a1b2c3', 2), ('123456', 1)])
+
+
+class TestAircraft(unittest.TestCase):
+    def setUp(self):
+        if _unavailability:
+            raise unittest.SkipTest(_unavailability)
+        collector = _ParsedMessageCollector()
+        parser = air_modes.make_parser(collector)
+        for hex_message in [_POSITION_A, _IDENT_A]:
+            parser(hex_message)
+        [(self.object_id, self.messages)] = _group_by_aircraft(collector.take())
+        self.aircraft = Aircraft(self.object_id)
+        self.changes = []
+        self.aircraft.state_changed = lambda key=None: self.changes.append(key)
+
+    def test_receive_batch(self):
+        # The position cannot be decoded from one message without a receiver location; the identification after it must still be used.
+        cpr_decoder = air_modes.cpr_decoder(my_location=None)
+        self.aircraft.receive(ModeSMessageWrapper(self.object_id, self.messages, cpr_decoder, 1000.0))
+        self.assertEqual(self.aircraft.get_call(), 'SDR12345')
+        self.assertEqual(self.aircraft.get_track().latitude.value, None)
+        self.assertEqual(self.aircraft.get_last_heard_time(), 1000.0)
+        self.assertEqual(self.changes, [None])
+
+
+class _FakeMessage(object):
+    def __init__(self, aa=None, ecc=None, label=None):
+        self.data = _FakeData({} if aa is None else {'aa': aa})
+        self.ecc = ecc
+        self.label = label
+
+
+class _FakeData(dict):
+    @property
+    def fields(self):
+        return self
@@ -17,6 +17,7 @@
 
 from __future__ import absolute_import, division, print_function, unicode_literals
 
+from shinysdr.i.processpool import the_decoder_process_pool
 from shinysdr.plugins.multimon import FMAPRSDemodulator
 from shinysdr.testutil import DemodulatorTestCase
 
@@ -27,3 +28,4 @@ class TestFMAPRSDemodulator(DemodulatorTestCase):
     
     def tearDown(self):
         self.demodulator._close()  # TODO temporary kludge!!! Clean up in a way that actually works in non-tests!
+        the_decoder_process_pool.stop_idle()
@@ -17,11 +17,13 @@
 
 from __future__ import absolute_import, division, print_function, unicode_literals
 
+import numpy
 import six
 
 from twisted.trial import unittest
 
-from shinysdr.plugins.rtl_433 import RTL433Demodulator, RTL433MessageWrapper, RTL433MsgGroup, RTL433ProcessProtocol
+from shinysdr.i.processpool import the_decoder_process_pool
+from shinysdr.plugins.rtl_433 import RTL433Demodulator, RTL433MessageWrapper, RTL433MsgGroup, RTL433ProcessProtocol, set_sample_format, _encode_cs16, _encode_cu8
 from shinysdr.testutil import DemodulatorTestCase, LogTester
 
 
@@ -31,6 +33,24 @@ class TestRTL433Demodulator(DemodulatorTestCase):
     
     def tearDown(self):
         self.demodulator._close()  # TODO temporary kludge!!! Clean up in a way that actually works in non-tests!
+        the_decoder_process_pool.stop_idle()
+
+
+class TestSampleFormats(unittest.TestCase):
+    items = numpy.array([1 + 0j, -1 - 0.5j, 2 + 0j], dtype=numpy.complex64)
+    
+    def test_cs16(self):
+        self.assertEqual(
+            numpy.frombuffer(_encode_cs16(self.items), dtype='<i2').tolist(),
+            [32767, 0, -32767, -16384, 32767, 0])
+    
+    def test_cu8(self):
+        self.assertEqual(
+            numpy.frombuffer(_encode_cu8(self.items), dtype=numpy.uint8).tolist(),
+            [255, 128, 0, 64, 255, 128])
+    
+    def test_set_sample_format_invalid(self):
+        self.assertRaises(ValueError, lambda: set_sample_format('cs8'))
 
 
 class TestRTL433Protocol(unittest.TestCase):
@@ -40,7 +60,8 @@ class TestRTL433Protocol(unittest.TestCase):
     def setUp(self):
         self.log_tester = LogTester()
         self.received = []
-        self.protocol = RTL433ProcessProtocol(target=self.received.append, log=self.log_tester.log)
+        self.time = 1000
+        self.protocol = RTL433ProcessProtocol(target=self.received.append, log=self.log_tester.log, time_source=lambda: self.time)
     
     def test_success(self):
         self.protocol.outReceived(b'{"foo":"bar"}\n')
@@ -54,6 +75,32 @@ class TestRTL433Protocol(unittest.TestCase):
         self.protocol.outReceived(b'foo\n')
         self.log_tester.check(dict(text="bad JSON from rtl_433: 'foo'"))
         self.assertEqual(self.received, [])
+    
+    def test_batch_with_bad_line(self):
+        self.protocol.outReceived(b'{"a":1}\n{"b":\n2}\n{"c":3}\n')
+        self.assertEqual([w.message for w in self.received], [{'a': 1}, {'c': 3}])
+        self.assertEqual(len(self.log_tester.logged), 3)  # two bad lines and one message
+    
+    def test_partial_lines(self):
+        self.protocol.outReceived(b'{"a":1}\n{"b"')
+        self.protocol.outReceived(b':2}\n')
+        self.assertEqual([w.message for w in self.received], [{'a': 1}, {'b': 2}])
+    
+    def test_log_rate_limit(self):
+        self.protocol.outReceived(b'{"a":1}\n{"a":2}\n')
+        self.time += 5
+        self.protocol.outReceived(b'{"a":3}\n')
+        self.time += 10
+        self.protocol.outReceived(b'{"a":4}\n')
+        self.assertEqual(len(self.received), 4)
+        if six.PY2:
+            self.log_tester.check(
+                dict(text="rtl_433 message: {u'a': 1}"),
+                dict(text="rtl_433 message: {u'a': 4} (2 not logged since the last)"))
+        else:
+            self.log_tester.check(
+                dict(text="rtl_433 message: {'a': 1}"),
+                dict(text="rtl_433 message: {'a': 4} (2 not logged since the last)"))
 
 
 class TestMessageWrapperAndGroup(unittest.TestCase):
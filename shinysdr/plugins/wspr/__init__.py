@@ -22,16 +22,22 @@ from twisted.web import static
 
 from shinysdr.interfaces import ModeDef, ClientResourceDef
 
-from .demodulator import WSPRDemodulator, find_wsprd
+from .demodulator import WSPRDemodulator, find_wsprd, set_max_concurrent_decodes
+from .skimmer import WSPRSkimmerDemodulator
 
 plugin_mode = ModeDef(mode='WSPR',
     info='WSPR',
     demod_class=WSPRDemodulator,
     unavailability=None if find_wsprd() else 'wsprd not found.')
 
+plugin_mode_skimmer = ModeDef(mode='WSPR-SKIM',
+    info='WSPR skimmer (all bands)',
+    demod_class=WSPRSkimmerDemodulator,
+    unavailability=None if find_wsprd() else 'wsprd not found.')
+
 plugin_client = ClientResourceDef(
     key=__name__,
     resource=static.File(sibpath(__file__, 'client')),
     load_js_path='wspr.js')
 
-__all__ = []
+__all__ = ['set_max_concurrent_decodes']
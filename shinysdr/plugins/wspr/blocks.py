@@ -19,17 +19,18 @@
 
 from __future__ import absolute_import, division, print_function, unicode_literals
 
+import threading
 import time
+import wave
 from math import pi
 
 from twisted.internet import reactor, threads
 from twisted.logger import Logger
 
 from gnuradio import gr, blocks, analog
-from gnuradio.blocks import wavfile_sink
+import numpy
 
 from shinysdr.filters import MultistageChannelFilter
-from shinysdr.i.pycompat import defaultstr
 from shinysdr.math import dB
 
 
@@ -39,9 +40,15 @@ class WAVIntervalSink(gr.hier_block2):
     `listener` gets notified of events and decides where the files go. See
     `IWAVIntervalListener` for the interface to implement.
 
-    Whenever the current time is a round multiple of `interval`, a new file is
-    opened and samples are written there. `duration` seconds later, it's
-    closed, until the next round multiple of `interval`.
+    Whenever the current time is a round multiple of `interval`, recording
+    starts. `duration` seconds later, it stops, and the samples are written to
+    a file, until the next round multiple of `interval`.
+
+    The samples are kept in memory while recording, so that the file is
+    written in one piece (in a thread) rather than as the samples arrive, and
+    does not exist at all until it is complete. If no samples arrived at all
+    (the block is not connected to a running flow graph), no file is written
+    and the listener is not told the recording finished.
     """
 
     __log = Logger()
@@ -70,21 +77,24 @@ class WAVIntervalSink(gr.hier_block2):
         self.interval = interval
         self.listener = listener
         self.duration = duration
+        self.sample_rate = sample_rate
 
-        self._sink = wavfile_sink(
-            # There doesn't seem to be a way to create a sink without
-            # immediately opening a file :(
-            filename=defaultstr('/dev/null'),
-            n_channels=1,
-            sample_rate=sample_rate,
-            bits_per_sample=16)
+        self._buffer = _IntervalBuffer(int(duration * sample_rate))
 
-        self.connect(self, self._sink)
+        self.connect(self, self._buffer)
 
     def start_running(self):
         if self._next_delayed_call is None:
             self._schedule_next_start()
 
+    def stop_running(self):
+        """Stop recording, discarding the current recording if any."""
+        if self._next_delayed_call is not None:
+            if self._next_delayed_call.active():
+                self._next_delayed_call.cancel()
+            self._next_delayed_call = None
+        self._buffer.stop()
+
     def _schedule_next_start(self):
         now = self._time()
         time_running = now % self.interval
@@ -97,35 +107,90 @@ class WAVIntervalSink(gr.hier_block2):
 
     def _start_recording(self, start_time):
         filename = self.listener.filename(start_time)
-
-        self._deferToThread(
-            self._open_wav, filename
-        ).addCallback(
-            self.listener.fileOpened
-        ).addErrback(lambda f: self.__log.failure(failure=f))
+        self._buffer.start()
+        self.listener.fileOpened(filename)
 
         self._next_delayed_call = self._callLater(
             self.duration,
             self._stop_recording, filename)
 
     def _stop_recording(self, filename):
-        self._deferToThread(
-            self._close_wav, filename
-        ).addCallback(
-            self.listener.fileClosed
-        ).addErrback(lambda f: self.__log.failure(failure=f))
+        samples = self._buffer.stop()
+        if len(samples):
+            self._deferToThread(
+                self._write_wav, filename, samples
+            ).addCallback(
+                self.listener.fileClosed
+            ).addErrback(lambda f: self.__log.failure(failure=f))
 
         self._schedule_next_start()
 
-    def _open_wav(self, filename):
+    def _write_wav(self, filename, samples):
         # called in thread.
-        self._sink.open(filename)
+        wav = wave.open(filename, 'wb')
+        try:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(self.sample_rate)
+            wav.writeframes(samples.tobytes())
+        finally:
+            wav.close()
         return filename
 
-    def _close_wav(self, filename):
-        # called in thread.
-        self._sink.close()
-        return filename
+
+class _IntervalBuffer(gr.sync_block):
+    """Accumulates up to `capacity` samples, as 16-bit WAV samples, between
+    start() and stop(). Samples beyond the capacity are discarded.
+    """
+
+    def __init__(self, capacity):
+        gr.sync_block.__init__(
+            self,
+            name=type(self).__name__,
+            in_sig=[numpy.float32],
+            out_sig=[])
+        self.__capacity = capacity
+        self.__lock = threading.Lock()
+        self.__samples = None  # array being recorded into, or None if not recording
+        self.__length = 0
+
+    def start(self):
+        # A new array each time, since the previous one may still be being
+        # written out.
+        samples = numpy.empty(self.__capacity, dtype=_WAV_SAMPLE_TYPE)
+        with self.__lock:
+            self.__samples = samples
+            self.__length = 0
+
+    def stop(self):
+        """Stop recording and return the samples recorded."""
+        with self.__lock:
+            samples = self.__samples
+            self.__samples = None
+            if samples is None:
+                return numpy.empty(0, dtype=_WAV_SAMPLE_TYPE)
+            return samples[:self.__length]
+
+    def work(self, input_items, output_items):
+        items = input_items[0]
+        with self.__lock:
+            samples = self.__samples
+            if samples is not None:
+                length = self.__length
+                count = min(len(items), len(samples) - length)
+                samples[length:length + count] = numpy.rint(numpy.clip(items[:count], -1.0, 1.0) * 32767)
+                self.__length = length + count
+        return len(items)
+
+
+# little-endian 16-bit, as in a WAV file
+_WAV_SAMPLE_TYPE = numpy.dtype('<i2')
+
+
+# Rough allowance per output sample of WSPRFilter for the rotator, AGC, WAV
+# writing, and wsprd, which decodes each two-minute interval in a few seconds
+# of intensive computation.
+_COST_PER_OUTPUT_SAMPLE = 50
 
 
 class WSPRFilter(gr.hier_block2):
@@ -151,7 +216,8 @@ class WSPRFilter(gr.hier_block2):
             output_rate=12000,
             output_frequency=1500,
             transition_width=100,
-            width=800):
+            width=800,
+            center_freq=0):
         """Make a new WSPRFilter.
 
         input_rate: the incomming sample rate
@@ -162,6 +228,9 @@ class WSPRFilter(gr.hier_block2):
         frequency in the real output
 
         width, transition_width: passband and transition band widths.
+
+        center_freq: the frequency in the complex input which is output at
+        output_frequency, if not 0Hz.
         """
 
         gr.hier_block2.__init__(
@@ -169,14 +238,18 @@ class WSPRFilter(gr.hier_block2):
             gr.io_signature(1, 1, gr.sizeof_gr_complex),
             gr.io_signature(1, 1, gr.sizeof_float))
 
+        self.__output_rate = output_rate
+        self.__channel_filter = MultistageChannelFilter(
+            input_rate=input_rate,
+            output_rate=output_rate,
+            cutoff_freq=width / 2,
+            transition_width=transition_width,
+            center_freq=center_freq)
+
         self.connect(
             self,
 
-            MultistageChannelFilter(
-                input_rate=input_rate,
-                output_rate=output_rate,
-                cutoff_freq=width / 2,
-                transition_width=transition_width),
+            self.__channel_filter,
 
             blocks.rotator_cc(2 * pi * output_frequency / output_rate),
 
@@ -189,5 +262,12 @@ class WSPRFilter(gr.hier_block2):
 
             self)
 
+    def get_estimated_cost(self):
+        """Estimate the computation this filter performs, in complex
+        multiply-accumulates per second, including an allowance for the
+        output stages and wsprd's eventual decoding of the output.
+        """
+        return self.__channel_filter.get_estimated_cost() + self.__output_rate * _COST_PER_OUTPUT_SAMPLE
+
 
 __all__ = ['WAVIntervalSink', 'WSPRFilter']
@@ -20,11 +20,12 @@
 
 from __future__ import absolute_import, division, print_function, unicode_literals
 
+import errno
+import multiprocessing
 import os.path
-import time
-import tempfile
 import shutil
-import errno
+import tempfile
+import time
 
 import six
 
@@ -37,8 +38,10 @@ from zope.interface import implementer
 
 from shinysdr.values import ExportedState, SubscriptionContext, exported_value
 from shinysdr.i.pycompat import defaultstr
-from shinysdr.interfaces import IDemodulator, BandShape
+from shinysdr.interfaces import ICostEstimatingDemodulator, IDemodulator, BandShape
 from shinysdr.signals import SignalType
+from shinysdr.types import QuantityT
+from shinysdr import units
 
 from .blocks import WAVIntervalSink, WSPRFilter
 from .interfaces import IWAVIntervalListener
@@ -55,7 +58,59 @@ def find_wsprd():
     return None
 
 
-@implementer(IDemodulator)
+def _default_max_concurrent_decodes():
+    try:
+        return multiprocessing.cpu_count()
+    except NotImplementedError:
+        return 1
+
+
+# Limits the number of wsprd processes running at once, across all WSPR
+# demodulators. All intervals end at the same moment, so with many bands being
+# received they would otherwise all be decoded at once, competing for CPU time
+# and memory.
+_decode_semaphore = defer.DeferredSemaphore(_default_max_concurrent_decodes())
+
+
+def set_max_concurrent_decodes(limit=None):
+    """Set the maximum number of wsprd processes which may run at once.
+
+    limit: the default is the number of CPUs.
+
+    This should be called from the configuration file, before any WSPR
+    receivers are created.
+    """
+    global _decode_semaphore  # pylint: disable=global-statement
+    if limit is None:
+        limit = _default_max_concurrent_decodes()
+    _decode_semaphore = defer.DeferredSemaphore(limit)
+
+
+def _make_recording_dir():
+    """Make a temporary directory for recordings, in memory (tmpfs) if possible."""
+    shm = '/dev/shm'
+    if os.path.isdir(shm) and os.access(shm, os.W_OK | os.X_OK):
+        return tempfile.mkdtemp(prefix='shinysdr_wspr_', dir=shm)
+    else:
+        return tempfile.mkdtemp(prefix='shinysdr_wspr_')
+
+
+def _make_data_dir():
+    """Make a temporary directory on disk for wsprd's own files, which it appends to indefinitely and so must not be in memory."""
+    return tempfile.mkdtemp(prefix='shinysdr_wspr_data_')
+
+
+def _remove_dir(directory):
+    try:
+        shutil.rmtree(directory)
+    except OSError as e:
+        if e.errno == errno.ENOENT:
+            pass
+        else:
+            raise
+
+
+@implementer(IDemodulator, ICostEstimatingDemodulator)
 class WSPRDemodulator(gr.hier_block2, ExportedState):
     """Decode WSPR (Weak Signal Propagation Reporter).
 
@@ -86,7 +141,8 @@ class WSPRDemodulator(gr.hier_block2, ExportedState):
             input_rate=0,
             context=None,
 
-            _mkdtemp=tempfile.mkdtemp,
+            _mkdtemp=_make_recording_dir,
+            _make_data_dir=_make_data_dir,
             _WAVIntervalSink=WAVIntervalSink,
             _find_wsprd=find_wsprd):
         assert input_rate > 0
@@ -99,14 +155,20 @@ class WSPRDemodulator(gr.hier_block2, ExportedState):
 
         # it's not great doing this in the reactor since it could block.
         # However, so can creating GNU Radio blocks.
+        # The recording directory holds each WAV file only while wsprd is
+        # reading it. The data directory holds wsprd's own files (such as its
+        # table of callsigns from two-part transmissions, and its log of every
+        # decode, which keeps growing).
         self.__recording_dir = _mkdtemp()
+        self.__data_dir = _make_data_dir()
 
-        wspr_filter = WSPRFilter(input_rate, output_frequency=self.__audio_frequency)
+        wspr_filter = self.__wspr_filter = WSPRFilter(input_rate, output_frequency=self.__audio_frequency)
 
         self.__listener = WAVIntervalListener(
             self.__recording_dir,
             context,
             self.__audio_frequency,
+            data_directory=self.__data_dir,
             _find_wsprd=self.__find_wsprd)
 
         self.connect(
@@ -122,7 +184,9 @@ class WSPRDemodulator(gr.hier_block2, ExportedState):
     def state_def(self):
         for d in super(WSPRDemodulator, self).state_def():
             yield d
-        yield 'status', self.__listener.state()['status']
+        listener_state = self.__listener.state()
+        yield 'status', listener_state['status']
+        yield 'decode_latency', listener_state['decode_latency']
 
     def __make_wav_sink(self, context, _WAVIntervalSink):
         wav_sink = _WAVIntervalSink(
@@ -151,6 +215,10 @@ class WSPRDemodulator(gr.hier_block2, ExportedState):
         """Implement IDemodulator."""
         return SignalType(kind='MONO', sample_rate=self.__demod_rate)
 
+    def get_estimated_cost(self):
+        """Implement ICostEstimatingDemodulator."""
+        return self.__wspr_filter.get_estimated_cost()
+
     def close(self):
         """Clean up temporary files.
 
@@ -159,14 +227,11 @@ class WSPRDemodulator(gr.hier_block2, ExportedState):
         """
         if self.__recording_dir:
             recording_dir = self.__recording_dir
+            data_dir = self.__data_dir
             self.__recording_dir = None
-            try:
-                shutil.rmtree(recording_dir)
-            except OSError as e:
-                if e.errno == errno.ENOENT:
-                    pass
-                else:
-                    raise
+            self.__data_dir = None
+            _remove_dir(recording_dir)
+            _remove_dir(data_dir)
 
     def __del__(self):
         self.close()
@@ -185,16 +250,21 @@ class WAVIntervalListener(ExportedState):
     __frequency_subscription = None
     __invalidated_by_frequency_change = False
     __decoder_active = None
+    __decode_latency = 0.0
+    __log = Logger()
 
     def __init__(self,
             directory,
             context,
             audio_frequency,
+            data_directory=None,
 
             _reactor=reactor,
             _find_wsprd=find_wsprd,
-            _time=time.time):
+            _time=time.time,
+            _semaphore=None):
         self.directory = directory
+        self.data_directory = directory if data_directory is None else data_directory
         self.context = context
         self.audio_frequency = audio_frequency
         self.__wsprd = _find_wsprd()
@@ -202,6 +272,7 @@ class WAVIntervalListener(ExportedState):
             raise Exception('Could not find wsprd. Is WSJT-X installed and wsprd in $PATH?')
         self._time = _time
         self._reactor = _reactor
+        self.__semaphore = _semaphore
 
     def fileOpened(self, filename):
         rf_frequency_cell = self.context.get_absolute_frequency_cell()
@@ -228,22 +299,39 @@ class WAVIntervalListener(ExportedState):
         # wsprd expects its -f argument to be as if the recording was made with
         # a USB receiver
         dial_freq = (rf_frequency - self.audio_frequency) / 1e6
-        self.__decoder_active = defer.Deferred()
-        self.__decoder_active.addBoth(self.__decode_finished)
+        decode_time = self._time()
+        timing = {}
+        semaphore = self.__semaphore or _decode_semaphore
+        self.__decoder_active = semaphore.run(self.__run_wsprd, filename, dial_freq, decode_time, timing)
+        self.__decoder_active.addBoth(self.__decode_finished, filename, decode_time, timing)
+
+    def __run_wsprd(self, filename, dial_freq, decode_time, timing):
+        timing['started'] = self._time()
+        finished = defer.Deferred()
         self._reactor.spawnProcess(
-            WsprdProtocol(self.context, filename, self._time(), self.__decoder_active),
+            WsprdProtocol(self.context, filename, decode_time, finished),
             self.__wsprd,
-            args=['wsprd', '-d', '-f', str(dial_freq), filename],
+            args=['wsprd', '-d', '-a', self.data_directory, '-f', str(dial_freq), filename],
             env={},
-            path=self.directory)
+            path=self.data_directory)
+        return finished
 
     def __check_modified_frequency(self, value):
         if value != self.__start_frequency:
             self.__invalidated_by_frequency_change = True
             self.state_changed()
 
-    def __decode_finished(self, _unused_value):
+    def __decode_finished(self, value, filename, decode_time, timing):
         self.__decoder_active = None
+        now = self._time()
+        started = timing.get('started', now)
+        self.__decode_latency = now - decode_time
+        self.__log.debug('WSPR decode of {filename} finished in {latency:.1f} s ({waiting:.1f} s waiting for another decode to finish)',
+            filename=filename,
+            latency=now - decode_time,
+            waiting=started - decode_time)
+        self.state_changed()
+        return value
 
     def filename(self, start_time):
         # TODO: We should be using the same frequency as __start_frequency but
@@ -266,6 +354,11 @@ class WAVIntervalListener(ExportedState):
         else:
             return 'Waiting for next even minute'
 
+    @exported_value(type=QuantityT(units.s), label='Decode latency', changes='explicit')
+    def get_decode_latency(self):
+        """Time from the last recording being completed to the end of its decoding, including waiting for other decodes, in seconds."""
+        return self.__decode_latency
+
 
 class WsprdProtocol(ProcessProtocol):
     __tail = ''
@@ -339,4 +432,4 @@ class WsprdProtocol(ProcessProtocol):
         self.context.output_message(spot)
 
 
-__all__ = ['WSPRDemodulator', 'WAVIntervalListener', 'WsprdProtocol']
+__all__ = ['WSPRDemodulator', 'WAVIntervalListener', 'WsprdProtocol', 'set_max_concurrent_decodes']
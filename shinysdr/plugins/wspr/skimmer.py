@@ -0,0 +1,344 @@
+# Copyright 2019 Kevin Reid and the ShinySDR contributors
+#
+# This file is part of ShinySDR.
+#
+# ShinySDR is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ShinySDR is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ShinySDR.  If not, see <http://www.gnu.org/licenses/>.
+
+"""WSPR skimmer: decodes every WSPR band within a device's bandwidth."""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import os.path
+
+import six
+
+from gnuradio import blocks
+from gnuradio import gr
+
+from twisted.internet import reactor
+from zope.interface import implementer
+
+from shinysdr.i.blocks import DeviceChannelizer, choose_channelizer_channel_count
+from shinysdr.interfaces import BandShape, ICostEstimatingDemodulator, ITunableDemodulator
+from shinysdr.signals import no_signal
+from shinysdr.types import QuantityT
+from shinysdr import units
+from shinysdr.values import ExportedState, LooseCell, exported_value
+
+from .blocks import WAVIntervalSink, WSPRFilter
+from .demodulator import WAVIntervalListener, _make_data_dir, _make_recording_dir, _remove_dir, find_wsprd
+
+
+__all__ = []  # appended later
+
+
+# Dial frequencies (as for a USB receiver) of the WSPR bands, in Hz. The
+# transmissions are within 1400 to 1600 Hz above these.
+_WSPR_DIAL_FREQUENCIES = (
+    136000,
+    474200,
+    1836600,
+    3568600,
+    3592600,
+    5287200,
+    5364700,
+    7038600,
+    10138700,
+    14095600,
+    18104600,
+    21094600,
+    24924600,
+    28124600,
+    50293000,
+    70091000,
+    144489000,
+    432300000,
+    1296500000,
+)
+
+# Same as WSPRDemodulator.
+_AUDIO_FREQUENCY = 1500
+_AUDIO_RATE = 12000
+_INTERVAL = 120
+_DURATION = _INTERVAL - 5
+
+# Half the width of the band taken by one WSPRFilter, including its transition band.
+_BAND_HALF_WIDTH = 500
+
+# Fraction of the input bandwidth in which bands are decoded; the edges of the
+# device's passband are usually attenuated or aliased.
+_USABLE_FRACTION = 0.9
+
+
+@implementer(ITunableDemodulator, ICostEstimatingDemodulator)
+class WSPRSkimmerDemodulator(gr.hier_block2, ExportedState):
+    """Decode WSPR on every WSPR band within the input signal.
+
+    Like the AM-unsel mode, this ignores the receive frequency and uses the
+    entire RF signal. The input is split by one DeviceChannelizer, and each
+    band is filtered from the channel containing it, so a single receiver can
+    monitor many bands for little more than the cost of the channelizer.
+
+    Requires `wsprd`, as WSPRDemodulator does.
+    """
+
+    __update_call = None
+
+    def __init__(self,
+            mode='WSPR-SKIM',
+            input_rate=0,
+            context=None,
+
+            _mkdtemp=_make_recording_dir,
+            _make_data_dir=_make_data_dir,
+            _WAVIntervalSink=WAVIntervalSink,
+            _find_wsprd=find_wsprd,
+            _reactor=reactor):
+        assert input_rate > 0
+        gr.hier_block2.__init__(
+            self, type(self).__name__,
+            gr.io_signature(1, 1, gr.sizeof_gr_complex),
+            gr.io_signature(0, 0, 0))
+        self.__input_rate = input_rate
+        self.__context = context
+        self.__WAVIntervalSink = _WAVIntervalSink
+        self.__find_wsprd = _find_wsprd
+        self.__reactor = _reactor
+        self.__rec_freq_input = 0.0
+        self.__plan = None
+        self.__bands = []
+
+        # Each band gets a subdirectory of each, since wsprd's working files
+        # (such as its table of callsigns from two-part transmissions) are
+        # per-band. As in WSPRDemodulator, only the WAV files are in the
+        # recording directory.
+        self.__recording_dir = _mkdtemp()
+        self.__data_dir = _make_data_dir()
+
+        channel_count = choose_channelizer_channel_count(input_rate)
+        if channel_count is None:
+            self.__channelizer = None
+        else:
+            self.__channelizer = DeviceChannelizer(input_rate=input_rate, channel_count=channel_count)
+
+        self.__do_connect()
+
+        # The bands are chosen once we know the device frequency, which is
+        # not until the receiver has called set_rec_freq.
+        self.__schedule_update()
+
+    def __schedule_update(self):
+        if self.__update_call is None:
+            self.__update_call = self.__reactor.callLater(0, self.__update_bands)
+
+    def __update_bands(self):
+        self.__update_call = None
+        if self.__recording_dir is None:
+            return  # closed
+        device_freq = self.__context.get_absolute_frequency_cell().get() - self.__rec_freq_input
+        plan = _plan_bands(device_freq, self.__input_rate, self.__channelizer)
+        if plan == self.__plan:
+            return
+        self.__plan = plan
+
+        for band in self.__bands:
+            band.close()
+        self.__bands = [
+            _SkimmerBand(
+                dial_frequency=dial_frequency,
+                channel=channel,
+                center_freq=center_freq,
+                input_rate=self.__channelizer.get_channel_rate() if self.__channelizer else self.__input_rate,
+                directory=os.path.join(self.__recording_dir, str(dial_frequency)),
+                data_directory=os.path.join(self.__data_dir, str(dial_frequency)),
+                context=self.__context,
+                _WAVIntervalSink=self.__WAVIntervalSink,
+                _find_wsprd=self.__find_wsprd)
+            for dial_frequency, (channel, center_freq) in sorted(six.iteritems(plan))
+        ]
+
+        self.__context.lock()
+        try:
+            self.__do_connect()
+        finally:
+            self.__context.unlock()
+        self.state_changed('bands')
+        self.state_changed('band_shape')
+
+    def __do_connect(self):
+        self.disconnect_all()
+        channelizer = self.__channelizer
+        if not self.__bands:
+            self.connect(self, blocks.null_sink(gr.sizeof_gr_complex))
+        elif channelizer is None:
+            for band in self.__bands:
+                self.connect(self, band.filter, band.sink)
+        else:
+            self.connect(self, channelizer)
+            for band in self.__bands:
+                self.connect((channelizer, band.channel), band.filter, band.sink)
+            used_channels = set(band.channel for band in self.__bands)
+            for channel in six.moves.range(channelizer.get_channel_count()):
+                if channel not in used_channels:
+                    self.connect((channelizer, channel), blocks.null_sink(gr.sizeof_gr_complex))
+
+    @exported_value(type=BandShape, changes='explicit')
+    def get_band_shape(self):
+        """Implement IDemodulator."""
+        halfbw = self.__input_rate * 0.5
+        offset = self.__rec_freq_input
+        epsilon = 1  # don't be invalid in case of floating-point error
+        device_freq = self.__context.get_absolute_frequency_cell().get() - offset
+        return BandShape(
+            stop_low=-halfbw - offset,
+            stop_high=halfbw - offset,
+            pass_low=-halfbw - offset + epsilon,
+            pass_high=-halfbw - offset + epsilon,
+            markers={
+                band.dial_frequency + _AUDIO_FREQUENCY - device_freq - offset: 'WSPR'
+                for band in self.__bands
+            })
+
+    def get_output_type(self):
+        """Implement IDemodulator."""
+        return no_signal
+
+    def set_rec_freq(self, freq):
+        """Implement ITunableDemodulator."""
+        # The bands decoded depend only on the device's frequency, not the
+        # receiver's, but this is also how we find out about the device's
+        # frequency changing.
+        self.__rec_freq_input = freq
+        self.state_changed('band_shape')
+        self.__schedule_update()
+
+    def get_estimated_cost(self):
+        """Implement ICostEstimatingDemodulator."""
+        cost = sum(band.filter.get_estimated_cost() for band in self.__bands)
+        if self.__channelizer is not None:
+            cost += self.__channelizer.get_estimated_cost()
+        return cost
+
+    @exported_value(type=six.text_type, label='Bands', changes='explicit')
+    def get_bands(self):
+        if not self.__bands:
+            return 'None in range'
+        return ', '.join('%s MHz' % (band.dial_frequency / 1e6,) for band in self.__bands)
+
+    @exported_value(type=QuantityT(units.s), label='Decode latency', changes='continuous')
+    def get_decode_latency(self):
+        """The longest of the bands' last decode latencies."""
+        return max([band.listener.get_decode_latency() for band in self.__bands] or [0.0])
+
+    def close(self):
+        """Stop recording and clean up temporary files."""
+        for band in self.__bands:
+            band.close()
+        if self.__recording_dir:
+            recording_dir = self.__recording_dir
+            data_dir = self.__data_dir
+            self.__recording_dir = None
+            self.__data_dir = None
+            _remove_dir(recording_dir)
+            _remove_dir(data_dir)
+
+    def __del__(self):
+        self.close()
+
+
+__all__.append('WSPRSkimmerDemodulator')
+
+
+def _plan_bands(device_freq, input_rate, channelizer):
+    """Choose the WSPR bands to decode from a signal centered on device_freq.
+
+    Returns a dict from the dial frequency of each band to the channelizer
+    channel it is taken from (None if channelizer is None) and the band's
+    center frequency relative to that channel.
+    """
+    usable = input_rate * _USABLE_FRACTION / 2
+    plan = {}
+    for dial_frequency in _WSPR_DIAL_FREQUENCIES:
+        center = dial_frequency + _AUDIO_FREQUENCY - device_freq
+        if abs(center) + _BAND_HALF_WIDTH > usable:
+            continue
+        if channelizer is None:
+            plan[dial_frequency] = (None, center)
+        else:
+            channel = channelizer.find_channel(center - _BAND_HALF_WIDTH, center + _BAND_HALF_WIDTH)
+            if channel is None:
+                continue
+            plan[dial_frequency] = (channel, center - channelizer.get_channel_freq(channel))
+    return plan
+
+
+class _SkimmerBand(object):
+    """The filter, recorder, and decoder for one band of a WSPRSkimmerDemodulator."""
+
+    def __init__(self,
+            dial_frequency,
+            channel,
+            center_freq,
+            input_rate,
+            directory,
+            data_directory,
+            context,
+            _WAVIntervalSink,
+            _find_wsprd):
+        self.dial_frequency = dial_frequency
+        self.channel = channel
+        for d in (directory, data_directory):
+            if not os.path.isdir(d):
+                # A band's directories are kept when the bands are replaced after retuning.
+                os.mkdir(d)
+        self.filter = WSPRFilter(
+            input_rate,
+            output_rate=_AUDIO_RATE,
+            output_frequency=_AUDIO_FREQUENCY,
+            center_freq=center_freq)
+        self.listener = WAVIntervalListener(
+            directory,
+            _BandContext(context, dial_frequency + _AUDIO_FREQUENCY),
+            _AUDIO_FREQUENCY,
+            data_directory=data_directory,
+            _find_wsprd=_find_wsprd)
+        self.sink = _WAVIntervalSink(
+            interval=_INTERVAL,
+            duration=_DURATION,
+            listener=self.listener,
+            sample_rate=_AUDIO_RATE)
+        self.sink.start_running()
+
+    def close(self):
+        self.sink.stop_running()
+
+
+class _BandContext(object):
+    """What WAVIntervalListener needs of a demodulator context, for one band
+    of a skimmer: the skimmer's context, but with the band's frequency.
+    """
+
+    def __init__(self, context, frequency):
+        self.__context = context
+        self.__frequency_cell = LooseCell(
+            value=frequency,
+            type=float,
+            writable=False,
+            persists=False)
+
+    def get_absolute_frequency_cell(self):
+        return self.__frequency_cell
+
+    def output_message(self, message):
+        self.__context.output_message(message)
@@ -17,6 +17,10 @@
 
 from __future__ import absolute_import, division, print_function, unicode_literals
 
+import os
+import wave
+
+import numpy
 from zope.interface import implementer
 from zope.interface.verify import verifyObject
 
@@ -37,7 +41,9 @@ class TestWAVIntervalSink(unittest.TestCase):
     def setUp(self):
         self.clock = task.Clock()
 
-        self.listener = FakeListener()
+        directory = self.mktemp()
+        os.mkdir(directory)
+        self.listener = FakeListener(directory)
 
         self.sink = WAVIntervalSink(
             interval=120,
@@ -59,6 +65,9 @@ class TestWAVIntervalSink(unittest.TestCase):
     def advance_to_next_interval(self):
         self.clock.advance(120 - (self.clock.seconds() % 120))
 
+    def receive_samples(self, samples=(0.0,)):
+        self.sink._buffer.work([numpy.array(samples, dtype=numpy.float32)], [])
+
     def test_time(self):
         self.sink.start_running()
 
@@ -68,7 +77,8 @@ class TestWAVIntervalSink(unittest.TestCase):
 
         # start of first interval.
         self.advance_to_next_interval()
-        self.assertEqual(self.listener._filesOpened, ['120'])
+        self.assertEqual(self.listener._filesOpened, [self.listener.filename(120)])
+        self.receive_samples()
 
         # just before end of first interval.
         self.clock.advance(114)
@@ -76,12 +86,47 @@ class TestWAVIntervalSink(unittest.TestCase):
 
         # end of first interval.
         self.clock.advance(1)
-        self.assertEqual(self.listener._filesClosed, ['120'])
+        self.assertEqual(self.listener._filesClosed, [self.listener.filename(120)])
 
         # next interval begins.
         self.advance_to_next_interval()
-        self.assertEqual(self.listener._filesOpened, ['120', '240'])
-        self.assertEqual(self.listener._filesClosed, ['120'])
+        self.assertEqual(self.listener._filesOpened, [self.listener.filename(120), self.listener.filename(240)])
+        self.assertEqual(self.listener._filesClosed, [self.listener.filename(120)])
+
+    def test_wav_written_when_closed(self):
+        self.sink.start_running()
+        self.advance_to_next_interval()
+        filename = self.listener.filename(120)
+        self.assertFalse(os.path.exists(filename))
+        self.receive_samples([0.0, 0.5, -1.0, 2.0])
+
+        self.clock.advance(115)
+        wav = wave.open(filename, 'rb')
+        try:
+            self.assertEqual(wav.getnchannels(), 1)
+            self.assertEqual(wav.getsampwidth(), 2)
+            self.assertEqual(wav.getframerate(), 48000)
+            samples = numpy.frombuffer(wav.readframes(wav.getnframes()), dtype='<i2')
+        finally:
+            wav.close()
+        self.assertEqual(list(samples), [0, 16384, -32767, 32767])
+
+        # Samples between recordings are not kept, and a recording with no
+        # samples is not written.
+        self.receive_samples()
+        self.advance_to_next_interval()
+        self.clock.advance(115)
+        self.assertFalse(os.path.exists(self.listener.filename(240)))
+        self.assertEqual(self.listener._filesClosed, [filename])
+
+    def test_stop_running(self):
+        self.sink.start_running()
+        self.advance_to_next_interval()
+        self.receive_samples()
+        self.sink.stop_running()
+        self.assertFalse(self.clock.getDelayedCalls())
+        self.clock.advance(115)
+        self.assertEqual(self.listener._filesClosed, [])
 
     def test_start(self):
         # nothing is scheduled
@@ -99,17 +144,15 @@ class TestWAVIntervalSink(unittest.TestCase):
     #
     # What if interval == duration? (Currently undefined behavior)
     #
-    # What if there's an error in opening or closing the wav file?
-    #
-    # Are the interactions with the wavfile_sink block being done in a thread?
-    # They block on aquiring locks and file IO.
+    # What if there's an error in writing the wav file?
     #
     # Are the internal connections sane?
 
 
 @implementer(IWAVIntervalListener)
 class FakeListener(object):
-    def __init__(self):
+    def __init__(self, directory):
+        self._directory = directory
         self._filesOpened = []
         self._filesClosed = []
 
@@ -120,4 +163,4 @@ class FakeListener(object):
         self._filesOpened.append(filename)
 
     def filename(self, time):
-        return str(int(time))
+        return os.path.join(self._directory, str(int(time)))
@@ -86,6 +86,9 @@ class FakeContext(object):
     def get_absolute_frequency_cell(self):
         return self.__absolute_frequency_cell
 
+    def get_device_position(self):
+        return None
+
     def output_message(self, message):
         self.messages.append(message)
 
@@ -101,19 +104,25 @@ class TestIntervalListener(unittest.TestCase):
         self.clockAndSpawn = Clock()
         self.clockAndSpawn.spawnProcess = self.spawnProcess
         self.spawned = []
+        self.now = 123987901.7
+        self.semaphore = defer.DeferredSemaphore(1)
 
-        self.listener = WAVIntervalListener(
+        self.listener = self.make_listener()
+
+    def make_listener(self):
+        return WAVIntervalListener(
             self.directory,
             self.context,
             self.audio_frequency,
 
             _find_wsprd=self.find_wsprd,
             _time=self.time,
-            _reactor=self.clockAndSpawn)
+            _reactor=self.clockAndSpawn,
+            _semaphore=self.semaphore)
 
     def time(self):
         """Return some unix timestamp."""
-        return 123987901.7
+        return self.now
 
     def find_wsprd(self):
         return self.wsprd_path
@@ -165,6 +174,26 @@ class TestIntervalListener(unittest.TestCase):
         protocol.processEnded(None)
         self.assertEqual(self.listener.get_status(), _STATUS_IDLE)
 
+    def test_data_directory(self):
+        data_directory = self.mktemp()
+        os.mkdir(data_directory)
+        self.listener = WAVIntervalListener(
+            self.directory,
+            self.context,
+            self.audio_frequency,
+            data_directory=data_directory,
+
+            _find_wsprd=self.find_wsprd,
+            _time=self.time,
+            _reactor=self.clockAndSpawn,
+            _semaphore=self.semaphore)
+        self.assertEqual(os.path.dirname(self.listener.filename(1496624040.0)), self.directory)
+        self.listener.fileOpened('some file')
+        self.listener.fileClosed('some file')
+        _, _, args, _, path = self.spawned[0]
+        self.assertEqual(args[args.index('-a') + 1], data_directory)
+        self.assertEqual(path, data_directory)
+
     def test_frequency_change(self):
         """If the frequency changes during the recording, don't decode it.
 
@@ -195,6 +224,30 @@ class TestIntervalListener(unittest.TestCase):
         protocol.processEnded(None)
         self.assertEqual(self.listener.get_status(), _STATUS_RECEIVING)
 
+    def test_decode_concurrency_limit(self):
+        """Decodes beyond the limit wait for earlier ones to finish."""
+        other_listener = self.make_listener()
+        self.listener.fileOpened('some file')
+        other_listener.fileOpened('other file')
+        self.listener.fileClosed('some file')
+        other_listener.fileClosed('other file')
+        self.assertEqual(len(self.spawned), 1)
+        self.assertEqual(other_listener.get_status(), _STATUS_DECODING)
+
+        self.spawned[0][0].processEnded(None)
+        self.assertEqual(len(self.spawned), 2)
+        self.assertEqual(self.spawned[1][0].wav_filename, 'other file')
+        self.spawned[1][0].processEnded(None)
+        self.assertEqual(other_listener.get_status(), _STATUS_IDLE)
+
+    def test_decode_latency(self):
+        self.assertEqual(self.listener.get_decode_latency(), 0)
+        self.listener.fileOpened('some file')
+        self.listener.fileClosed('some file')
+        self.now += 12.5
+        self.spawned[0][0].processEnded(None)
+        self.assertEqual(self.listener.get_decode_latency(), 12.5)
+
 
 class FakeWAVIntervalSink(gr.hier_block2):
     def __init__(self, interval, duration, listener, sample_rate):
@@ -223,6 +276,7 @@ class TestDemodulatorSpecific(unittest.TestCase):
             None,
             _WAVIntervalSink=FakeWAVIntervalSink,
             _mkdtemp=self._mkdtemp,
+            _make_data_dir=self._make_data_dir,
             _find_wsprd=lambda: '/here/is/wsprd')
 
     def _mkdtemp(self):
@@ -230,6 +284,11 @@ class TestDemodulatorSpecific(unittest.TestCase):
         os.mkdir(self.tempdir)
         return self.tempdir
 
+    def _make_data_dir(self):
+        self.data_dir = self.mktemp()
+        os.mkdir(self.data_dir)
+        return self.data_dir
+
     def test_interface(self):
         demodulator = WSPRDemodulator(
             'WSPR',
@@ -241,8 +300,10 @@ class TestDemodulatorSpecific(unittest.TestCase):
 
     def test_temporary_directory(self):
         self.assertTrue(os.path.isdir(self.tempdir))
+        self.assertTrue(os.path.isdir(self.data_dir))
         self.demodulator.close()
         self.assertFalse(os.path.exists(self.tempdir))
+        self.assertFalse(os.path.exists(self.data_dir))
 
     def test_temporary_directory_already_deleted(self):
         """It's OK if the temp directory has been deleted before cleanup."""
@@ -0,0 +1,158 @@
+# Copyright 2019 Kevin Reid and the ShinySDR contributors
+#
+# This file is part of ShinySDR.
+#
+# ShinySDR is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ShinySDR is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ShinySDR.  If not, see <http://www.gnu.org/licenses/>.
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import os
+
+from zope.interface.verify import verifyObject
+
+from twisted.internet.task import Clock
+from twisted.trial import unittest
+
+from gnuradio import gr
+
+from shinysdr.i.blocks import DeviceChannelizer
+from shinysdr.interfaces import ITunableDemodulator
+from shinysdr.plugins.wspr.skimmer import WSPRSkimmerDemodulator, _plan_bands
+from shinysdr.plugins.wspr.test_demodulator import FakeContext
+
+
+class TestPlanBands(unittest.TestCase):
+    def test_bands_in_range(self):
+        # 40m and 30m are 7.0386 and 10.1387 MHz.
+        plan = _plan_bands(8.5e6, 4e6, None)
+        self.assertEqual(sorted(plan.keys()), [7038600, 10138700])
+        self.assertEqual(plan[7038600], (None, 7038600 + 1500 - 8.5e6))
+
+    def test_edge_excluded(self):
+        self.assertEqual(_plan_bands(8.5e6, 3e6, None), {})
+
+    def test_channelized(self):
+        channelizer = DeviceChannelizer(input_rate=4e6, channel_count=32)
+        plan = _plan_bands(8.5e6, 4e6, channelizer)
+        self.assertEqual(sorted(plan.keys()), [7038600, 10138700])
+        for dial_frequency, (channel, center_freq) in plan.items():
+            self.assertAlmostEqual(
+                channelizer.get_channel_freq(channel) + center_freq,
+                dial_frequency + 1500 - 8.5e6)
+            self.assertLess(abs(center_freq), channelizer.get_channel_rate() / 2)
+
+
+class TestSkimmer(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        self.context = _LockableFakeContext()
+        self.context.get_absolute_frequency_cell().set_internal(8.5e6)
+        self.sinks = []
+        self.skimmer = WSPRSkimmerDemodulator(
+            'WSPR-SKIM',
+            4e6,
+            self.context,
+            _mkdtemp=self._mkdtemp,
+            _make_data_dir=self._mkdtemp,
+            _WAVIntervalSink=self._make_sink,
+            _find_wsprd=lambda: '/here/is/wsprd',
+            _reactor=self.clock)
+
+    def tearDown(self):
+        self.skimmer.close()
+
+    def _mkdtemp(self):
+        directory = self.mktemp()
+        os.mkdir(directory)
+        return directory
+
+    def _make_sink(self, **kwargs):
+        sink = FakeWAVIntervalSink(**kwargs)
+        self.sinks.append(sink)
+        return sink
+
+    def test_interface(self):
+        verifyObject(ITunableDemodulator, self.skimmer)
+
+    def test_bands(self):
+        self.assertEqual(self.skimmer.get_bands(), 'None in range')
+        self.clock.advance(0)
+        self.assertEqual(self.skimmer.get_bands(), '7.0386 MHz, 10.1387 MHz')
+        self.assertEqual(len(self.sinks), 2)
+        self.assertTrue(all(sink.running for sink in self.sinks))
+        self.assertEqual(
+            sorted(self.skimmer.get_band_shape().markers.keys()),
+            [7038600 + 1500 - 8.5e6, 10138700 + 1500 - 8.5e6])
+
+    def test_receiver_tuning_keeps_bands(self):
+        self.clock.advance(0)
+        sinks = list(self.sinks)
+        # The receiver moves, but the device does not.
+        self.context.get_absolute_frequency_cell().set_internal(8.6e6)
+        self.skimmer.set_rec_freq(0.1e6)
+        self.clock.advance(0)
+        self.assertEqual(self.sinks, sinks)
+        self.assertTrue(all(sink.running for sink in self.sinks))
+        self.assertEqual(
+            sorted(self.skimmer.get_band_shape().markers.keys()),
+            [7038600 + 1500 - 8.6e6, 10138700 + 1500 - 8.6e6])
+
+    def test_device_tuning_replaces_bands(self):
+        self.clock.advance(0)
+        old_sinks = list(self.sinks)
+        self.context.get_absolute_frequency_cell().set_internal(14e6)
+        self.skimmer.set_rec_freq(0)
+        self.clock.advance(0)
+        self.assertEqual(self.skimmer.get_bands(), '14.0956 MHz')
+        self.assertFalse(any(sink.running for sink in old_sinks))
+
+    def test_small_device_tuning_reuses_directories(self):
+        self.clock.advance(0)
+        old_sinks = list(self.sinks)
+        # The same bands are still in range, but at different offsets.
+        self.context.get_absolute_frequency_cell().set_internal(8.51e6)
+        self.skimmer.set_rec_freq(0)
+        self.clock.advance(0)
+        self.assertEqual(self.skimmer.get_bands(), '7.0386 MHz, 10.1387 MHz')
+        self.assertFalse(any(sink.running for sink in old_sinks))
+        self.assertEqual(len(self.sinks), 4)
+        self.assertTrue(all(sink.running for sink in self.sinks[2:]))
+
+    def test_close(self):
+        self.clock.advance(0)
+        self.skimmer.close()
+        self.assertFalse(any(sink.running for sink in self.sinks))
+
+
+class _LockableFakeContext(FakeContext):
+    def lock(self):
+        pass
+
+    def unlock(self):
+        pass
+
+
+class FakeWAVIntervalSink(gr.hier_block2):
+    def __init__(self, interval, duration, listener, sample_rate):
+        gr.hier_block2.__init__(
+            self, type(self).__name__,
+            gr.io_signature(1, 1, gr.sizeof_float),
+            gr.io_signature(0, 0, 0))
+        self.running = False
+
+    def start_running(self):
+        self.running = True
+
+    def stop_running(self):
+        self.running = False
@@ -24,7 +24,7 @@ from twisted.trial import unittest
 from gnuradio import blocks
 
 # Note: not testing _ConstantVFOCell, it's just a useful utility
-from shinysdr.devices import _ConstantVFOCell, AudioDevice, Device, FrequencyShift, IDevice, PositionedDevice, _coerce_channel_mapping, find_audio_rx_names, merge_devices
+from shinysdr.devices import _ConstantVFOCell, AudioDevice, Device, FrequencyShift, IDevice, PositionedDevice, _coerce_channel_mapping, find_audio_rx_names, get_device_position, merge_devices
 from shinysdr.testutil import DeviceTestCase, StubComponent, StubRXDriver, StubTXDriver, state_smoke_test
 from shinysdr.types import RangeT
 from shinysdr.values import LooseCell, nullExportedState
@@ -230,6 +230,17 @@ class TestPositionedDevice(DeviceTestCase):
 
     # Test methods provided by DeviceTestCase
 
+    def test_get_device_position(self):
+        self.assertEqual(get_device_position(self.device), (10.0, 20.0))
+
+    def test_get_device_position_merged(self):
+        self.assertEqual(
+            get_device_position(merge_devices([Device(name='foo'), self.device])),
+            (10.0, 20.0))
+
+    def test_get_device_position_none(self):
+        self.assertEqual(get_device_position(Device(name='foo')), None)
+
 
 class _TestTXDriver(StubTXDriver):
     def __init__(self, log):
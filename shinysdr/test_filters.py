@@ -48,6 +48,12 @@ class TestMultistageChannelFilter(unittest.TestCase):
               final filter and decimate by 2 using  77 taps (1232000) in fft_filter_ccc_sptr
               No final resampler stage."""))
     
+    def test_estimated_cost(self):
+        wide = MultistageChannelFilter(input_rate=2400000, output_rate=240000, cutoff_freq=80000, transition_width=20000)
+        narrow = MultistageChannelFilter(input_rate=2400000, output_rate=8000, cutoff_freq=3000, transition_width=1200)
+        self.assertTrue(narrow.get_estimated_cost() > 0)
+        self.assertTrue(wide.get_estimated_cost() > narrow.get_estimated_cost())
+    
     def test_too_wide_cutoff(self):
         self.assertRaisesRegexp(ValueError, '500.*182', MultistageChannelFilter, input_rate=200000, output_rate=182, cutoff_freq=500, transition_width=18.2)
     
@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+
+# Copyright 2019 Kevin Reid and the ShinySDR contributors
+# 
+# This file is part of ShinySDR.
+# 
+# ShinySDR is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# ShinySDR is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with ShinySDR.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Benchmark for the APRS parser. Parses the packets in aprs_corpus.txt repeatedly and reports packets per second.
+
+A full APRS-IS feed is on the order of 100 packets per second.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import io
+import os.path
+import sys
+import time
+
+from shinysdr.plugins import aprs
+
+
+def load_corpus(path=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'aprs_corpus.txt')):
+    with io.open(path, encoding='utf-8') as f:
+        return [line.rstrip('\n') for line in f if not line.startswith('#')]
+
+
+def benchmark(lines, repetitions):
+    t0 = time.time()
+    for _ in range(repetitions):
+        receive_time = time.time()
+        for line in lines:
+            aprs.parse_tnc2(line, receive_time)
+    t1 = time.time()
+    count = len(lines) * repetitions
+    print(count, 'packets parsed in', t1 - t0, 'seconds;', count / (t1 - t0), 'packets/second')
+
+
+if __name__ == '__main__':
+    benchmark(load_corpus(), int(sys.argv[1]) if len(sys.argv) > 1 else 50)
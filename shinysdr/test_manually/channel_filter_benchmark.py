@@ -29,11 +29,20 @@ from gnuradio import blocks
 from gnuradio import gr
 
 from shinysdr.filters import MultistageChannelFilter
+from shinysdr.i.filter_cache import the_filter_design_cache
 
 
 def test_one_filter(**kwargs):
     print('------ %s -------' % (kwargs,))
+    
+    # Measure construction (filter design) time without and with cached designs.
+    the_filter_design_cache.clear()
+    t0 = time.clock()
+    MultistageChannelFilter(**kwargs)
+    t1 = time.clock()
     f = MultistageChannelFilter(**kwargs)
+    t2 = time.clock()
+    print('constructed in', t1 - t0, 'CPU-seconds uncached,', t2 - t1, 'cached')
     
     size = 10000000
     
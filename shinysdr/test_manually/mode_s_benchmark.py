@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+
+# Copyright 2019 Kevin Reid and the ShinySDR contributors
+# 
+# This file is part of ShinySDR.
+# 
+# ShinySDR is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# ShinySDR is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with ShinySDR.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Benchmark for Mode S message decoding. Parses the messages in mode_s_corpus.txt with gr-air-modes and applies them to a telemetry store, delivering them one at a time or in batches grouped by aircraft, and reports messages per second.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import io
+import os.path
+import time
+
+import air_modes
+
+from shinysdr.plugins.mode_s import ModeSMessageWrapper, _ParsedMessageCollector, _group_by_aircraft
+from shinysdr.plugins.mode_s.cpr import CPRDecoder
+from shinysdr.telemetry import TelemetryStore
+
+
+def load_corpus(path=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'mode_s_corpus.txt')):
+    with io.open(path, encoding='ascii') as f:
+        return [str(line.rstrip('\n')) for line in f if not line.startswith('#')]
+
+
+# The aircraft in the corpus are within about 160 km of this location.
+_RECEIVER_LOCATION = (37.5, -122.25)
+
+
+def benchmark(hex_messages, batch_size, my_location=_RECEIVER_LOCATION, repetitions=10):
+    print('------ batch_size=%s my_location=%s -------' % (batch_size, my_location))
+    collector = _ParsedMessageCollector()
+    parser = air_modes.make_parser(collector)
+    cpr_decoder = CPRDecoder(my_location=my_location)
+    store = TelemetryStore()
+    
+    t0 = time.time()
+    for _ in range(repetitions):
+        for start in range(0, len(hex_messages), batch_size):
+            for hex_message in hex_messages[start:start + batch_size]:
+                parser(hex_message)
+            receive_time = time.time()
+            for object_id, messages in _group_by_aircraft(collector.take()):
+                store.receive(ModeSMessageWrapper(object_id, messages, cpr_decoder, receive_time))
+    t1 = time.time()
+    
+    count = len(hex_messages) * repetitions
+    print(count, 'messages decoded in', t1 - t0, 'seconds;', count / (t1 - t0), 'messages/second')
+
+
+if __name__ == '__main__':
+    corpus = load_corpus()
+    benchmark(corpus, batch_size=1)
+    benchmark(corpus, batch_size=50)
+    benchmark(corpus, batch_size=50, my_location=None)
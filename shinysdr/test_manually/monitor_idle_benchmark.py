@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+
+# Copyright 2019 Kevin Reid and the ShinySDR contributors
+# 
+# This file is part of ShinySDR.
+# 
+# ShinySDR is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# ShinySDR is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with ShinySDR.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Benchmark for MonitorSink CPU usage with and without spectrum subscribers.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import time
+
+from gnuradio import blocks
+from gnuradio import gr
+
+from shinysdr.i.blocks import Context, MonitorSink, RecursiveLockBlockMixin
+from shinysdr.i.poller import the_subscription_context
+from shinysdr.signals import SignalType
+
+
+class _Top(gr.top_block, RecursiveLockBlockMixin):
+    pass
+
+
+def test_one_monitor(subscribed, sample_rate=2400000):
+    print('------ subscribed=%s -------' % (subscribed,))
+    size = 20000000
+    
+    top = _Top()
+    monitor = MonitorSink(
+        signal_type=SignalType(kind='IQ', sample_rate=sample_rate),
+        context=Context(top))
+    top.connect(
+        blocks.vector_source_c([5] * size),
+        monitor)
+    subscription = None
+    if subscribed:
+        _, subscription = monitor.state()['fft'].subscribe2(lambda v: None, the_subscription_context)
+    
+    t0 = time.clock()
+    top.start()
+    top.wait()
+    top.stop()
+    t1 = time.clock()
+    
+    if subscription is not None:
+        subscription.unsubscribe()
+
+    print(size, 'samples processed in', t1 - t0, 'CPU-seconds')
+
+
+if __name__ == '__main__':
+    test_one_monitor(subscribed=True)
+    test_one_monitor(subscribed=False)
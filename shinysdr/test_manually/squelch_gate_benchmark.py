@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+
+# Copyright 2019 Kevin Reid and the ShinySDR contributors
+# 
+# This file is part of ShinySDR.
+# 
+# ShinySDR is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# ShinySDR is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with ShinySDR.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Benchmark for CPU usage of squelched receivers, with and without the 'squelch_gate' feature.
+
+Receivers are placed on the simulated device with their squelch closed, and their audio goes to the client. With the feature enabled, everything after each receiver's squelch should be idle except for filling its output with zeros, so the difference should grow with the number of receivers.
+
+The reactor cannot be restarted, so run this once as is and once with the argument 'gate' to compare.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import time
+
+from twisted.internet import reactor
+
+from shinysdr.i.top import Top
+from shinysdr.plugins.simulate import SimulatedDevice
+
+
+def test_squelched_receivers(squelch_gate, count=10, duration=10.0):
+    print('------ squelch_gate=%s -------' % (squelch_gate,))
+    top = Top(
+        devices={'s1': SimulatedDevice(freq=0)},
+        features={'stereo': True, 'squelch_gate': squelch_gate})
+    for i in range(count):
+        (_key, receiver) = top.add_receiver('NFM', key='r%d' % i)
+        receiver.set_rec_freq(-90e3 + i * 9e3)
+        receiver.get_demodulator().set_squelch_threshold(0)
+    top.add_audio_callback(lambda data: None, 48000)
+    
+    t0 = time.clock()
+    reactor.callLater(duration, reactor.stop)
+    reactor.run()
+    t1 = time.clock()
+    
+    top.stop()
+    top.close_all_devices()
+    
+    print(count, 'squelched receivers used', t1 - t0, 'CPU-seconds in', duration, 'seconds')
+
+
+if __name__ == '__main__':
+    import sys
+    test_squelched_receivers(squelch_gate=(sys.argv[1:] == ['gate']))
@@ -571,6 +571,14 @@ class TestStateInsert(unittest.TestCase):
         # throws but exception is caught -- TODO: Test logging
         self.assertEqual([], list(self.object.state().keys()))
         self.flushLoggedErrors(ValueError)
+    
+    def test_nonpersistent(self):
+        table = CellDict(dynamic=True)
+        self.object = CollectionState(table)
+        table['a'] = ExportedState()
+        table.insert('b', ExportedState(), persists=False)
+        self.assertEqual(sorted(self.object.state().keys()), ['a', 'b'])
+        self.assertEqual(list(self.object.state_to_json().keys()), ['a'])
 
 
 class InsertFailSpecimen(CollectionState):
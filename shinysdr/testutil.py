@@ -48,7 +48,7 @@ from shinysdr.grc import DemodulatorAdapter
 from shinysdr.i.modes import lookup_mode
 from shinysdr.i.poller import Poller
 from shinysdr.i.pycompat import bytes_or_ascii
-from shinysdr.interfaces import IDemodulator
+from shinysdr.interfaces import ICostEstimatingDemodulator, IDemodulator
 from shinysdr.signals import SignalType
 from shinysdr.types import RangeT
 from shinysdr.values import ExportedState, InterestTracker, IDeltaSubscriber, ISubscription, SubscriptionContext, nullExportedState
@@ -335,6 +335,12 @@ class DemodulatorTestCase(unittest.TestCase):
         if self.__noop: return
         verifyObject(IDemodulator, self.demodulator)
     
+    def test_estimated_cost(self):
+        if self.__noop: return
+        if ICostEstimatingDemodulator.providedBy(self.demodulator):
+            verifyObject(ICostEstimatingDemodulator, self.demodulator)
+            self.assertTrue(self.demodulator.get_estimated_cost() > 0)
+    
     def test_state(self):
         if self.__noop: return
         state_smoke_test(self.demodulator)
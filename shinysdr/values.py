@@ -833,14 +833,10 @@ class ExportedState(object):
             cells[key].set_state(state[key])
 
 
-def unserialize_exported_state(ctor, kwargs=None, state=None):
-    all_kwargs = {}
-    if kwargs is not None:
-        # note that persistence overrides provided kwargs
-        all_kwargs.update(kwargs)
-    not_yet_set_state = {}
-    if state is not None:
-        not_yet_set_state.update(state)
+def split_constructor_state(ctor, state):
+    """Split state for an object to be constructed by ctor into (kwargs, remaining_state), where kwargs are the constructor arguments for cells declared with exported_value(parameter=...) and remaining_state is the rest, to be applied with state_from_json."""
+    ctor_kwargs = {}
+    not_yet_set_state = dict(state)
     for key, value in list(six.iteritems(not_yet_set_state)):
         getter_name = 'get_' + key  # TODO centralize or eliminate naming scheme
         if not hasattr(ctor, getter_name): continue
@@ -848,8 +844,18 @@ def unserialize_exported_state(ctor, kwargs=None, state=None):
         if not isinstance(getter, ExportedGetter): continue
         this_kwargs = getter.state_to_kwargs(value)
         if this_kwargs is None: continue
-        all_kwargs.update(this_kwargs)
+        ctor_kwargs.update(this_kwargs)
         del not_yet_set_state[key]
+    return ctor_kwargs, not_yet_set_state
+
+
+def unserialize_exported_state(ctor, kwargs=None, state=None):
+    all_kwargs = {}
+    if kwargs is not None:
+        # note that persistence overrides provided kwargs
+        all_kwargs.update(kwargs)
+    ctor_kwargs, not_yet_set_state = split_constructor_state(ctor, state or {})
+    all_kwargs.update(ctor_kwargs)
     obj = ctor(**all_kwargs)
     if len(not_yet_set_state) > 0:
         obj.state_from_json(not_yet_set_state)
@@ -895,13 +901,18 @@ class CellDict(object):
         if key in self.__cells:
             self.__cells[key].set_internal(value)
         else:
-            assert self._dynamic
-            self.__cells[key] = LooseCell(
-                value=value,
-                type=self.__member_type,
-                persists=True,
-                writable=False)
-            self._shape_subscription()
+            self.insert(key, value)
+    
+    def insert(self, key, value, persists=True):
+        """Add a new entry. If persists is false, it is omitted from the persistent state (state_to_json) of the containing object."""
+        assert self._dynamic
+        assert key not in self.__cells
+        self.__cells[key] = LooseCell(
+            value=value,
+            type=self.__member_type,
+            persists=persists,
+            writable=False)
+        self._shape_subscription()
     
     def __delitem__(self, key):
         assert self._dynamic